@@ -17,10 +17,12 @@ from oslo_log import log as logging
 
 from nova.api.openstack import api_version_request
 from nova.api.openstack import wsgi
+import nova.conf
 from nova import context
 from nova import objects
 from nova.policies import extended_volumes as ev_policies
 
+CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
 
 
@@ -65,7 +67,7 @@ class ExtendedVolumesController(wsgi.Controller):
 
         bdms = {}
         results = context.scatter_gather_cells(
-                        ctxt, cell_mappings.values(), 60,
+                        ctxt, cell_mappings.values(), CONF.api.cell_timeout,
                         objects.BlockDeviceMappingList.bdms_by_instance_uuid,
                         instance_uuids)
         for cell_uuid, result in results.items():
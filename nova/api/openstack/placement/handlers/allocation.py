@@ -193,7 +193,7 @@ def list_for_resource_provider(req):
 
 
 def _new_allocations(context, resource_provider_uuid, consumer_uuid,
-                     resources, project_id, user_id):
+                     resources, project_id, user_id, resource_providers=None):
     """Create new allocation objects for a set of resources
 
     Returns a list of Allocation objects.
@@ -205,16 +205,25 @@ def _new_allocations(context, resource_provider_uuid, consumer_uuid,
     :param resources: A dict of resource classes and values.
     :param project_id: The project consuming the resources.
     :param user_id: The user consuming the resources.
+    :param resource_providers: Optional dict, keyed by uuid, of the resource
+                               providers already loaded for the request. The
+                               resource provider is added to it when it has
+                               to be loaded.
     """
     allocations = []
-    try:
-        resource_provider = rp_obj.ResourceProvider.get_by_uuid(
-            context, resource_provider_uuid)
-    except exception.NotFound:
-        raise webob.exc.HTTPBadRequest(
-            _("Allocation for resource provider '%(rp_uuid)s' "
-              "that does not exist.") %
-            {'rp_uuid': resource_provider_uuid})
+    if resource_providers is None:
+        resource_providers = {}
+    resource_provider = resource_providers.get(resource_provider_uuid)
+    if resource_provider is None:
+        try:
+            resource_provider = rp_obj.ResourceProvider.get_by_uuid(
+                context, resource_provider_uuid)
+        except exception.NotFound:
+            raise webob.exc.HTTPBadRequest(
+                _("Allocation for resource provider '%(rp_uuid)s' "
+                  "that does not exist.") %
+                {'rp_uuid': resource_provider_uuid})
+        resource_providers[resource_provider_uuid] = resource_provider
     for resource_class in resources:
         allocation = rp_obj.Allocation(
             resource_provider=resource_provider,
@@ -317,6 +326,9 @@ def set_allocations(req):
     # happen within a single transaction and with resource provider
     # generations check all in one go.
     allocation_objects = []
+    # Load each resource provider only once, even when several consumers
+    # allocate from it.
+    resource_providers = {}
 
     for consumer_uuid in data:
         project_id = data[consumer_uuid]['project_id']
@@ -330,7 +342,8 @@ def set_allocations(req):
                                                    consumer_uuid,
                                                    resources,
                                                    project_id,
-                                                   user_id)
+                                                   user_id,
+                                                   resource_providers)
                 allocation_objects.extend(new_allocations)
         else:
             # The allocations are empty, which means wipe them out.
@@ -37,6 +37,7 @@ from sqlalchemy import sql
 from sqlalchemy.sql import null
 
 from nova.api.openstack.placement import exception
+from nova import cache_utils
 from nova.db.sqlalchemy import api as db_api
 from nova.db.sqlalchemy import api_models as models
 from nova.db.sqlalchemy import resource_class_cache as rc_cache
@@ -58,6 +59,9 @@ _CONSUMER_TBL = models.Consumer.__table__
 _RC_CACHE = None
 _TRAIT_LOCK = 'trait_sync'
 _TRAITS_SYNCED = False
+# Cache client of the inventory and usage records of resource providers, see
+# _get_cached_usages_by_provider().
+_USAGE_CACHE = None
 
 CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
@@ -281,6 +285,7 @@ def _increment_provider_generation(ctx, rp):
     res = ctx.session.execute(upd_stmt)
     if res.rowcount != 1:
         raise exception.ConcurrentUpdateDetected
+    _invalidate_usage_cache([rp.id])
     return new_generation
 
 
@@ -1063,343 +1068,214 @@ def _get_providers_with_shared_capacity(ctx, rc_id, amount):
     return [r[0] for r in ctx.session.execute(sel)]
 
 
+def _usages_by_provider_and_rc_table(resources):
+    """Returns a derived table (subquery in the FROM clause or JOIN) against
+    the allocations table, winnowed to the requested resource classes and
+    grouped by resource provider and resource class.
+
+    :param resources: Dict keyed by resource class integer ID of requested
+                      amounts of that resource
+    """
+    return sa.alias(
+        sa.select([
+            _ALLOC_TBL.c.resource_provider_id,
+            _ALLOC_TBL.c.resource_class_id,
+            sql.func.sum(_ALLOC_TBL.c.used).label('used'),
+        ]).where(
+            _ALLOC_TBL.c.resource_class_id.in_(resources),
+        ).group_by(
+            _ALLOC_TBL.c.resource_provider_id,
+            _ALLOC_TBL.c.resource_class_id
+        ),
+        name='usage',
+    )
+
+
+def _capacity_condition(inv, usages, resources):
+    """Returns a WHERE clause matching the rows of an inventories table joined
+    to a _usages_by_provider_and_rc_table() derived table that have capacity
+    for the requested amount of their resource class.
+
+    :param inv: Aliased inventories table
+    :param usages: Derived usage table from _usages_by_provider_and_rc_table()
+    :param resources: Dict keyed by resource class integer ID of requested
+                      amounts of that resource
+    """
+    usage_conds = []
+    for rc_id, amount in resources.items():
+        usage_cond = sa.and_(
+            inv.c.resource_class_id == rc_id,
+            (
+                (sql.func.coalesce(usages.c.used, 0) + amount) <=
+                (inv.c.total - inv.c.reserved) * inv.c.allocation_ratio
+            ),
+            inv.c.min_unit <= amount,
+            inv.c.max_unit >= amount,
+            amount % inv.c.step_size == 0,
+        )
+        usage_conds.append(usage_cond)
+    return sa.and_(inv.c.resource_class_id.in_(resources),
+                   sa.or_(*usage_conds))
+
+
 @db_api.api_context_manager.reader
-def _get_all_with_shared(ctx, resources, member_of=None):
-    """Uses some more advanced SQL to find providers that either have the
-    requested resources "locally" or are associated with a provider that shares
-    those requested resources.
+def _get_providers_with_capacity_by_rc(ctx, resources):
+    """Returns a dict, keyed by resource class ID, of sets of internal IDs of
+    the resource providers having capacity for the requested amount of that
+    resource class.
 
+    All requested resource classes are evaluated in a single pass over the
+    inventories table.
+
+    :param ctx: Session context to use
     :param resources: Dict keyed by resource class integer ID of requested
                       amounts of that resource
     """
-    # NOTE(jaypipes): The SQL we generate here depends on which resource
-    # classes have providers that share that resource via an aggregate.
-    #
-    # We begin building a "join chain" by starting with a projection from the
-    # resource_providers table:
-    #
-    # SELECT rp.id
-    # FROM resource_providers AS rp
-    #
-    # in addition to a copy of resource_provider_aggregates for each resource
-    # class that has a shared provider:
-    #
-    #  resource_provider_aggregates AS sharing_{RC_NAME},
-    #
-    # We then join to a copy of the inventories table for each resource we are
-    # requesting:
-    #
-    # {JOIN TYPE} JOIN inventories AS inv_{RC_NAME}
-    #  ON rp.id = inv_{RC_NAME}.resource_provider_id
-    #  AND inv_{RC_NAME}.resource_class_id = $RC_ID
-    # LEFT JOIN (
-    #  SELECT resource_provider_id, SUM(used) AS used
-    #  FROM allocations
-    #  WHERE resource_class_id = $RC_ID
-    #  GROUP BY resource_provider_id
-    # ) AS usage_{RC_NAME}
-    #  ON rp.id = usage_{RC_NAME}.resource_provider_id
-    #
-    # For resource classes that DO NOT have any shared resource providers, the
-    # {JOIN TYPE} will be an INNER join, because we are filtering out any
-    # resource providers that do not have local inventory of that resource
-    # class.
-    #
-    # For resource classes that DO have shared resource providers, the {JOIN
-    # TYPE} will be a LEFT (OUTER) join.
-    #
-    # For the first join, {JOINING TABLE} will be resource_providers. For each
-    # subsequent resource class that is added to the SQL expression, {JOINING
-    # TABLE} will be the alias of the inventories table that refers to the
-    # previously-processed resource class.
-    #
-    # For resource classes that DO have shared providers, we also perform a
-    # "butterfly join" against two copies of the resource_provider_aggregates
-    # table:
-    #
-    # +-----------+  +------------+  +-------------+  +------------+
-    # | last_inv  |  | rpa_shared |  | rpa_sharing |  | rp_sharing |
-    # +-----------|  +------------+  +-------------+  +------------+
-    # | rp_id     |=>| rp_id      |  | rp_id       |<=| id         |
-    # |           |  | agg_id     |<=| agg_id      |  |            |
-    # +-----------+  +------------+  +-------------+  +------------+
-    #
-    # Note in the diagram above, we call the _get_providers_sharing_capacity()
-    # for a resource class to construct the "rp_sharing" set/table.
-    #
-    # The first part of the butterfly join is an outer join against a copy of
-    # the resource_provider_aggregates table in order to winnow results to
-    # providers that are associated with any aggregate that the sharing
-    # provider is associated with:
-    #
-    # LEFT JOIN resource_provider_aggregates AS shared_{RC_NAME}
-    #  ON rp.id = shared_{RC_NAME}.resource_provider_id
-    #
-    # The above is then joined to the set of aggregates associated with the set
-    # of sharing providers for that resource:
-    #
-    # LEFT JOIN resource_provider_aggregates AS sharing_{RC_NAME}
-    #  ON shared_{RC_NAME}.aggregate_id = sharing_{RC_NAME}.aggregate_id
-    #  AND sharing_{RC_NAME}.resource_provider_id IN($RPS_{RC_NAME})
-    #
-    # If the request specified limiting resource providers to one or more
-    # specific aggregates, we then join the above to another copy of the
-    # aggregate table and filter on the provided aggregates.
-    #
-    # We calculate the WHERE conditions based on whether the resource class has
-    # any shared providers.
-    #
-    # For resource classes that DO NOT have any shared resource providers, the
-    # WHERE clause constructed finds resource providers that have inventory for
-    # "local" resource providers:
-    #
-    # WHERE (COALESCE(usage_vcpu.used, 0) + $AMOUNT <=
-    #   (inv_{RC_NAME}.total - inv_{RC_NAME}.reserved)
-    #   * inv_{RC_NAME}.allocation_ratio
-    # AND
-    # inv_{RC_NAME}.min_unit <= $AMOUNT AND
-    # inv_{RC_NAME}.max_unit >= $AMOUNT AND
-    # $AMOUNT % inv_{RC_NAME}.step_size == 0)
-    #
-    # For resource classes that DO have shared resource providers, the WHERE
-    # clause is slightly more complicated:
-    #
-    # WHERE (
-    #   inv_{RC_NAME}.resource_provider_id IS NOT NULL AND
-    #   (
-    #     (
-    #     COALESCE(usage_{RC_NAME}.used, 0) + $AMOUNT <=
-    #       (inv_{RC_NAME}.total - inv_{RC_NAME}.reserved)
-    #       * inv_{RC_NAME}.allocation_ratio
-    #     ) AND
-    #     inv_{RC_NAME}.min_unit <= $AMOUNT AND
-    #     inv_{RC_NAME}.max_unit >= $AMOUNT AND
-    #     $AMOUNT % inv_{RC_NAME}.step_size == 0
-    #   ) OR
-    #   sharing_{RC_NAME}.resource_provider_id IS NOT NULL
-    # )
-    #
-    # Finally, we GROUP BY the resource provider ID:
-    #
-    # GROUP BY rp.id
-    #
-    # To show an example, here is the exact SQL that will be generated in an
-    # environment that has a shared storage pool and compute nodes that have
-    # vCPU and RAM associated with the same aggregate as the provider
-    # representing the shared storage pool, and where the request specified
-    # aggregates that the compute nodes had to be associated with:
+    # The SQL we want to produce looks like this:
     #
-    # SELECT rp.id
-    # FROM resource_providers AS rp
-    # INNER JOIN inventories AS inv_vcpu
-    #  ON rp.id = inv_vcpu.resource_provider_id
-    #  AND inv_vcpu.resource_class_id = $VCPU_ID
-    # LEFT JOIN (
-    #  SELECT resource_provider_id, SUM(used) AS used
-    #  FROM allocations
-    #  WHERE resource_class_id = $VCPU_ID
-    #  GROUP BY resource_provider_id
-    # ) AS usage_vcpu
-    #  ON rp.id = usage_vcpu.resource_provider_id
-    # INNER JOIN inventories AS inv_memory_mb
-    #  ON rp.id = inv_memory_mb.resource_provider_id
-    #  AND inv_memory_mb.resource_class_id = $MEMORY_MB_ID
-    # LEFT JOIN (
-    #  SELECT resource_provider_id, SUM(used) AS used
-    #  FROM allocations
-    #  WHERE resource_class_id = $MEMORY_MB_ID
-    #  GROUP BY resource_provider_id
-    # ) AS usage_memory_mb
-    #  ON rp.id = usage_memory_mb.resource_provider_id
-    # LEFT JOIN inventories AS inv_disk_gb
-    #  ON inv_memory_mb.resource_provider_id = \
-    #       inv_disk_gb.resource_provider_id
-    #  AND inv_disk_gb.resource_class_id = $DISK_GB_ID
+    # SELECT inv.resource_provider_id, inv.resource_class_id
+    # FROM inventories AS inv
     # LEFT JOIN (
-    #  SELECT resource_provider_id, SUM(used) AS used
-    #  FROM allocations
-    #  WHERE resource_class_id = $DISK_GB_ID
-    #  GROUP BY resource_provider_id
-    # ) AS usage_disk_gb
-    #  ON rp.id = usage_disk_gb.resource_provider_id
-    # LEFT JOIN resource_provider_aggregates AS shared_disk_gb
-    #  ON rp.id = shared_disk.resource_provider_id
-    # LEFT JOIN resource_provider_aggregates AS sharing_disk_gb
-    #  ON shared_disk_gb.aggregate_id = sharing_disk_gb.aggregate_id
-    #  AND sharing_disk_gb.resource_provider_id IN ($RPS_SHARING_DISK)
-    # INNER JOIN resource_provider_aggregates AS member_aggs
-    #  ON rp.id = member_aggs.resource_provider_id
-    #  AND member_aggs.aggregate_id IN ($MEMBER_OF)
-    # WHERE (
-    #   (
-    #     COALESCE(usage_vcpu.used, 0) + $AMOUNT_VCPU <=
-    #     (inv_vcpu.total - inv_vcpu.reserved)
-    #     * inv_vcpu.allocation_ratio
-    #   ) AND
-    #   inv_vcpu.min_unit <= $AMOUNT_VCPU AND
-    #   inv_vcpu.max_unit >= $AMOUNT_VCPU AND
-    #   $AMOUNT_VCPU % inv_vcpu.step_size == 0
-    # ) AND (
-    #   (
-    #     COALESCE(usage_memory_mb.used, 0) + $AMOUNT_MEMORY_MB <=
-    #     (inv_memory_mb.total - inv_memory_mb.reserved)
-    #     * inv_memory_mb.allocation_ratio
-    #   ) AND
-    #   inv_memory_mb.min_unit <= $AMOUNT_MEMORY_MB AND
-    #   inv_memory_mb.max_unit >= $AMOUNT_MEMORY_MB AND
-    #   $AMOUNT_MEMORY_MB % inv_memory_mb.step_size == 0
-    # ) AND (
-    #   inv_disk.resource_provider_id IS NOT NULL AND
-    #   (
-    #     (
-    #       COALESCE(usage_disk_gb.used, 0) + $AMOUNT_DISK_GB <=
-    #         (inv_disk_gb.total - inv_disk_gb.reserved)
-    #         * inv_disk_gb.allocation_ratio
-    #     ) AND
-    #     inv_disk_gb.min_unit <= $AMOUNT_DISK_GB AND
-    #     inv_disk_gb.max_unit >= $AMOUNT_DISK_GB AND
-    #     $AMOUNT_DISK_GB % inv_disk_gb.step_size == 0
-    #   ) OR
-    #     sharing_disk_gb.resource_provider_id IS NOT NULL
+    #     SELECT resource_provider_id, resource_class_id, SUM(used) AS used
+    #     FROM allocations
+    #     WHERE resource_class_id IN ($RESOURCES)
+    #     GROUP BY resource_provider_id, resource_class_id
+    # ) AS usage
+    #  ON inv.resource_provider_id = usage.resource_provider_id
+    #  AND inv.resource_class_id = usage.resource_class_id
+    # WHERE inv.resource_class_id IN ($RESOURCES) AND
+    # (
+    #    inv.resource_class_id = $VCPU
+    #    AND (COALESCE(usage.used, 0) + $VCPU_REQUESTED <=
+    #         (inv.total - inv.reserved) * inv.allocation_ratio)
+    #    AND inv.min_unit <= $VCPU_REQUESTED
+    #    AND inv.max_unit >= $VCPU_REQUESTED
+    #    AND $VCPU_REQUESTED % inv.step_size = 0
+    # ) OR (
+    #    ...
     # )
-    # GROUP BY rp.id
+    inv = sa.alias(_INV_TBL, name="inv")
+    usages = _usages_by_provider_and_rc_table(resources)
 
-    rpt = sa.alias(_RP_TBL, name="rp")
+    inv_usage_join = sa.outerjoin(
+        inv, usages,
+        sa.and_(
+            inv.c.resource_provider_id == usages.c.resource_provider_id,
+            inv.c.resource_class_id == usages.c.resource_class_id,
+        ))
 
-    # Contains a set of resource provider IDs for each resource class requested
-    sharing_providers = {
-        rc_id: _get_providers_with_shared_capacity(ctx, rc_id, amount)
-        for rc_id, amount in resources.items()
-    }
+    sel = sa.select([inv.c.resource_provider_id, inv.c.resource_class_id])
+    sel = sel.select_from(inv_usage_join)
+    sel = sel.where(_capacity_condition(inv, usages, resources))
 
-    name_map = {
-        rc_id: _RC_CACHE.string_from_id(rc_id).lower() for rc_id in resources
-    }
+    res = collections.defaultdict(set)
+    for rp_id, rc_id in ctx.session.execute(sel):
+        res[rc_id].add(rp_id)
+    return res
 
-    # Dict, keyed by resource class ID, of an aliased table object for the
-    # inventories table winnowed to only that resource class.
-    inv_tables = {
-        rc_id: sa.alias(_INV_TBL, name='inv_%s' % name_map[rc_id])
-        for rc_id in resources
-    }
 
-    # Dict, keyed by resource class ID, of a derived table (subquery in the
-    # FROM clause or JOIN) against the allocations table  winnowed to only that
-    # resource class, grouped by resource provider.
-    usage_tables = {
-        rc_id: sa.alias(
-            sa.select([
-                _ALLOC_TBL.c.resource_provider_id,
-                sql.func.sum(_ALLOC_TBL.c.used).label('used'),
-            ]).where(
-                _ALLOC_TBL.c.resource_class_id == rc_id
-            ).group_by(
-                _ALLOC_TBL.c.resource_provider_id
-            ),
-            name='usage_%s' % name_map[rc_id],
-        )
-        for rc_id in resources
-    }
+@db_api.api_context_manager.reader
+def _get_providers_associated_with(ctx, rp_ids):
+    """Returns a dict, keyed by the supplied resource provider internal IDs, of
+    sets of internal IDs of the resource providers sharing an aggregate with
+    that provider. A provider with any aggregate is associated with itself.
 
-    # Dict, keyed by resource class ID, of an aliased table of
-    # resource_provider_aggregates representing the aggregates associated with
-    # a provider sharing the resource class
-    sharing_tables = {
-        rc_id: sa.alias(_RP_AGG_TBL, name='sharing_%s' % name_map[rc_id])
-        for rc_id in resources
-        if len(sharing_providers[rc_id]) > 0
-    }
+    :param ctx: Session context to use
+    :param rp_ids: Iterable of internal resource provider IDs
+    """
+    res = collections.defaultdict(set)
+    if not rp_ids:
+        return res
+    # SELECT sharing.resource_provider_id, shared.resource_provider_id
+    # FROM resource_provider_aggregates AS sharing
+    # JOIN resource_provider_aggregates AS shared
+    #  ON sharing.aggregate_id = shared.aggregate_id
+    # WHERE sharing.resource_provider_id IN ($RP_IDS)
+    sharing = sa.alias(_RP_AGG_TBL, name='sharing')
+    shared = sa.alias(_RP_AGG_TBL, name='shared')
+    sel = sa.select([sharing.c.resource_provider_id,
+                     shared.c.resource_provider_id])
+    sel = sel.select_from(sa.join(
+        sharing, shared, sharing.c.aggregate_id == shared.c.aggregate_id))
+    sel = sel.where(sharing.c.resource_provider_id.in_(rp_ids))
+    sel = sel.distinct()
+    for sharing_id, shared_id in ctx.session.execute(sel):
+        res[sharing_id].add(shared_id)
+    return res
 
-    # Dict, keyed by resource class ID, of an aliased table of
-    # resource_provider_aggregates representing the resource providers
-    # associated by aggregate to the providers sharing a particular resource
-    # class.
-    shared_tables = {
-        rc_id: sa.alias(_RP_AGG_TBL, name='shared_%s' % name_map[rc_id])
-        for rc_id in resources
-        if len(sharing_providers[rc_id]) > 0
-    }
 
-    # List of the WHERE conditions we build up by looking at the contents
-    # of the sharing providers
-    where_conds = []
-
-    # Primary selection is on the resource_providers table and all of the
-    # aliased table copies of resource_provider_aggregates for each resource
-    # being shared
-    sel = sa.select([rpt.c.id])
-
-    # The chain of joins that we eventually pass to select_from()
-    join_chain = None
-
-    for rc_id, sps in sharing_providers.items():
-        it = inv_tables[rc_id]
-        ut = usage_tables[rc_id]
-        amount = resources[rc_id]
-
-        rp_link = join_chain if join_chain is not None else rpt
-
-        # We can do a more efficient INNER JOIN when we don't have shared
-        # resource providers for this resource class
-        joiner = sa.join
-        if sps:
-            joiner = sa.outerjoin
-        # Add a join condition winnowing this copy of inventories table
-        # to only the resource class being analyzed in this loop...
-        inv_join = joiner(rp_link, it,
-            sa.and_(rpt.c.id == it.c.resource_provider_id,
-                    it.c.resource_class_id == rc_id))
-        usage_join = sa.outerjoin(inv_join, ut,
-            rpt.c.id == ut.c.resource_provider_id)
-        join_chain = usage_join
+@db_api.api_context_manager.reader
+def _get_provider_ids_in_aggregates(ctx, member_of):
+    """Returns a set of internal IDs of the resource providers that are
+    associated with any of the supplied aggregates.
 
-        usage_cond = sa.and_(
-            ((sql.func.coalesce(ut.c.used, 0) + amount) <=
-             (it.c.total - it.c.reserved) * it.c.allocation_ratio),
-            it.c.min_unit <= amount,
-            it.c.max_unit >= amount,
-            amount % it.c.step_size == 0)
-        if not sps:
-            where_conds.append(usage_cond)
+    :param ctx: Session context to use
+    :param member_of: List of aggregate UUIDs
+    """
+    sel = sa.select([_RP_AGG_TBL.c.resource_provider_id])
+    sel = sel.select_from(sa.join(
+        _RP_AGG_TBL, _AGG_TBL,
+        sa.and_(_AGG_TBL.c.id == _RP_AGG_TBL.c.aggregate_id,
+                _AGG_TBL.c.uuid.in_(member_of))))
+    return set(r[0] for r in ctx.session.execute(sel))
+
+
+@db_api.api_context_manager.reader
+def _get_all_with_shared(ctx, resources, member_of=None,
+                         sharing_providers=None):
+    """Finds providers that either have the requested resources "locally" or
+    are associated with a provider that shares those requested resources.
+
+    Returns a sorted list of resource provider internal IDs.
+
+    :param resources: Dict keyed by resource class integer ID of requested
+                      amounts of that resource
+    :param member_of: An optional list of aggregate UUIDs. If provided, only
+                      resource providers that are members of one or more of the
+                      supplied aggregates are returned.
+    :param sharing_providers: An optional dict, keyed by resource class
+                              integer ID, of lists of internal IDs of providers
+                              sharing capacity for the requested amount of that
+                              resource class. Looked up when not supplied.
+    """
+    # NOTE: Rather than building one copy of the inventories table, one usage
+    # subquery and one "butterfly" join of resource_provider_aggregates for
+    # each requested resource class, we compute the providers having capacity
+    # for every requested resource class in a single grouped pass over the
+    # inventories table, look up the providers associated by aggregate with
+    # any of the sharing providers in a second query and then combine the
+    # resulting sets of integer IDs. A provider matches when, for each
+    # requested resource class, it either has capacity for the requested
+    # amount itself or is associated with a provider sharing that capacity.
+    if sharing_providers is None:
+        sharing_providers = {
+            rc_id: _get_providers_with_shared_capacity(ctx, rc_id, amount)
+            for rc_id, amount in resources.items()
+        }
+
+    capacity = _get_providers_with_capacity_by_rc(ctx, resources)
+
+    all_sharing_ids = set()
+    for sps in sharing_providers.values():
+        all_sharing_ids |= set(sps)
+    associated = _get_providers_associated_with(ctx, all_sharing_ids)
+
+    matches = None
+    for rc_id in resources:
+        rc_matches = set(capacity[rc_id])
+        for sp_id in sharing_providers.get(rc_id, []):
+            rc_matches |= associated[sp_id]
+        if matches is None:
+            matches = rc_matches
         else:
-            sharing = sharing_tables[rc_id]
-            shared = shared_tables[rc_id]
-            cond = sa.or_(
-                sa.and_(
-                    it.c.resource_provider_id != sa.null(),
-                    usage_cond,
-                ),
-                sharing.c.resource_provider_id != sa.null())
-            where_conds.append(cond)
-
-            # We need to add the "butterfly" join now that produces the set of
-            # resource providers associated with a provider that is sharing the
-            # resource via an aggregate
-            shared_join = sa.outerjoin(join_chain, shared,
-                rpt.c.id == shared.c.resource_provider_id)
-            sharing_join = sa.outerjoin(shared_join, sharing,
-                sa.and_(
-                    shared.c.aggregate_id == sharing.c.aggregate_id,
-                    sharing.c.resource_provider_id.in_(sps),
-                ))
-            join_chain = sharing_join
+            matches &= rc_matches
+        if not matches:
+            return []
 
-    # If 'member_of' has values join with the PlacementAggregates to
-    # get those resource providers that are associated with any of the
-    # list of aggregate uuids provided with 'member_of'.
     if member_of:
-        member_join = sa.join(join_chain, _RP_AGG_TBL,
-                _RP_AGG_TBL.c.resource_provider_id == rpt.c.id)
-        agg_join = sa.join(member_join, _AGG_TBL, sa.and_(
-                _AGG_TBL.c.id == _RP_AGG_TBL.c.aggregate_id,
-                _AGG_TBL.c.uuid.in_(member_of)))
-        join_chain = agg_join
-
-    sel = sel.select_from(join_chain)
-    sel = sel.where(sa.and_(*where_conds))
-    sel = sel.group_by(rpt.c.id)
+        matches &= _get_provider_ids_in_aggregates(ctx, member_of)
 
-    return [r for r in ctx.session.execute(sel)]
+    return sorted(matches)
 
 
 @base.VersionedObjectRegistry.register_if(False)
@@ -1769,11 +1645,23 @@ def _delete_allocations_for_consumer(ctx, consumer_id):
     be written. This is wrapped in a transaction, so if the write subsequently
     fails, the deletion will also be rolled back.
     """
+    _invalidate_usage_cache_for_consumers(ctx, [consumer_id])
     del_sql = _ALLOC_TBL.delete().where(
         _ALLOC_TBL.c.consumer_id == consumer_id)
     ctx.session.execute(del_sql)
 
 
+@db_api.api_context_manager.writer
+def _delete_allocations_for_consumers(ctx, consumer_ids):
+    """Deletes any existing allocations of several consumers at once, see
+    _delete_allocations_for_consumer().
+    """
+    _invalidate_usage_cache_for_consumers(ctx, consumer_ids)
+    del_sql = _ALLOC_TBL.delete().where(
+        _ALLOC_TBL.c.consumer_id.in_(consumer_ids))
+    ctx.session.execute(del_sql)
+
+
 def _check_capacity_exceeded(ctx, allocs):
     """Checks to see if the supplied allocation records would result in any of
     the inventories involved having their capacity exceeded.
@@ -1875,6 +1763,10 @@ def _check_capacity_exceeded(ctx, allocs):
                 resource_provider=provider_str)
 
     res_providers = {}
+    # Dict, keyed by (rp_uuid, res_class), of the total amount requested by
+    # the allocations checked so far, since several consumers may be
+    # allocating the same resources of a provider.
+    amounts_needed = collections.defaultdict(int)
     for alloc in allocs:
         rc_id = _RC_CACHE.id_from_string(alloc.resource_class)
         rp_uuid = alloc.resource_provider.uuid
@@ -1913,13 +1805,14 @@ def _check_capacity_exceeded(ctx, allocs):
         # usage["used"] can be returned as None
         used = usage['used'] or 0
         capacity = (usage['total'] - usage['reserved']) * allocation_ratio
-        if capacity < (used + amount_needed):
+        amounts_needed[key] += amount_needed
+        if capacity < (used + amounts_needed[key]):
             LOG.warning(
                 "Over capacity for %(rc)s on resource provider %(rp)s. "
                 "Needed: %(needed)s, Used: %(used)s, Capacity: %(cap)s",
                 {'rc': alloc.resource_class,
                  'rp': rp_uuid,
-                 'needed': amount_needed,
+                 'needed': amounts_needed[key],
                  'used': used,
                  'cap': capacity})
             raise exception.InvalidAllocationCapacityExceeded(
@@ -1982,6 +1875,53 @@ def _ensure_user(ctx, external_id):
     return _ensure_lookup_table_entry(ctx, _USER_TBL, external_id)
 
 
+def _ensure_consumers(ctx, allocs):
+    """Ensures that there are records in the consumers, projects and users
+    tables for the consumers of the supplied allocations, like
+    Allocation.ensure_consumer_project_user() does for a single allocation,
+    looking each project, user and consumer up only once.
+
+    :param ctx: `nova.context.RequestContext` object that has the oslo.db
+                Session object in it
+    :param allocs: List of `Allocation` objects
+    """
+    # Dict of (project_id, user_id) tuples keyed by consumer UUID. Consumers
+    # whose project and user are not set are silently skipped, see
+    # Allocation.ensure_consumer_project_user().
+    consumers = {}
+    for alloc in allocs:
+        if ('project_id' in alloc and alloc.project_id is not None and
+                'user_id' in alloc and alloc.user_id is not None):
+            consumers.setdefault(alloc.consumer_id,
+                                 (alloc.project_id, alloc.user_id))
+    if not consumers:
+        return
+
+    sel_stmt = sa.select([_CONSUMER_TBL.c.uuid]).where(
+        _CONSUMER_TBL.c.uuid.in_(list(consumers)))
+    existing = set(r[0] for r in ctx.session.execute(sel_stmt))
+
+    project_ids = {}
+    user_ids = {}
+    for consumer_id, (project_id, user_id) in consumers.items():
+        if consumer_id in existing:
+            continue
+        if project_id not in project_ids:
+            project_ids[project_id] = _ensure_project(ctx, project_id)
+        if user_id not in user_ids:
+            user_ids[user_id] = _ensure_user(ctx, user_id)
+        try:
+            ctx.session.execute(_CONSUMER_TBL.insert().values(
+                uuid=consumer_id,
+                project_id=project_ids[project_id],
+                user_id=user_ids[user_id]))
+        except db_exc.DBDuplicateEntry:
+            # We assume at this time that a consumer project/user can't
+            # change, so if we get here, we raced and should just pass
+            # if the consumer already exists.
+            pass
+
+
 @db_api.api_context_manager.reader
 def _get_allocations_by_provider_id(ctx, rp_id):
     allocs = sa.alias(_ALLOC_TBL, name="a")
@@ -2066,8 +2006,7 @@ class AllocationList(base.ObjectListBase, base.VersionedObject):
         # provides a clean slate for the consumers mentioned in the list of
         # allocations being manipulated.
         consumer_ids = set(alloc.consumer_id for alloc in allocs)
-        for consumer_id in consumer_ids:
-            _delete_allocations_for_consumer(context, consumer_id)
+        _delete_allocations_for_consumers(context, consumer_ids)
 
         # Before writing any allocation records, we check that the submitted
         # allocations do not cause any inventory capacity to be exceeded for
@@ -2091,7 +2030,7 @@ class AllocationList(base.ObjectListBase, base.VersionedObject):
         visited_rps = _check_capacity_exceeded(context,
                                                [alloc for alloc in
                                                 allocs if alloc.used > 0])
-        seen_consumers = set()
+        new_allocs = []
         for alloc in allocs:
             # If alloc.used is set to zero that is a signal that we don't want
             # to (re-)create any allocations for this resource class.
@@ -2103,20 +2042,19 @@ class AllocationList(base.ObjectListBase, base.VersionedObject):
                 rp = alloc.resource_provider
                 visited_rps[rp.uuid] = rp
                 continue
-            consumer_id = alloc.consumer_id
-            # Only set consumer <-> project/user association if we haven't set
-            # it already.
-            if consumer_id not in seen_consumers:
-                alloc.ensure_consumer_project_user(context)
-                seen_consumers.add(consumer_id)
-            rp = alloc.resource_provider
-            rc_id = _RC_CACHE.id_from_string(alloc.resource_class)
-            ins_stmt = _ALLOC_TBL.insert().values(
-                    resource_provider_id=rp.id,
-                    resource_class_id=rc_id,
-                    consumer_id=consumer_id,
-                    used=alloc.used)
-            context.session.execute(ins_stmt)
+            new_allocs.append(alloc)
+
+        # Set the consumer <-> project/user associations and write the
+        # allocation records of all of the consumers at once.
+        _ensure_consumers(context, new_allocs)
+        if new_allocs:
+            context.session.execute(_ALLOC_TBL.insert(), [
+                {'resource_provider_id': alloc.resource_provider.id,
+                 'resource_class_id': _RC_CACHE.id_from_string(
+                     alloc.resource_class),
+                 'consumer_id': alloc.consumer_id,
+                 'used': alloc.used}
+                for alloc in new_allocs])
 
         # Generation checking happens here. If the inventory for this resource
         # provider changed out from under us, this will raise a
@@ -2229,6 +2167,13 @@ class UsageList(base.ObjectListBase, base.VersionedObject):
     @staticmethod
     @db_api.api_context_manager.reader
     def _get_all_by_resource_provider_uuid(context, rp_uuid):
+        if CONF.placement.usage_cache_time:
+            sel = sa.select([_RP_TBL.c.id]).where(_RP_TBL.c.uuid == rp_uuid)
+            rp_ids = [r[0] for r in context.session.execute(sel)]
+            return [dict(resource_class_id=usage['resource_class_id'],
+                         usage=usage['used'] or 0)
+                    for usage in _get_cached_usages_by_provider(context,
+                                                                rp_ids)]
         query = (context.session.query(models.Inventory.resource_class_id,
                  func.coalesce(func.sum(models.Allocation.used), 0))
                  .join(models.ResourceProvider,
@@ -2654,12 +2599,107 @@ class ProviderSummary(base.VersionedObject):
         return set(res.resource_class for res in self.resources)
 
 
+def _get_usage_cache():
+    global _USAGE_CACHE
+    if _USAGE_CACHE is None:
+        _USAGE_CACHE = cache_utils.get_client(
+            expiration_time=CONF.placement.usage_cache_time)
+    return _USAGE_CACHE
+
+
+def _usage_cache_key(rp_id):
+    return 'placement-usage-%d' % rp_id
+
+
+def _invalidate_usage_cache(rp_ids):
+    """Removes the cached inventory and usage records of resource providers.
+
+    :param rp_ids: Iterable of resource provider internal IDs
+    """
+    if not CONF.placement.usage_cache_time:
+        return
+    keys = [_usage_cache_key(rp_id) for rp_id in rp_ids]
+    if keys:
+        _get_usage_cache().delete_multi(keys)
+
+
+def _invalidate_usage_cache_for_consumers(ctx, consumer_ids):
+    """Removes the cached inventory and usage records of the resource
+    providers the supplied consumers have allocations against. Deleting
+    allocations doesn't increment the generation of those providers.
+    """
+    if not CONF.placement.usage_cache_time:
+        return
+    sel = sa.select([_ALLOC_TBL.c.resource_provider_id])
+    sel = sel.where(_ALLOC_TBL.c.consumer_id.in_(consumer_ids)).distinct()
+    _invalidate_usage_cache(r[0] for r in ctx.session.execute(sel))
+
+
+@db_api.api_context_manager.reader
+def _get_cached_usages_by_provider(ctx, rp_ids):
+    """Returns a list of usage records, in the format returned by
+    _get_usages_by_provider_and_rc(), for all the resource classes of the
+    supplied resource providers.
+
+    The records of each provider are cached along with its generation, so
+    only the providers whose generation changed since they were last read have
+    their usages summed from the allocations table. There is a single cache
+    entry per provider, replaced when its generation changes.
+
+    :param ctx: Session context to use
+    :param rp_ids: List of resource provider internal IDs
+    """
+    if not rp_ids:
+        return []
+    sel = sa.select([_RP_TBL.c.id, _RP_TBL.c.generation]).where(
+        _RP_TBL.c.id.in_(rp_ids))
+    generations = dict(ctx.session.execute(sel).fetchall())
+    if not generations:
+        return []
+
+    cache = _get_usage_cache()
+    rp_ids = list(generations)
+    usages = []
+    missing = []
+    cached = cache.get_multi([_usage_cache_key(rp_id) for rp_id in rp_ids])
+    for rp_id, entry in zip(rp_ids, cached):
+        # Entries cached under an older generation of the provider are
+        # outdated and get replaced below.
+        if entry is None or entry[0] != generations[rp_id]:
+            missing.append(rp_id)
+        else:
+            usages.extend(entry[1])
+
+    if missing:
+        records_by_rp = collections.defaultdict(list)
+        for usage in _get_usages_from_db(ctx, missing):
+            records_by_rp[usage['resource_provider_id']].append(dict(usage))
+        for rp_id in missing:
+            records = records_by_rp[rp_id]
+            cache.set(_usage_cache_key(rp_id), (generations[rp_id], records))
+            usages.extend(records)
+    return usages
+
+
 @db_api.api_context_manager.reader
 def _get_usages_by_provider_and_rc(ctx, rp_ids, rc_ids):
     """Returns a row iterator of usage records grouped by resource provider ID
     and resource class ID for all resource providers and resource classes
     involved in our request
     """
+    if not CONF.placement.usage_cache_time:
+        return _get_usages_from_db(ctx, rp_ids, rc_ids)
+    rc_ids = set(rc_ids)
+    return [usage for usage in _get_cached_usages_by_provider(ctx, rp_ids)
+            if usage['resource_class_id'] in rc_ids]
+
+
+@db_api.api_context_manager.reader
+def _get_usages_from_db(ctx, rp_ids, rc_ids=None):
+    """Returns a list of usage records grouped by resource provider ID and
+    resource class ID for the supplied resource providers and, if supplied,
+    resource classes, as read from the database.
+    """
     # We build up a SQL expression that looks like this:
     # SELECT
     #   rp.id as resource_provider_id
@@ -2684,8 +2724,15 @@ def _get_usages_by_provider_and_rc(ctx, rp_ids, rc_ids):
     #   AND inv.resource_class_id = usage.resource_class_id
     # WHERE rp.id IN ($rp_ids)
     # AND inv.resource_class_id IN ($rc_ids)
+    #
+    # The resource_class_id conditions are left out when rc_ids is None.
     rpt = sa.alias(_RP_TBL, name="rp")
     inv = sa.alias(_INV_TBL, name="inv")
+    usage_conds = [_ALLOC_TBL.c.resource_provider_id.in_(rp_ids)]
+    where_conds = [rpt.c.id.in_(rp_ids)]
+    if rc_ids is not None:
+        usage_conds.append(_ALLOC_TBL.c.resource_class_id.in_(rc_ids))
+        where_conds.append(inv.c.resource_class_id.in_(rc_ids))
     # Build our derived table (subquery in the FROM clause) that sums used
     # amounts for resource provider and resource class
     usage = sa.alias(
@@ -2694,10 +2741,7 @@ def _get_usages_by_provider_and_rc(ctx, rp_ids, rc_ids):
             _ALLOC_TBL.c.resource_class_id,
             sql.func.sum(_ALLOC_TBL.c.used).label('used'),
         ]).where(
-            sa.and_(
-                _ALLOC_TBL.c.resource_provider_id.in_(rp_ids),
-                _ALLOC_TBL.c.resource_class_id.in_(rc_ids),
-            ),
+            sa.and_(*usage_conds),
         ).group_by(
             _ALLOC_TBL.c.resource_provider_id,
             _ALLOC_TBL.c.resource_class_id
@@ -2723,9 +2767,7 @@ def _get_usages_by_provider_and_rc(ctx, rp_ids, rc_ids):
         inv.c.reserved,
         inv.c.allocation_ratio,
         usage.c.used,
-    ]).select_from(usage_join).where(
-        sa.and_(rpt.c.id.in_(rp_ids),
-                inv.c.resource_class_id.in_(rc_ids)))
+    ]).select_from(usage_join).where(sa.and_(*where_conds))
     return ctx.session.execute(query).fetchall()
 
 
@@ -2823,97 +2865,74 @@ def _get_provider_ids_matching_all(ctx, resources, required_traits,
         if not trait_rps:
             return []
 
-    rpt = sa.alias(_RP_TBL, name="rp")
-
-    rc_name_map = {
-        rc_id: _RC_CACHE.string_from_id(rc_id).lower() for rc_id in resources
-    }
-
-    # Dict, keyed by resource class ID, of an aliased table object for the
-    # inventories table winnowed to only that resource class.
-    inv_tables = {
-        rc_id: sa.alias(_INV_TBL, name='inv_%s' % rc_name_map[rc_id])
-        for rc_id in resources
-    }
-
-    # Dict, keyed by resource class ID, of a derived table (subquery in the
-    # FROM clause or JOIN) against the allocations table winnowed to only that
-    # resource class, grouped by resource provider.
-    usage_tables = {
-        rc_id: sa.alias(
-            sa.select([
-                _ALLOC_TBL.c.resource_provider_id,
-                sql.func.sum(_ALLOC_TBL.c.used).label('used'),
-            ]).where(
-                _ALLOC_TBL.c.resource_class_id == rc_id
-            ).group_by(
-                _ALLOC_TBL.c.resource_provider_id
-            ),
-            name='usage_%s' % rc_name_map[rc_id],
-        )
-        for rc_id in resources
-    }
-
-    sel = sa.select([rpt.c.id])
-
-    # List of the WHERE conditions we build up by iterating over the requested
-    # resources
-    where_conds = []
-
-    # First filter by the resource providers that had all the required traits
-    if trait_rps:
-        where_conds.append(rpt.c.id.in_(trait_rps))
-
-    # The chain of joins that we eventually pass to select_from()
-    join_chain = rpt
-
-    for rc_id, amount in resources.items():
-        inv_by_rc = inv_tables[rc_id]
-        usage_by_rc = usage_tables[rc_id]
-
-        # We can do a more efficient INNER JOIN because we don't have shared
-        # resource providers to deal with
-        rp_inv_join = sa.join(
-            join_chain, inv_by_rc,
-            sa.and_(
-                inv_by_rc.c.resource_provider_id == rpt.c.id,
-                # Add a join condition winnowing this copy of inventories table
-                # to only the resource class being analyzed in this loop...
-                inv_by_rc.c.resource_class_id == rc_id,
-            ),
-        )
-        rp_inv_usage_join = sa.outerjoin(
-            rp_inv_join, usage_by_rc,
-            inv_by_rc.c.resource_provider_id ==
-                usage_by_rc.c.resource_provider_id,
-        )
-        join_chain = rp_inv_usage_join
+    # The SQL we want to produce looks like this:
+    #
+    # SELECT inv.resource_provider_id
+    # FROM inventories AS inv
+    # LEFT JOIN (
+    #     SELECT resource_provider_id, resource_class_id, SUM(used) AS used
+    #     FROM allocations
+    #     WHERE resource_class_id IN ($RESOURCES)
+    #     GROUP BY resource_provider_id, resource_class_id
+    # ) AS usage
+    #  ON inv.resource_provider_id = usage.resource_provider_id
+    #  AND inv.resource_class_id = usage.resource_class_id
+    # INNER JOIN resource_provider_aggregates AS member_aggs
+    #  ON inv.resource_provider_id = member_aggs.resource_provider_id
+    # INNER JOIN placement_aggregates AS aggs
+    #  ON aggs.id = member_aggs.aggregate_id
+    #  AND aggs.uuid IN ($MEMBER_OF)
+    # WHERE inv.resource_class_id IN ($RESOURCES) AND
+    # (
+    #    inv.resource_class_id = $VCPU
+    #    AND (COALESCE(usage.used, 0) + $VCPU_REQUESTED <=
+    #         (inv.total - inv.reserved) * inv.allocation_ratio)
+    #    AND inv.min_unit <= $VCPU_REQUESTED
+    #    AND inv.max_unit >= $VCPU_REQUESTED
+    #    AND $VCPU_REQUESTED % inv.step_size = 0
+    # ) OR (
+    #    ...
+    # )
+    # AND inv.resource_provider_id IN ($TRAIT_RPS)
+    # GROUP BY inv.resource_provider_id
+    # HAVING COUNT(DISTINCT inv.resource_class_id) = $NUM_RESOURCES
+    inv = sa.alias(_INV_TBL, name="inv")
+    usages = _usages_by_provider_and_rc_table(resources)
 
-        usage_cond = sa.and_(
-            (
-            (sql.func.coalesce(usage_by_rc.c.used, 0) + amount) <=
-            (inv_by_rc.c.total - inv_by_rc.c.reserved) *
-                inv_by_rc.c.allocation_ratio
-            ),
-            inv_by_rc.c.min_unit <= amount,
-            inv_by_rc.c.max_unit >= amount,
-            amount % inv_by_rc.c.step_size == 0,
-        )
-        where_conds.append(usage_cond)
+    join_chain = sa.outerjoin(
+        inv, usages,
+        sa.and_(
+            inv.c.resource_provider_id == usages.c.resource_provider_id,
+            inv.c.resource_class_id == usages.c.resource_class_id,
+        ))
 
     # If 'member_of' has values join with the PlacementAggregates to
     # get those resource providers that are associated with any of the
-    # list of aggregate uuids provided with 'member_of'.
+    # list of aggregate uuids provided with 'member_of'. A provider in several
+    # of those aggregates yields duplicate rows, which the COUNT(DISTINCT)
+    # below accounts for.
     if member_of:
         member_join = sa.join(join_chain, _RP_AGG_TBL,
-                _RP_AGG_TBL.c.resource_provider_id == rpt.c.id)
+                _RP_AGG_TBL.c.resource_provider_id ==
+                    inv.c.resource_provider_id)
         agg_join = sa.join(member_join, _AGG_TBL, sa.and_(
                 _AGG_TBL.c.id == _RP_AGG_TBL.c.aggregate_id,
                 _AGG_TBL.c.uuid.in_(member_of)))
         join_chain = agg_join
 
+    where_conds = [_capacity_condition(inv, usages, resources)]
+
+    # First filter by the resource providers that had all the required traits
+    if trait_rps:
+        where_conds.append(inv.c.resource_provider_id.in_(trait_rps))
+
+    sel = sa.select([inv.c.resource_provider_id])
     sel = sel.select_from(join_chain)
     sel = sel.where(sa.and_(*where_conds))
+    sel = sel.group_by(inv.c.resource_provider_id)
+    sel = sel.having(
+        sql.func.count(
+            sql.func.distinct(inv.c.resource_class_id)) == len(resources))
 
     return [r[0] for r in ctx.session.execute(sel)]
 
@@ -3007,19 +3026,7 @@ def _get_trees_matching_all_resources(ctx, resources):
 
     # Derived table containing usage numbers for all resource providers for
     # each resource class involved in the request
-    usages = sa.alias(
-        sa.select([
-            _ALLOC_TBL.c.resource_provider_id,
-            _ALLOC_TBL.c.resource_class_id,
-            sql.func.sum(_ALLOC_TBL.c.used).label('used'),
-        ]).where(
-            _ALLOC_TBL.c.resource_class_id.in_(resources),
-        ).group_by(
-            _ALLOC_TBL.c.resource_provider_id,
-            _ALLOC_TBL.c.resource_class_id
-        ),
-        name='usage',
-    )
+    usages = _usages_by_provider_and_rc_table(resources)
 
     sel = sa.select([rpt.c.root_provider_id])
 
@@ -3033,24 +3040,8 @@ def _get_trees_matching_all_resources(ctx, resources):
                 usages.c.resource_class_id,
         ))
 
-    usage_conds = []
-    for rc_id, amount in resources.items():
-        usage_cond = sa.and_(
-            inv.c.resource_class_id == rc_id,
-            (
-                (sql.func.coalesce(usages.c.used, 0) + amount) <=
-                (inv.c.total - inv.c.reserved) * inv.c.allocation_ratio
-            ),
-            inv.c.min_unit <= amount,
-            inv.c.max_unit >= amount,
-            amount % inv.c.step_size == 0,
-        )
-        usage_conds.append(usage_cond)
-
     sel = sel.select_from(rp_inv_usage_join)
-    sel = sel.where(
-        sa.and_(inv.c.resource_class_id.in_(resources),
-                sa.or_(*usage_conds)))
+    sel = sel.where(_capacity_condition(inv, usages, resources))
     sel = sel.group_by(rpt.c.root_provider_id)
     sel = sel.having(
         sql.func.count(
@@ -3117,57 +3108,6 @@ def _build_provider_summaries(context, usages, prov_traits):
     return summaries
 
 
-def _aggregates_associated_with_providers(a, b, prov_aggs):
-    """quickly check if the two rps are in the same aggregates
-
-    :param a: resource provider ID for first provider
-    :param b: resource provider ID for second provider
-    :param prov_aggs: a dict keyed by resource provider IDs, of sets
-                      of aggregate ids associated with that provider
-    """
-    a_aggs = prov_aggs[a]
-    b_aggs = prov_aggs[b]
-    return a_aggs & b_aggs
-
-
-def _shared_allocation_request_resources(ctx, ns_rp_id, requested_resources,
-                                         sharing, summaries, prov_aggs):
-    """Returns a dict, keyed by resource class ID, of lists of
-    AllocationRequestResource objects that represent resources that are
-    provided by a sharing provider.
-
-    :param ctx: nova.context.RequestContext object
-    :param ns_rp_id: an internal ID of a non-sharing resource provider
-    :param requested_resources: dict, keyed by resource class ID, of amounts
-                                being requested for that resource class
-    :param sharing: dict, keyed by resource class ID, of lists of resource
-                    provider IDs that share that resource class and can
-                    contribute to the overall allocation request
-    :param summaries: dict, keyed by resource provider ID, of ProviderSummary
-                      objects containing usage and trait information for
-                      resource providers involved in the overall request
-    :param prov_aggs: dict, keyed by resource provider ID, of sets of
-                      aggregate ids associated with that provider.
-    """
-    res_requests = collections.defaultdict(list)
-    for rc_id in sharing:
-        for rp_id in sharing[rc_id]:
-            aggs_in_both = _aggregates_associated_with_providers(
-                ns_rp_id, rp_id, prov_aggs)
-            if not aggs_in_both:
-                continue
-            summary = summaries[rp_id]
-            rp_uuid = summary.resource_provider.uuid
-            res_req = AllocationRequestResource(
-                ctx,
-                resource_provider=ResourceProvider(ctx, uuid=rp_uuid),
-                resource_class=_RC_CACHE.string_from_id(rc_id),
-                amount=requested_resources[rc_id],
-            )
-            res_requests[rc_id].append(res_req)
-    return res_requests
-
-
 def _allocation_request_for_provider(ctx, requested_resources, rp_uuid):
     """Returns an AllocationRequest object containing AllocationRequestResource
     objects for each resource class in the supplied requested resources dict.
@@ -3187,7 +3127,42 @@ def _allocation_request_for_provider(ctx, requested_resources, rp_uuid):
     return AllocationRequest(ctx, resource_requests=resource_requests)
 
 
-def _alloc_candidates_no_shared(ctx, requested_resources, rp_ids):
+def _limit_candidates(candidates, limit=None, randomize=False):
+    """Returns a list of at most limit candidates consumed from the supplied
+    iterable, which is only advanced as far as needed.
+
+    When randomize is False the first limit candidates are returned. When it
+    is True a random sample of limit candidates is returned in random order,
+    which is drawn by reservoir sampling so that only limit candidates are
+    held in memory at any time.
+
+    :param candidates: An iterable, possibly a generator, of candidates
+    :param limit: An optional maximum number of candidates to return
+    :param randomize: Whether to randomly sample and order the candidates
+    """
+    if not limit:
+        chosen = list(candidates)
+    elif not randomize:
+        return list(itertools.islice(candidates, limit))
+    else:
+        chosen = []
+        for i, candidate in enumerate(candidates):
+            if i < limit:
+                chosen.append(candidate)
+                continue
+            # Replace a random member of the reservoir with a probability of
+            # limit / (i + 1), which keeps every candidate seen so far
+            # equally likely to be in the sample.
+            j = random.randint(0, i)
+            if j < limit:
+                chosen[j] = candidate
+    if randomize:
+        random.shuffle(chosen)
+    return chosen
+
+
+def _alloc_candidates_no_shared(ctx, requested_resources, rp_ids,
+                                limit=None, randomize=False):
     """Returns a tuple of (allocation requests, provider summaries) for a
     supplied set of requested resource amounts and resource providers. The
     supplied resource providers have capacity to satisfy ALL of the resources
@@ -3205,7 +3180,13 @@ def _alloc_candidates_no_shared(ctx, requested_resources, rp_ids):
                                 being requested for that resource class
     :param rp_ids: List of resource provider IDs for providers that matched the
                    requested resources
+    :param limit: An optional maximum number of allocation requests to return
+    :param randomize: Whether to randomly sample and order the allocation
+                      requests
     """
+    # Each provider is a candidate on its own, so we pick the providers to
+    # return before looking up anything about them.
+    rp_ids = _limit_candidates(rp_ids, limit, randomize)
     if not rp_ids:
         return [], []
     # Grab usage summaries for each provider and resource class requested
@@ -3233,8 +3214,100 @@ def _alloc_candidates_no_shared(ctx, requested_resources, rp_ids):
     return alloc_requests, list(summaries.values())
 
 
+def _shared_candidates(requested_rc_ids, required_traits, ns_rp_ids, sharing,
+                       prov_rc_ids, prov_aggregates, prov_traits):
+    """Generates allocation candidates combining the resources of non-sharing
+    providers with the resources of the providers sharing with them.
+
+    Each candidate is a tuple of (resource class ID, resource provider ID)
+    pairs, one for each resource class supplied by the candidate. Candidates
+    are yielded lazily so that the caller can stop consuming them early.
+
+    :param requested_rc_ids: List of requested resource class IDs
+    :param required_traits: A map, keyed by trait string name, of required
+                            trait internal IDs that each candidate's set of
+                            providers must collectively have associated with
+                            them
+    :param ns_rp_ids: List of resource provider IDs for providers that are NOT
+                      sharing a resource
+    :param sharing: dict, keyed by resource class ID, of a set of resource
+                    provider IDs that share that resource class
+    :param prov_rc_ids: dict, keyed by resource provider ID, of sets of the
+                        requested resource class IDs the provider has
+                        inventory for
+    :param prov_aggregates: dict, keyed by resource provider ID, of sets of
+                            aggregate ids associated with that provider
+    :param prov_traits: dict, keyed by resource provider ID, of string trait
+                        names associated with that provider
+    """
+    required_trait_names = set(required_traits)
+    prov_trait_names = {
+        rp_id: set(traits) for rp_id, traits in prov_traits.items()
+    }
+
+    # The set of frozensets of provider internal IDs of the candidates yielded
+    # so far. This is used to ensure we don't end up having allocation
+    # requests with duplicate sets of resource providers.
+    seen = set()
+
+    for ns_rp_id in ns_rp_ids:
+        # NOTE(jaypipes): The "ns_" prefix for variables in this code block
+        # indicates the variable is something related to the non-sharing
+        # provider involved in the request
+        ns_resources = prov_rc_ids.get(ns_rp_id)
+        if not ns_resources:
+            # This resource provider doesn't actually provide any requested
+            # resource. It only has requested resources shared *with* it.
+            # Since this provider won't actually have an allocation request
+            # written for it, we just ignore it and continue
+            continue
+        ns_aggs = prov_aggregates[ns_rp_id]
+
+        # Build the list of resource class IDs and, for each of them, the list
+        # of provider internal IDs able to supply it to this non-sharing
+        # provider: the non-sharing provider itself first, followed by each
+        # provider sharing the resource class with it via an aggregate.
+        rc_ids = []
+        rc_prov_ids = []
+        for rc_id in requested_rc_ids:
+            prov_ids = []
+            if rc_id in ns_resources:
+                prov_ids.append(ns_rp_id)
+            for sharing_rp_id in sharing.get(rc_id, []):
+                if ns_aggs & prov_aggregates[sharing_rp_id]:
+                    prov_ids.append(sharing_rp_id)
+            if prov_ids:
+                rc_ids.append(rc_id)
+                rc_prov_ids.append(prov_ids)
+
+        # Construct all the possible permutations of non-shared resources and
+        # shared resources.
+        for prov_ids in itertools.product(*rc_prov_ids):
+            combo = frozenset(prov_ids)
+            # Check if we already have this combination
+            if combo in seen:
+                continue
+
+            # Before we yield the candidate, we first need to ensure that the
+            # resource providers involved in it have all of the traits
+            if required_trait_names:
+                all_traits = set()
+                for rp_id in combo:
+                    all_traits |= prov_trait_names.get(rp_id, set())
+                missing_traits = required_trait_names - all_traits
+                if missing_traits:
+                    LOG.debug('Excluding a set of allocation candidate %s : '
+                              'missing traits %s are not satisfied.',
+                              set(combo), ','.join(missing_traits))
+                    continue
+
+            seen.add(combo)
+            yield tuple(zip(rc_ids, prov_ids))
+
+
 def _alloc_candidates_with_shared(ctx, requested_resources, required_traits,
-                                  ns_rp_ids, sharing):
+                                  ns_rp_ids, sharing, limit=None,
+                                  randomize=False):
     """Returns a tuple of (allocation requests, provider summaries) for a
     supplied set of requested resource amounts and resource providers.
 
@@ -3258,6 +3331,9 @@ def _alloc_candidates_with_shared(ctx, requested_resources, required_traits,
                       resource.
     :param sharing: dict, keyed by resource class ID, of a set of resource
                     provider IDs that share that resource class
+    :param limit: An optional maximum number of allocation requests to return
+    :param randomize: Whether to randomly sample and order the allocation
+                      requests
     """
     # We need to grab usage information for all the providers identified as
     # potentially fulfilling part of the resource request. This includes
@@ -3278,147 +3354,53 @@ def _alloc_candidates_with_shared(ctx, requested_resources, required_traits,
     requested_rc_ids = list(requested_resources)
     usages = _get_usages_by_provider_and_rc(ctx, all_rp_ids, requested_rc_ids)
 
+    # Get a dict, keyed by resource provider internal ID, of the set of
+    # requested resource class IDs that provider has inventory for
+    prov_rc_ids = collections.defaultdict(set)
+    for usage in usages:
+        prov_rc_ids[usage['resource_provider_id']].add(
+            usage['resource_class_id'])
+
     # Get a dict, keyed by resource provider internal ID, of trait string names
     # that provider has associated with it
     prov_traits = _provider_traits(ctx, all_rp_ids)
 
-    # Get a dict, keyed by resource provider internal ID, of ProviderSummary
-    # objects for all providers involved in the request
-    summaries = _build_provider_summaries(ctx, usages, prov_traits)
-
-    # Next, build up a list of allocation requests. These allocation requests
-    # are AllocationRequest objects, containing resource provider UUIDs,
-    # resource class names and amounts to consume from that resource provider
-    alloc_requests = []
-
-    # Build a list of the sets of provider internal IDs that end up in
-    # allocation request objects. This is used to ensure we don't end up
-    # having allocation requests with duplicate sets of resource providers.
-    alloc_prov_ids = []
-
     # Get a dict, keyed by resource provider internal ID, of sets of aggregate
     # ids that provider has associated with it
     prov_aggregates = _provider_aggregates(ctx, all_rp_ids)
 
-    for ns_rp_id in ns_rp_ids:
-        # Build a dict, keyed by resource class ID, of lists of
-        # AllocationRequestResource objects
-        res_req_dict = collections.defaultdict(list)
-
-        if ns_rp_id not in summaries:
-            # This resource provider is not providing any resources that have
-            # been requested. This means that this resource provider has some
-            # requested resources shared *with* it but the allocation of the
-            # requested resource will not be made against it. Since this
-            # provider won't actually have an allocation request written for
-            # it, we just ignore it and continue
-            continue
-        # NOTE(jaypipes): The "ns_" prefix for variables in this code block
-        # indicates the variable is something related to the non-sharing
-        # provider involved in the request
-        ns_rp_summary = summaries[ns_rp_id]
-        ns_rp_uuid = ns_rp_summary.resource_provider.uuid
-        ns_resource_class_names = ns_rp_summary.resource_class_names
-        ns_resources = set(
-            rc_id for rc_id in requested_resources
-            if _RC_CACHE.string_from_id(rc_id) in ns_resource_class_names
-        )
-
-        has_none = len(ns_resources) == 0
-        if has_none:
-            # This resource provider doesn't actually provide any requested
-            # resource. It only has requested resources shared *with* it.
-            # We do not list this provider in allocation_requests but do
-            # list it in provider_summaries.
-            continue
-
-        # Get AllocationRequestResource(s) from the non-sharing provider
-        for rc_id, amount in requested_resources.items():
-            if rc_id not in ns_resources:
-                continue
-            res_req_dict[rc_id].append(
-                AllocationRequestResource(
-                    ctx, resource_provider=ResourceProvider(ctx,
-                                                            uuid=ns_rp_uuid),
-                    resource_class=_RC_CACHE.string_from_id(rc_id),
-                    amount=amount))
-
-        # Build a dict, keyed by resource class ID, of lists of
-        # AllocationRequestResource objects that represent each
-        # resource provider for a shared resource
-        sharing_resource_requests = _shared_allocation_request_resources(
-                                    ctx, ns_rp_id, requested_resources,
-                                    sharing, summaries, prov_aggregates)
-
-        # Get AllocationRequestResource(s) from sharing provider(s)
-        for rc_id in sharing_resource_requests:
-            sharing_res_reqs = sharing_resource_requests[rc_id]
-            res_req_dict[rc_id].extend(sharing_res_reqs)
-
-        # Get request_groups, lists of lists of AllocationRequestResource
-        # for each resource class, which makes no distinction between
-        # non-sharing resource providers and sharing resource providers.
-        request_groups = res_req_dict.values()
-
-        # Add an AllocationRequest that includes resources from the
-        # non-sharing provider AND shared resources from each sharing
-        # provider of that resource class. This is where we construct all the
-        # possible permutations of non-shared resources and shared resources.
-        for res_requests in itertools.product(*request_groups):
-            # Before we add the allocation request to our list, we first need
-            # to ensure that the resource providers involved in this allocation
-            # request have all of the traits
-            all_prov_ids = set()
-            all_traits = set()
-            for res_req in res_requests:
-                rp_uuid = res_req.resource_provider.uuid
-                rp_id = None
-                for id, summary in summaries.items():
-                    if summary.resource_provider.uuid == rp_uuid:
-                        rp_id = id
-                        break
-                all_prov_ids.add(rp_id)
-                all_traits |= set(prov_traits.get(rp_id, []))
-
-            # Check if there are missing traits
-            missing_traits = set(required_traits) - all_traits
-            if missing_traits:
-                LOG.debug('Excluding a set of allocation candidate %s : '
-                          'missing traits %s are not satisfied.',
-                          all_prov_ids, ','.join(missing_traits))
-                continue
-
-            # Check if we already have this combination in alloc_requests
-            if all_prov_ids in alloc_prov_ids:
-                continue
+    candidates = _limit_candidates(
+        _shared_candidates(requested_rc_ids, required_traits, ns_rp_ids,
+                           sharing, prov_rc_ids, prov_aggregates, prov_traits),
+        limit, randomize)
 
-            alloc_prov_ids.append(all_prov_ids)
-            req = AllocationRequest(ctx, resource_requests=list(res_requests))
-            alloc_requests.append(req)
-
-    # The process above may have removed some previously-identified resource
-    # providers from being included in the allocation requests due to the
-    # sharing providers not satisfying trait requirements that were missing
-    # from "local providers". So, here, we need to remove any provider
-    # summaries for resource providers that do not appear in any allocation
-    # requests.
-    alloc_req_rp_uuids = set()
-    for ar in alloc_requests:
-        for rr in ar.resource_requests:
-            alloc_req_rp_uuids.add(rr.resource_provider.uuid)
-
-    # Look up the internal ID for each identified rp UUID
+    # Only the providers appearing in the chosen candidates get a provider
+    # summary.
     alloc_req_rp_ids = set()
-    for rp_uuid in alloc_req_rp_uuids:
-        for rp_id, summary in summaries.items():
-            if summary.resource_provider.uuid == rp_uuid:
-                alloc_req_rp_ids.add(rp_id)
-
-    p_sums_ids = set(summaries)
-    eliminated_rp_ids = p_sums_ids - alloc_req_rp_ids
-    for elim_id in eliminated_rp_ids:
-        del summaries[elim_id]
+    for candidate in candidates:
+        alloc_req_rp_ids.update(rp_id for _rc_id, rp_id in candidate)
+    summaries = _build_provider_summaries(
+        ctx,
+        [usage for usage in usages
+         if usage['resource_provider_id'] in alloc_req_rp_ids],
+        prov_traits)
 
+    # Next, build up a list of allocation requests. These allocation requests
+    # are AllocationRequest objects, containing resource provider UUIDs,
+    # resource class names and amounts to consume from that resource provider
+    alloc_requests = []
+    for candidate in candidates:
+        res_requests = [
+            AllocationRequestResource(
+                ctx,
+                resource_provider=ResourceProvider(
+                    ctx, uuid=summaries[rp_id].resource_provider.uuid),
+                resource_class=_RC_CACHE.string_from_id(rc_id),
+                amount=requested_resources[rc_id],
+            ) for rc_id, rp_id in candidate
+        ]
+        alloc_requests.append(
+            AllocationRequest(ctx, resource_requests=res_requests))
     return alloc_requests, list(summaries.values())
 
 
@@ -3567,6 +3549,12 @@ class AllocationCandidates(base.VersionedObject):
             for rc_id, amount in resources.items()
         }
         have_sharing = any(sharing_providers.values())
+
+        # Candidates are generated lazily and limited as they are generated,
+        # by reservoir sampling when they are to be randomized, so we never
+        # materialize more than `limit` allocation requests and only build
+        # provider summaries for the providers used by those.
+        randomize = CONF.placement.randomize_allocation_candidates
         if not have_sharing:
             # We know there's no sharing providers, so we can more efficiently
             # get a list of resource provider IDs that have ALL the requested
@@ -3578,7 +3566,7 @@ class AllocationCandidates(base.VersionedObject):
             rp_ids = _get_provider_ids_matching_all(context, resources,
                                                     trait_map, member_of)
             alloc_request_objs, summary_objs = _alloc_candidates_no_shared(
-                context, resources, rp_ids)
+                context, resources, rp_ids, limit=limit, randomize=randomize)
         else:
             if trait_map:
                 trait_rps = _get_provider_ids_having_any_trait(context,
@@ -3593,40 +3581,10 @@ class AllocationCandidates(base.VersionedObject):
             # and are related to a provider that is sharing some resources
             # with it. In other words, this is the list of resource provider
             # IDs that are NOT sharing resources.
-            rps = _get_all_with_shared(context, resources, member_of)
-            rp_ids = set([r[0] for r in rps])
+            rp_ids = _get_all_with_shared(context, resources, member_of,
+                                          sharing_providers)
             alloc_request_objs, summary_objs = _alloc_candidates_with_shared(
-                context, resources, trait_map, rp_ids, sharing_providers)
-
-        # Limit the number of allocation request objects. We do this after
-        # creating all of them so that we can do a random slice without
-        # needing to mess with the complex sql above or add additional
-        # columns to the DB.
-
-        if limit and limit <= len(alloc_request_objs):
-            if CONF.placement.randomize_allocation_candidates:
-                alloc_request_objs = random.sample(alloc_request_objs, limit)
-            else:
-                alloc_request_objs = alloc_request_objs[:limit]
-        elif CONF.placement.randomize_allocation_candidates:
-            random.shuffle(alloc_request_objs)
-
-        # Limit summaries to only those mentioned in the allocation requests.
-        if limit and limit <= len(alloc_request_objs):
-            kept_summary_objs = []
-            alloc_req_rp_uuids = set()
-            # Extract resource provider uuids from the resource requests.
-            for aro in alloc_request_objs:
-                for arr in aro.resource_requests:
-                    alloc_req_rp_uuids.add(arr.resource_provider.uuid)
-            for summary in summary_objs:
-                rp_uuid = summary.resource_provider.uuid
-                # Skip a summary if we are limiting and haven't selected an
-                # allocation request that uses the resource provider.
-                if rp_uuid not in alloc_req_rp_uuids:
-                    continue
-                kept_summary_objs.append(summary)
-        else:
-            kept_summary_objs = summary_objs
+                context, resources, trait_map, rp_ids, sharing_providers,
+                limit=limit, randomize=randomize)
 
-        return alloc_request_objs, kept_summary_objs
+        return alloc_request_objs, summary_objs
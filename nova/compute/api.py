@@ -75,6 +75,7 @@ from nova.objects import quotas as quotas_obj
 from nova.pci import request as pci_request
 import nova.policy
 from nova import profiler
+from nova import quota
 from nova import rpc
 from nova.scheduler import client as scheduler_client
 from nova.scheduler import utils as scheduler_utils
@@ -231,15 +232,10 @@ def _diff_dict(orig, new):
 
 def load_cells():
     global CELLS
-    if not CELLS:
-        CELLS = objects.CellMappingList.get_all(
-            nova_context.get_admin_context())
-        LOG.debug('Found %(count)i cells: %(cells)s',
-                  dict(count=len(CELLS),
-                       cells=','.join([c.identity for c in CELLS])))
-
-    if not CELLS:
-        LOG.error('No cells are configured, unable to continue')
+    # NOTE: The list may have been refreshed by another caller of
+    # nova.context.load_cells() since we last looked at it.
+    nova_context.load_cells()
+    CELLS = nova_context.CELLS
 
 
 @profiler.trace_cls("compute_api")
@@ -1133,6 +1129,8 @@ class API(base.Base):
             # we stop supporting v1.
             for instance in instances:
                 instance.create()
+            quota.invalidate_instances_cores_ram_count(context.project_id,
+                                                       context.user_id)
             # NOTE(melwitt): We recheck the quota after creating the objects
             # to prevent users from allocating more resources than their
             # allowed quota in the event of a race. This is configurable
@@ -1793,6 +1791,9 @@ class API(base.Base):
             LOG.info('instance termination disabled', instance=instance)
             return
 
+        quota.invalidate_instances_cores_ram_count(instance.project_id,
+                                                   instance.user_id)
+
         cell = None
         # If there is an instance.host (or the instance is shelved-offloaded or
         # in error state), the instance has been scheduled and sent to a
@@ -2445,11 +2446,12 @@ class API(base.Base):
         # Only subtract from limit if it is not None
         limit = (limit - len(build_req_instances)) if limit else limit
 
-        # We could arguably avoid joining on security_groups if we're using
-        # neutron (which is the default) but if you're using neutron then the
-        # security_group_instance_association table should be empty anyway
-        # and the DB should optimize out that join, making it insignificant.
-        fields = ['metadata', 'info_cache', 'security_groups']
+        # With neutron, the API reads the security groups of the instances
+        # from neutron and the security_group_instance_association table is
+        # empty, so only load them when using nova-network.
+        fields = ['metadata', 'info_cache']
+        if not openstack_driver.is_neutron_security_groups():
+            fields.append('security_groups')
         if expected_attrs:
             fields.extend(expected_attrs)
 
@@ -3417,6 +3419,8 @@ class API(base.Base):
                 flavor=new_instance_type,
                 clean_shutdown=clean_shutdown,
                 request_spec=request_spec)
+        quota.invalidate_instances_cores_ram_count(instance.project_id,
+                                                   instance.user_id)
 
     @check_instance_lock
     @check_instance_state(vm_state=[vm_states.ACTIVE, vm_states.STOPPED,
@@ -85,6 +85,7 @@ from nova.objects import fields
 from nova.objects import instance as obj_instance
 from nova.objects import migrate_data as migrate_data_obj
 from nova.pci import whitelist
+from nova import quota
 from nova import rpc
 from nova import safe_utils
 from nova.scheduler import client as scheduler_client
@@ -754,6 +755,8 @@ class ComputeManager(manager.Manager):
                 self.host, action=fields.NotificationAction.DELETE,
                 phase=fields.NotificationPhase.END, bdms=bdms)
         self._delete_scheduler_instance_info(context, instance.uuid)
+        quota.invalidate_instances_cores_ram_count(instance.project_id,
+                                                   instance.user_id)
 
     def _init_instance(self, context, instance):
         """Initialize this instance during service init."""
@@ -3966,6 +3969,8 @@ class ComputeManager(manager.Manager):
             instance.host = migration.source_compute
             instance.node = migration.source_node
             instance.save()
+            quota.invalidate_instances_cores_ram_count(instance.project_id,
+                                                       instance.user_id)
 
             self._revert_allocation(context, instance, migration)
 
@@ -4418,6 +4423,8 @@ class ComputeManager(manager.Manager):
 
         instance.task_state = task_states.RESIZE_FINISH
         instance.save(expected_task_state=task_states.RESIZE_MIGRATED)
+        quota.invalidate_instances_cores_ram_count(instance.project_id,
+                                                   instance.user_id)
 
         self._notify_about_instance_usage(
             context, instance, "finish_resize.start",
@@ -6572,12 +6579,13 @@ class ComputeManager(manager.Manager):
         spacing=CONF.heal_instance_info_cache_interval)
     def _heal_instance_info_cache(self, context):
         """Called periodically.  On every call, try to update the
-        info_cache's network information for another instance by
+        info_cache's network information for other instances by
         calling to the network manager.
 
         This is implemented by keeping a cache of uuids of instances
-        that live on this host.  On each call, we pop one off of a
-        list, pull the DB record, and try the call to the network API.
+        that live on this host.  On each call, we pop up to
+        heal_instance_info_cache_batch_size off of a list, pull their DB
+        records, and try the call to the network API for all of them.
         If anything errors don't fail, as it's possible the instance
         has been deleted, etc.
         """
@@ -6585,8 +6593,9 @@ class ComputeManager(manager.Manager):
         if not heal_interval:
             return
 
+        batch_size = CONF.heal_instance_info_cache_batch_size
         instance_uuids = getattr(self, '_instance_uuids_to_heal', [])
-        instance = None
+        instances = []
 
         LOG.debug('Starting heal instance info cache')
 
@@ -6609,17 +6618,17 @@ class ComputeManager(manager.Manager):
                               'because it is being deleted.', instance=inst)
                     continue
 
-                if not instance:
-                    # Save the first one we find so we don't
-                    # have to get it again
-                    instance = inst
+                if len(instances) < batch_size:
+                    # Save the first ones we find so we don't
+                    # have to get them again
+                    instances.append(inst)
                 else:
                     instance_uuids.append(inst['uuid'])
 
             self._instance_uuids_to_heal = instance_uuids
         else:
-            # Find the next valid instance on the list
-            while instance_uuids:
+            # Find the next valid instances on the list
+            while instance_uuids and len(instances) < batch_size:
                 try:
                     inst = objects.Instance.get_by_uuid(
                             context, instance_uuids.pop(0),
@@ -6640,29 +6649,35 @@ class ComputeManager(manager.Manager):
                     LOG.debug('Skipping network cache update for instance '
                               'because it is being deleted.', instance=inst)
                 else:
-                    instance = inst
-                    break
+                    instances.append(inst)
 
-        if instance:
-            # We have an instance now to refresh
+        if instances:
+            # We have instances now to refresh
             try:
                 # Call to network API to get instance info.. this will
-                # force an update to the instance's info_cache
-                self.network_api.get_instance_nw_info(context, instance)
-                LOG.debug('Updated the network info_cache for instance',
-                          instance=instance)
-            except exception.InstanceNotFound:
-                # Instance is gone.
-                LOG.debug('Instance no longer exists. Unable to refresh',
-                          instance=instance)
-                return
-            except exception.InstanceInfoCacheNotFound:
-                # InstanceInfoCache is gone.
-                LOG.debug('InstanceInfoCache no longer exists. '
-                          'Unable to refresh', instance=instance)
+                # force an update to the instances' info_cache
+                nw_infos = self.network_api.get_instances_nw_info(context,
+                                                                  instances)
             except Exception:
                 LOG.error('An error occurred while refreshing the network '
-                          'cache.', instance=instance, exc_info=True)
+                          'cache.', exc_info=True)
+                return
+            for instance in instances:
+                result = nw_infos[instance.uuid]
+                if isinstance(result, exception.InstanceNotFound):
+                    # Instance is gone.
+                    LOG.debug('Instance no longer exists. Unable to refresh',
+                              instance=instance)
+                elif isinstance(result, exception.InstanceInfoCacheNotFound):
+                    # InstanceInfoCache is gone.
+                    LOG.debug('InstanceInfoCache no longer exists. '
+                              'Unable to refresh', instance=instance)
+                elif isinstance(result, Exception):
+                    LOG.error('An error occurred while refreshing the network '
+                              'cache: %s', result, instance=instance)
+                else:
+                    LOG.debug('Updated the network info_cache for instance',
+                              instance=instance)
         else:
             LOG.debug("Didn't find any instances for network info cache "
                       "update.")
@@ -7022,6 +7037,9 @@ class ComputeManager(manager.Manager):
         number of virtual machines known by the database, we proceed in a lazy
         loop, one database record at a time, checking if the hypervisor has the
         same power state as is in the database.
+
+        If the driver supports it, the power states of all the instances are
+        read from the hypervisor at once rather than one instance at a time.
         """
         db_instances = objects.InstanceList.get_by_host(context, self.host,
                                                         expected_attrs=[],
@@ -7038,13 +7056,29 @@ class ComputeManager(manager.Manager):
                         {'num_db_instances': num_db_instances,
                          'num_vm_instances': num_vm_instances})
 
+        try:
+            vm_power_states = self.driver.get_power_states(db_instances)
+        except NotImplementedError:
+            vm_power_states = None
+        except Exception:
+            LOG.exception("Failed to get the power states of all instances "
+                          "from the hypervisor, querying them one instance "
+                          "at a time instead.")
+            vm_power_states = None
+
         def _sync(db_instance):
+            vm_power_state = None
+            if vm_power_states is not None:
+                vm_power_state = vm_power_states.get(db_instance.uuid,
+                                                     power_state.NOSTATE)
+
             # NOTE(melwitt): This must be synchronized as we query state from
             #                two separate sources, the driver and the database.
             #                They are set (in stop_instance) and read, in sync.
             @utils.synchronized(db_instance.uuid)
             def query_driver_power_state_and_sync():
-                self._query_driver_power_state_and_sync(context, db_instance)
+                self._query_driver_power_state_and_sync(
+                    context, db_instance, vm_power_state=vm_power_state)
 
             try:
                 query_driver_power_state_and_sync()
@@ -7066,36 +7100,49 @@ class ComputeManager(manager.Manager):
                 self._syncs_in_progress[uuid] = True
                 self._sync_power_pool.spawn_n(_sync, db_instance)
 
-    def _query_driver_power_state_and_sync(self, context, db_instance):
+    def _query_driver_power_state_and_sync(self, context, db_instance,
+                                           vm_power_state=None):
+        """Align the power state of an instance with the hypervisor.
+
+        :param vm_power_state: The power state of the instance if already read
+                               from the hypervisor along with those of other
+                               instances, or None to read it here.
+        """
         if db_instance.task_state is not None:
             LOG.info("During sync_power_state the instance has a "
                      "pending task (%(task)s). Skip.",
                      {'task': db_instance.task_state}, instance=db_instance)
             return
         # No pending tasks. Now try to figure out the real vm_power_state.
-        try:
-            vm_instance = self.driver.get_info(db_instance)
-            vm_power_state = vm_instance.state
-        except exception.InstanceNotFound:
-            vm_power_state = power_state.NOSTATE
+        verify_vm_power_state = vm_power_state is not None
+        if vm_power_state is None:
+            try:
+                vm_instance = self.driver.get_info(db_instance)
+                vm_power_state = vm_instance.state
+            except exception.InstanceNotFound:
+                vm_power_state = power_state.NOSTATE
         # Note(maoy): the above get_info call might take a long time,
         # for example, because of a broken libvirt driver.
         try:
-            self._sync_instance_power_state(context,
-                                            db_instance,
-                                            vm_power_state,
-                                            use_slave=True)
+            self._sync_instance_power_state(
+                context, db_instance, vm_power_state, use_slave=True,
+                verify_vm_power_state=verify_vm_power_state)
         except exception.InstanceNotFound:
             # NOTE(hanlind): If the instance gets deleted during sync,
             # silently ignore.
             pass
 
     def _sync_instance_power_state(self, context, db_instance, vm_power_state,
-                                   use_slave=False):
+                                   use_slave=False,
+                                   verify_vm_power_state=False):
         """Align instance power state between the database and hypervisor.
 
         If the instance is not found on the hypervisor, but is in the database,
         then a stop() API will be called on the instance.
+
+        If verify_vm_power_state is True, vm_power_state may predate changes
+        made to the instance since, and is read again from the hypervisor
+        before acting on any difference with the database.
         """
 
         # We re-query the DB to get the latest instance info to minimize
@@ -7131,6 +7178,9 @@ class ComputeManager(manager.Manager):
                      instance=db_instance)
             return
 
+        if verify_vm_power_state and vm_power_state != db_power_state:
+            vm_power_state = self._get_power_state(context, db_instance)
+
         orig_db_power_state = db_power_state
         if vm_power_state != db_power_state:
             LOG.info('During _sync_instance_power_state the DB '
@@ -7640,7 +7690,10 @@ class ComputeManager(manager.Manager):
                       instance=instance)
             if event.name == 'network-changed':
                 try:
-                    self.network_api.get_instance_nw_info(context, instance)
+                    # Do not trust the cached details of the networks of the
+                    # instance, which may be what changed.
+                    self.network_api.get_instance_nw_info(
+                        context, instance, refresh_networks=True)
                 except exception.NotFound as e:
                     LOG.info('Failed to process external instance event '
                              '%(event)s due to: %(error)s',
@@ -15,10 +15,16 @@ import copy
 import heapq
 import itertools
 
+import eventlet.timeout
+from oslo_log import log as logging
 import six
 
+import nova.conf
 from nova import context
 
+CONF = nova.conf.CONF
+LOG = logging.getLogger(__name__)
+
 
 class RecordSortContext(object):
     def __init__(self, sort_keys, sort_dirs):
@@ -136,6 +142,60 @@ class CrossCellLister(object):
         """
         pass
 
+    def _iter_pages(self, ctx, filters, limit, page_limit, first_page,
+                    **kwargs):
+        """Generate records from a cell, fetching one page at a time.
+
+        The first page has already been fetched. The next one is only
+        queried, using the last record we returned as its marker, once the
+        caller has consumed every record of the previous page. We stop
+        when a cell returns a short page or, if a limit was provided, once
+        we have generated that many records since no cell needs to return
+        more than that. Like the first one, each page must be returned
+        within [api]/cell_timeout or eventlet.timeout.Timeout is raised.
+
+        :param ctx: A RequestContext targeted at the cell
+        :param filters: A dict of column=filter items
+        :param limit: The overall limit of the listing, or None
+        :param page_limit: The maximum number of records in a page
+        :param first_page: The first page of records from the cell
+        """
+        page = first_page
+        remaining = limit or 0
+        while True:
+            last_record = None
+            for record in page:
+                last_record = record
+                yield record
+                remaining -= 1
+                if remaining == 0:
+                    # We'll only hit this if limit was nonzero
+                    return
+            if last_record is None or len(page) < page_limit:
+                return
+            if remaining > 0:
+                page_limit = min(page_limit, remaining)
+            with eventlet.timeout.Timeout(CONF.api.cell_timeout):
+                page = self.get_by_filters(
+                    ctx, filters, limit=page_limit,
+                    marker=last_record[self.marker_identifier], **kwargs)
+
+    @staticmethod
+    def _skip_failed_cell(cell_uuid, records):
+        """Generate records from a cell until fetching one of them fails.
+
+        Further pages of a cell are fetched while we merge the results,
+        after scatter_gather_all_cells() has returned. If one of them fails
+        or times out, the rest of the records of that cell are left out
+        like those of a cell that failed to return its first page.
+        """
+        try:
+            for record in records:
+                yield record
+        except (Exception, eventlet.timeout.Timeout):
+            LOG.warning('Cell %s did not respond or failed and is '
+                        'skipped from the results', cell_uuid)
+
     def get_records_sorted(self, ctx, filters, limit, marker, **kwargs):
         """Get a cross-cell list of records matching filters.
 
@@ -151,9 +211,11 @@ class CrossCellLister(object):
         This function is a generator of records from the database like what you
         would get from instance_get_all_by_filters_sort() in the DB API.
 
-        NOTE: Since we do these in parallel, a nonzero limit will be passed
-        to each database query, although the limit will be enforced in the
-        output of this function. Meaning, we will still query $limit from each
+        NOTE: Since we do these in parallel, every cell is asked for its
+        first page of results up front. With [api]/list_records_batch_size
+        set, that page is at most that many records, and further pages are
+        only fetched from a cell once the merge below has consumed the ones
+        it already returned. Otherwise, we will still query $limit from each
         database, but only return $limit total results.
 
         """
@@ -233,19 +295,36 @@ class CrossCellLister(object):
                     # full unpaginated set for our cell.
                     return []
 
+            batch_size = CONF.api.list_records_batch_size
+            if batch_size and (not limit or batch_size < limit):
+                page_limit = batch_size
+            else:
+                page_limit = limit
+
             main_query_result = self.get_by_filters(
                 ctx, filters,
-                limit=limit, marker=local_marker,
+                limit=page_limit, marker=local_marker,
                 **kwargs)
 
+            if page_limit != limit:
+                main_query_result = self._iter_pages(
+                    ctx, filters, limit, page_limit, main_query_result,
+                    **kwargs)
+
             return (RecordWrapper(self.sort_ctx, inst) for inst in
                     itertools.chain(local_marker_prefix, main_query_result))
 
-        # FIXME(danms): If we raise or timeout on a cell we need to handle
-        # that here gracefully. The below routine will provide sentinels
-        # to indicate that, which will crash the merge below, but we don't
-        # handle this anywhere yet anyway.
         results = context.scatter_gather_all_cells(ctx, do_query)
+        # Leave out the cells that failed or did not respond in time rather
+        # than have one of them fail the whole listing.
+        for cell_uuid, result in list(results.items()):
+            if result in (context.did_not_respond_sentinel,
+                          context.raised_exception_sentinel):
+                LOG.warning('Cell %s did not respond or failed and is '
+                            'skipped from the results', cell_uuid)
+                del results[cell_uuid]
+            else:
+                results[cell_uuid] = self._skip_failed_cell(cell_uuid, result)
 
         # If a limit was provided, it was passed to the per-cell query
         # routines.  That means we have NUM_CELLS * limit items across
@@ -57,12 +57,14 @@ class _Provider(object):
         # Contains a dict, keyed by uuid of child resource providers having
         # this provider as a parent
         self.children = {}
-        # dict of inventory records, keyed by resource class
+        # dict of inventory records, keyed by resource class.  Like traits and
+        # aggregates, this is replaced rather than modified when updated, so
+        # copies of the provider may share it.
         self.inventory = {}
-        # Set of trait names
-        self.traits = set()
-        # Set of aggregate UUIDs
-        self.aggregates = set()
+        # Frozenset of trait names
+        self.traits = frozenset()
+        # Frozenset of aggregate UUIDs
+        self.aggregates = frozenset()
 
     @classmethod
     def from_dict(cls, pdict):
@@ -79,12 +81,31 @@ class _Provider(object):
 
     def data(self):
         inventory = copy.deepcopy(self.inventory)
-        traits = copy.copy(self.traits)
-        aggregates = copy.copy(self.aggregates)
+        traits = set(self.traits)
+        aggregates = set(self.aggregates)
         return ProviderData(
             self.uuid, self.name, self.generation, self.parent_uuid,
             inventory, traits, aggregates)
 
+    def snapshot(self):
+        """Like data(), but sharing the inventory, traits and aggregates of
+        the provider rather than copying them.  The inventory must not be
+        modified.
+        """
+        return ProviderData(
+            self.uuid, self.name, self.generation, self.parent_uuid,
+            self.inventory, self.traits, self.aggregates)
+
+    def copy(self):
+        """Returns a copy of the provider without its children."""
+        provider = _Provider(self.name, uuid=self.uuid,
+                             generation=self.generation,
+                             parent_uuid=self.parent_uuid)
+        provider.inventory = self.inventory
+        provider.traits = self.traits
+        provider.aggregates = self.aggregates
+        return provider
+
     def get_provider_uuids(self):
         """Returns a list, in top-down traversal order, of UUIDs of this
         provider and all its descendants.
@@ -94,22 +115,6 @@ class _Provider(object):
             ret.extend(child.get_provider_uuids())
         return ret
 
-    def find(self, search):
-        if self.name == search or self.uuid == search:
-            return self
-        if search in self.children:
-            return self.children[search]
-        if self.children:
-            for child in self.children.values():
-                # We already searched for the child by UUID above, so here we
-                # just check for a child name match
-                if child.name == search:
-                    return child
-                subchild = child.find(search)
-                if subchild:
-                    return subchild
-        return None
-
     def add_child(self, provider):
         self.children[provider.uuid] = provider
 
@@ -175,7 +180,7 @@ class _Provider(object):
         """
         self._update_generation(generation)
         if self.have_traits_changed(new):
-            self.traits = set(new)  # create a copy of the new traits
+            self.traits = frozenset(new)
             return True
         return False
 
@@ -200,7 +205,7 @@ class _Provider(object):
         """
         self._update_generation(generation)
         if self.have_aggregates_changed(new):
-            self.aggregates = set(new)  # create a copy of the new aggregates
+            self.aggregates = frozenset(new)
             return True
         return False
 
@@ -221,6 +226,9 @@ class ProviderTree(object):
         """Create an empty provider tree."""
         self.lock = lockutils.internal_lock(_LOCK_NAME)
         self.roots = []
+        # Every provider in the tree, keyed by UUID and by name
+        self._by_uuid = {}
+        self._by_name = {}
 
     def get_provider_uuids(self, name_or_uuid=None):
         """Return a list, in top-down traversable order, of the UUIDs of all
@@ -269,11 +277,8 @@ class ProviderTree(object):
             # Sanity check for orphans.  Every parent UUID must either be None
             # (the provider is a root), or be in the tree already, or exist as
             # a key in to_add_by_uuid (we're adding it).
-            all_parents = set([None]) | set(to_add_by_uuid)
-            # NOTE(efried): Can't use get_provider_uuids directly because we're
-            # already under lock.
-            for root in self.roots:
-                all_parents |= set(root.get_provider_uuids())
+            all_parents = (set([None]) | set(to_add_by_uuid) |
+                           set(self._by_uuid))
             missing_parents = set()
             for pd in to_add_by_uuid.values():
                 parent_uuid = pd.get('parent_provider_uuid')
@@ -315,16 +320,19 @@ class ProviderTree(object):
                     # Wasn't there in the first place - fine.
                     pass
 
-                provider = _Provider.from_dict(pd)
-                if parent_uuid is None:
-                    self.roots.append(provider)
-                else:
-                    parent = self._find_with_lock(parent_uuid)
-                    parent.add_child(provider)
+                self._add_with_lock(_Provider.from_dict(pd))
 
                 # Remove this entry to signify we're done with it.
                 to_add_by_uuid.pop(uuid)
 
+    def _add_with_lock(self, provider):
+        if provider.parent_uuid is None:
+            self.roots.append(provider)
+        else:
+            self._by_uuid[provider.parent_uuid].add_child(provider)
+        self._by_uuid[provider.uuid] = provider
+        self._by_name[provider.name] = provider
+
     def _remove_with_lock(self, name_or_uuid):
         found = self._find_with_lock(name_or_uuid)
         if found.parent_uuid:
@@ -332,6 +340,10 @@ class ProviderTree(object):
             parent.remove_child(found)
         else:
             self.roots.remove(found)
+        for uuid in found.get_provider_uuids():
+            provider = self._by_uuid.pop(uuid)
+            if self._by_name.get(provider.name) is provider:
+                del self._by_name[provider.name]
 
     def remove(self, name_or_uuid):
         """Safely removes the provider identified by the supplied name_or_uuid
@@ -359,15 +371,46 @@ class ProviderTree(object):
                 raise ValueError(err % uuid)
 
             p = _Provider(name, uuid=uuid, generation=generation)
-            self.roots.append(p)
+            self._add_with_lock(p)
             return p.uuid
 
     def _find_with_lock(self, name_or_uuid):
-        for root in self.roots:
-            found = root.find(name_or_uuid)
-            if found:
-                return found
-        raise ValueError(_("No such provider %s") % name_or_uuid)
+        found = (self._by_uuid.get(name_or_uuid) or
+                 self._by_name.get(name_or_uuid))
+        if found is None:
+            raise ValueError(_("No such provider %s") % name_or_uuid)
+        return found
+
+    def copy(self):
+        """Return a copy of the tree.
+
+        The providers of the copy share their inventory, traits and aggregates
+        with those of this tree until either is updated, which replaces rather
+        than modifies them.  Copying is therefore much cheaper than a deep copy
+        of the tree, and changes to either tree have no effect on the other.
+        """
+        tree = ProviderTree()
+        with self.lock:
+            for root in self.roots:
+                for uuid in root.get_provider_uuids():
+                    tree._add_with_lock(self._by_uuid[uuid].copy())
+        return tree
+
+    def snapshot(self):
+        """Return point-in-time data for every provider in the tree.
+
+        Unlike data(), this does not copy the inventory, traits or aggregates
+        of the providers; the returned inventory dicts must not be modified.
+
+        :return: OrderedDict, keyed by provider UUID in top-down traversal
+                 order, of ProviderData objects.
+        """
+        ret = collections.OrderedDict()
+        with self.lock:
+            for root in self.roots:
+                for uuid in root.get_provider_uuids():
+                    ret[uuid] = self._by_uuid[uuid].snapshot()
+        return ret
 
     def data(self, name_or_uuid):
         """Return a point-in-time copy of the specified provider's data.
@@ -407,7 +450,7 @@ class ProviderTree(object):
         with self.lock:
             parent_node = self._find_with_lock(parent)
             p = _Provider(name, uuid, generation, parent_node.uuid)
-            parent_node.add_child(p)
+            self._add_with_lock(p)
             return p.uuid
 
     def has_inventory(self, name_or_uuid):
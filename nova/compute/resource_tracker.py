@@ -20,9 +20,13 @@ model.
 """
 import collections
 import copy
+import datetime
+import functools
+import inspect
 
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 
 from nova.compute import claims
 from nova.compute import monitors
@@ -49,6 +53,12 @@ CONF = nova.conf.CONF
 
 LOG = logging.getLogger(__name__)
 COMPUTE_RESOURCE_SEMAPHORE = "compute_resources"
+# Seconds by which the window of instances reconciled by the periodic task
+# overlaps the previous run, to cover clock skew between the compute and
+# database hosts. Reconciling an instance twice is harmless.
+_RECONCILE_OVERLAP = 60
+_INSTANCE_EXPECTED_ATTRS = ['system_metadata', 'numa_topology', 'flavor',
+                            'migration_context']
 
 
 def _instance_in_resize_state(instance):
@@ -80,6 +90,33 @@ def _is_trackable_migration(migration):
                                         'evacuation')
 
 
+def _synchronized_node(f):
+    """Serializes the calls of the decorated ResourceTracker method for a
+    node, named by the nodename argument of the method or by the
+    hypervisor_hostname of its resources argument.
+
+    Claims and audits of different nodes run concurrently. The state the
+    tracker shares between its nodes is only changed by the methods holding
+    COMPUTE_RESOURCE_SEMAPHORE. Those never wait on the placement service;
+    the only database calls made under it set up and save the PCI devices,
+    which are shared by all the nodes of the host.
+    """
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        call_args = inspect.getcallargs(f, self, *args, **kwargs)
+        if 'nodename' in call_args:
+            nodename = call_args['nodename']
+        else:
+            nodename = call_args['resources']['hypervisor_hostname']
+
+        @utils.synchronized('%s-%s' % (COMPUTE_RESOURCE_SEMAPHORE, nodename))
+        def _synchronized():
+            return f(self, *args, **kwargs)
+
+        return _synchronized()
+    return wrapper
+
+
 def _normalize_inventory_from_cn_obj(inv_data, cn):
     """Helper function that injects various information from a compute node
     object into the inventory dict returned from the virt driver's
@@ -139,6 +176,8 @@ class ResourceTracker(object):
         self.stats = stats.Stats()
         self.tracked_instances = {}
         self.tracked_migrations = {}
+        # Dict of the state of the last audit of each node, keyed by nodename
+        self.audits = {}
         monitor_handler = monitors.MonitorHandler(self)
         self.monitors = monitor_handler.monitors
         self.old_resources = collections.defaultdict(objects.ComputeNode)
@@ -154,7 +193,7 @@ class ResourceTracker(object):
         except KeyError:
             raise exception.ComputeHostNotFound(host=nodename)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    @_synchronized_node
     def instance_claim(self, context, instance, nodename, limits=None):
         """Indicate that some resources are needed for an upcoming compute
         instance build operation.
@@ -215,20 +254,19 @@ class ResourceTracker(object):
 
         # self._set_instance_host_and_node() will save instance to the DB
         # so set instance.numa_topology first.  We need to make sure
-        # that numa_topology is saved while under COMPUTE_RESOURCE_SEMAPHORE
+        # that numa_topology is saved while holding the lock of the node
         # so that the resource audit knows about any cpus we've pinned.
         instance_numa_topology = claim.claimed_numa_topology
         instance.numa_topology = instance_numa_topology
         self._set_instance_host_and_node(instance, nodename)
 
-        if self.pci_tracker:
-            # NOTE(jaypipes): ComputeNode.pci_device_pools is set below
-            # in _update_usage_from_instance().
-            self.pci_tracker.claim_instance(context, pci_requests,
-                                            instance_numa_topology)
+        # NOTE(jaypipes): ComputeNode.pci_device_pools is set below
+        # in _update_usage_from_instance().
+        self._claim_pci_devices(context, pci_requests,
+                                instance_numa_topology)
 
         # Mark resources in-use and update stats
-        self._update_usage_from_instance(context, instance, nodename)
+        self._update_instance_usage(context, instance, nodename)
 
         elevated = context.elevated()
         # persist changes to the compute node:
@@ -236,7 +274,7 @@ class ResourceTracker(object):
 
         return claim
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    @_synchronized_node
     def rebuild_claim(self, context, instance, nodename, limits=None,
                       image_meta=None, migration=None):
         """Create a claim for a rebuild operation."""
@@ -245,7 +283,7 @@ class ResourceTracker(object):
                                 migration, move_type='evacuation',
                                 limits=limits, image_meta=image_meta)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    @_synchronized_node
     def resize_claim(self, context, instance, instance_type, nodename,
                      migration, image_meta=None, limits=None):
         """Create a claim for a resize or cold-migration move."""
@@ -323,12 +361,10 @@ class ResourceTracker(object):
                                  limits=limits)
 
         claim.migration = migration
-        claimed_pci_devices_objs = []
-        if self.pci_tracker:
-            # NOTE(jaypipes): ComputeNode.pci_device_pools is set below
-            # in _update_usage_from_instance().
-            claimed_pci_devices_objs = self.pci_tracker.claim_instance(
-                    context, new_pci_requests, claim.claimed_numa_topology)
+        # NOTE(jaypipes): ComputeNode.pci_device_pools is set below
+        # in _update_usage_from_migration().
+        claimed_pci_devices_objs = self._claim_pci_devices(
+                context, new_pci_requests, claim.claimed_numa_topology)
         claimed_pci_devices = objects.PciDeviceList(
                 objects=claimed_pci_devices_objs)
 
@@ -349,18 +385,43 @@ class ResourceTracker(object):
 
         # Mark the resources in-use for the resize landing on this
         # compute host:
-        self._update_usage_from_migration(context, instance, migration,
-                                          nodename)
+        self._update_migration_usage(context, instance, migration, nodename)
         elevated = context.elevated()
         self._update(elevated, cn)
 
         return claim
 
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _claim_pci_devices(self, context, pci_requests, numa_topology):
+        """Claim the PCI devices requested by an instance."""
+        if not self.pci_tracker:
+            return []
+        return self.pci_tracker.claim_instance(context, pci_requests,
+                                               numa_topology)
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _update_instance_usage(self, context, instance, nodename,
+                               is_removed=False):
+        """Update usage for a single instance, holding the lock of the
+        state shared between nodes.
+        """
+        self._update_usage_from_instance(context, instance, nodename,
+                                         is_removed=is_removed)
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _update_migration_usage(self, context, instance, migration,
+                                nodename):
+        """Update usage for a single migration, holding the lock of the
+        state shared between nodes.
+        """
+        self._update_usage_from_migration(context, instance, migration,
+                                          nodename)
+
     def _create_migration(self, context, instance, new_instance_type,
                           nodename, move_type=None):
         """Create a migration record for the upcoming resize.  This should
-        be done while the COMPUTE_RESOURCES_SEMAPHORE is held so the resource
-        claim will not be lost if the audit process starts.
+        be done while the lock of the node is held so the resource claim
+        will not be lost if the audit process starts.
         """
         migration = objects.Migration(context=context.elevated())
         migration.dest_compute = self.host
@@ -385,8 +446,8 @@ class ResourceTracker(object):
 
         If a migration record was created already before the request made
         it to this compute host, only set up the migration so it's included in
-        resource tracking. This should be done while the
-        COMPUTE_RESOURCES_SEMAPHORE is held.
+        resource tracking. This should be done while the lock of the node is
+        held.
         """
         migration.dest_compute = self.host
         migration.dest_node = nodename
@@ -396,8 +457,8 @@ class ResourceTracker(object):
 
     def _set_instance_host_and_node(self, instance, nodename):
         """Tag the instance as belonging to this host.  This should be done
-        while the COMPUTE_RESOURCES_SEMAPHORE is held so the resource claim
-        will not be lost if the audit process starts.
+        while the lock of the node is held so the resource claim will not be
+        lost if the audit process starts.
         """
         instance.host = self.host
         instance.launched_on = self.host
@@ -407,18 +468,18 @@ class ResourceTracker(object):
     def _unset_instance_host_and_node(self, instance):
         """Untag the instance so it no longer belongs to the host.
 
-        This should be done while the COMPUTE_RESOURCES_SEMAPHORE is held so
-        the resource claim will not be lost if the audit process starts.
+        This should be done while the lock of the node is held so the
+        resource claim will not be lost if the audit process starts.
         """
         instance.host = None
         instance.node = None
         instance.save()
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    @_synchronized_node
     def abort_instance_claim(self, context, instance, nodename):
         """Remove usage from the given instance."""
-        self._update_usage_from_instance(context, instance, nodename,
-                                         is_removed=True)
+        self._update_instance_usage(context, instance, nodename,
+                                    is_removed=True)
 
         instance.clear_numa_topology()
         self._unset_instance_host_and_node(instance)
@@ -437,9 +498,20 @@ class ResourceTracker(object):
                 dev_pools_obj = self.pci_tracker.stats.to_device_pools_obj()
                 self.compute_nodes[nodename].pci_device_pools = dev_pools_obj
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    @_synchronized_node
     def drop_move_claim(self, context, instance, nodename,
                         instance_type=None, prefix='new_'):
+        if self._drop_move_usage(context, instance, nodename,
+                                 instance_type=instance_type, prefix=prefix):
+            ctxt = context.elevated()
+            self._update(ctxt, self.compute_nodes[nodename])
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _drop_move_usage(self, context, instance, nodename,
+                         instance_type=None, prefix='new_'):
+        """Remove the usage of a move operation, returning True if the usage
+        of the node changed.
+        """
         # Remove usage for an incoming/outgoing migration on the destination
         # node.
         if instance['uuid'] in self.tracked_migrations:
@@ -457,9 +529,7 @@ class ResourceTracker(object):
                         instance_type, numa_topology=numa_topology)
                 self._drop_pci_devices(instance, nodename, prefix)
                 self._update_usage(usage, nodename, sign=-1)
-
-                ctxt = context.elevated()
-                self._update(ctxt, self.compute_nodes[nodename])
+                return True
         # Remove usage for an instance that is not tracked in migrations (such
         # as on the source node after a migration).
         # NOTE(lbeliveau): On resize on the same node, the instance is
@@ -468,11 +538,10 @@ class ResourceTracker(object):
             self.tracked_instances.pop(instance['uuid'])
             self._drop_pci_devices(instance, nodename, prefix)
             # TODO(lbeliveau): Validate if numa needs the same treatment.
+            return True
+        return False
 
-            ctxt = context.elevated()
-            self._update(ctxt, self.compute_nodes[nodename])
-
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    @_synchronized_node
     def update_usage(self, context, instance, nodename):
         """Update the resource usage and stats after a change in an
         instance
@@ -485,7 +554,7 @@ class ResourceTracker(object):
         # don't update usage for this instance unless it submitted a resource
         # claim first:
         if uuid in self.tracked_instances:
-            self._update_usage_from_instance(context, instance, nodename)
+            self._update_instance_usage(context, instance, nodename)
             self._update(context.elevated(), self.compute_nodes[nodename])
 
     def disabled(self, nodename):
@@ -589,6 +658,7 @@ class ResourceTracker(object):
         self._setup_pci_tracker(context, cn, resources)
         self._update(context, cn)
 
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def _setup_pci_tracker(self, context, compute_node, resources):
         if not self.pci_tracker:
             n_id = compute_node.id
@@ -601,6 +671,7 @@ class ResourceTracker(object):
             dev_pools_obj = self.pci_tracker.stats.to_device_pools_obj()
             compute_node.pci_device_pools = dev_pools_obj
 
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def _copy_resources(self, compute_node, resources):
         """Copy resource values to supplied compute_node."""
         # purge old stats and init with anything passed in by the driver
@@ -696,15 +767,18 @@ class ResourceTracker(object):
                               'another host\'s instance!',
                           {'uuid': migration.instance_uuid})
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    @_synchronized_node
     def _update_available_resource(self, context, resources):
+        audit_start = timeutils.utcnow()
+        nodename = resources['hypervisor_hostname']
+
+        if self._reconcile_available_resource(context, resources):
+            return
 
         # initialize the compute node object, creating it
         # if it does not already exist.
         self._init_compute_node(context, resources)
 
-        nodename = resources['hypervisor_hostname']
-
         # if we could not init the compute node the tracker will be
         # disabled and we should quit now
         if self.disabled(nodename):
@@ -713,9 +787,7 @@ class ResourceTracker(object):
         # Grab all instances assigned to this node:
         instances = objects.InstanceList.get_by_host_and_node(
             context, self.host, nodename,
-            expected_attrs=['system_metadata',
-                            'numa_topology',
-                            'flavor', 'migration_context'])
+            expected_attrs=_INSTANCE_EXPECTED_ATTRS)
 
         # Now calculate usage based on instance utilization:
         self._update_usage_from_instances(context, instances, nodename)
@@ -725,11 +797,29 @@ class ResourceTracker(object):
                 context, self.host, nodename)
 
         self._pair_instances_to_migrations(migrations, instances)
-        self._update_usage_from_migrations(context, migrations, nodename)
+        self._update_usage_from_migrations_and_orphans(
+            context, instances, migrations, nodename)
 
         self._remove_deleted_instances_allocations(
             context, self.compute_nodes[nodename], migrations)
 
+        self._update_compute_node_usage(context, nodename)
+
+        self.audits[nodename] = {
+            'full': audit_start,
+            'since': audit_start,
+            'capacity': self._capacity_signature(resources),
+            'migrations': self._migrations_signature(migrations),
+        }
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _update_usage_from_migrations_and_orphans(self, context, instances,
+                                                  migrations, nodename):
+        """Calculate the usage of the in-progress migrations and orphaned
+        instances of a node, on top of the usage of its instances.
+        """
+        self._update_usage_from_migrations(context, migrations, nodename)
+
         # Detect and account for orphaned instances that may exist on the
         # hypervisor, but are not in the DB:
         orphans = self._find_orphaned_instances()
@@ -745,6 +835,10 @@ class ResourceTracker(object):
         dev_pools_obj = self.pci_tracker.stats.to_device_pools_obj()
         cn.pci_device_pools = dev_pools_obj
 
+    def _update_compute_node_usage(self, context, nodename):
+        """Report the final usage of a node and save its compute node."""
+        cn = self.compute_nodes[nodename]
+
         self._report_final_resource_view(nodename)
 
         metrics = self._get_host_metrics(context, nodename)
@@ -757,6 +851,124 @@ class ResourceTracker(object):
         LOG.debug('Compute_service record updated for %(host)s:%(node)s',
                   {'host': self.host, 'node': nodename})
 
+    @staticmethod
+    def _capacity_signature(resources):
+        return tuple(resources.get(key) for key in
+                     ('vcpus', 'memory_mb', 'local_gb', 'numa_topology'))
+
+    @staticmethod
+    def _migrations_signature(migrations):
+        return sorted((migration.id, migration.status)
+                      for migration in migrations)
+
+    def _can_reconcile(self, nodename, resources):
+        """Returns True if the usage of a node can be reconciled with the
+        instances changed since its last audit instead of being audited
+        from all of them.
+
+        The tracker keeps a single set of tracked instances which is reset
+        by the audit of each node, so this is only done for hosts with a
+        single node.
+        """
+        interval = CONF.compute.resource_tracker_full_audit_interval
+        audit = self.audits.get(nodename)
+        return bool(
+            interval > 0 and audit is not None and
+            list(self.compute_nodes) == [nodename] and
+            not self.driver.requires_allocation_refresh and
+            not self.disabled(nodename) and
+            not timeutils.is_older_than(audit['full'], interval) and
+            audit['capacity'] == self._capacity_signature(resources))
+
+    def _refresh_hypervisor_resources(self, compute_node, resources):
+        """Copy the resource values reported by the driver to the supplied
+        compute_node, keeping the usage tracked from instances.
+        """
+        self.stats.digest_stats(resources.get('stats'))
+        compute_node.stats = copy.deepcopy(self.stats)
+
+        compute_node.ram_allocation_ratio = self.ram_allocation_ratio
+        compute_node.cpu_allocation_ratio = self.cpu_allocation_ratio
+        compute_node.disk_allocation_ratio = self.disk_allocation_ratio
+
+        tracked = ('vcpus_used', 'memory_mb_used', 'local_gb_used',
+                   'numa_topology', 'running_vms', 'current_workload')
+        usage = {key: getattr(compute_node, key) for key in tracked}
+        compute_node.update_from_virt_driver(resources)
+        for key, value in usage.items():
+            setattr(compute_node, key, value)
+        compute_node.free_ram_mb = (compute_node.memory_mb -
+                                    compute_node.memory_mb_used)
+        compute_node.free_disk_gb = (compute_node.local_gb -
+                                     compute_node.local_gb_used)
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _reconcile_instances(self, context, resources, instances):
+        """Update the usage of a node from the hypervisor resources and the
+        instances changed since its last audit.
+        """
+        nodename = resources['hypervisor_hostname']
+        self._refresh_hypervisor_resources(self.compute_nodes[nodename],
+                                           resources)
+
+        for instance in instances:
+            on_node = (not instance.deleted and instance.host == self.host and
+                       instance.node == nodename)
+            if instance.uuid in self.tracked_instances:
+                self._update_usage_from_instance(context, instance, nodename,
+                                                 is_removed=not on_node)
+            elif (on_node and
+                    instance.vm_state not in vm_states.ALLOW_RESOURCE_REMOVAL):
+                self._update_usage_from_instance(context, instance, nodename)
+
+    def _reconcile_available_resource(self, context, resources):
+        """Update the usage of a node from the instances which changed since
+        it was last audited, rather than recomputing it from all of them.
+
+        Returns False, leaving the node untouched, if a full audit is needed
+        instead: when it is due, on the first audit of the node, or when the
+        hypervisor capacity or the in-progress migrations of the node
+        changed. Orphaned instances and deleted instances allocations are
+        only checked by full audits.
+        """
+        nodename = resources['hypervisor_hostname']
+        if not self._can_reconcile(nodename, resources):
+            return False
+
+        reconcile_start = timeutils.utcnow()
+        audit = self.audits[nodename]
+        migrations = objects.MigrationList.get_in_progress_by_host_and_node(
+                context, self.host, nodename)
+        if self._migrations_signature(migrations) != audit['migrations']:
+            return False
+
+        # Grab the instances changed since the last audit which are, or were
+        # tracked, on this host, including the deleted ones.
+        since = audit['since'] - datetime.timedelta(seconds=_RECONCILE_OVERLAP)
+        read_deleted_context = context.elevated(read_deleted='yes')
+        instances = objects.InstanceList.get_by_filters(
+            read_deleted_context,
+            {'host': self.host, 'changes-since': since},
+            expected_attrs=_INSTANCE_EXPECTED_ATTRS)
+        changed = {instance.uuid: instance for instance in instances}
+        tracked = [uuid for uuid in self.tracked_instances
+                   if uuid not in changed]
+        if tracked:
+            instances = objects.InstanceList.get_by_filters(
+                read_deleted_context,
+                {'uuid': tracked, 'changes-since': since},
+                expected_attrs=_INSTANCE_EXPECTED_ATTRS)
+            changed.update((instance.uuid, instance) for instance in instances)
+
+        self._reconcile_instances(context, resources, changed.values())
+
+        LOG.debug('Reconciled %(count)d changed instances for '
+                  '%(host)s (node: %(node)s)',
+                  {'count': len(changed), 'host': self.host, 'node': nodename})
+        self._update_compute_node_usage(context, nodename)
+        audit['since'] = reconcile_start
+        return True
+
     def _get_compute_node(self, context, nodename):
         """Returns compute node for the host and nodename."""
         try:
@@ -915,6 +1127,13 @@ class ResourceTracker(object):
                 self.reportclient.set_traits_for_provider(
                     context, compute_node.uuid, traits)
 
+        self._save_pci_devices(context)
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _save_pci_devices(self, context):
+        """Save the changed PCI devices, dropping the deleted ones from the
+        tracker, holding the lock of the state shared between nodes.
+        """
         if self.pci_tracker:
             self.pci_tracker.save(context)
 
@@ -1097,7 +1316,7 @@ class ResourceTracker(object):
                 continue
 
     def _update_usage_from_instance(self, context, instance, nodename,
-            is_removed=False, require_allocation_refresh=False):
+            is_removed=False):
         """Update usage for a single instance."""
 
         uuid = instance['uuid']
@@ -1125,10 +1344,6 @@ class ResourceTracker(object):
                 self.pci_tracker.update_pci_for_instance(context,
                                                          instance,
                                                          sign=sign)
-            if require_allocation_refresh:
-                LOG.debug("Auto-correcting allocations.")
-                self.reportclient.update_instance_allocation(context, cn,
-                                                             instance, sign)
             # new instance, update compute node resource usage:
             self._update_usage(self._get_usage_dict(instance), nodename,
                                sign=sign)
@@ -1146,18 +1361,6 @@ class ResourceTracker(object):
         instances assigned to the local compute host, even if they are not
         currently powered on.
         """
-        self.tracked_instances.clear()
-
-        cn = self.compute_nodes[nodename]
-        # set some initial values, reserve room for host/hypervisor:
-        cn.local_gb_used = CONF.reserved_host_disk_mb / 1024
-        cn.memory_mb_used = CONF.reserved_host_memory_mb
-        cn.vcpus_used = CONF.reserved_host_cpus
-        cn.free_ram_mb = (cn.memory_mb - cn.memory_mb_used)
-        cn.free_disk_gb = (cn.local_gb - cn.local_gb_used)
-        cn.current_workload = 0
-        cn.running_vms = 0
-
         # NOTE(jaypipes): In Pike, we need to be tolerant of Ocata compute
         # nodes that overwrite placement allocations to look like what the
         # resource tracker *thinks* is correct. When an instance is
@@ -1232,13 +1435,40 @@ class ResourceTracker(object):
                 "Will auto-correct allocations to handle "
                 "Ocata-style assumptions.")
 
+        instances = [instance for instance in instances
+                     if instance.vm_state not in
+                     vm_states.ALLOW_RESOURCE_REMOVAL]
+        if instances and msg_allocation_refresh:
+            LOG.debug(msg_allocation_refresh)
+
+        self._reset_usage_from_instances(context, instances, nodename)
+
+        # Placement is only called once the usage is calculated, not to hold
+        # the lock of the state shared between nodes meanwhile.
+        if require_allocation_refresh:
+            cn = self.compute_nodes[nodename]
+            for instance in instances:
+                LOG.debug("Auto-correcting allocations.")
+                self.reportclient.update_instance_allocation(context, cn,
+                                                             instance, 1)
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _reset_usage_from_instances(self, context, instances, nodename):
+        """Reset the usage of a node to the usage of the given instances."""
+        self.tracked_instances.clear()
+
+        cn = self.compute_nodes[nodename]
+        # set some initial values, reserve room for host/hypervisor:
+        cn.local_gb_used = CONF.reserved_host_disk_mb / 1024
+        cn.memory_mb_used = CONF.reserved_host_memory_mb
+        cn.vcpus_used = CONF.reserved_host_cpus
+        cn.free_ram_mb = (cn.memory_mb - cn.memory_mb_used)
+        cn.free_disk_gb = (cn.local_gb - cn.local_gb_used)
+        cn.current_workload = 0
+        cn.running_vms = 0
+
         for instance in instances:
-            if instance.vm_state not in vm_states.ALLOW_RESOURCE_REMOVAL:
-                if msg_allocation_refresh:
-                    LOG.debug(msg_allocation_refresh)
-                    msg_allocation_refresh = False
-                self._update_usage_from_instance(context, instance, nodename,
-                    require_allocation_refresh=require_allocation_refresh)
+            self._update_usage_from_instance(context, instance, nodename)
 
     def _remove_deleted_instances_allocations(self, context, cn,
                                               migrations):
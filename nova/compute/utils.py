@@ -41,6 +41,7 @@ from nova.notifications.objects import keypair as keypair_notification
 from nova.notifications.objects import server_group as sg_notification
 from nova import objects
 from nova.objects import fields
+from nova import quota
 from nova import rpc
 from nova import safe_utils
 from nova import utils
@@ -843,6 +844,10 @@ def check_num_instances_quota(context, instance_type, min_count,
     req_cores = max_count * instance_type.vcpus
     req_ram = max_count * instance_type.memory_mb
     deltas = {'instances': max_count, 'cores': req_cores, 'ram': req_ram}
+    # NOTE: The recheck quota case, where we used a delta of zero, must count
+    # the instances that were just created so the cached counts are dropped.
+    if min_count == max_count == 0:
+        quota.invalidate_instances_cores_ram_count(project_id, user_id)
 
     try:
         objects.Quotas.check_deltas(context, deltas,
@@ -46,6 +46,7 @@ from nova import notifications
 from nova import objects
 from nova.objects import base as nova_object
 from nova import profiler
+from nova import quota
 from nova import rpc
 from nova.scheduler import client as scheduler_client
 from nova.scheduler import utils as scheduler_utils
@@ -1172,6 +1173,11 @@ class ComputeTaskManager(base.Base):
                     instances.append(instance)
                     cell_mapping_cache[instance.uuid] = cell
 
+        # The instances now exist in their cells, so any cached quota usage
+        # counts of the project and user are out of date.
+        quota.invalidate_instances_cores_ram_count(context.project_id,
+                                                   context.user_id)
+
         # NOTE(melwitt): We recheck the quota after creating the
         # objects to prevent users from allocating more resources
         # than their allowed quota in the event of a race. This is
@@ -229,6 +229,125 @@ osapi_opts = [
         help="""
 As a query can potentially return many thousands of items, you can limit the
 maximum number of items in a single response by setting this option.
+"""),
+    cfg.IntOpt("list_records_batch_size",
+        default=100,
+        min=0,
+        help="""
+Maximum number of records to fetch from a cell database at a time when
+listing instances or migrations across cells.
+
+Every cell is asked for its first batch of records in parallel. Further
+batches are only fetched from a cell once the records it already returned
+have been merged into the response, so a listing reads roughly as many
+records as it returns instead of up to ``max_limit`` records from every cell.
+
+Possible values:
+
+* 0: Fetch up to the requested limit from every cell at once.
+* Any positive integer: Number of records to fetch from a cell at a time.
+
+Related options:
+
+* ``max_limit``
+"""),
+    cfg.IntOpt("cell_timeout",
+        default=60,
+        min=1,
+        help="""
+Maximum number of seconds to wait for the cells queried in parallel by a
+request, for example when listing instances or counting quota usage across
+cells.
+
+The request goes on with the results of the cells that responded in time
+and ignores the others, so this bounds the latency added by a slow cell.
+
+Related options:
+
+* ``cell_down_cooldown``
+"""),
+    cfg.IntOpt("cell_down_cooldown",
+        default=0,
+        min=0,
+        help="""
+Number of seconds for which a cell that did not respond within
+``cell_timeout`` is skipped by requests querying cells in parallel.
+
+Once that time has passed the next request queries the cell again, and the
+cell is only skipped again if it times out again.
+
+Possible values:
+
+* 0: Always query every cell (default).
+* Any positive integer: Number of seconds to skip a cell for.
+
+Related options:
+
+* ``cell_timeout``
+"""),
+    cfg.FloatOpt("cell_hedge_delay",
+        default=0,
+        min=0,
+        help="""
+Number of seconds after which a request querying cells in parallel sends a
+second, identical query to every cell that has not responded yet. The first
+of the two responses is used. The other query is left to complete and its
+response is discarded.
+
+This trades a little extra load on slow cells for lower tail latency when a
+cell database only occasionally responds slowly, for example because the
+query hit a busy database connection or replica.
+
+Possible values:
+
+* 0: Never send a second query (default).
+* Any positive number: Number of seconds to wait before sending a second
+  query to a cell.
+
+Related options:
+
+* ``cell_timeout``
+"""),
+    cfg.IntOpt("cell_mappings_cache_time",
+        default=0,
+        min=0,
+        help="""
+Number of seconds after which the list of cells is read again from the API
+database.
+
+The cell mappings are otherwise read once and kept until the service is
+restarted. When they are read again, the connections to the cells whose
+database connection or transport URL changed are set up anew on their next
+use, and new cells are queried by the requests that query all cells.
+
+Possible values:
+
+* 0: Read the cell mappings only once (default).
+* Any positive integer: Number of seconds to keep the cell mappings for.
+"""),
+    cfg.IntOpt("cell_database_max_pool_size",
+        min=1,
+        help="""
+Maximum number of connections to keep open in the pool of each cell
+database.
+
+A service targeting cells, such as the API, keeps one connection pool per
+cell database, so the number of connections it may open grows with the
+number of cells. If this option is not set, the pools of the cell databases
+are sized by ``[database]/max_pool_size``.
+
+Related options:
+
+* ``[database]/max_pool_size``
+"""),
+    cfg.BoolOpt("warm_up_cells",
+        default=False,
+        help="""
+Set up the database connections of every cell when an API worker starts.
+
+Otherwise the connection to a cell database is set up by the first request
+using that cell, which then waits for it. A cell whose database cannot be
+reached when the worker starts is logged and set up on first use instead.
 """),
     cfg.StrOpt("compute_link_prefix",
         deprecated_group="DEFAULT",
@@ -642,6 +642,33 @@ Possible values:
 
 * Any positive integer representing a build failure count.
 * Zero to never auto-disable.
+"""),
+    cfg.IntOpt('resource_tracker_full_audit_interval',
+        default=0,
+        min=0,
+        help="""
+Number of seconds between full audits of the compute node resource usage.
+
+By default the ``update_available_resource`` periodic task recomputes the
+usage of the compute node from every instance assigned to it. When this
+option is set, the task does so at most once per interval, and otherwise only
+reconciles the usage with the instances changed since its previous run. This
+reduces the load of the task on the database and the compute service for
+hosts running many instances.
+
+A full audit is still run when the capacity reported by the hypervisor or the
+in-progress migrations of the node change. Orphaned instances running on the
+hypervisor are only detected by full audits. Compute services managing
+several nodes, such as ironic, always run full audits.
+
+Possible values:
+
+* 0: Run a full audit every time (default).
+* Any positive integer in seconds.
+
+Related options:
+
+* ``update_resources_interval``
 """),
 ]
 
@@ -713,6 +740,31 @@ Possible values:
 
 * Any positive integer in seconds.
 * Any value <=0 will disable the sync. This is not recommended.
+
+Related options:
+
+* ``heal_instance_info_cache_batch_size``
+"""),
+    cfg.IntOpt('heal_instance_info_cache_batch_size',
+        default=1,
+        min=1,
+        help="""
+Number of instances whose network information cache is updated by each run
+of the task updating these caches.
+
+Each run updates the caches of this many instances on the compute node, in
+turn. With Neutron, the ports and networks of all these instances are looked
+up at once, which takes far fewer requests to Neutron than looking them up
+for each instance. Raising this value shortens the time taken to update the
+caches of all the instances on a busy compute node.
+
+Possible values:
+
+* Any positive integer.
+
+Related options:
+
+* ``heal_instance_info_cache_interval``
 """),
     cfg.IntOpt('reclaim_instance_interval',
         default=0,
@@ -76,6 +76,54 @@ Neutron for extensions.  After this number of seconds the next time Nova
 needs to create a resource in Neutron it will requery Neutron for the
 extensions that it has loaded.  Setting value to 0 will refresh the
 extensions with no wait.
+"""),
+    cfg.IntOpt('port_operation_concurrency',
+         default=1,
+         min=1,
+         help="""
+Maximum number of ports of an instance which are created or updated at
+once when allocating its network resources.
+
+With the default of 1 the ports are created and updated one after another.
+Higher values reduce the time taken to allocate the network resources of
+instances with several network interfaces, at the cost of sending neutron
+more requests at once. If creating or updating a port fails, the ports of
+the instance which are not being processed yet are skipped, and the ports
+already processed are rolled back.
+
+Related options:
+
+* ``[neutron]/connection_pool_size``: Requests made beyond the size of the
+  connection pool wait for a connection, or open extra connections which are
+  not kept.
+"""),
+    cfg.IntOpt('network_cache_time',
+         default=0,
+         min=0,
+         help="""
+Number of seconds for which the details of neutron networks, the physical
+networks they are on and the list of neutron extensions are cached. These
+rarely change, and are otherwise looked up again each time the network
+information of an instance is refreshed or its ports are created.
+
+The cache is kept by each nova service process, unless the ``[cache]``
+options configure a shared backend such as memcached. The entries of the
+networks of an instance are removed when a ``network-changed`` event is
+received for it, but only from the cache of the compute service handling
+the event unless the cache is shared. Otherwise changes to a network, such
+as its name or MTU, are seen once its entries expire.
+
+Possible values:
+
+* 0: Disables the cache (default).
+* Any positive integer: Number of seconds to cache network details for.
+
+Related options:
+
+* ``[neutron]/extension_sync_interval``: The list of extensions is looked
+  up in the cache, if enabled, once this interval has passed.
+* ``[cache]/enabled`` and ``[cache]/backend`` to share the cache between
+  services.
 """),
 ]
 
@@ -111,6 +159,8 @@ ALL_OPTS = (neutron_opts + metadata_proxy_opts)
 def register_opts(conf):
     conf.register_group(neutron_group)
     conf.register_opts(ALL_OPTS, group=neutron_group)
+    conf.register_opts(confutils.get_connection_pool_opts(),
+                       group=neutron_group)
     # NOTE(efried): We don't pass `url` as a deprecated opt because that would
     # make CONF.neutron.url indistinguishable from
     # CONF.neutron.endpoint_override in the code, and we need to be able to use
@@ -122,6 +172,7 @@ def list_opts():
     return {
         neutron_group: (
             ALL_OPTS +
+            confutils.get_connection_pool_opts() +
             ks_loading.get_session_conf_options() +
             ks_loading.get_auth_common_conf_options() +
             ks_loading.get_auth_plugin_conf_options('password') +
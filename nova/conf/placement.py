@@ -60,6 +60,35 @@ are returned in a deterministic but undefined order. That is, all things
 being equal, two requests for allocation candidates will return the same
 results in the same order; but no guarantees are made as to how that order
 is determined.
+"""),
+    cfg.IntOpt(
+        'usage_cache_time',
+        default=0,
+        min=0,
+        help="""
+Number of seconds for which the placement service caches the inventory and
+usage of a resource provider. These are read when listing allocation
+candidates and resource provider usages.
+
+Cached records are keyed on the resource provider generation, so any change
+to the inventory or allocations of a provider that increments its generation
+is seen immediately. Deleting allocations does not increment the generation
+of the providers involved. Their cache entries are removed instead, but only
+from the cache of the API worker handling the deletion unless the ``[cache]``
+options configure a shared backend such as memcached. Other workers, and
+requests racing with the deletion, may report the deleted usage until the
+entries expire. Allocations are always checked against the database, so a
+stale entry can hide capacity but never over-commit a provider.
+
+Possible values:
+
+* 0: Disables the cache (default).
+* Any positive integer: Number of seconds to cache records for.
+
+Related options:
+
+* ``[cache]/enabled`` and ``[cache]/backend`` to share the cache between
+  API workers.
 """),
 ]
 
@@ -74,6 +103,8 @@ deprecated_opts = {
 def register_opts(conf):
     conf.register_group(placement_group)
     conf.register_opts(placement_opts, group=placement_group)
+    conf.register_opts(confutils.get_connection_pool_opts(),
+                       group=placement_group)
     confutils.register_ksa_opts(conf, placement_group, DEFAULT_SERVICE_TYPE,
                                 deprecated_opts=deprecated_opts)
 
@@ -82,6 +113,7 @@ def list_opts():
     return {
         placement_group.name: (
             placement_opts +
+            confutils.get_connection_pool_opts() +
             ks_loading.get_session_conf_options() +
             ks_loading.get_auth_common_conf_options() +
             ks_loading.get_auth_plugin_conf_options('password') +
@@ -330,6 +330,37 @@ impossible for a user to exceed their quota with the caveat that it will,
 however, be possible for a REST API user to be rejected with a 403 response in
 the event of a collision close to reaching their quota limit, even if the user
 has enough quota available when they made the request.
+"""),
+    cfg.IntOpt('count_usage_cache_time',
+        default=0,
+        min=0,
+        help="""
+Number of seconds for which the counts of instances, cores and ram of a project
+and user are cached.
+
+These usages are counted in every cell database on each quota check, for
+example when creating or resizing servers. With the cache, consecutive checks
+for the same project and user within that time reuse the counts instead, and
+a slow cell is only waited on once per period. Counts missing cells that did
+not respond are never cached.
+
+The cached counts of a project and user are dropped when its servers are
+created, deleted or resized, and the quota recheck made when
+``recheck_quota`` is True always counts from the cell databases. Deletes and
+resizes finish on the compute services, so they only drop the counts cached
+by the API services when the cache is shared between services. Otherwise
+those changes are only seen when the counts expire.
+
+Possible values:
+
+* 0: Disables the cache (default).
+* Any positive integer: Number of seconds to cache counts for.
+
+Related options:
+
+* ``recheck_quota``
+* ``[cache]/enabled`` and ``[cache]/backend`` to share the cache between
+  API workers and compute services.
 """),
 ]
 
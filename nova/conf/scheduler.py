@@ -178,6 +178,39 @@ aggregate, then this should be True to prevent them from receiving unrestricted
 scheduling to any available node.
 
 See also the limit_tenants_to_placement_aggregate option.
+"""),
+    cfg.BoolOpt("timing_metrics",
+                default=False,
+                help="""
+Log the time spent in each phase of a scheduling request.
+
+When enabled, the scheduler measures the phases of every select_destinations
+request: the allocation candidates query to the placement service, the
+loading of the host states of each cell, each filter, each weigher and the
+resource claims against the placement service, and counts the claims retried
+because of a concurrent update of the allocations. The number of runs and the
+total duration of each phase are then logged at INFO level in a single line
+per request, which can be fed to a log based metrics system to find out which
+phases take longer as the deployment grows.
+
+Related options:
+
+* timing_trace
+"""),
+    cfg.BoolOpt("timing_trace",
+                default=False,
+                help="""
+Log the trace of the phases of each scheduling request.
+
+When enabled, the scheduler logs at INFO level, for every select_destinations
+request, the start offset and the duration of each of the phases measured as
+described for the timing_metrics option, in the order they ended. This is
+meant for troubleshooting a slow scheduler and is verbose in large
+deployments.
+
+Related options:
+
+* timing_metrics
 """),
 ]
 
@@ -274,6 +307,68 @@ NOTE: In a multi-cell (v2) setup where the cell MQ is separated from the
 top-level, computes cannot directly communicate with the scheduler. Thus,
 this option cannot be enabled in that scenario. See also the
 [workarounds]/disable_group_policy_check_upcall option.
+"""),
+    cfg.BoolOpt("cache_host_states",
+        default=False,
+        help="""
+Keep host states in memory between scheduling requests.
+
+By default the scheduler reads the compute node and compute service records
+for every candidate host from the cell databases on each scheduling request.
+When this option is enabled, the HostManager instead builds its view of the
+hosts once and then keeps it up to date by only reading the compute node and
+service records which changed since the previous request, so that a scheduling
+request only costs a small delta query per cell regardless of the number of
+hosts in the deployment.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+Related options:
+
+* host_state_cache_full_refresh_interval
+"""),
+    cfg.IntOpt("host_state_cache_full_refresh_interval",
+        default=600,
+        min=0,
+        help="""
+Interval in seconds for rebuilding the cached host states from scratch.
+
+When host states are cached between scheduling requests, the cache of each
+cell is rebuilt from a full read of its compute node and service records at
+this interval, in order to recover from any change missed by the incremental
+updates, for example due to clock skew between the hosts writing the records.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect. Also note that this setting
+only has an effect if the 'cache_host_states' option is enabled.
+
+Possible values:
+
+* 0: Never rebuild the cache after it has been first populated.
+* Any positive integer: the number of seconds between two rebuilds.
+
+Related options:
+
+* cache_host_states
+"""),
+    cfg.BoolOpt("batch_claims",
+        default=False,
+        help="""
+Claim the resources of all the instances of a multi-create request at once.
+
+By default, when a request creates several instances, the scheduler selects a
+host for an instance and claims its resources in the placement service before
+moving on to the next instance, which costs at least one round trip to the
+placement service per instance. When this option is enabled, the scheduler
+first selects a host for each instance and then claims the resources of all
+of the instances in a single call to the placement service. If that claim
+fails, for example because another scheduler consumed some of the same
+resources in the meantime, the scheduler selects the hosts again and claims
+the resources of each instance in turn, as if this option was disabled.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
 """),
     cfg.MultiStrOpt("available_filters",
         default=["nova.scheduler.filters.all_filters"],
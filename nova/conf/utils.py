@@ -49,6 +49,48 @@ def get_ksa_adapter_opts(default_service_type, deprecated_opts=None):
     return opts
 
 
+def get_connection_pool_opts():
+    """Get the options sizing the HTTP connection pool of a service client.
+
+    :return: List of cfg.Opts.
+    """
+    return [
+        cfg.IntOpt(
+            'connection_pool_size',
+            default=10,
+            min=1,
+            help="""
+Maximum number of HTTP connections kept open to each endpoint of the service.
+
+Connections are kept alive and shared by every client of the service within
+a process, so requests reuse an established connection instead of opening a
+new one. When more requests than this are in flight at once, the excess
+requests either open short-lived connections or, if
+``connection_pool_block`` is set, wait for a pooled connection to be free.
+
+Related options:
+
+* ``connection_pool_block``
+"""),
+        cfg.BoolOpt(
+            'connection_pool_block',
+            default=False,
+            help="""
+Wait for a free pooled connection when all of them are in use.
+
+When enabled, ``connection_pool_size`` bounds the number of concurrent
+requests a process sends to each endpoint of the service. When disabled,
+requests beyond that number use connections which are closed once the
+request completes. Either way, a warning is logged periodically while the
+pool is exhausted.
+
+Related options:
+
+* ``connection_pool_size``
+"""),
+    ]
+
+
 def _dummy_opt(name):
     # A config option that can't be set by the user, so it behaves as if it's
     # ignored; but consuming code may expect it to be present in a conf group.
@@ -17,6 +17,7 @@
 
 """RequestContext: context for requests that persist through all of nova."""
 
+import bisect
 from contextlib import contextmanager
 import copy
 
@@ -30,16 +31,18 @@ from oslo_log import log as logging
 from oslo_utils import timeutils
 import six
 
+import nova.conf
 from nova import exception
 from nova.i18n import _
 from nova import objects
 from nova import policy
 from nova import utils
 
+CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
 # TODO(melwitt): This cache should be cleared whenever WSGIService receives a
-# SIGHUP and periodically based on an expiration time. Currently, none of the
-# cell caches are purged, so neither is this one, for now.
+# SIGHUP. The connections of a cell are only replaced when the database
+# connection or transport URL of its cell mapping changes.
 CELL_CACHE = {}
 # NOTE(melwitt): Used for the scatter-gather utility to indicate we timed out
 # waiting for a result from a cell.
@@ -47,10 +50,19 @@ did_not_respond_sentinel = object()
 # NOTE(melwitt): Used for the scatter-gather utility to indicate an exception
 # was raised gathering a result from a cell.
 raised_exception_sentinel = object()
-# FIXME(danms): Keep a global cache of the cells we find the
-# first time we look. This needs to be refreshed on a timer or
-# trigger.
+# Keep a global cache of the cells we find the first time we look. It is
+# read again every [api]/cell_mappings_cache_time seconds if that is set.
 CELLS = []
+CELLS_LOADED_AT = None
+# Time at which each cell last failed to respond to a scatter-gather, used
+# to skip it for [api]/cell_down_cooldown seconds.
+CELL_TIMEOUTS = {}
+# Upper bounds in seconds of the buckets of the cell latency histograms.
+CELL_LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+# Histogram of the time taken by the calls made to each cell by the
+# scatter-gather utility, as a list of counts per CELL_LATENCY_BUCKETS entry
+# followed by the count of calls slower than the last bucket.
+CELL_LATENCIES = {}
 
 
 class _ContextAuthPlugin(plugin.BaseAuthPlugin):
@@ -357,17 +369,20 @@ def set_target_cell(context, cell_mapping):
         # Synchronize access to the cache by multiple API workers.
         @utils.synchronized(cell_mapping.uuid)
         def get_or_set_cached_cell_and_set_connections():
-            try:
-                cell_tuple = CELL_CACHE[cell_mapping.uuid]
-            except KeyError:
+            urls = (cell_mapping.database_connection,
+                    cell_mapping.transport_url)
+            cell_tuple = CELL_CACHE.get(cell_mapping.uuid)
+            if cell_tuple is None or cell_tuple[2:] != urls:
+                # The cell is new to us, or its mapping changed since we
+                # connected to it.
                 db_connection_string = cell_mapping.database_connection
                 context.db_connection = db.create_context_manager(
                     db_connection_string)
                 if not cell_mapping.transport_url.startswith('none'):
                     context.mq_connection = rpc.create_transport(
                         cell_mapping.transport_url)
-                CELL_CACHE[cell_mapping.uuid] = (context.db_connection,
-                                                 context.mq_connection)
+                CELL_CACHE[cell_mapping.uuid] = (
+                    (context.db_connection, context.mq_connection) + urls)
             else:
                 context.db_connection = cell_tuple[0]
                 context.mq_connection = cell_tuple[1]
@@ -402,12 +417,45 @@ def target_cell(context, cell_mapping):
     yield cctxt
 
 
+def _record_cell_latency(cell_uuid, elapsed):
+    histogram = CELL_LATENCIES.setdefault(
+        cell_uuid, [0] * (len(CELL_LATENCY_BUCKETS) + 1))
+    histogram[bisect.bisect_left(CELL_LATENCY_BUCKETS, elapsed)] += 1
+
+
+def get_cell_latencies():
+    """Return the latency histograms of the calls made to each cell.
+
+    :returns: A dict {cell_uuid: [(upper_bound, count), ...]} with the number
+              of scatter-gather calls to each cell that completed within each
+              upper bound in seconds, and not within the previous one. The
+              last upper bound is None and counts the slower calls.
+    """
+    bounds = list(CELL_LATENCY_BUCKETS) + [None]
+    return {cell_uuid: list(zip(bounds, histogram))
+            for cell_uuid, histogram in CELL_LATENCIES.items()}
+
+
+def _cell_is_down(cell_uuid):
+    """Return whether a cell recently timed out and should be skipped."""
+    cooldown = CONF.api.cell_down_cooldown
+    timed_out_at = CELL_TIMEOUTS.get(cell_uuid)
+    if not cooldown or timed_out_at is None:
+        return False
+    return not timeutils.is_older_than(timed_out_at, cooldown)
+
+
 def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
     """Target cells in parallel and return their results.
 
     The first parameter in the signature of the function to call for each cell
     should be of type RequestContext.
 
+    Cells that did not respond within the timeout of a previous call are not
+    called for [api]/cell_down_cooldown seconds. If [api]/cell_hedge_delay is
+    set, the function is called a second time for every cell that has not
+    responded after that many seconds, and the first result is used.
+
     :param context: The RequestContext for querying cells
     :param cell_mappings: The CellMappings to target in parallel
     :param timeout: The total time in seconds to wait for all the results to be
@@ -418,57 +466,104 @@ def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
     :param kwargs: The kwargs for the function to call for each cell
     :returns: A dict {cell_uuid: result} containing the joined results. The
               did_not_respond_sentinel will be returned if a cell did not
-              respond within the timeout. The raised_exception_sentinel will
-              be returned if the call to a cell raised an exception. The
-              exception will be logged.
+              respond within the timeout, or was skipped because it recently
+              did not. The raised_exception_sentinel will be returned if the
+              call to a cell raised an exception. The exception will be
+              logged.
     """
-    greenthreads = []
+    greenthreads = {}
     queue = eventlet.queue.LightQueue()
     results = {}
+    skipped = set()
 
     def gather_result(cell_mapping, fn, context, *args, **kwargs):
         cell_uuid = cell_mapping.uuid
-        try:
-            with target_cell(context, cell_mapping) as cctxt:
-                result = fn(cctxt, *args, **kwargs)
-        except Exception:
-            LOG.exception('Error gathering result from cell %s', cell_uuid)
-            result = raised_exception_sentinel
+        with timeutils.StopWatch() as timer:
+            try:
+                with target_cell(context, cell_mapping) as cctxt:
+                    result = fn(cctxt, *args, **kwargs)
+            except Exception:
+                LOG.exception('Error gathering result from cell %s',
+                              cell_uuid)
+                result = raised_exception_sentinel
+        _record_cell_latency(cell_uuid, timer.elapsed())
         # The queue is already synchronized.
         queue.put((cell_uuid, result))
 
-    for cell_mapping in cell_mappings:
-        greenthreads.append((cell_mapping.uuid,
-                             utils.spawn(gather_result, cell_mapping,
-                                         fn, context, *args, **kwargs)))
+    def spawn_gather_result(cell_mapping):
+        greenthreads.setdefault(cell_mapping.uuid, []).append(
+            utils.spawn(gather_result, cell_mapping, fn, context, *args,
+                        **kwargs))
 
+    for cell_mapping in cell_mappings:
+        if _cell_is_down(cell_mapping.uuid):
+            LOG.debug('Skipping cell %s which recently did not respond',
+                      cell_mapping.uuid)
+            skipped.add(cell_mapping.uuid)
+            continue
+        spawn_gather_result(cell_mapping)
+
+    # Only hedge once, and only the cells we are still waiting on.
+    hedge_delay = CONF.api.cell_hedge_delay
     with eventlet.timeout.Timeout(timeout, exception.CellTimeout):
         try:
             while len(results) != len(greenthreads):
-                cell_uuid, result = queue.get()
-                results[cell_uuid] = result
+                if not hedge_delay:
+                    cell_uuid, result = queue.get()
+                else:
+                    try:
+                        cell_uuid, result = queue.get(timeout=hedge_delay)
+                    except eventlet.queue.Empty:
+                        hedge_delay = None
+                        for cell_mapping in cell_mappings:
+                            if (cell_mapping.uuid in greenthreads and
+                                    cell_mapping.uuid not in results):
+                                LOG.debug('Sending a hedged request to cell '
+                                          '%s', cell_mapping.uuid)
+                                spawn_gather_result(cell_mapping)
+                        continue
+                # A hedged cell may respond twice, keep the first result.
+                results.setdefault(cell_uuid, result)
         except exception.CellTimeout:
             # NOTE(melwitt): We'll fill in did_not_respond_sentinels at the
             # same time we kill/wait for the green threads.
             pass
 
     # Kill the green threads still pending and wait on those we know are done.
-    for cell_uuid, greenthread in greenthreads:
+    # The slower of the hedged calls to a cell that responded is left to
+    # finish on its own, and its result is discarded.
+    for cell_uuid, cell_greenthreads in greenthreads.items():
         if cell_uuid not in results:
-            greenthread.kill()
+            for greenthread in cell_greenthreads:
+                greenthread.kill()
             results[cell_uuid] = did_not_respond_sentinel
+            CELL_TIMEOUTS[cell_uuid] = timeutils.utcnow()
             LOG.warning('Timed out waiting for response from cell %s',
                         cell_uuid)
+        elif len(cell_greenthreads) > 1:
+            CELL_TIMEOUTS.pop(cell_uuid, None)
         else:
-            greenthread.wait()
+            cell_greenthreads[0].wait()
+            CELL_TIMEOUTS.pop(cell_uuid, None)
+
+    for cell_uuid in skipped:
+        results[cell_uuid] = did_not_respond_sentinel
 
     return results
 
 
+def _cells_expired():
+    cache_time = CONF.api.cell_mappings_cache_time
+    return bool(cache_time and CELLS_LOADED_AT is not None and
+                timeutils.is_older_than(CELLS_LOADED_AT, cache_time))
+
+
 def load_cells():
     global CELLS
-    if not CELLS:
+    global CELLS_LOADED_AT
+    if not CELLS or _cells_expired():
         CELLS = objects.CellMappingList.get_all(get_admin_context())
+        CELLS_LOADED_AT = timeutils.utcnow()
         LOG.debug('Found %(count)i cells: %(cells)s',
                   dict(count=len(CELLS),
                        cells=','.join([c.identity for c in CELLS])))
@@ -477,12 +572,31 @@ def load_cells():
         LOG.error('No cells are configured, unable to continue')
 
 
+def warm_up_cells():
+    """Set up the database connection of every cell.
+
+    This is meant to be called when a service starts so that its first
+    requests do not have to wait for the connections to be set up. Cells
+    that cannot be reached are logged and skipped.
+    """
+    load_cells()
+    ctxt = get_admin_context()
+    for cell_mapping in CELLS:
+        try:
+            with target_cell(ctxt, cell_mapping) as cctxt:
+                # Creating the engine connects to the database.
+                cctxt.db_connection.get_legacy_facade().get_engine()
+        except Exception:
+            LOG.warning('Unable to set up the connection to cell %s',
+                        cell_mapping.identity, exc_info=True)
+
+
 def scatter_gather_skip_cell0(context, fn, *args, **kwargs):
     """Target all cells except cell0 in parallel and return their results.
 
     The first parameter in the signature of the function to call for each cell
-    should be of type RequestContext. There is a 60 second timeout for waiting
-    on all results to be gathered.
+    should be of type RequestContext. The [api]/cell_timeout option sets the
+    number of seconds to wait for all results to be gathered.
 
     :param context: The RequestContext for querying cells
     :param fn: The function to call for each cell
@@ -497,16 +611,16 @@ def scatter_gather_skip_cell0(context, fn, *args, **kwargs):
     """
     load_cells()
     cell_mappings = [cell for cell in CELLS if not cell.is_cell0()]
-    return scatter_gather_cells(context, cell_mappings, 60, fn, *args,
-                                **kwargs)
+    return scatter_gather_cells(context, cell_mappings,
+                                CONF.api.cell_timeout, fn, *args, **kwargs)
 
 
 def scatter_gather_all_cells(context, fn, *args, **kwargs):
     """Target all cells in parallel and return their results.
 
     The first parameter in the signature of the function to call for each cell
-    should be of type RequestContext. There is a 60 second timeout for waiting
-    on all results to be gathered.
+    should be of type RequestContext. The [api]/cell_timeout option sets the
+    number of seconds to wait for all results to be gathered.
 
     :param context: The RequestContext for querying cells
     :param fn: The function to call for each cell
@@ -520,4 +634,5 @@ def scatter_gather_all_cells(context, fn, *args, **kwargs):
               exception will be logged.
     """
     load_cells()
-    return scatter_gather_cells(context, CELLS, 60, fn, *args, **kwargs)
+    return scatter_gather_cells(context, CELLS, CONF.api.cell_timeout, fn,
+                                *args, **kwargs)
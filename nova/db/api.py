@@ -156,6 +156,17 @@ def service_get_all_computes_by_hv_type(context, hv_type,
         include_disabled=include_disabled)
 
 
+def service_get_all_by_binary_changed_since(context, binary, changed_since):
+    """Get services for a given binary created, updated or deleted since the
+    given time.
+
+    Deleted services are only returned if the context allows reading deleted
+    records.
+    """
+    return IMPL.service_get_all_by_binary_changed_since(context, binary,
+                                                        changed_since)
+
+
 def service_get_all_by_host(context, host):
     """Get all services for a given host."""
     return IMPL.service_get_all_by_host(context, host)
@@ -280,6 +291,20 @@ def compute_node_get_all_by_pagination(context, limit=None, marker=None):
                                                    limit=limit, marker=marker)
 
 
+def compute_node_get_all_changed_since(context, changed_since):
+    """Get compute nodes created, updated or deleted since the given time.
+
+    :param context: The security context
+    :param changed_since: Only return compute nodes with a created_at,
+                          updated_at or deleted_at value at or after this
+                          datetime. Deleted compute nodes are only returned
+                          if the context allows reading deleted records.
+
+    :returns: List of dictionaries each containing compute node properties
+    """
+    return IMPL.compute_node_get_all_changed_since(context, changed_since)
+
+
 def compute_node_get_all_by_host(context, host):
     """Get compute nodes by host name
 
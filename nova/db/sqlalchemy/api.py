@@ -114,8 +114,11 @@ def create_context_manager(connection=None):
 
     : param connection: The database connection string
     """
+    db_conf = _get_db_conf(CONF.database, connection=connection)
+    if CONF.api.cell_database_max_pool_size is not None:
+        db_conf['max_pool_size'] = CONF.api.cell_database_max_pool_size
     ctxt_mgr = enginefacade.transaction_context()
-    ctxt_mgr.configure(**_get_db_conf(CONF.database, connection=connection))
+    ctxt_mgr.configure(**db_conf)
     return ctxt_mgr
 
 
@@ -477,6 +480,16 @@ def service_get_all_by_binary(context, binary, include_disabled=False):
     return query.all()
 
 
+@pick_context_manager_reader
+def service_get_all_by_binary_changed_since(context, binary, changed_since):
+    return model_query(context, models.Service).\
+                    filter_by(binary=binary).\
+                    filter(or_(models.Service.created_at >= changed_since,
+                               models.Service.updated_at >= changed_since,
+                               models.Service.deleted_at >= changed_since)).\
+                    all()
+
+
 @pick_context_manager_reader
 def service_get_all_computes_by_hv_type(context, hv_type,
                                         include_disabled=False):
@@ -586,6 +599,11 @@ def _compute_node_select(context, filters=None, limit=None, marker=None):
         select = select.where(cn_tbl.c.hypervisor_hostname == hyp_hostname)
     if "mapped" in filters:
         select = select.where(cn_tbl.c.mapped < filters['mapped'])
+    if "changed_since" in filters:
+        changed_since = filters["changed_since"]
+        select = select.where(or_(cn_tbl.c.created_at >= changed_since,
+                                  cn_tbl.c.updated_at >= changed_since,
+                                  cn_tbl.c.deleted_at >= changed_since))
     if marker is not None:
         try:
             compute_node_get(context, marker)
@@ -669,6 +687,11 @@ def compute_node_get_all_mapped_less_than(context, mapped_less_than):
                                   {'mapped': mapped_less_than})
 
 
+@pick_context_manager_reader
+def compute_node_get_all_changed_since(context, changed_since):
+    return _compute_node_fetchall(context, {'changed_since': changed_since})
+
+
 @pick_context_manager_reader
 def compute_node_get_all_by_pagination(context, limit=None, marker=None):
     return _compute_node_fetchall(context, limit=limit, marker=marker)
@@ -1915,8 +1938,10 @@ def _instances_fill_metadata(context, instances, manual_joins=None):
     :param context: security context
     :param instances: list of instances to fill
     :param manual_joins: list of tables to manually join (can be any
-                         combination of 'metadata' and 'system_metadata' or
-                         None to take the default of both)
+                         combination of 'metadata', 'system_metadata',
+                         'pci_devices', 'fault' and 'security_groups' or
+                         None to take the default of 'metadata' and
+                         'system_metadata')
     """
     uuids = [inst['uuid'] for inst in instances]
 
@@ -1938,6 +1963,13 @@ def _instances_fill_metadata(context, instances, manual_joins=None):
         for row in _instance_pcidevs_get_multi(context, uuids):
             pcidevs[row['instance_uuid']].append(row)
 
+    secgroups = collections.defaultdict(list)
+    if 'security_groups' in manual_joins:
+        for instance_uuid, secgroup in _instance_security_groups_get_multi(
+                context, [inst['uuid'] for inst in instances
+                          if not inst['deleted']]):
+            secgroups[instance_uuid].append(secgroup)
+
     if 'fault' in manual_joins:
         faults = instance_fault_get_by_instance_uuids(context, uuids,
                                                       latest=True)
@@ -1951,6 +1983,8 @@ def _instances_fill_metadata(context, instances, manual_joins=None):
         inst['metadata'] = meta[inst['uuid']]
         if 'pci_devices' in manual_joins:
             inst['pci_devices'] = pcidevs[inst['uuid']]
+        if 'security_groups' in manual_joins:
+            inst['security_groups'] = secgroups[inst['uuid']]
         inst_faults = faults.get(inst['uuid'])
         inst['fault'] = inst_faults and inst_faults[0] or None
         filled_instances.append(inst)
@@ -2100,6 +2134,13 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
         manual_joins, columns_to_join_new = (
             _manual_join_columns(columns_to_join))
 
+    # NOTE: Joining the many-to-many security groups would return a row per
+    # group of every instance and have the paginated query wrapped in a
+    # subquery, so load them in a single separate query instead.
+    if 'security_groups' in columns_to_join_new:
+        columns_to_join_new.remove('security_groups')
+        manual_joins.append('security_groups')
+
     query_prefix = context.session.query(models.Instance)
     for column in columns_to_join_new:
         if 'extra.' in column:
@@ -5979,6 +6020,23 @@ def pci_device_get_all_by_instance_uuid(context, instance_uuid):
                        all()
 
 
+@pick_context_manager_reader
+def _instance_security_groups_get_multi(context, instance_uuids):
+    """Return (instance_uuid, security_group) tuples for the instances."""
+    if not instance_uuids:
+        return []
+    return model_query(context, models.SecurityGroupInstanceAssociation,
+                       (models.SecurityGroupInstanceAssociation.instance_uuid,
+                        models.SecurityGroup),
+                       read_deleted="no").\
+        join(models.SecurityGroup,
+             models.SecurityGroup.id ==
+             models.SecurityGroupInstanceAssociation.security_group_id).\
+        filter(models.SecurityGroup.deleted == 0).\
+        filter(models.SecurityGroupInstanceAssociation.instance_uuid.in_(
+            instance_uuids))
+
+
 @pick_context_manager_reader
 def _instance_pcidevs_get_multi(context, instance_uuids):
     if not instance_uuids:
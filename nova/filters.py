@@ -17,6 +17,8 @@
 Filter support
 """
 
+import contextlib
+
 from oslo_log import log as logging
 
 from nova.i18n import _LI
@@ -44,6 +46,20 @@ class BaseFilter(object):
             if self._filter_one(obj, spec_obj):
                 yield obj
 
+    def filter_all_batch(self, columns, spec_obj):
+        """Return a sequence of booleans telling, for each object of the
+        column store, whether it passes the filter.
+
+        Can be overridden in a subclass to evaluate the filter over all of the
+        objects at once, for instance with array operations. Return None if
+        the filter cannot be evaluated that way for this request, in which
+        case filter_all() is used instead.
+
+        :param columns: column store of the objects to filter, as returned by
+                        BaseFilterHandler.get_columns()
+        """
+        return None
+
     # Set to true in a subclass if a filter only needs to be run once
     # for each request rather than for each instance
     run_filter_once_per_request = False
@@ -65,9 +81,30 @@ class BaseFilterHandler(loadables.BaseLoader):
     This class should be subclassed where one needs to use filters.
     """
 
+    def get_columns(self, objs):
+        """Return a column store of objs for BaseFilter.filter_all_batch(),
+        or None if batch filtering is not supported.
+
+        Can be overridden in a subclass. The returned object must have an
+        'objs' attribute listing the objects it holds, a compress() method
+        returning the column store of the objects for which the given
+        sequence of booleans is True, and a select() method returning the
+        column store of the given subset of its objects.
+        """
+        return None
+
+    @contextlib.contextmanager
+    def filter_context(self, filter_):
+        """Context manager wrapped around each run of a filter.
+
+        Can be overridden in a subclass to instrument the filters.
+        """
+        yield
+
     def get_filtered_objects(self, filters, objs, spec_obj, index=0):
         list_objs = list(objs)
         LOG.debug("Starting with %d host(s)", len(list_objs))
+        columns = self.get_columns(list_objs)
         # Track the hosts as they are removed. The 'full_filter_results' list
         # contains the host/nodename info for every host that passes each
         # filter, while the 'part_filter_results' list just tracks the number
@@ -82,11 +119,22 @@ class BaseFilterHandler(loadables.BaseLoader):
             if filter_.run_filter_for_index(index):
                 cls_name = filter_.__class__.__name__
                 start_count = len(list_objs)
-                objs = filter_.filter_all(list_objs, spec_obj)
-                if objs is None:
-                    LOG.debug("Filter %s says to stop filtering", cls_name)
-                    return
-                list_objs = list(objs)
+                with self.filter_context(filter_):
+                    passes = None
+                    if columns is not None:
+                        passes = filter_.filter_all_batch(columns, spec_obj)
+                    if passes is not None:
+                        columns = columns.compress(passes)
+                        list_objs = columns.objs
+                    else:
+                        objs = filter_.filter_all(list_objs, spec_obj)
+                        if objs is None:
+                            LOG.debug("Filter %s says to stop filtering",
+                                      cls_name)
+                            return
+                        list_objs = list(objs)
+                        if columns is not None:
+                            columns = columns.select(list_objs)
                 end_count = len(list_objs)
                 part_filter_results.append(log_msg % {"cls_name": cls_name,
                         "start": start_count, "end": end_count})
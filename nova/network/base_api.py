@@ -257,6 +257,27 @@ class NetworkAPI(base.Base):
                                                update_cells=update_cells)
         return result
 
+    def get_instances_nw_info(self, context, instances, **kwargs):
+        """Returns the network info of several instances, updating their info
+        caches.
+
+        Subclasses may override this to look up the network information of
+        all the instances at once, rather than one instance at a time.
+
+        :param instances: list of Instance objects
+        :param kwargs: passed to get_instance_nw_info for each instance
+        :returns: dict, keyed by instance UUID, of the NetworkInfo of each
+                  instance, or of the exception raised getting it.
+        """
+        nw_infos = {}
+        for instance in instances:
+            try:
+                nw_infos[instance.uuid] = self.get_instance_nw_info(
+                    context, instance, **kwargs)
+            except Exception as exc:
+                nw_infos[instance.uuid] = exc
+        return nw_infos
+
     def _get_instance_nw_info(self, context, instance, **kwargs):
         """Template method, so a subclass can implement for neutron/network."""
         raise NotImplementedError()
@@ -15,9 +15,12 @@
 #    under the License.
 #
 
+import collections
 import copy
+import sys
 import time
 
+import eventlet.semaphore
 from keystoneauth1 import loading as ks_loading
 from neutronclient.common import exceptions as neutron_client_exc
 from neutronclient.v2_0 import client as clientv20
@@ -26,6 +29,7 @@ from oslo_utils import excutils
 from oslo_utils import uuidutils
 import six
 
+from nova import cache_utils
 from nova.compute import utils as compute_utils
 import nova.conf
 from nova import exception
@@ -50,19 +54,55 @@ LOG = logging.getLogger(__name__)
 
 _SESSION = None
 _ADMIN_AUTH = None
+_NETWORK_CACHE = None
 
 DEFAULT_SECGROUP = 'default'
 BINDING_PROFILE = 'binding:profile'
 BINDING_HOST_ID = 'binding:host_id'
 MIGRATING_ATTR = 'migrating_to'
+# Maximum number of IDs to filter a single listing query on, since the search
+# criteria form part of the URL, which has a fixed max size
+MAX_SEARCH_IDS = 150
+
+
+# Key of the list of neutron extensions in the network cache
+_EXTENSIONS_CACHE_KEY = 'neutron-extensions'
 
 
 def reset_state():
     global _ADMIN_AUTH
     global _SESSION
+    global _NETWORK_CACHE
 
     _ADMIN_AUTH = None
     _SESSION = None
+    _NETWORK_CACHE = None
+
+
+def _get_network_cache():
+    """Returns the cache of network details, or None if it is disabled."""
+    global _NETWORK_CACHE
+    if not CONF.neutron.network_cache_time:
+        return None
+    if _NETWORK_CACHE is None:
+        _NETWORK_CACHE = cache_utils.get_client(
+            expiration_time=CONF.neutron.network_cache_time)
+    return _NETWORK_CACHE
+
+
+def _network_cache_key(kind, net_id):
+    return 'neutron-%s-%s' % (kind, net_id)
+
+
+def _invalidate_network_cache(net_ids):
+    """Removes the cached details and physical network of networks."""
+    cache = _get_network_cache()
+    if cache is None:
+        return
+    keys = [_network_cache_key(kind, net_id)
+            for net_id in net_ids for kind in ('network', 'physnet')]
+    if keys:
+        cache.delete_multi(keys)
 
 
 def _load_auth_plugin(conf):
@@ -145,8 +185,7 @@ def get_client(context, admin=False):
     auth_plugin = None
 
     if not _SESSION:
-        _SESSION = ks_loading.load_session_from_conf_options(
-            CONF, nova.conf.neutron.NEUTRON_GROUP)
+        _SESSION = utils.get_ksa_session(nova.conf.neutron.NEUTRON_GROUP)
 
     if admin or (context.is_admin and not context.auth_token):
         if not _ADMIN_AUTH:
@@ -209,6 +248,73 @@ def _is_not_duplicate(item, items, items_list_name, instance):
     return not present
 
 
+def _chunk_ids(ids):
+    """Split an iterable of IDs into lists of at most MAX_SEARCH_IDS."""
+    ids = list(ids)
+    for i in range(0, len(ids), MAX_SEARCH_IDS):
+        yield ids[i:i + MAX_SEARCH_IDS]
+
+
+def _map_concurrently(func, items, rollback):
+    """Calls func on each of items and returns the results, in order.
+
+    Up to [neutron]/port_operation_concurrency calls are made at once. If a
+    call raises, the calls not started yet are skipped and, once the started
+    calls have finished, rollback is called and the first exception raised
+    is re-raised.
+    """
+    concurrency = CONF.neutron.port_operation_concurrency
+    semaphore = eventlet.semaphore.Semaphore(concurrency)
+    results = [None] * len(items)
+    failures = []
+
+    def _call(index, item):
+        with semaphore:
+            if failures:
+                return
+            try:
+                results[index] = func(item)
+            except Exception:
+                failures.append(sys.exc_info())
+
+    if concurrency == 1 or len(items) < 2:
+        for index, item in enumerate(items):
+            _call(index, item)
+    else:
+        threads = [utils.spawn(_call, index, item)
+                   for index, item in enumerate(items)]
+        for thread in threads:
+            thread.wait()
+
+    if failures:
+        try:
+            six.reraise(*failures[0])
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                rollback()
+    return results
+
+
+class _PortLookups(object):
+    """Neutron resources related to the ports of an instance.
+
+    Building the network info model of an instance needs the floating IPs,
+    subnets and DHCP ports related to each of its ports. These are listed
+    for all the ports at once and kept here while the model is built, so
+    that the number of calls made to neutron does not grow with the number
+    of ports, fixed IPs or subnets.
+
+    :param floating_ips: dict, keyed by port ID, of lists of floating IPs.
+    :param subnets: dict, keyed by subnet ID, of subnets.
+    :param dhcp_ports: dict, keyed by network ID, of lists of DHCP ports.
+    """
+
+    def __init__(self, floating_ips, subnets, dhcp_ports):
+        self.floating_ips = floating_ips
+        self.subnets = subnets
+        self.dhcp_ports = dhcp_ports
+
+
 def _ensure_no_port_binding_failure(port):
     binding_vif_type = port.get('binding:vif_type')
     if binding_vif_type == network_model.VIF_TYPE_BINDING_FAILED:
@@ -822,8 +928,7 @@ class API(base_api.NetworkAPI):
             created_port_uuid will be None for the pair where a pre-existing
             port was part of the user request
         """
-        created_port_ids = []
-        requests_and_created_ports = []
+        requests = []
         for request in ordered_networks:
             network = nets.get(request.network_id)
             # if network_id did not pass validate_networks() and not available
@@ -831,47 +936,52 @@ class API(base_api.NetworkAPI):
             if not network:
                 continue
 
-            try:
-                port_security_enabled = network.get(
-                    'port_security_enabled', True)
-                if port_security_enabled:
-                    if not network.get('subnets'):
-                        # Neutron can't apply security groups to a port
-                        # for a network without L3 assignments.
-                        LOG.debug('Network with port security enabled does '
-                                  'not have subnets so security groups '
-                                  'cannot be applied: %s',
-                                  network, instance=instance)
-                        raise exception.SecurityGroupCannotBeApplied()
-                else:
-                    if security_group_ids:
-                        # We don't want to apply security groups on port
-                        # for a network defined with
-                        # 'port_security_enabled=False'.
-                        LOG.debug('Network has port security disabled so '
-                                  'security groups cannot be applied: %s',
-                                  network, instance=instance)
-                        raise exception.SecurityGroupCannotBeApplied()
-
-                created_port_id = None
-                if not request.port_id:
-                    # create minimal port, if port not already created by user
-                    created_port = self._create_port_minimal(
-                            neutron, instance, request.network_id,
-                            request.address, security_group_ids)
-                    created_port_id = created_port['id']
-                    created_port_ids.append(created_port_id)
-
-                requests_and_created_ports.append((
-                    request, created_port_id))
+            port_security_enabled = network.get(
+                'port_security_enabled', True)
+            if port_security_enabled:
+                if not network.get('subnets'):
+                    # Neutron can't apply security groups to a port
+                    # for a network without L3 assignments.
+                    LOG.debug('Network with port security enabled does '
+                              'not have subnets so security groups '
+                              'cannot be applied: %s',
+                              network, instance=instance)
+                    raise exception.SecurityGroupCannotBeApplied()
+            else:
+                if security_group_ids:
+                    # We don't want to apply security groups on port
+                    # for a network defined with
+                    # 'port_security_enabled=False'.
+                    LOG.debug('Network has port security disabled so '
+                              'security groups cannot be applied: %s',
+                              network, instance=instance)
+                    raise exception.SecurityGroupCannotBeApplied()
+
+            requests.append(request)
+
+        # Create minimal ports, if ports not already created by user. The
+        # networks are all checked first so that no port is created when
+        # one of them cannot be used.
+        created_port_ids = []
 
-            except Exception:
-                with excutils.save_and_reraise_exception():
-                    if created_port_ids:
-                        self._delete_ports(
-                            neutron, instance, created_port_ids)
+        def _create_port(request):
+            created_port = self._create_port_minimal(
+                    neutron, instance, request.network_id,
+                    request.address, security_group_ids)
+            created_port_ids.append(created_port['id'])
+            return created_port['id']
+
+        def _delete_created_ports():
+            if created_port_ids:
+                self._delete_ports(neutron, instance, created_port_ids)
+
+        created = iter(_map_concurrently(
+            _create_port, [request for request in requests
+                           if not request.port_id],
+            _delete_created_ports))
 
-        return requests_and_created_ports
+        return [(request, None if request.port_id else next(created))
+                for request in requests]
 
     def allocate_for_instance(self, context, instance, vpn,
                               requested_networks, macs=None,
@@ -1015,11 +1125,8 @@ class API(base_api.NetworkAPI):
         ports_in_requested_order = []
         nets_in_requested_order = []
         created_vifs = []   # this list is for cleanups if we fail
+        requests_to_update = []
         for request, created_port_id in requests_and_created_ports:
-            vifobj = objects.VirtualInterface(context)
-            vifobj.instance_uuid = instance.uuid
-            vifobj.tag = request.tag if 'tag' in request else None
-
             network = nets.get(request.network_id)
             # if network_id did not pass validate_networks() and not available
             # here then skip it safely not continuing with a None Network
@@ -1027,6 +1134,15 @@ class API(base_api.NetworkAPI):
                 continue
 
             nets_in_requested_order.append(network)
+            ports_in_requested_order.append(created_port_id or
+                                            request.port_id)
+            requests_to_update.append((request, network, created_port_id))
+
+        def _update_requested_port(request_to_update):
+            request, network, created_port_id = request_to_update
+            vifobj = objects.VirtualInterface(context)
+            vifobj.instance_uuid = instance.uuid
+            vifobj.tag = request.tag if 'tag' in request else None
 
             zone = 'compute:%s' % instance.availability_zone
             port_req_body = {'port': {'device_id': instance.uuid,
@@ -1036,57 +1152,64 @@ class API(base_api.NetworkAPI):
                 requested_ports_dict[request.port_id].get(BINDING_PROFILE)):
                 port_req_body['port'][BINDING_PROFILE] = (
                     requested_ports_dict[request.port_id][BINDING_PROFILE])
-            try:
-                self._populate_neutron_extension_values(
-                    context, instance, request.pci_request_id, port_req_body,
-                    network=network, neutron=neutron,
-                    bind_host_id=bind_host_id)
-                self._populate_pci_mac_address(instance,
-                    request.pci_request_id, port_req_body)
-                self._populate_mac_address(
-                    instance, port_req_body, available_macs)
-
-                if created_port_id:
-                    port_id = created_port_id
-                    created_port_ids.append(port_id)
-                else:
-                    port_id = request.port_id
-                ports_in_requested_order.append(port_id)
-
-                # After port is created, update other bits
-                updated_port = self._update_port(
-                    port_client, instance, port_id, port_req_body)
-
-                # NOTE(danms): The virtual_interfaces table enforces global
-                # uniqueness on MAC addresses, which clearly does not match
-                # with neutron's view of the world. Since address is a 255-char
-                # string we can namespace it with our port id. Using '/' should
-                # be safely excluded from MAC address notations as well as
-                # UUIDs. We could stop doing this when we remove
-                # nova-network, but we'd need to leave the read translation in
-                # for longer than that of course.
-                vifobj.address = '%s/%s' % (updated_port['mac_address'],
-                                            updated_port['id'])
-                vifobj.uuid = port_id
-                vifobj.create()
-                created_vifs.append(vifobj)
-
-                if not created_port_id:
-                    # only add if update worked and port create not called
-                    preexisting_port_ids.append(port_id)
-
-                self._update_port_dns_name(context, instance, network,
-                                           ports_in_requested_order[-1],
-                                           neutron)
-            except Exception:
-                with excutils.save_and_reraise_exception():
-                    self._unbind_ports(context,
-                                       preexisting_port_ids,
-                                       neutron, port_client)
-                    self._delete_ports(neutron, instance, created_port_ids)
-                    for vif in created_vifs:
-                        vif.destroy()
-
+            self._populate_neutron_extension_values(
+                context, instance, request.pci_request_id, port_req_body,
+                network=network, neutron=neutron,
+                bind_host_id=bind_host_id)
+            self._populate_pci_mac_address(instance,
+                request.pci_request_id, port_req_body)
+            self._populate_mac_address(
+                instance, port_req_body, available_macs)
+
+            if created_port_id:
+                port_id = created_port_id
+                created_port_ids.append(port_id)
+            else:
+                port_id = request.port_id
+
+            # After port is created, update other bits
+            updated_port = self._update_port(
+                port_client, instance, port_id, port_req_body)
+
+            # NOTE(danms): The virtual_interfaces table enforces global
+            # uniqueness on MAC addresses, which clearly does not match
+            # with neutron's view of the world. Since address is a 255-char
+            # string we can namespace it with our port id. Using '/' should
+            # be safely excluded from MAC address notations as well as
+            # UUIDs. We could stop doing this when we remove
+            # nova-network, but we'd need to leave the read translation in
+            # for longer than that of course.
+            vifobj.address = '%s/%s' % (updated_port['mac_address'],
+                                        updated_port['id'])
+            vifobj.uuid = port_id
+            vifobj.create()
+            created_vifs.append(vifobj)
+
+            if not created_port_id:
+                # only add if update worked and port create not called
+                preexisting_port_ids.append(port_id)
+
+            self._update_port_dns_name(context, instance, network,
+                                       port_id, neutron)
+
+        def _rollback():
+            self._unbind_ports(context,
+                               preexisting_port_ids,
+                               neutron, port_client)
+            # Delete every port we created, including those whose update
+            # was never started because another one failed first.
+            self._delete_ports(neutron, instance,
+                               [created_port_id for _, created_port_id in
+                                requests_and_created_ports if created_port_id])
+            for vif in created_vifs:
+                vif.destroy()
+
+        _map_concurrently(_update_requested_port, requests_to_update,
+                          _rollback)
+
+        # The ports may not have been updated in their requested order.
+        preexisting_port_ids.sort(key=ports_in_requested_order.index)
+        created_port_ids.sort(key=ports_in_requested_order.index)
         return (nets_in_requested_order, ports_in_requested_order,
             preexisting_port_ids, created_port_ids)
 
@@ -1095,9 +1218,16 @@ class API(base_api.NetworkAPI):
         if (not self.last_neutron_extension_sync or
             ((time.time() - self.last_neutron_extension_sync)
              >= CONF.neutron.extension_sync_interval)):
-            if neutron is None:
-                neutron = get_client(context)
-            extensions_list = neutron.list_extensions()['extensions']
+            cache = _get_network_cache()
+            extensions_list = None
+            if cache is not None:
+                extensions_list = cache.get(_EXTENSIONS_CACHE_KEY)
+            if extensions_list is None:
+                if neutron is None:
+                    neutron = get_client(context)
+                extensions_list = neutron.list_extensions()['extensions']
+                if cache is not None:
+                    cache.set(_EXTENSIONS_CACHE_KEY, extensions_list)
             self.last_neutron_extension_sync = time.time()
             self.extensions.clear()
             self.extensions = {ext['name']: ext for ext in extensions_list}
@@ -1375,9 +1505,44 @@ class API(base_api.NetworkAPI):
                    {'port_id': port_id, 'reason': exc})
             raise exception.NovaException(message=msg)
 
+    def get_instances_nw_info(self, context, instances, **kwargs):
+        """Returns the network info of several instances, updating their info
+        caches.
+
+        The ports of all the instances, and the networks in their info caches,
+        are listed up front with a single query each.
+        """
+        # NOTE: There is nothing to gain by listing the ports and networks of
+        # a single instance up front.
+        if len(instances) < 2:
+            return super(API, self).get_instances_nw_info(
+                context, instances, **kwargs)
+
+        client = get_client(context, admin=True)
+        neutron_ports = collections.defaultdict(list)
+        for uuids in _chunk_ids(instance.uuid for instance in instances):
+            for port in client.list_ports(device_id=uuids).get('ports', []):
+                neutron_ports[port['device_id']].append(port)
+
+        net_ids = set()
+        for instance in instances:
+            net_ids.update(vif['network']['id']
+                           for vif in instance.get_network_info())
+        available_networks = {}
+        for ids in _chunk_ids(net_ids):
+            for network in client.list_networks(id=ids).get('networks', []):
+                available_networks[network['id']] = network
+
+        return super(API, self).get_instances_nw_info(
+            context, instances, admin_client=client,
+            neutron_ports=neutron_ports,
+            available_networks=available_networks, **kwargs)
+
     def _get_instance_nw_info(self, context, instance, networks=None,
                               port_ids=None, admin_client=None,
-                              preexisting_port_ids=None, **kwargs):
+                              preexisting_port_ids=None, neutron_ports=None,
+                              available_networks=None,
+                              refresh_networks=False, **kwargs):
         # NOTE(danms): This is an inner method intended to be called
         # by other code that updates instance nwinfo. It *must* be
         # called with the refresh_cache-%(instance_uuid) lock held!
@@ -1386,14 +1551,28 @@ class API(base_api.NetworkAPI):
         # Otherwise multiple requests could collide and cause cache
         # corruption.
         compute_utils.refresh_info_cache_for_instance(context, instance)
-        nw_info = self._build_network_info_model(context, instance, networks,
-                                                 port_ids, admin_client,
-                                                 preexisting_port_ids)
+        nw_info = self._build_network_info_model(
+            context, instance, networks, port_ids, admin_client,
+            preexisting_port_ids, neutron_ports=neutron_ports,
+            available_networks=available_networks,
+            refresh_networks=refresh_networks)
         return network_model.NetworkInfo.hydrate(nw_info)
 
     def _gather_port_ids_and_networks(self, context, instance, networks=None,
-                                      port_ids=None, neutron=None):
-        """Return an instance's complete list of port_ids and networks."""
+                                      port_ids=None, neutron=None,
+                                      available_networks=None,
+                                      refresh_networks=False):
+        """Return an instance's complete list of port_ids and networks.
+
+        :param available_networks: dict, keyed by network ID, of networks
+                                   already retrieved from neutron, used
+                                   instead of looking up the networks in the
+                                   info cache of the instance if they are all
+                                   present.
+        :param refresh_networks: If True, the networks in the info cache of
+                                 the instance are looked up from neutron
+                                 rather than from the network cache.
+        """
 
         if ((networks is None and port_ids is not None) or
             (port_ids is None and networks is not None)):
@@ -1409,9 +1588,16 @@ class API(base_api.NetworkAPI):
             net_ids = [iface['network']['id'] for iface in ifaces]
 
         if networks is None:
-            networks = self._get_available_networks(context,
-                                                    instance.project_id,
-                                                    net_ids, neutron)
+            if (net_ids and available_networks is not None and
+                    set(net_ids) <= set(available_networks)):
+                networks = [available_networks[net_id] for net_id in
+                            collections.OrderedDict.fromkeys(net_ids)]
+            else:
+                if refresh_networks:
+                    _invalidate_network_cache(net_ids)
+                networks = self._get_cached_networks(context,
+                                                     instance.project_id,
+                                                     net_ids, neutron)
         # an interface was added/removed from instance.
         else:
 
@@ -1443,6 +1629,32 @@ class API(base_api.NetworkAPI):
 
         return networks, port_ids
 
+    def _get_cached_networks(self, context, project_id, net_ids, neutron):
+        """Returns the networks with the given IDs, in order, looking them
+        up in the network cache first.
+
+        The cached networks are shared between projects, so this must only
+        be called with an admin client, which sees all the networks.
+        """
+        cache = _get_network_cache()
+        if cache is None or not net_ids:
+            return self._get_available_networks(context, project_id,
+                                                net_ids, neutron)
+
+        net_ids = list(collections.OrderedDict.fromkeys(net_ids))
+        keys = [_network_cache_key('network', net_id) for net_id in net_ids]
+        nets_by_id = {net_id: net for net_id, net in
+                      zip(net_ids, cache.get_multi(keys)) if net is not None}
+        missing_ids = [net_id for net_id in net_ids
+                       if net_id not in nets_by_id]
+        if missing_ids:
+            for net in self._get_available_networks(context, project_id,
+                                                    missing_ids, neutron):
+                cache.set(_network_cache_key('network', net['id']), net)
+                nets_by_id[net['id']] = net
+        return [nets_by_id[net_id] for net_id in net_ids
+                if net_id in nets_by_id]
+
     @base_api.refresh_cache
     def add_fixed_ip_to_instance(self, context, instance, network_id):
         """Add a fixed IP to the instance from specified network."""
@@ -1508,6 +1720,18 @@ class API(base_api.NetworkAPI):
                 instance_uuid=instance.uuid, ip=address)
 
     def _get_phynet_info(self, context, neutron, net_id):
+        cache = _get_network_cache()
+        if cache is not None:
+            key = _network_cache_key('physnet', net_id)
+            cached = cache.get(key)
+            if cached is None:
+                cached = {'physical_network': self._lookup_phynet_info(
+                    context, neutron, net_id)}
+                cache.set(key, cached)
+            return cached['physical_network']
+        return self._lookup_phynet_info(context, neutron, net_id)
+
+    def _lookup_phynet_info(self, context, neutron, net_id):
         phynet_name = None
         if self._has_multi_provider_extension(context, neutron=neutron):
             network = neutron.show_network(net_id,
@@ -2199,12 +2423,49 @@ class API(base_api.NetworkAPI):
         """Force add a network to the project."""
         raise NotImplementedError()
 
-    def _nw_info_get_ips(self, client, port):
+    def _get_port_lookups(self, client, ports):
+        """Lists the floating IPs, subnets and DHCP ports related to the
+        given ports with a single (chunked) query each.
+
+        :returns: A _PortLookups object.
+        """
+        floating_ips = {port['id']: [] for port in ports}
+        for ids in _chunk_ids(floating_ips):
+            for fip in self._safe_get_floating_ips(client, port_id=ids):
+                floating_ips[fip['port_id']].append(fip)
+
+        # NOTE: list_subnets(id=[]) would return all the subnets visible to
+        # the tenant, so only list them when the ports have fixed IPs.
+        subnet_ids = collections.OrderedDict.fromkeys(
+            ip['subnet_id'] for port in ports for ip in port['fixed_ips'])
+        subnets = {}
+        for ids in _chunk_ids(subnet_ids):
+            for subnet in client.list_subnets(id=ids).get('subnets', []):
+                subnets[subnet['id']] = subnet
+
+        network_ids = collections.OrderedDict.fromkeys(
+            subnets[subnet_id]['network_id'] for subnet_id in subnet_ids
+            if subnet_id in subnets)
+        dhcp_ports = collections.defaultdict(list)
+        for ids in _chunk_ids(network_ids):
+            data = client.list_ports(network_id=ids,
+                                     device_owner='network:dhcp')
+            for port in data.get('ports', []):
+                dhcp_ports[port['network_id']].append(port)
+
+        return _PortLookups(floating_ips, subnets, dhcp_ports)
+
+    def _nw_info_get_ips(self, client, port, lookups=None):
         network_IPs = []
         for fixed_ip in port['fixed_ips']:
             fixed = network_model.FixedIP(address=fixed_ip['ip_address'])
-            floats = self._get_floating_ips_by_fixed_and_port(
-                client, fixed_ip['ip_address'], port['id'])
+            if lookups is None:
+                floats = self._get_floating_ips_by_fixed_and_port(
+                    client, fixed_ip['ip_address'], port['id'])
+            else:
+                floats = [
+                    fip for fip in lookups.floating_ips.get(port['id'], [])
+                    if fip['fixed_ip_address'] == fixed_ip['ip_address']]
             for ip in floats:
                 fip = network_model.IP(address=ip['floating_ip_address'],
                                        type='floating')
@@ -2212,8 +2473,10 @@ class API(base_api.NetworkAPI):
             network_IPs.append(fixed)
         return network_IPs
 
-    def _nw_info_get_subnets(self, context, port, network_IPs, client=None):
-        subnets = self._get_subnets_from_port(context, port, client)
+    def _nw_info_get_subnets(self, context, port, network_IPs, client=None,
+                             lookups=None):
+        subnets = self._get_subnets_from_port(context, port, client,
+                                              lookups=lookups)
         for subnet in subnets:
             subnet['ips'] = [fixed_ip for fixed_ip in network_IPs
                              if fixed_ip.is_in_subnet(subnet)]
@@ -2303,7 +2566,7 @@ class API(base_api.NetworkAPI):
                 if vif.get('preserve_on_delete')]
 
     def _build_vif_model(self, context, client, current_neutron_port,
-                         networks, preexisting_port_ids):
+                         networks, preexisting_port_ids, lookups=None):
         """Builds a ``nova.network.model.VIF`` object based on the parameters
         and current state of the port in Neutron.
 
@@ -2317,6 +2580,9 @@ class API(base_api.NetworkAPI):
         :param preexisting_port_ids: List of IDs of ports attached to a
             given server instance which Nova did not create and therefore
             should not delete when the port is detached from the server.
+        :param lookups: Optional _PortLookups object holding the floating
+            IPs, subnets and DHCP ports related to the port. If None, they
+            are listed from Neutron.
         :return: nova.network.model.VIF object which represents a port in the
             instance network info cache.
         """
@@ -2326,10 +2592,12 @@ class API(base_api.NetworkAPI):
             vif_active = True
 
         network_IPs = self._nw_info_get_ips(client,
-                                            current_neutron_port)
+                                            current_neutron_port,
+                                            lookups=lookups)
         subnets = self._nw_info_get_subnets(context,
                                             current_neutron_port,
-                                            network_IPs, client)
+                                            network_IPs, client,
+                                            lookups=lookups)
 
         devname = "tap" + current_neutron_port['id']
         devname = devname[:network_model.NIC_NAME_LEN]
@@ -2356,7 +2624,10 @@ class API(base_api.NetworkAPI):
 
     def _build_network_info_model(self, context, instance, networks=None,
                                   port_ids=None, admin_client=None,
-                                  preexisting_port_ids=None):
+                                  preexisting_port_ids=None,
+                                  neutron_ports=None,
+                                  available_networks=None,
+                                  refresh_networks=False):
         """Return list of ordered VIFs attached to instance.
 
         :param context: Request context.
@@ -2374,21 +2645,46 @@ class API(base_api.NetworkAPI):
                         an instance is de-allocated. Supplied list will
                         be added to the cached list of preexisting port
                         IDs for this instance.
+        :param neutron_ports: dict, keyed by instance UUID, of lists of the
+                              ports of several instances, already listed from
+                              neutron. If None, or if ports in the info cache
+                              of the instance are missing from it, the ports
+                              of the instance are listed here.
+        :param available_networks: dict, keyed by network ID, of networks
+                                   already retrieved from neutron.
+        :param refresh_networks: If True, the networks of the instance are
+                                 looked up from neutron rather than from the
+                                 network cache.
         """
 
-        search_opts = {'tenant_id': instance.project_id,
-                       'device_id': instance.uuid, }
         if admin_client is None:
             client = get_client(context, admin=True)
         else:
             client = admin_client
 
-        data = client.list_ports(**search_opts)
-
-        current_neutron_ports = data.get('ports', [])
+        if neutron_ports is not None:
+            current_neutron_ports = [
+                port for port in neutron_ports.get(instance.uuid, [])
+                if port['tenant_id'] == instance.project_id]
+            # NOTE: The ports were listed before the refresh_cache lock of
+            # the instance was taken. If the info cache has ports missing
+            # from that list, they may have been attached since, so we list
+            # the ports of the instance again rather than drop them from
+            # the cache.
+            listed_port_ids = set(port['id'] for port in current_neutron_ports)
+            if any(vif['id'] not in listed_port_ids
+                   for vif in instance.get_network_info()):
+                neutron_ports = None
+        if neutron_ports is None:
+            search_opts = {'tenant_id': instance.project_id,
+                           'device_id': instance.uuid, }
+            data = client.list_ports(**search_opts)
+            current_neutron_ports = data.get('ports', [])
         nw_info_refresh = networks is None and port_ids is None
         networks, port_ids = self._gather_port_ids_and_networks(
-                context, instance, networks, port_ids, client)
+                context, instance, networks, port_ids, client,
+                available_networks=available_networks,
+                refresh_networks=refresh_networks)
         nw_info = network_model.NetworkInfo()
 
         if preexisting_port_ids is None:
@@ -2401,12 +2697,19 @@ class API(base_api.NetworkAPI):
             current_neutron_port_map[current_neutron_port['id']] = (
                 current_neutron_port)
 
+        # List what the VIFs need of all the ports up front rather than
+        # port by port.
+        lookups = self._get_port_lookups(
+            client, [current_neutron_port_map[port_id]
+                     for port_id in collections.OrderedDict.fromkeys(port_ids)
+                     if port_id in current_neutron_port_map])
+
         for port_id in port_ids:
             current_neutron_port = current_neutron_port_map.get(port_id)
             if current_neutron_port:
                 vif = self._build_vif_model(
                     context, client, current_neutron_port, networks,
-                    preexisting_port_ids)
+                    preexisting_port_ids, lookups=lookups)
                 nw_info.append(vif)
             elif nw_info_refresh:
                 LOG.info('Port %s from network info_cache is no '
@@ -2416,8 +2719,13 @@ class API(base_api.NetworkAPI):
 
         return nw_info
 
-    def _get_subnets_from_port(self, context, port, client=None):
-        """Return the subnets for a given port."""
+    def _get_subnets_from_port(self, context, port, client=None,
+                               lookups=None):
+        """Return the subnets for a given port.
+
+        If a _PortLookups object is given, the subnets and DHCP ports are
+        taken from it rather than listed from neutron.
+        """
 
         fixed_ips = port['fixed_ips']
         # No fixed_ips for the port means there is no subnet associated
@@ -2427,11 +2735,18 @@ class API(base_api.NetworkAPI):
         # related to the port. To avoid this, the method returns here.
         if not fixed_ips:
             return []
-        if not client:
-            client = get_client(context)
-        search_opts = {'id': [ip['subnet_id'] for ip in fixed_ips]}
-        data = client.list_subnets(**search_opts)
-        ipam_subnets = data.get('subnets', [])
+        if lookups is not None:
+            subnet_ids = collections.OrderedDict.fromkeys(
+                ip['subnet_id'] for ip in fixed_ips)
+            ipam_subnets = [lookups.subnets[subnet_id]
+                            for subnet_id in subnet_ids
+                            if subnet_id in lookups.subnets]
+        else:
+            if not client:
+                client = get_client(context)
+            search_opts = {'id': [ip['subnet_id'] for ip in fixed_ips]}
+            data = client.list_subnets(**search_opts)
+            ipam_subnets = data.get('subnets', [])
         subnets = []
 
         for subnet in ipam_subnets:
@@ -2444,10 +2759,13 @@ class API(base_api.NetworkAPI):
                 subnet_dict['ipv6_address_mode'] = subnet['ipv6_address_mode']
 
             # attempt to populate DHCP server field
-            search_opts = {'network_id': subnet['network_id'],
-                           'device_owner': 'network:dhcp'}
-            data = client.list_ports(**search_opts)
-            dhcp_ports = data.get('ports', [])
+            if lookups is not None:
+                dhcp_ports = lookups.dhcp_ports.get(subnet['network_id'], [])
+            else:
+                search_opts = {'network_id': subnet['network_id'],
+                               'device_owner': 'network:dhcp'}
+                data = client.list_ports(**search_opts)
+                dhcp_ports = data.get('ports', [])
             for p in dhcp_ports:
                 for ip_pair in p['fixed_ips']:
                     if ip_pair['subnet_id'] == subnet['id']:
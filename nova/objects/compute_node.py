@@ -405,6 +405,18 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.ComputeNode,
                                   db_computes)
 
+    # NOTE: This is only used by the scheduler, which has direct database
+    # access, so it is not remotable.
+    @classmethod
+    def get_all_changed_since(cls, context, changed_since):
+        """Return ComputeNode records created, updated or deleted since
+        changed_since.
+        """
+        db_computes = db.compute_node_get_all_changed_since(context,
+                                                            changed_since)
+        return base.obj_make_list(context, cls(context), objects.ComputeNode,
+                                  db_computes)
+
     @base.remotable_classmethod
     def get_by_hypervisor(cls, context, hypervisor_match):
         db_computes = db.compute_node_search_by_hypervisor(context,
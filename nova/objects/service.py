@@ -517,6 +517,15 @@ class ServiceList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.Service,
                                   db_services)
 
+    # NOTE: This is only used by the scheduler, which has direct database
+    # access, so it is not remotable.
+    @classmethod
+    def get_by_binary_changed_since(cls, context, binary, changed_since):
+        db_services = db.service_get_all_by_binary_changed_since(
+            context, binary, changed_since)
+        return base.obj_make_list(context, cls(context), objects.Service,
+                                  db_services)
+
     @base.remotable_classmethod
     def get_by_host(cls, context, host):
         db_services = db.service_get_all_by_host(context, host)
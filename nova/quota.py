@@ -22,6 +22,7 @@ from oslo_log import log as logging
 from oslo_utils import importutils
 import six
 
+from nova import cache_utils
 import nova.conf
 from nova import context as nova_context
 from nova import db
@@ -33,6 +34,9 @@ LOG = logging.getLogger(__name__)
 
 
 CONF = nova.conf.CONF
+# Cache of the counts of instances, cores and ram, enabled by
+# [quota]/count_usage_cache_time.
+_COUNT_CACHE = None
 
 
 class DbQuotaDriver(object):
@@ -1302,6 +1306,45 @@ def _floating_ip_count(context, project_id):
     return {'project': {'floating_ips': count}}
 
 
+def _get_count_cache():
+    """Returns the cache of usage counts, or None if it is disabled."""
+    global _COUNT_CACHE
+    if not CONF.quota.count_usage_cache_time:
+        return None
+    if _COUNT_CACHE is None:
+        _COUNT_CACHE = cache_utils.get_client(
+            expiration_time=CONF.quota.count_usage_cache_time)
+    return _COUNT_CACHE
+
+
+def _count_cache_keys(project_id, user_id=None):
+    """Returns the cache keys of the project and user counts of instances,
+    cores, and ram.
+
+    The project counts are cached separately from the user counts so that a
+    change made by one user of a project invalidates the project counts seen
+    by all of its users.
+    """
+    project_key = 'quota-instances-cores-ram-%s' % project_id
+    return project_key, '%s-%s' % (project_key, user_id)
+
+
+def invalidate_instances_cores_ram_count(project_id, user_id=None):
+    """Drop the cached counts of instances, cores, and ram of a project and,
+    if user_id is specified, of one of its users.
+
+    This must be called whenever instances of the project are created,
+    deleted or resized so that the next count is read from the cells.
+    """
+    cache = _get_count_cache()
+    if not cache:
+        return
+    project_key, user_key = _count_cache_keys(project_id, user_id)
+    cache.delete(project_key)
+    if user_id:
+        cache.delete(user_key)
+
+
 def _instances_cores_ram_count(context, project_id, user_id=None):
     """Get the counts of instances, cores, and ram in the database.
 
@@ -1318,6 +1361,18 @@ def _instances_cores_ram_count(context, project_id, user_id=None):
                           'cores': <count across user>,
                           'ram': <count across user>}}
     """
+    cache = _get_count_cache()
+    project_key, user_key = _count_cache_keys(project_id, user_id)
+    if cache:
+        project_counts = cache.get(project_key)
+        user_counts = cache.get(user_key) if user_id else None
+        if project_counts is not None and (user_counts is not None or
+                                           not user_id):
+            total_counts = {'project': copy.deepcopy(project_counts)}
+            if user_id:
+                total_counts['user'] = copy.deepcopy(user_counts)
+            return total_counts
+
     # TODO(melwitt): Counting across cells for instances means we will miss
     # counting resources if a cell is down. In the future, we should query
     # placement for cores/ram and InstanceMappings for instances (once we are
@@ -1327,6 +1382,7 @@ def _instances_cores_ram_count(context, project_id, user_id=None):
     total_counts = {'project': {'instances': 0, 'cores': 0, 'ram': 0}}
     if user_id:
         total_counts['user'] = {'instances': 0, 'cores': 0, 'ram': 0}
+    complete = True
     for result in results.values():
         if result not in (nova_context.did_not_respond_sentinel,
                           nova_context.raised_exception_sentinel):
@@ -1335,6 +1391,12 @@ def _instances_cores_ram_count(context, project_id, user_id=None):
             if user_id:
                 for resource, count in result['user'].items():
                     total_counts['user'][resource] += count
+        else:
+            complete = False
+    if cache and complete:
+        cache.set(project_key, copy.deepcopy(total_counts['project']))
+        if user_id:
+            cache.set(user_key, copy.deepcopy(total_counts['user']))
     return total_counts
 
 
@@ -16,6 +16,7 @@
 import contextlib
 import copy
 import functools
+import hashlib
 import re
 import time
 
@@ -23,6 +24,7 @@ from keystoneauth1 import exceptions as ks_exc
 import os_traits
 from oslo_log import log as logging
 from oslo_middleware import request_id
+from oslo_serialization import jsonutils
 from oslo_utils import versionutils
 from six.moves.urllib import parse
 
@@ -33,6 +35,7 @@ from nova import exception
 from nova.i18n import _
 from nova import objects
 from nova import rc_fields as fields
+from nova.scheduler import timing
 from nova.scheduler import utils as scheduler_utils
 from nova import utils
 
@@ -119,6 +122,7 @@ def retries(f):
                 LOG.debug(
                     'Unable to %(op)s because %(reason)s; retrying...',
                     {'op': e.operation, 'reason': e.reason})
+                timing.count('%s.retries' % e.operation)
         LOG.error('Failed scheduler client operation %s: out of retries',
                   f.__name__)
         return False
@@ -182,6 +186,40 @@ def _instance_to_allocations_dict(instance):
     return {key: val for key, val in alloc_dict.items() if val}
 
 
+def _alloc_request_v1_12(alloc_request, allocation_request_version):
+    """Return a copy of an allocation_request received from placement in the
+    dict format of the 1.12 microversion, along with the microversion to use
+    to write it.
+
+    :param alloc_request: The allocation_request to convert
+    :param allocation_request_version: The microversion used to request the
+                                       allocations.
+    """
+    # Older clients might not send the allocation_request_version, so
+    # default to 1.10.
+    # TODO(alex_xu): In the rocky, all the client should send the
+    # allocation_request_version. So remove this default value.
+    allocation_request_version = allocation_request_version or '1.10'
+    # Ensure we don't change the supplied alloc request since it's used in
+    # a loop within the scheduler against multiple instance claims
+    ar = copy.deepcopy(alloc_request)
+
+    # If the allocation_request_version less than 1.12, then convert the
+    # allocation array format to the dict format. This conversion can be
+    # remove in Rocky release.
+    if versionutils.convert_version_to_tuple(
+            allocation_request_version) < (1, 12):
+        ar = {
+            'allocations': {
+                alloc['resource_provider']['uuid']: {
+                    'resources': alloc['resources']
+                } for alloc in ar['allocations']
+            }
+        }
+        allocation_request_version = '1.12'
+    return ar, allocation_request_version
+
+
 def _move_operation_alloc_request(source_allocs, dest_alloc_req):
     """Given existing allocations for a source host and a new allocation
     request for a destination host, return a new allocation_request that
@@ -245,6 +283,18 @@ def _extract_inventory_in_use(body):
     return None
 
 
+def _provider_fingerprint(data):
+    """Returns a hash of the generation, inventory, traits and aggregates of
+    a resource provider.
+
+    :param data: ProviderData of the resource provider.
+    """
+    content = [data.generation, data.inventory, sorted(data.traits),
+               sorted(data.aggregates)]
+    return hashlib.sha1(
+        jsonutils.dump_as_bytes(content, sort_keys=True)).hexdigest()
+
+
 def get_placement_request_id(response):
     if response is not None:
         return response.headers.get(request_id.HTTP_RESP_HEADER_REQUEST_ID)
@@ -259,6 +309,8 @@ class SchedulerReportClient(object):
         self._provider_tree = provider_tree.ProviderTree()
         # Track the last time we updated providers' aggregates and traits
         self.association_refresh_time = {}
+        # Fingerprints of the cached providers known to match placement
+        self._provider_fingerprints = {}
         self._client = self._create_client()
         # NOTE(danms): Keep track of how naggy we've been
         self._warn_count = 0
@@ -269,6 +321,7 @@ class SchedulerReportClient(object):
         # Flush provider tree and associations so we start from a clean slate.
         self._provider_tree = provider_tree.ProviderTree()
         self.association_refresh_time = {}
+        self._provider_fingerprints = {}
         client = utils.get_ksa_adapter('placement')
         # Set accept header on every request to ensure we notify placement
         # service of our response body media type preferences.
@@ -720,6 +773,15 @@ class SchedulerReportClient(object):
         # We don't have it locally; check placement or create it.
         created_rp = None
         rps_to_refresh = self._get_providers_in_tree(context, uuid)
+        if self._provider_tree_in_sync(rps_to_refresh):
+            # None of the providers of the tree changed in placement since we
+            # retrieved them, so only refresh the associations which are due.
+            for rp_to_refresh in rps_to_refresh:
+                if self._associations_stale(rp_to_refresh['uuid']):
+                    self._refresh_associations(context, rp_to_refresh['uuid'])
+                    self._record_fingerprint(rp_to_refresh['uuid'])
+            return uuid
+
         if not rps_to_refresh:
             created_rp = self._create_resource_provider(
                 context, uuid, name or uuid,
@@ -740,8 +802,53 @@ class SchedulerReportClient(object):
                 context, rp_to_refresh['uuid'],
                 generation=rp_to_refresh.get('generation'), force=True)
 
+        for rp in rps_to_refresh or [created_rp]:
+            self._record_fingerprint(rp['uuid'])
+
         return uuid
 
+    def _record_fingerprint(self, rp_uuid):
+        """Record that the cached inventory, traits and aggregates of a
+        provider match the ones placement has at the cached generation.
+        """
+        self._provider_fingerprints[rp_uuid] = _provider_fingerprint(
+            self._provider_tree.data(rp_uuid))
+
+    def _provider_in_sync(self, rp_uuid):
+        """Respond True if the cached data of a provider was not changed
+        since it was last recorded as matching placement.
+        """
+        fingerprint = self._provider_fingerprints.get(rp_uuid)
+        if fingerprint is None or not self._provider_tree.exists(rp_uuid):
+            return False
+        return fingerprint == _provider_fingerprint(
+            self._provider_tree.data(rp_uuid))
+
+    def _provider_tree_in_sync(self, rps):
+        """Respond True if the local cache holds exactly the providers of a
+        tree as listed by placement, in sync and at the listed generations.
+
+        Placement doesn't support conditional requests, so the generations of
+        the listed providers tell whether their inventory, traits and
+        aggregates must be retrieved again.
+
+        :param rps: List of dicts of resource provider information, as
+                    returned by _get_providers_in_tree.
+        """
+        roots = [rp['uuid'] for rp in rps
+                 if not rp.get('parent_provider_uuid')]
+        if len(roots) != 1:
+            return False
+        for rp in rps:
+            if not self._provider_in_sync(rp['uuid']):
+                return False
+            data = self._provider_tree.data(rp['uuid'])
+            if (data.generation != rp.get('generation') or
+                    data.parent_uuid != rp.get('parent_provider_uuid')):
+                return False
+        return (set(rp['uuid'] for rp in rps) ==
+                set(self._provider_tree.get_provider_uuids(roots[0])))
+
     @safe_connect
     def _delete_provider(self, rp_uuid, global_request_id=None):
         resp = self.delete('/resource_providers/%s' % rp_uuid,
@@ -757,6 +864,7 @@ class SchedulerReportClient(object):
             except ValueError:
                 pass
             self.association_refresh_time.pop(rp_uuid, None)
+            self._provider_fingerprints.pop(rp_uuid, None)
             return
 
         msg = ("[%(placement_req_id)s] Failed to delete resource provider "
@@ -891,14 +999,17 @@ class SchedulerReportClient(object):
         :returns: True if the inventory was updated (or did not need to be),
                   False otherwise.
         """
-        # TODO(jaypipes): Should we really be calling the placement API to get
-        # the current inventory for every resource provider each and every time
-        # update_resource_stats() is called? :(
-        curr = self._refresh_and_get_inventory(context, rp_uuid)
-        if curr is None:
-            return False
+        # Only call the placement API to get the current inventory if
+        # _ensure_resource_provider couldn't tell the cached one is current.
+        in_sync = self._provider_in_sync(rp_uuid)
+        if in_sync:
+            cur_gen = self._provider_tree.data(rp_uuid).generation
+        else:
+            curr = self._refresh_and_get_inventory(context, rp_uuid)
+            if curr is None:
+                return False
 
-        cur_gen = curr['resource_provider_generation']
+            cur_gen = curr['resource_provider_generation']
 
         # Check to see if we need to update placement's view
         if not self._provider_tree.has_inventory_changed(rp_uuid, inv_data):
@@ -956,6 +1067,7 @@ class SchedulerReportClient(object):
             # Invalidate our cache and re-fetch the resource provider
             # to be sure to get the latest generation.
             self._provider_tree.remove(rp_uuid)
+            self._provider_fingerprints.pop(rp_uuid, None)
             # NOTE(jaypipes): We don't need to pass a name parameter to
             # _ensure_resource_provider() because we know the resource provider
             # record already exists. We're just reloading the record here.
@@ -993,6 +1105,8 @@ class SchedulerReportClient(object):
         new_gen = updated_inventories_result['resource_provider_generation']
 
         self._provider_tree.update_inventory(rp_uuid, inv_data, new_gen)
+        if in_sync:
+            self._record_fingerprint(rp_uuid)
         LOG.debug('Updated inventory for %s at generation %i',
                   rp_uuid, new_gen)
         return True
@@ -1040,11 +1154,13 @@ class SchedulerReportClient(object):
         self._ensure_resource_provider(
             context, rp_uuid, name=name,
             parent_provider_uuid=parent_provider_uuid)
-        # Ensure inventories are up to date (for *all* cached RPs)
+        # Ensure inventories are up to date (for *all* cached RPs), except for
+        # the providers _ensure_resource_provider found unchanged.
         for uuid in self._provider_tree.get_provider_uuids():
-            self._refresh_and_get_inventory(context, uuid)
+            if not self._provider_in_sync(uuid):
+                self._refresh_and_get_inventory(context, uuid)
         # Return a *copy* of the tree.
-        return copy.deepcopy(self._provider_tree)
+        return self._provider_tree.copy()
 
     def set_inventory_for_provider(self, context, rp_uuid, rp_name, inv_data,
                                    parent_provider_uuid=None):
@@ -1314,6 +1430,12 @@ class SchedulerReportClient(object):
         :param aggregates: Iterable of aggregates to set on the provider.
         :raises: ResourceProviderUpdateFailed on any placement API failure.
         """
+        # If not different from what we've got, short out
+        if (self._provider_tree.exists(rp_uuid) and
+                not self._provider_tree.have_aggregates_changed(
+                    rp_uuid, aggregates or [])):
+            return
+
         # TODO(efried): Handle generation conflicts when supported by placement
         url = '/resource_providers/%s/aggregates' % rp_uuid
         aggregates = list(aggregates) if aggregates else []
@@ -1451,6 +1573,7 @@ class SchedulerReportClient(object):
                 except ValueError:
                     pass
                 self.association_refresh_time.pop(rp_uuid, None)
+                self._provider_fingerprints.pop(rp_uuid, None)
 
         # Overall indicator of success.  Will be set to False on any exception.
         success = True
@@ -1458,9 +1581,9 @@ class SchedulerReportClient(object):
         # Helper methods herein will be updating the local cache (this is
         # intentional) so we need to grab up front any data we need to operate
         # on in its "original" form.
-        old_tree = self._provider_tree
-        old_uuids = old_tree.get_provider_uuids()
-        new_uuids = new_tree.get_provider_uuids()
+        old_uuids = self._provider_tree.get_provider_uuids()
+        new_providers = new_tree.snapshot()
+        new_uuids = list(new_providers)
 
         # Do provider deletion first, since it has the best chance of failing
         # for non-generation-conflict reasons (i.e. allocations).
@@ -1481,7 +1604,7 @@ class SchedulerReportClient(object):
         for uuid in new_uuids:
             if uuid not in uuids_to_add:
                 continue
-            provider = new_tree.data(uuid)
+            provider = new_providers[uuid]
             with catch_all(uuid) as status:
                 self._ensure_resource_provider(
                     context, uuid, name=provider.name,
@@ -1497,14 +1620,22 @@ class SchedulerReportClient(object):
         # its descendants are also removed, and set_*_for_provider methods on
         # it wouldn't be able to get started. Walking the tree in bottom-up
         # order ensures we at least try to process all of the providers.
+        # Providers whose fingerprint matches the one recorded for the cache
+        # are unchanged, and skipped altogether.
         for uuid in reversed(new_uuids):
-            pd = new_tree.data(uuid)
+            pd = new_providers[uuid]
+            in_sync = self._provider_in_sync(pd.uuid)
+            if (in_sync and _provider_fingerprint(pd) ==
+                    self._provider_fingerprints[pd.uuid]):
+                continue
             with catch_all(pd.uuid) as status:
                 self._set_inventory_for_provider(
                     context, pd.uuid, pd.inventory)
                 self.set_aggregates_for_provider(
                     context, pd.uuid, pd.aggregates)
                 self.set_traits_for_provider(context, pd.uuid, pd.traits)
+                if in_sync:
+                    self._record_fingerprint(pd.uuid)
             success = success and status.success
 
         if not success:
@@ -1589,28 +1720,8 @@ class SchedulerReportClient(object):
                                            allocations.
         :returns: True if the allocations were created, False otherwise.
         """
-        # Older clients might not send the allocation_request_version, so
-        # default to 1.10.
-        # TODO(alex_xu): In the rocky, all the client should send the
-        # allocation_request_version. So remove this default value.
-        allocation_request_version = allocation_request_version or '1.10'
-        # Ensure we don't change the supplied alloc request since it's used in
-        # a loop within the scheduler against multiple instance claims
-        ar = copy.deepcopy(alloc_request)
-
-        # If the allocation_request_version less than 1.12, then convert the
-        # allocation array format to the dict format. This conversion can be
-        # remove in Rocky release.
-        if versionutils.convert_version_to_tuple(
-                allocation_request_version) < (1, 12):
-            ar = {
-                'allocations': {
-                    alloc['resource_provider']['uuid']: {
-                        'resources': alloc['resources']
-                    } for alloc in ar['allocations']
-                }
-            }
-            allocation_request_version = '1.12'
+        ar, allocation_request_version = _alloc_request_v1_12(
+            alloc_request, allocation_request_version)
 
         url = '/allocations/%s' % consumer_uuid
 
@@ -1646,6 +1757,59 @@ class SchedulerReportClient(object):
                      'text': r.text})
         return r.status_code == 204
 
+    @safe_connect
+    @retries
+    def claim_resources_batch(self, context, alloc_requests, project_id,
+                              user_id, allocation_request_version=None):
+        """Creates allocation records for several consumers at once.
+
+        All of the allocations are written in a single POST /allocations
+        call, so either all of them are created or none of them is.
+
+        Unlike claim_resources(), this does not check for existing allocations
+        of the consumers, so this must only be used for new consumers, like
+        the instances of a multi-create request, and not for move operations.
+
+        :param context: The security context
+        :param alloc_requests: Dict, keyed by consumer UUID, of the JSON
+                               allocation_requests received from placement
+                               to claim for each consumer.
+        :param project_id: The project_id associated with the allocations.
+        :param user_id: The user_id associated with the allocations.
+        :param allocation_request_version: The microversion used to request the
+                                           allocations.
+        :returns: True if the allocations were created, False otherwise.
+        :raises: Retry if the operation should be retried due to a concurrent
+                 update.
+        """
+        payload = {}
+        for consumer_uuid, alloc_request in alloc_requests.items():
+            ar, _version = _alloc_request_v1_12(alloc_request,
+                                                allocation_request_version)
+            ar['project_id'] = project_id
+            ar['user_id'] = user_id
+            payload[consumer_uuid] = ar
+
+        r = self.post('/allocations', payload,
+                      version=POST_ALLOCATIONS_API_VERSION,
+                      global_request_id=context.global_id)
+        if r.status_code != 204:
+            # NOTE(jaypipes): Yes, it sucks doing string comparison like this
+            # but we have no error codes, only error messages.
+            if 'concurrently updated' in r.text:
+                reason = ('another process changed the resource providers '
+                          'involved in our attempt to post allocations for '
+                          'consumers %s' % ', '.join(alloc_requests))
+                raise Retry('claim_resources_batch', reason)
+            else:
+                LOG.warning(
+                    'Unable to post allocations for instances '
+                    '%(uuids)s (%(code)i %(text)s)',
+                    {'uuids': ', '.join(alloc_requests),
+                     'code': r.status_code,
+                     'text': r.text})
+        return r.status_code == 204
+
     @safe_connect
     def remove_provider_from_instance_allocation(self, context, consumer_uuid,
                                                  rp_uuid, user_id, project_id,
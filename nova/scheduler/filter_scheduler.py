@@ -31,6 +31,7 @@ from nova import objects
 from nova import rpc
 from nova.scheduler import client
 from nova.scheduler import driver
+from nova.scheduler import timing
 from nova.scheduler import utils
 
 CONF = nova.conf.CONF
@@ -139,8 +140,9 @@ class FilterScheduler(driver.Scheduler):
         # Note: remember, we are using a generator-iterator here. So only
         # traverse this list once. This can bite you if the hosts
         # are being scanned in a filter or weighing function.
-        hosts = self._get_all_host_states(elevated, spec_obj,
-            provider_summaries)
+        with timing.timed('host_states'):
+            hosts = self._get_all_host_states(elevated, spec_obj,
+                provider_summaries)
 
         # NOTE(sbauza): The RequestSpec.num_instances field contains the number
         # of instances created when the RequestSpec was used to first boot some
@@ -175,6 +177,27 @@ class FilterScheduler(driver.Scheduler):
             return self._legacy_find_hosts(context, num_instances, spec_obj,
                                            hosts, num_alts)
 
+        if CONF.filter_scheduler.batch_claims and num_instances > 1:
+            return self._schedule_batch(context, elevated, spec_obj, hosts,
+                                        instance_uuids, num_alts,
+                                        alloc_reqs_by_rp_uuid,
+                                        allocation_request_version,
+                                        provider_summaries)
+
+        return self._schedule_one_by_one(context, elevated, spec_obj, hosts,
+                                         instance_uuids, num_alts,
+                                         alloc_reqs_by_rp_uuid,
+                                         allocation_request_version)
+
+    def _schedule_one_by_one(self, context, elevated, spec_obj, hosts,
+            instance_uuids, num_alts, alloc_reqs_by_rp_uuid,
+            allocation_request_version):
+        """Returns a list of lists of Selection objects, like _schedule(),
+        claiming the resources of each instance in turn before selecting a
+        host for the next one.
+        """
+        num_instances = len(instance_uuids)
+
         # A list of the instance UUIDs that were successfully claimed against
         # in the placement API. If we are not able to successfully claim for
         # all involved instances, we use this list to remove those allocations
@@ -185,7 +208,8 @@ class FilterScheduler(driver.Scheduler):
         claimed_hosts = []
 
         for num in range(num_instances):
-            hosts = self._get_sorted_hosts(spec_obj, hosts, num)
+            limit = self._get_sort_limit(num, num_instances)
+            hosts = self._get_sorted_hosts(spec_obj, hosts, num, limit=limit)
             if not hosts:
                 # NOTE(jaypipes): If we get here, that means not all instances
                 # in instance_uuids were able to be matched to a selected host.
@@ -194,32 +218,9 @@ class FilterScheduler(driver.Scheduler):
                 break
 
             instance_uuid = instance_uuids[num]
-            # Attempt to claim the resources against one or more resource
-            # providers, looping over the sorted list of possible hosts
-            # looking for an allocation_request that contains that host's
-            # resource provider UUID
-            claimed_host = None
-            for host in hosts:
-                cn_uuid = host.uuid
-                if cn_uuid not in alloc_reqs_by_rp_uuid:
-                    msg = ("A host state with uuid = '%s' that did not have a "
-                          "matching allocation_request was encountered while "
-                          "scheduling. This host was skipped.")
-                    LOG.debug(msg, cn_uuid)
-                    continue
-
-                alloc_reqs = alloc_reqs_by_rp_uuid[cn_uuid]
-                # TODO(jaypipes): Loop through all allocation_requests instead
-                # of just trying the first one. For now, since we'll likely
-                # want to order the allocation_requests in the future based on
-                # information in the provider summaries, we'll just try to
-                # claim resources using the first allocation_request
-                alloc_req = alloc_reqs[0]
-                if utils.claim_resources(elevated, self.placement_client,
-                        spec_obj, instance_uuid, alloc_req,
-                        allocation_request_version=allocation_request_version):
-                    claimed_host = host
-                    break
+            claimed_host = self._claim_first_host(elevated, spec_obj,
+                self._iter_best_hosts(spec_obj, hosts, limit), instance_uuid,
+                alloc_reqs_by_rp_uuid, allocation_request_version)
 
             if claimed_host is None:
                 # We weren't able to claim resources in the placement API
@@ -249,6 +250,114 @@ class FilterScheduler(driver.Scheduler):
             alloc_reqs_by_rp_uuid, allocation_request_version)
         return selections_to_return
 
+    def _claim_first_host(self, elevated, spec_obj, hosts, instance_uuid,
+            alloc_reqs_by_rp_uuid, allocation_request_version):
+        """Claim the resources of an instance against the first host of the
+        supplied list that can be claimed against, and return that host, or
+        None if the claim failed for all of the hosts.
+        """
+        # Attempt to claim the resources against one or more resource
+        # providers, looping over the sorted list of possible hosts
+        # looking for an allocation_request that contains that host's
+        # resource provider UUID
+        for host in hosts:
+            cn_uuid = host.uuid
+            if cn_uuid not in alloc_reqs_by_rp_uuid:
+                msg = ("A host state with uuid = '%s' that did not have a "
+                      "matching allocation_request was encountered while "
+                      "scheduling. This host was skipped.")
+                LOG.debug(msg, cn_uuid)
+                continue
+
+            alloc_reqs = alloc_reqs_by_rp_uuid[cn_uuid]
+            # TODO(jaypipes): Loop through all allocation_requests instead
+            # of just trying the first one. For now, since we'll likely
+            # want to order the allocation_requests in the future based on
+            # information in the provider summaries, we'll just try to
+            # claim resources using the first allocation_request
+            alloc_req = alloc_reqs[0]
+            with timing.timed('placement.claim_resources'):
+                claimed = utils.claim_resources(elevated,
+                    self.placement_client, spec_obj, instance_uuid, alloc_req,
+                    allocation_request_version=allocation_request_version)
+            if claimed:
+                return host
+        return None
+
+    def _schedule_batch(self, context, elevated, spec_obj, hosts,
+            instance_uuids, num_alts, alloc_reqs_by_rp_uuid,
+            allocation_request_version, provider_summaries):
+        """Returns a list of lists of Selection objects, like _schedule(),
+        claiming the resources of all of the instances at once.
+
+        A host is first selected for each instance, consuming the resources
+        of the instance from the selected HostStates as usual. The resources
+        of all of the instances are then claimed in a single placement API
+        call. If that fails, for example because another scheduler claimed
+        some of the same resources in the meantime, the selections are
+        undone and the instances are scheduled again one by one, as if batch
+        claims were disabled.
+        """
+        # The hosts of the instance group before selecting any host, to
+        # restore if the batch claim fails
+        group_hosts = None
+        if spec_obj.instance_group is not None:
+            group_hosts = list(spec_obj.instance_group.hosts)
+        # The list of hosts selected for each instance, before claiming
+        selected_hosts = []
+        for num in range(len(instance_uuids)):
+            limit = self._get_sort_limit(num, len(instance_uuids))
+            hosts = self._get_sorted_hosts(spec_obj, hosts, num, limit=limit)
+            selected_host = None
+            for host in self._iter_best_hosts(spec_obj, hosts, limit):
+                if host.uuid in alloc_reqs_by_rp_uuid:
+                    selected_host = host
+                    break
+                LOG.debug("A host state with uuid = '%s' that did not have a "
+                          "matching allocation_request was encountered while "
+                          "scheduling. This host was skipped.", host.uuid)
+            if selected_host is None:
+                # Not all instances can be placed, nothing was claimed yet so
+                # the _ensure_sufficient_hosts() call below will just raise.
+                break
+            selected_hosts.append(selected_host)
+            self._consume_selected_host(selected_host, spec_obj)
+
+        self._ensure_sufficient_hosts(context, selected_hosts,
+                                      len(instance_uuids))
+
+        alloc_reqs = {
+            instance_uuid: alloc_reqs_by_rp_uuid[host.uuid][0]
+            for instance_uuid, host in zip(instance_uuids, selected_hosts)}
+        with timing.timed('placement.claim_resources_batch'):
+            claimed = utils.claim_resources_batch(elevated,
+                self.placement_client, spec_obj, alloc_reqs,
+                allocation_request_version=allocation_request_version)
+
+        if not claimed:
+            LOG.debug("Unable to claim resources for all instances at once, "
+                      "claiming them one by one.")
+            # NOTE: The resources of the instances were consumed from the
+            # selected HostStates, so refresh them from the database, and the
+            # selected hosts were added to the instance group, so remove
+            # them, for the filters to select the hosts from scratch.
+            for host in selected_hosts:
+                host.updated = None
+            if group_hosts is not None:
+                spec_obj.instance_group.hosts = group_hosts
+                # hosts has to be not part of the updates when saving
+                spec_obj.instance_group.obj_reset_changes(['hosts'])
+            hosts = self._get_all_host_states(elevated, spec_obj,
+                                              provider_summaries)
+            return self._schedule_one_by_one(context, elevated, spec_obj,
+                                             hosts, instance_uuids, num_alts,
+                                             alloc_reqs_by_rp_uuid,
+                                             allocation_request_version)
+
+        return self._get_alternate_hosts(
+            selected_hosts, spec_obj, hosts, num, num_alts,
+            alloc_reqs_by_rp_uuid, allocation_request_version)
+
     def _ensure_sufficient_hosts(self, context, hosts, required_count,
             claimed_uuids=None):
         """Checks that we have selected a host for each requested instance. If
@@ -302,7 +411,8 @@ class FilterScheduler(driver.Scheduler):
         selections_to_return = []
 
         for num in range(num_instances):
-            hosts = self._get_sorted_hosts(spec_obj, hosts, num)
+            limit = self._get_sort_limit(num, num_instances)
+            hosts = self._get_sorted_hosts(spec_obj, hosts, num, limit=limit)
             if not hosts:
                 # No hosts left, so break here, and the
                 # _ensure_sufficient_hosts() call below will handle this.
@@ -393,10 +503,42 @@ class FilterScheduler(driver.Scheduler):
             selections_to_return.append(selected_plus_alts)
         return selections_to_return
 
-    def _get_sorted_hosts(self, spec_obj, host_states, index):
+    @staticmethod
+    def _get_sort_limit(index, num_instances):
+        """Returns the number of best hosts to sort for the instance with the
+        supplied index, or None if all of the hosts have to be sorted.
+
+        Only the selected host matters until the last instance, whose sorted
+        hosts are also used to pick the alternates, so there is no need to
+        sort all of the hosts before that.
+        """
+        if index < num_instances - 1:
+            return CONF.filter_scheduler.host_subset_size
+        return None
+
+    def _iter_best_hosts(self, spec_obj, hosts, limit):
+        """Iterates over a list of hosts returned by _get_sorted_hosts() with
+        the supplied limit, best host first. The hosts following the limit
+        best ones are only sorted if the iteration gets to them, that is if
+        none of the best hosts could be used.
+        """
+        best_hosts = hosts[:limit]
+        for host in best_hosts:
+            yield host
+        if limit is None or len(hosts) <= limit:
+            return
+        for weighed_host in self.host_manager.get_weighed_hosts(hosts,
+                                                                spec_obj):
+            if weighed_host.obj not in best_hosts:
+                yield weighed_host.obj
+
+    def _get_sorted_hosts(self, spec_obj, host_states, index, limit=None):
         """Returns a list of HostState objects that match the required
         scheduling constraints for the request spec object and have been sorted
         according to the weighers.
+
+        If limit is set, only the limit best hosts are sorted, the other ones
+        follow them in no particular order.
         """
         filtered_hosts = self.host_manager.get_filtered_hosts(host_states,
             spec_obj, index)
@@ -406,8 +548,11 @@ class FilterScheduler(driver.Scheduler):
         if not filtered_hosts:
             return []
 
+        if CONF.filter_scheduler.shuffle_best_same_weighed_hosts:
+            # All of the best hosts with the same weight are needed below.
+            limit = None
         weighed_hosts = self.host_manager.get_weighed_hosts(filtered_hosts,
-            spec_obj)
+            spec_obj, limit=limit)
         if CONF.filter_scheduler.shuffle_best_same_weighed_hosts:
             # NOTE(pas-ha) Randomize best hosts, relying on weighed_hosts
             # being already sorted by weight in descending order.
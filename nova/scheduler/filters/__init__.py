@@ -17,6 +17,8 @@
 Scheduler host filters
 """
 from nova import filters
+from nova.scheduler.filters import utils as filters_utils
+from nova.scheduler import timing
 
 
 class BaseHostFilter(filters.BaseFilter):
@@ -49,11 +51,43 @@ class BaseHostFilter(filters.BaseFilter):
         """
         raise NotImplementedError()
 
+    def filter_all_batch(self, columns, spec):
+        """Return a sequence of booleans telling which HostStates of the
+        column store pass the filter, or None to use host_passes() instead.
+        """
+        # Do this here so we don't get scheduler.filters.utils
+        from nova.scheduler import utils
+        if not self.RUN_ON_REBUILD and utils.request_is_rebuild(spec):
+            # Let filter_all() pass all of the hosts.
+            return None
+        return self.host_passes_batch(columns, spec)
+
+    def host_passes_batch(self, columns, spec_obj):
+        """Return an array of booleans telling which HostStates pass the
+        filter, or None if the filter can't be evaluated in batch.
+
+        Override this in a subclass whose decision only depends on numeric
+        HostState fields.
+
+        :param columns: nova.scheduler.filters.utils.HostStateColumns
+        """
+        return None
+
 
 class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
         super(HostFilterHandler, self).__init__(BaseHostFilter)
 
+    def get_columns(self, objs):
+        # NOTE: NumPy is an optional dependency, filtering falls back to the
+        # per-host path without it.
+        if not filters_utils.columns_supported():
+            return None
+        return filters_utils.HostStateColumns(objs)
+
+    def filter_context(self, filter_):
+        return timing.timed('filter.%s' % filter_.__class__.__name__)
+
 
 def all_filters():
     """Return a list of filter classes found in this directory.
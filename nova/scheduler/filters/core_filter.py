@@ -75,6 +75,43 @@ class BaseCoreFilter(filters.BaseHostFilter):
 
         return True
 
+    def _get_cpu_allocation_ratios(self, columns, spec_obj):
+        return columns.evaluate(
+            lambda host_state: self._get_cpu_allocation_ratio(host_state,
+                                                              spec_obj))
+
+    def host_passes_batch(self, columns, spec_obj):
+        """Return an array telling which hosts have sufficient CPU cores."""
+        vcpus_total = columns.get('vcpus_total')
+        vcpus_used = columns.get('vcpus_used')
+        cpu_allocation_ratio = self._get_cpu_allocation_ratios(columns,
+                                                               spec_obj)
+        if (vcpus_total is None or vcpus_used is None or
+                cpu_allocation_ratio is None):
+            return None
+
+        # Fail safe
+        unset = vcpus_total == 0
+        if unset.any():
+            LOG.warning(_LW("VCPUs not set; assuming CPU collection broken"))
+
+        instance_vcpus = spec_obj.vcpus
+        vcpus_limit = vcpus_total * cpu_allocation_ratio
+        # Only provide a VCPU limit to compute if the virt driver is reporting
+        # an accurate count of installed VCPUs. (XenServer driver does not)
+        has_limit = ~unset & (vcpus_limit > 0)
+        columns.set_limits('vcpu', vcpus_limit, has_limit)
+
+        # Do not allow an instance to overcommit against itself, only
+        # against other instances.
+        passes = ~(has_limit & (instance_vcpus > vcpus_total))
+        passes &= vcpus_limit - vcpus_used >= instance_vcpus
+        passes |= unset
+        LOG.debug("%(failed)d host(s) do not have %(instance_vcpus)d usable "
+                  "vcpus", {'failed': len(passes) - passes.sum(),
+                            'instance_vcpus': instance_vcpus})
+        return passes
+
 
 class CoreFilter(BaseCoreFilter):
     """CoreFilter filters based on CPU core utilization."""
@@ -82,6 +119,9 @@ class CoreFilter(BaseCoreFilter):
     def _get_cpu_allocation_ratio(self, host_state, spec_obj):
         return host_state.cpu_allocation_ratio
 
+    def _get_cpu_allocation_ratios(self, columns, spec_obj):
+        return columns.get('cpu_allocation_ratio')
+
 
 class AggregateCoreFilter(BaseCoreFilter):
     """AggregateCoreFilter with per-aggregate CPU subscription flag.
@@ -71,6 +71,37 @@ class DiskFilter(filters.BaseHostFilter):
         host_state.limits['disk_gb'] = disk_gb_limit
         return True
 
+    def _get_disk_allocation_ratios(self, columns, spec_obj):
+        return columns.get('disk_allocation_ratio')
+
+    def host_passes_batch(self, columns, spec_obj):
+        """Filter based on disk usage."""
+        requested_disk = (1024 * (spec_obj.root_gb +
+                                  spec_obj.ephemeral_gb) +
+                          spec_obj.swap)
+        free_disk_mb = columns.get('free_disk_mb')
+        total_usable_disk_gb = columns.get('total_usable_disk_gb')
+        disk_allocation_ratio = self._get_disk_allocation_ratios(columns,
+                                                                 spec_obj)
+        if (free_disk_mb is None or total_usable_disk_gb is None or
+                disk_allocation_ratio is None):
+            return None
+
+        total_usable_disk_mb = total_usable_disk_gb * 1024
+        disk_mb_limit = total_usable_disk_mb * disk_allocation_ratio
+        used_disk_mb = total_usable_disk_mb - free_disk_mb
+        usable_disk_mb = disk_mb_limit - used_disk_mb
+        # Do not allow an instance to overcommit against itself, only against
+        # other instances.
+        passes = ((total_usable_disk_mb >= requested_disk) &
+                  (usable_disk_mb >= requested_disk))
+        LOG.debug("%(failed)d host(s) do not have %(requested_disk)s MB "
+                  "usable disk", {'failed': len(passes) - passes.sum(),
+                                  'requested_disk': requested_disk})
+
+        columns.set_limits('disk_gb', disk_mb_limit / 1024, passes)
+        return passes
+
 
 class AggregateDiskFilter(DiskFilter):
     """AggregateDiskFilter with per-aggregate disk allocation ratio flag.
@@ -94,3 +125,8 @@ class AggregateDiskFilter(DiskFilter):
             ratio = host_state.disk_allocation_ratio
 
         return ratio
+
+    def _get_disk_allocation_ratios(self, columns, spec_obj):
+        return columns.evaluate(
+            lambda host_state: self._get_disk_allocation_ratio(host_state,
+                                                               spec_obj))
@@ -56,3 +56,19 @@ class ExactCoreFilter(filters.BaseHostFilter):
         # single host, then all after the first will fail in the claim.
         host_state.limits['vcpu'] = host_state.vcpus_total
         return True
+
+    def host_passes_batch(self, columns, spec_obj):
+        """Return an array telling which hosts have the exact number of CPU
+        cores.
+        """
+        vcpus_total = columns.get('vcpus_total')
+        vcpus_used = columns.get('vcpus_used')
+        if vcpus_total is None or vcpus_used is None:
+            return None
+        # Fail safe
+        unset = vcpus_total == 0
+        if unset.any():
+            LOG.warning(_LW("VCPUs not set; assuming CPU collection broken"))
+        passes = ~unset & (vcpus_total - vcpus_used == spec_obj.vcpus)
+        columns.set_limits('vcpu', vcpus_total, passes)
+        return passes
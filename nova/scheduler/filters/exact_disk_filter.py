@@ -50,3 +50,18 @@ class ExactDiskFilter(filters.BaseHostFilter):
         # single host, then all after the first will fail in the claim.
         host_state.limits['disk_gb'] = host_state.total_usable_disk_gb
         return True
+
+    def host_passes_batch(self, columns, spec_obj):
+        """Return an array telling which hosts have the exact amount of disk
+        available.
+        """
+        requested_disk = (1024 * (spec_obj.root_gb +
+                                  spec_obj.ephemeral_gb) +
+                          spec_obj.swap)
+        free_disk_mb = columns.get('free_disk_mb')
+        total_usable_disk_gb = columns.get('total_usable_disk_gb')
+        if free_disk_mb is None or total_usable_disk_gb is None:
+            return None
+        passes = free_disk_mb == requested_disk
+        columns.set_limits('disk_gb', total_usable_disk_gb, passes)
+        return passes
@@ -47,3 +47,15 @@ class ExactRamFilter(filters.BaseHostFilter):
         # single host, then all after the first will fail in the claim.
         host_state.limits['memory_mb'] = host_state.total_usable_ram_mb
         return True
+
+    def host_passes_batch(self, columns, spec_obj):
+        """Return an array telling which hosts have the exact amount of RAM
+        available.
+        """
+        free_ram_mb = columns.get('free_ram_mb')
+        total_usable_ram_mb = columns.get('total_usable_ram_mb')
+        if free_ram_mb is None or total_usable_ram_mb is None:
+            return None
+        passes = free_ram_mb == spec_obj.memory_mb
+        columns.set_limits('memory_mb', total_usable_ram_mb, passes)
+        return passes
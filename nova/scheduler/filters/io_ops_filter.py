@@ -48,6 +48,19 @@ class IoOpsFilter(filters.BaseHostFilter):
                          'max_io_ops': max_io_ops})
         return passes
 
+    def _get_max_io_ops(self, columns, spec_obj):
+        return CONF.filter_scheduler.max_io_ops_per_host
+
+    def host_passes_batch(self, columns, spec_obj):
+        num_io_ops = columns.get('num_io_ops')
+        max_io_ops = self._get_max_io_ops(columns, spec_obj)
+        if num_io_ops is None or max_io_ops is None:
+            return None
+        passes = num_io_ops < max_io_ops
+        LOG.debug("%(failed)d host(s) fail I/O ops check",
+                  {'failed': len(passes) - passes.sum()})
+        return passes
+
 
 class AggregateIoOpsFilter(IoOpsFilter):
     """AggregateIoOpsFilter with per-aggregate the max io operations.
@@ -69,3 +82,8 @@ class AggregateIoOpsFilter(IoOpsFilter):
             value = max_io_ops_per_host
 
         return value
+
+    def _get_max_io_ops(self, columns, spec_obj):
+        return columns.evaluate(
+            lambda host_state: self._get_max_io_ops_per_host(host_state,
+                                                             spec_obj))
@@ -45,6 +45,19 @@ class NumInstancesFilter(filters.BaseHostFilter):
                          'max_instances': max_instances})
         return passes
 
+    def _get_max_instances(self, columns, spec_obj):
+        return CONF.filter_scheduler.max_instances_per_host
+
+    def host_passes_batch(self, columns, spec_obj):
+        num_instances = columns.get('num_instances')
+        max_instances = self._get_max_instances(columns, spec_obj)
+        if num_instances is None or max_instances is None:
+            return None
+        passes = num_instances < max_instances
+        LOG.debug("%(failed)d host(s) fail num_instances check",
+                  {'failed': len(passes) - passes.sum()})
+        return passes
+
 
 class AggregateNumInstancesFilter(NumInstancesFilter):
     """AggregateNumInstancesFilter with per-aggregate the max num instances.
@@ -68,3 +81,8 @@ class AggregateNumInstancesFilter(NumInstancesFilter):
             value = max_instances_per_host
 
         return value
+
+    def _get_max_instances(self, columns, spec_obj):
+        return columns.evaluate(
+            lambda host_state: self._get_max_instances_per_host(host_state,
+                                                                spec_obj))
@@ -17,10 +17,13 @@
 import collections
 
 from oslo_log import log as logging
+from oslo_utils import importutils
 import six
 
 from nova.i18n import _LI
 
+np = importutils.try_import('numpy')
+
 LOG = logging.getLogger(__name__)
 
 
@@ -83,3 +86,82 @@ def instance_uuids_overlap(host_state, uuids):
     # host_state.instances is a dict whose keys are the instance uuids
     host_uuids = set(host_state.instances.keys())
     return bool(host_uuids.intersection(set_uuids))
+
+
+class HostStateColumns(object):
+    """Column store of the numeric fields of a list of HostStates.
+
+    Each field is read from the HostStates the first time a filter asks for
+    it and is then kept as a NumPy array, so that filters can be evaluated
+    with array operations over all of the hosts at once. The arrays are
+    carried over when the list of hosts is narrowed down by a filter.
+
+    Requires NumPy, see columns_supported().
+    """
+
+    def __init__(self, host_states, columns=None):
+        self.objs = list(host_states)
+        self._columns = columns or {}
+
+    def __len__(self):
+        return len(self.objs)
+
+    @staticmethod
+    def _to_array(values):
+        values = list(values)
+        # NOTE: Let the per-host filtering deal with unset or non-numeric
+        # values.
+        if any(value is None for value in values):
+            return None
+        try:
+            return np.array(values, dtype=float)
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, field):
+        """Return the array of the values of a HostState field, or None if
+        the field is not set on some of the hosts.
+        """
+        if field not in self._columns:
+            self._columns[field] = self._to_array(
+                getattr(host_state, field) for host_state in self.objs)
+        return self._columns[field]
+
+    def evaluate(self, func):
+        """Return the array of the values returned by func for each
+        HostState, or None if func returned None for some of the hosts.
+        """
+        return self._to_array(func(host_state) for host_state in self.objs)
+
+    def compress(self, passes):
+        """Return the column store of the hosts for which passes is True."""
+        passes = np.asarray(passes, dtype=bool)
+        objs = [obj for obj, passed in six.moves.zip(self.objs, passes)
+                if passed]
+        columns = {field: column if column is None else column[passes]
+                   for field, column in self._columns.items()}
+        return HostStateColumns(objs, columns)
+
+    def select(self, host_states):
+        """Return the column store of a subset of the hosts."""
+        positions = {id(obj): i for i, obj in enumerate(self.objs)}
+        try:
+            indices = [positions[id(obj)] for obj in host_states]
+        except KeyError:
+            return HostStateColumns(host_states)
+        columns = {field: column if column is None else column[indices]
+                   for field, column in self._columns.items()}
+        return HostStateColumns(host_states, columns)
+
+    def set_limits(self, name, limits, passes):
+        """Set the named limit of the hosts for which passes is True."""
+        for host_state, limit, passed in six.moves.zip(
+                self.objs, np.broadcast_to(limits, len(self.objs)).tolist(),
+                passes):
+            if passed:
+                host_state.limits[name] = limit
+
+
+def columns_supported():
+    """Return True if HostStateColumns can be used."""
+    return np is not None
@@ -18,6 +18,7 @@ Manage hosts in the current zone.
 """
 
 import collections
+import datetime
 import functools
 import time
 try:
@@ -38,6 +39,7 @@ from nova.i18n import _LI, _LW
 from nova import objects
 from nova.pci import stats as pci_stats
 from nova.scheduler import filters
+from nova.scheduler import timing
 from nova.scheduler import weights
 from nova import utils
 from nova.virt import hardware
@@ -47,6 +49,10 @@ CONF = nova.conf.CONF
 
 LOG = logging.getLogger(__name__)
 HOST_INSTANCE_SEMAPHORE = "host_instance"
+# Number of seconds by which an incremental host state cache sync overlaps
+# with the previous one, to cope with records written by hosts whose clock is
+# slightly behind the scheduler's.
+HOST_STATE_CACHE_SYNC_OVERLAP = 30
 
 
 class ReadOnlyDict(IterableUserDict):
@@ -591,10 +597,14 @@ class HostManager(object):
         return self.filter_handler.get_filtered_objects(self.enabled_filters,
                 hosts, spec_obj, index)
 
-    def get_weighed_hosts(self, hosts, spec_obj):
-        """Weigh the hosts."""
+    def get_weighed_hosts(self, hosts, spec_obj, limit=None):
+        """Weigh the hosts.
+
+        If limit is set, only the limit best hosts are sorted, see
+        BaseWeightHandler.get_weighed_objects().
+        """
         return self.weight_handler.get_weighed_objects(self.weighers,
-                hosts, spec_obj)
+                hosts, spec_obj, limit=limit)
 
     def _get_computes_for_cells(self, context, cells, compute_uuids=None):
         """Get a tuple of compute node and service information.
@@ -617,7 +627,8 @@ class HostManager(object):
         for cell in cells:
             LOG.debug('Getting compute nodes and services for cell %(cell)s',
                       {'cell': cell.identity})
-            with context_module.target_cell(context, cell) as cctxt:
+            with timing.timed('host_states.cell.%s' % cell.uuid), \
+                    context_module.target_cell(context, cell) as cctxt:
                 if compute_uuids is None:
                     compute_nodes[cell.uuid].extend(
                         objects.ComputeNodeList.get_all(cctxt))
@@ -662,6 +673,22 @@ class HostManager(object):
                   {'count': len(disabled_cells),
                    'cells': ', '.join(
                    [c.identity for c in disabled_cells])})
+        # NOTE: The cached host states are rebuilt from scratch on the next
+        # request whenever the cells are refreshed.
+        self._reset_host_state_cache()
+
+    def _reset_host_state_cache(self):
+        # Dict of cached HostStates keyed by compute node UUID
+        self._host_state_cache = {}
+        # Dict of the ComputeNode objects backing the cached HostStates, keyed
+        # by compute node UUID
+        self._compute_node_cache = {}
+        # Dict of dicts of compute Service objects, keyed by cell UUID and
+        # then by hostname
+        self._service_cache = {}
+        # Dict of (last sync time, last full sync time) tuples keyed by cell
+        # UUID
+        self._host_state_cache_synced = {}
 
     def get_host_states_by_uuids(self, context, compute_uuids, spec_obj):
 
@@ -679,6 +706,10 @@ class HostManager(object):
         else:
             cells = self.enabled_cells
 
+        if CONF.filter_scheduler.cache_host_states:
+            return self._get_cached_host_states(context, cells,
+                                                compute_uuids)
+
         compute_nodes, services = self._get_computes_for_cells(
             context, cells, compute_uuids=compute_uuids)
         return self._get_host_states(context, compute_nodes, services)
@@ -692,6 +723,118 @@ class HostManager(object):
                                                                self.cells)
         return self._get_host_states(context, compute_nodes, services)
 
+    def _sync_host_state_cache(self, context, cell):
+        """Bring the cached compute nodes and services of a cell up to date.
+
+        The first sync of a cell, and then one sync every
+        host_state_cache_full_refresh_interval seconds, reads all of the
+        compute node and service records of the cell. Any other sync only
+        reads the records created, updated or deleted since the previous one.
+        """
+        now = timeutils.utcnow()
+        last_sync, last_full_sync = self._host_state_cache_synced.get(
+            cell.uuid, (None, None))
+        interval = CONF.filter_scheduler.host_state_cache_full_refresh_interval
+        full_sync = (last_full_sync is None or
+                     (interval and
+                      timeutils.is_older_than(last_full_sync, interval)))
+
+        with context_module.target_cell(context, cell) as cctxt:
+            if full_sync:
+                LOG.debug('Loading all compute nodes and services for cell '
+                          '%(cell)s', {'cell': cell.identity})
+                computes = objects.ComputeNodeList.get_all(cctxt)
+                services = objects.ServiceList.get_by_binary(
+                    cctxt, 'nova-compute', include_disabled=True)
+            else:
+                changed_since = last_sync - datetime.timedelta(
+                    seconds=HOST_STATE_CACHE_SYNC_OVERLAP)
+                LOG.debug('Loading compute nodes and services changed since '
+                          '%(since)s for cell %(cell)s',
+                          {'since': changed_since, 'cell': cell.identity})
+                # We need the deleted records to evict them from the cache.
+                cctxt = cctxt.elevated(read_deleted='yes')
+                computes = objects.ComputeNodeList.get_all_changed_since(
+                    cctxt, changed_since)
+                services = objects.ServiceList.get_by_binary_changed_since(
+                    cctxt, 'nova-compute', changed_since)
+
+        if full_sync:
+            services_by_host = {}
+            stale_uuids = set(uuid for uuid, host_state in
+                              self._host_state_cache.items()
+                              if host_state.cell_uuid == cell.uuid)
+        else:
+            services_by_host = self._service_cache.setdefault(cell.uuid, {})
+            stale_uuids = set()
+
+        for service in services:
+            if not service.deleted:
+                services_by_host[service.host] = service
+                continue
+            # A deleted service record may come along with a newer record
+            # for the same host, so only evict the very same service.
+            cached = services_by_host.get(service.host)
+            if cached is not None and cached.id == service.id:
+                del services_by_host[service.host]
+        self._service_cache[cell.uuid] = services_by_host
+
+        for compute in computes:
+            if compute.deleted:
+                stale_uuids.add(compute.uuid)
+                continue
+            stale_uuids.discard(compute.uuid)
+            self._compute_node_cache[compute.uuid] = compute
+            host_state = self._host_state_cache.get(compute.uuid)
+            if not host_state:
+                host_state = self.host_state_cls(compute.host,
+                                                 compute.hypervisor_hostname,
+                                                 cell.uuid,
+                                                 compute=compute)
+                self._host_state_cache[compute.uuid] = host_state
+            host_state.update(compute=compute)
+
+        for uuid in stale_uuids:
+            self._host_state_cache.pop(uuid, None)
+            self._compute_node_cache.pop(uuid, None)
+
+        self._host_state_cache_synced[cell.uuid] = (
+            now, now if full_sync else last_full_sync)
+
+    def _get_cached_host_states(self, context, cells, compute_uuids):
+        """Returns an iterator over the cached HostStates of the given cells,
+        restricted to the given compute node UUIDs unless those are None.
+
+        The cache of each cell is synchronized with its database first.
+        """
+        for cell in cells:
+            with timing.timed('host_states.cell.%s' % cell.uuid):
+                self._sync_host_state_cache(context, cell)
+
+        cell_uuids = set(cell.uuid for cell in cells)
+        if compute_uuids is None:
+            compute_uuids = list(self._host_state_cache)
+
+        host_states = []
+        for compute_uuid in compute_uuids:
+            host_state = self._host_state_cache.get(compute_uuid)
+            if host_state is None or host_state.cell_uuid not in cell_uuids:
+                continue
+            host = host_state.host
+            service = self._service_cache[host_state.cell_uuid].get(host)
+            if not service:
+                LOG.warning("No compute service record found for host "
+                            "%(host)s", {'host': host})
+                continue
+            compute = self._compute_node_cache[compute_uuid]
+            host_state.update(service=dict(service),
+                              aggregates=self._get_aggregates_info(host),
+                              inst_dict=self._get_instance_info(context,
+                                                                compute))
+            host_states.append(host_state)
+
+        return iter(host_states)
+
     def _get_host_states(self, context, compute_nodes, services):
         """Returns a generator over HostStates given a list of computes.
 
@@ -36,6 +36,7 @@ from nova.objects import host_mapping as host_mapping_obj
 from nova import quota
 from nova.scheduler import client as scheduler_client
 from nova.scheduler import request_filter
+from nova.scheduler import timing
 from nova.scheduler import utils
 
 
@@ -124,6 +125,20 @@ class SchedulerManager(manager.Manager):
                                                            request_spec,
                                                            filter_properties)
 
+        timings = None
+        if CONF.scheduler.timing_metrics or CONF.scheduler.timing_trace:
+            timings = timing.start()
+        try:
+            return self._select_destinations(ctxt, spec_obj, instance_uuids,
+                                             return_objects,
+                                             return_alternates)
+        finally:
+            if timings is not None:
+                timing.stop()
+                self._report_timings(instance_uuids, timings)
+
+    def _select_destinations(self, ctxt, spec_obj, instance_uuids,
+                             return_objects, return_alternates):
         try:
             request_filter.process_reqspec(ctxt, spec_obj)
         except exception.RequestFilterFailed as e:
@@ -133,8 +148,9 @@ class SchedulerManager(manager.Manager):
         alloc_reqs_by_rp_uuid, provider_summaries, allocation_request_version \
             = None, None, None
         if self.driver.USES_ALLOCATION_CANDIDATES:
-            res = self.placement_client.get_allocation_candidates(ctxt,
-                                                                  resources)
+            with timing.timed('placement.allocation_candidates'):
+                res = self.placement_client.get_allocation_candidates(
+                    ctxt, resources)
             if res is None:
                 # We have to handle the case that we failed to connect to the
                 # Placement service and the safe_connect decorator on
@@ -172,6 +188,20 @@ class SchedulerManager(manager.Manager):
             return jsonutils.to_primitive(selection_dicts)
         return selections
 
+    def _report_timings(self, instance_uuids, timings):
+        """Log the timings of a scheduling request and/or their trace,
+        depending on the configuration.
+        """
+        if CONF.scheduler.timing_metrics:
+            LOG.info('Timings of the scheduling of instances %(uuids)s: '
+                     '%(timings)s',
+                     {'uuids': instance_uuids, 'timings': timings.to_dict()})
+        if CONF.scheduler.timing_trace:
+            LOG.info('Scheduling of instances %(uuids)s took %(total).3f '
+                     'seconds:\n%(trace)s',
+                     {'uuids': instance_uuids, 'total': timings.elapsed(),
+                      'trace': timings.format_trace()})
+
     def update_aggregates(self, ctxt, aggregates):
         """Updates HostManager internal aggregates information.
 
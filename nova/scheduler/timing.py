@@ -0,0 +1,132 @@
+# Copyright (c) 2026 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Time the phases of a scheduling request.
+
+The scheduler manager starts a RequestTimings for each select_destinations()
+call when [scheduler]/timing_metrics or [scheduler]/timing_trace is enabled.
+The code running the phases of the request (placement query, host state
+loading, filters, weighers, claims...) records into it through the timed()
+and count() helpers, which are no-ops when no request is being timed. The
+RequestTimings is stored in a thread-local, which is greenthread-local once
+eventlet has monkey patched threading, so the concurrent requests handled by
+a scheduler do not mix up their timings.
+"""
+
+import collections
+import contextlib
+import threading
+
+from oslo_utils import timeutils
+
+_LOCAL = threading.local()
+
+
+class RequestTimings(object):
+    """Durations of the phases of a scheduling request."""
+
+    def __init__(self):
+        self._watch = timeutils.StopWatch()
+        self._watch.start()
+        # Dict of [number of runs, total duration] lists keyed by phase name
+        self.phases = collections.OrderedDict()
+        # Dict of event counts keyed by event name
+        self.counters = collections.OrderedDict()
+        # List of (phase name, start offset, duration) tuples in the order the
+        # phases ended
+        self.trace = []
+
+    def elapsed(self):
+        """Return the number of seconds elapsed since the request started."""
+        return self._watch.elapsed()
+
+    @contextlib.contextmanager
+    def timed(self, phase):
+        start = self.elapsed()
+        try:
+            yield
+        finally:
+            duration = self.elapsed() - start
+            runs = self.phases.setdefault(phase, [0, 0.0])
+            runs[0] += 1
+            runs[1] += duration
+            self.trace.append((phase, start, duration))
+
+    def count(self, event, value=1):
+        self.counters[event] = self.counters.get(event, 0) + value
+
+    def to_dict(self):
+        """Return the timings as a dict of primitives, durations being in
+        seconds.
+        """
+        return {
+            'total': self.elapsed(),
+            'phases': {phase: {'count': runs, 'total': total}
+                       for phase, (runs, total) in self.phases.items()},
+            'counters': dict(self.counters),
+        }
+
+    def format_trace(self):
+        """Return the trace of the phases as a multi-line string, each line
+        giving the start offset and the duration of a phase in milliseconds.
+        """
+        return '\n'.join('%10.3f %10.3f %s' % (start * 1000,
+                                               duration * 1000, phase)
+                         for phase, start, duration in self.trace)
+
+
+def start():
+    """Start timing a request in the current thread and return its
+    RequestTimings.
+    """
+    _LOCAL.timings = RequestTimings()
+    return _LOCAL.timings
+
+
+def stop():
+    """Stop timing the request of the current thread and return its
+    RequestTimings, or None if no request is being timed.
+    """
+    timings = current()
+    _LOCAL.timings = None
+    return timings
+
+
+def current():
+    """Return the RequestTimings of the current thread, or None if no
+    request is being timed.
+    """
+    return getattr(_LOCAL, 'timings', None)
+
+
+@contextlib.contextmanager
+def timed(phase):
+    """Time the enclosed block as a run of the named phase of the request
+    being timed, if any.
+    """
+    timings = current()
+    if timings is None:
+        yield
+        return
+    with timings.timed(phase):
+        yield
+
+
+def count(event, value=1):
+    """Count an event for the request being timed, if any."""
+    timings = current()
+    if timings is not None:
+        timings.count(event, value)
@@ -805,6 +805,33 @@ def claim_resources(ctx, client, spec_obj, instance_uuid, alloc_req,
             user_id, allocation_request_version=allocation_request_version)
 
 
+def claim_resources_batch(ctx, client, spec_obj, alloc_reqs,
+        allocation_request_version=None):
+    """Given a dict, keyed by instance UUID, of allocation_request JSON objects
+    returned from Placement, attempt to claim the resources of all of the
+    instances at once in the placement API. Returns True if all of the claims
+    were successful, False if none of them was made.
+
+    This is only meant for instances being created, see
+    SchedulerReportClient.claim_resources_batch().
+
+    :param ctx: The RequestContext object
+    :param client: The scheduler client to use for making the claim call
+    :param spec_obj: The RequestSpec object - needed to get the project_id
+    :param alloc_reqs: Dict, keyed by instance UUID, of the
+                       allocation_requests received from placement for the
+                       resources we want to claim for each instance against
+                       its chosen host.
+    :param allocation_request_version: The microversion used to request the
+                                       allocations.
+    """
+    LOG.debug("Attempting to claim resources in the placement API for "
+              "instances %s", list(alloc_reqs))
+
+    return client.claim_resources_batch(ctx, alloc_reqs, spec_obj.project_id,
+            ctx.user_id, allocation_request_version=allocation_request_version)
+
+
 def remove_allocation_from_compute(context, instance, compute_node_uuid,
                                    reportclient, flavor=None):
     """Removes the instance allocation from the compute host.
@@ -17,6 +17,8 @@
 Scheduler host weights
 """
 
+from nova.scheduler.filters import utils as filters_utils
+from nova.scheduler import timing
 from nova import weights
 
 
@@ -42,6 +44,16 @@ class HostWeightHandler(weights.BaseWeightHandler):
     def __init__(self):
         super(HostWeightHandler, self).__init__(BaseHostWeigher)
 
+    def get_columns(self, objs):
+        # NOTE: NumPy is an optional dependency, weighing falls back to the
+        # per-host path without it.
+        if not filters_utils.columns_supported():
+            return None
+        return filters_utils.HostStateColumns(objs)
+
+    def weigher_context(self, weigher):
+        return timing.timed('weigher.%s' % weigher.__class__.__name__)
+
 
 def all_weighers():
     """Return a list of weight plugin classes found in this directory."""
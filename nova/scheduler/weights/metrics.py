@@ -26,11 +26,14 @@ in the configuration file as the followings:
     The final weight would be name1.value * 1.0 + name2.value * -1.0.
 """
 
+from oslo_utils import importutils
+
 import nova.conf
 from nova import exception
 from nova.scheduler import utils
 from nova.scheduler import weights
 
+np = importutils.try_import('numpy')
 
 CONF = nova.conf.CONF
 
@@ -73,3 +76,25 @@ class MetricsWeigher(weights.BaseHostWeigher):
                         return CONF.metrics.weight_of_unavailable
 
         return value
+
+    def _weigh_objects_batch(self, columns, weight_properties):
+        if CONF.metrics.required:
+            # Let _weigh_object() raise ComputeHostMetricNotFound for the
+            # first host missing a metric.
+            return None
+
+        metrics_dicts = [{m.name: m.value for m in host_state.metrics or []}
+                         for host_state in columns.objs]
+        values = np.zeros(len(metrics_dicts))
+        unavailable = np.zeros(len(metrics_dicts), dtype=bool)
+        for (name, ratio) in self.setting:
+            found = np.array([name in metrics_dict
+                              for metrics_dict in metrics_dicts], dtype=bool)
+            metric_values = np.array([metrics_dict.get(name, 0.0)
+                                      for metrics_dict in metrics_dicts],
+                                     dtype=float)
+            values += metric_values * ratio
+            if ratio * self.weight_multiplier() != 0:
+                unavailable |= ~found
+        values[unavailable] = CONF.metrics.weight_of_unavailable
+        return values
@@ -21,9 +21,13 @@ versa. Configure the importance of this affinitization using the
 'pci_weight_multiplier' option.
 """
 
+from oslo_utils import importutils
+
 import nova.conf
 from nova.scheduler import weights
 
+np = importutils.try_import('numpy')
+
 CONF = nova.conf.CONF
 
 # An arbitrary value used to ensure PCI-requesting instances are stacked rather
@@ -41,6 +45,11 @@ class PCIWeigher(weights.BaseHostWeigher):
         """Override the weight multiplier."""
         return CONF.filter_scheduler.pci_weight_multiplier
 
+    @staticmethod
+    def _get_free_devices(host_state):
+        pools = host_state.pci_stats.pools if host_state.pci_stats else []
+        return sum(pool['count'] for pool in pools) or 0
+
     def _weigh_object(self, host_state, request_spec):
         """Higher weights win. We want to keep PCI hosts free unless needed.
 
@@ -50,8 +59,7 @@ class PCIWeigher(weights.BaseHostWeigher):
         requested, this will ensure hosts with PCI devices are avoided
         completely, if possible.
         """
-        pools = host_state.pci_stats.pools if host_state.pci_stats else []
-        free = sum(pool['count'] for pool in pools) or 0
+        free = self._get_free_devices(host_state)
 
         # reverse the "has PCI" values. For instances *without* PCI device
         # requests, this ensures we avoid the hosts with the most free PCI
@@ -63,3 +71,9 @@ class PCIWeigher(weights.BaseHostWeigher):
         weight = MAX_DEVS - min(free, MAX_DEVS - 1)
 
         return weight
+
+    def _weigh_objects_batch(self, columns, request_spec):
+        free = columns.evaluate(self._get_free_devices)
+        if free is None:
+            return None
+        return MAX_DEVS - np.minimum(free, MAX_DEVS - 1)
@@ -36,3 +36,6 @@ class RAMWeigher(weights.BaseHostWeigher):
     def _weigh_object(self, host_state, weight_properties):
         """Higher weights win.  We want spreading to be the default."""
         return host_state.free_ram_mb
+
+    def _weigh_objects_batch(self, columns, weight_properties):
+        return columns.get('free_ram_mb')
@@ -407,6 +407,9 @@ class WSGIService(service.Service):
                 service_ref = objects.Service.get_by_host_and_binary(
                     ctxt, self.host, self.binary)
 
+        if CONF.api.warm_up_cells:
+            context.warm_up_cells()
+
         if self.manager:
             self.manager.init_host()
             self.manager.pre_start_hook()
@@ -281,6 +281,9 @@ class TestCase(testtools.TestCase):
         api.CELLS = []
         context.CELL_CACHE = {}
         context.CELLS = []
+        context.CELLS_LOADED_AT = None
+        context.CELL_TIMEOUTS = {}
+        context.CELL_LATENCIES = {}
 
         self.cell_mappings = {}
         self.host_mappings = {}
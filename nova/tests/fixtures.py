@@ -1227,7 +1227,11 @@ class NeutronFixture(fixtures.Fixture):
     def _filter_ports(self, **_params):
         ports = copy.deepcopy(self._ports)
         for opt in _params:
-            filtered_ports = [p for p in ports if p.get(opt) == _params[opt]]
+            # Like neutron, match any of the values of a list filter.
+            values = _params[opt]
+            if not isinstance(values, list):
+                values = [values]
+            filtered_ports = [p for p in ports if p.get(opt) in values]
             ports = filtered_ports
         return {'ports': ports}
 
@@ -1203,6 +1203,39 @@ class AllocationCandidatesTestCase(ProviderDBBase):
         ]
         self._validate_allocation_requests(expected, alloc_cands)
 
+    def test_all_sharing_providers_limit(self):
+        ss1 = self._create_provider('ss1', uuids.agg1)
+        _set_traits(ss1, "MISC_SHARES_VIA_AGGREGATE")
+        _add_inventory(ss1, fields.ResourceClass.IPV4_ADDRESS, 24)
+        _add_inventory(ss1, fields.ResourceClass.SRIOV_NET_VF, 16)
+        _add_inventory(ss1, fields.ResourceClass.DISK_GB, 1600)
+
+        ss2 = self._create_provider('ss2', uuids.agg1)
+        _set_traits(ss2, "MISC_SHARES_VIA_AGGREGATE")
+        _add_inventory(ss2, fields.ResourceClass.DISK_GB, 1600)
+
+        alloc_cands = self._get_allocation_candidates(requests=[
+            placement_lib.RequestGroup(
+                use_same_provider=False,
+                resources={
+                    'IPV4_ADDRESS': 2,
+                    'SRIOV_NET_VF': 1,
+                    'DISK_GB': 1500,
+                }
+            )],
+            limit=1,
+        )
+
+        # Only one of the two candidates is built, and the provider summaries
+        # only cover the providers it uses.
+        allocation_requests = alloc_cands.allocation_requests
+        self.assertEqual(1, len(allocation_requests))
+        ar_rp_uuids = set(rr.resource_provider.uuid
+                          for rr in allocation_requests[0].resource_requests)
+        ps_rp_uuids = set(ps.resource_provider.uuid
+                          for ps in alloc_cands.provider_summaries)
+        self.assertEqual(ar_rp_uuids, ps_rp_uuids)
+
     def test_two_non_sharing_connect_to_one_sharing_different_aggregate(self):
         # Covering the following setup:
         #
@@ -1466,6 +1466,56 @@ class TestAllocationListCreateDelete(ResourceProviderBaseCase):
         # If we are joining wrong, this will be a KeyError
         allocation_list.create_all()
 
+    def test_allocation_list_create_multiple_consumers(self):
+        rp = rp_obj.ResourceProvider(
+            self.ctx, name=uuidsentinel.rp_name, uuid=uuidsentinel.rp_uuid)
+        rp.create()
+        inv = rp_obj.Inventory(resource_provider=rp,
+                               resource_class=fields.ResourceClass.VCPU,
+                               total=4, max_unit=4)
+        inv.obj_set_defaults()
+        rp.set_inventory(rp_obj.InventoryList(objects=[inv]))
+        generation = rp.generation
+
+        def _allocations(used_by_consumer):
+            return rp_obj.AllocationList(self.ctx, objects=[
+                rp_obj.Allocation(resource_provider=rp,
+                                  consumer_id=consumer_uuid,
+                                  resource_class=fields.ResourceClass.VCPU,
+                                  project_id=uuidsentinel.project,
+                                  user_id=uuidsentinel.user,
+                                  used=used)
+                for consumer_uuid, used in used_by_consumer])
+
+        # Each allocation fits, but not all of them together.
+        allocation_list = _allocations([(uuidsentinel.consumer1, 2),
+                                        (uuidsentinel.consumer2, 2),
+                                        (uuidsentinel.consumer3, 1)])
+        self.assertRaises(exception.InvalidAllocationCapacityExceeded,
+                          allocation_list.create_all)
+        allocations = rp_obj.AllocationList.get_all_by_resource_provider(
+            self.ctx, rp)
+        self.assertEqual(0, len(allocations))
+
+        allocation_list = _allocations([(uuidsentinel.consumer1, 2),
+                                        (uuidsentinel.consumer2, 2)])
+        allocation_list.create_all()
+
+        allocations = rp_obj.AllocationList.get_all_by_resource_provider(
+            self.ctx, rp)
+        self.assertEqual(
+            sorted([uuidsentinel.consumer1, uuidsentinel.consumer2]),
+            sorted(alloc.consumer_id for alloc in allocations))
+        for consumer_uuid in (uuidsentinel.consumer1, uuidsentinel.consumer2):
+            allocations = rp_obj.AllocationList.get_all_by_consumer_id(
+                self.ctx, consumer_uuid)
+            self.assertEqual(uuidsentinel.project, allocations[0].project_id)
+            self.assertEqual(uuidsentinel.user, allocations[0].user_id)
+        # The generation of the provider is only incremented once.
+        self.assertEqual(generation + 1, rp.generation)
+        rp = rp_obj.ResourceProvider.get_by_uuid(self.ctx, rp.uuid)
+        self.assertEqual(generation + 1, rp.generation)
+
     def test_allocation_list_create(self):
         max_unit = 10
         consumer_uuid = uuidsentinel.consumer
@@ -1933,6 +1983,60 @@ class UsageListTestCase(ResourceProviderBaseCase):
             self.ctx, db_rp.uuid)
         self.assertEqual(2, len(usage_list))
 
+    def test_get_all_cached(self):
+        self.flags(usage_cache_time=60, group='placement')
+        rp_obj._USAGE_CACHE = None
+        self.addCleanup(setattr, rp_obj, '_USAGE_CACHE', None)
+        db_rp, _ = self._make_allocation(rp_uuid=uuidsentinel.rp_uuid)
+
+        def _get_usage():
+            usage_list = rp_obj.UsageList.get_all_by_resource_provider_uuid(
+                self.ctx, db_rp.uuid)
+            self.assertEqual(1, len(usage_list))
+            return usage_list[0].usage
+
+        with mock.patch.object(rp_obj, '_get_usages_from_db',
+                               wraps=rp_obj._get_usages_from_db) as mock_db:
+            self.assertEqual(2, _get_usage())
+            self.assertEqual(2, _get_usage())
+            # The second read is served from the cache
+            self.assertEqual(1, mock_db.call_count)
+
+            # Writing an allocation increments the provider generation
+            alloc = rp_obj.Allocation(
+                self.ctx, resource_provider=db_rp,
+                consumer_id=uuidsentinel.other_consumer, used=3,
+                resource_class=fields.ResourceClass.DISK_GB)
+            rp_obj.AllocationList(self.ctx, objects=[alloc]).create_all()
+            self.assertEqual(5, _get_usage())
+            self.assertEqual(2, mock_db.call_count)
+
+            # Deleting allocations doesn't increment the provider generation
+            # but removes the cached usage
+            rp_obj.AllocationList.get_all_by_consumer_id(
+                self.ctx, uuidsentinel.disk_consumer).delete_all()
+            self.assertEqual(3, _get_usage())
+            self.assertEqual(3, mock_db.call_count)
+
+    def test_get_all_cached_outdated_generation(self):
+        self.flags(usage_cache_time=60, group='placement')
+        rp_obj._USAGE_CACHE = None
+        self.addCleanup(setattr, rp_obj, '_USAGE_CACHE', None)
+        db_rp, _ = self._make_allocation(rp_uuid=uuidsentinel.rp_uuid)
+        rp_obj.UsageList.get_all_by_resource_provider_uuid(self.ctx,
+                                                           db_rp.uuid)
+        cache = rp_obj._get_usage_cache()
+        key = rp_obj._usage_cache_key(db_rp.id)
+        generation, records = cache.get(key)
+
+        # Records cached under another generation of the provider are not
+        # used, and are replaced by those of its current generation.
+        cache.set(key, (generation - 1, []))
+        usage_list = rp_obj.UsageList.get_all_by_resource_provider_uuid(
+            self.ctx, db_rp.uuid)
+        self.assertEqual(2, usage_list[0].usage)
+        self.assertEqual((generation, records), cache.get(key))
+
 
 class ResourceClassListTestCase(ResourceProviderBaseCase):
 
@@ -2689,11 +2793,10 @@ class SharedProviderTestCase(ResourceProviderBaseCase):
         # Before we associate the compute nodes and shared storage provider
         # with the same aggregate, verify that no resource providers are found
         # that meet the requested set of resource amounts
-        got_rps = rp_obj._get_all_with_shared(
+        got_ids = rp_obj._get_all_with_shared(
             self.ctx,
             resources,
         )
-        got_ids = [rp.id for rp in got_rps]
         self.assertEqual([], got_ids)
 
         # Now associate the shared storage pool and both compute nodes with the
@@ -2704,11 +2807,10 @@ class SharedProviderTestCase(ResourceProviderBaseCase):
 
         # OK, now that has all been set up, let's verify that we get the ID of
         # the shared storage pool when we ask for some DISK_GB
-        got_rps = rp_obj._get_all_with_shared(
+        got_ids = rp_obj._get_all_with_shared(
             self.ctx,
             resources,
         )
-        got_ids = [rp.id for rp in got_rps]
         self.assertEqual([cn1.id, cn2.id], got_ids)
 
         # Now we add another compute node that has vCPU and RAM along with
@@ -2756,11 +2858,10 @@ class SharedProviderTestCase(ResourceProviderBaseCase):
         inv_list = rp_obj.InventoryList(objects=[vcpu, memory_mb, disk_gb])
         cn3.set_inventory(inv_list)
 
-        got_rps = rp_obj._get_all_with_shared(
+        got_ids = rp_obj._get_all_with_shared(
             self.ctx,
             resources,
         )
-        got_ids = [rp.id for rp in got_rps]
         self.assertEqual([cn1.id, cn2.id, cn3.id], got_ids)
 
         # Consume all vCPU and RAM inventory on the "local disk" compute node
@@ -2785,11 +2886,10 @@ class SharedProviderTestCase(ResourceProviderBaseCase):
         )
         alloc_list.create_all()
 
-        got_rps = rp_obj._get_all_with_shared(
+        got_ids = rp_obj._get_all_with_shared(
             self.ctx,
             resources,
         )
-        got_ids = [rp.id for rp in got_rps]
         self.assertEqual([cn1.id, cn2.id], got_ids)
 
         # Now we consume all the memory in the second compute node and verify
@@ -2810,11 +2910,10 @@ class SharedProviderTestCase(ResourceProviderBaseCase):
             )
             alloc_list.create_all()
 
-        got_rps = rp_obj._get_all_with_shared(
+        got_ids = rp_obj._get_all_with_shared(
             self.ctx,
             resources,
         )
-        got_ids = [rp.id for rp in got_rps]
         self.assertEqual([cn1.id], got_ids)
 
         # Create another two compute node providers having no local disk
@@ -2901,9 +3000,8 @@ class SharedProviderTestCase(ResourceProviderBaseCase):
         # associated with an aggregate that has a storage provider with DISK_GB
         # inventory, that storage provider is not marked as sharing that
         # DISK_GB inventory with anybody.
-        got_rps = rp_obj._get_all_with_shared(
+        got_ids = rp_obj._get_all_with_shared(
             self.ctx,
             resources,
         )
-        got_ids = [rp.id for rp in got_rps]
         self.assertEqual([cn1.id], got_ids)
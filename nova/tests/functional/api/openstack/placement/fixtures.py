@@ -107,6 +107,7 @@ class APIFixture(fixture.GabbiFixture):
     def _reset_db_flags():
         rp_obj._TRAITS_SYNCED = False
         rp_obj._RC_CACHE = None
+        rp_obj._USAGE_CACHE = None
 
 
 class AllocationFixture(APIFixture):
@@ -125,3 +125,45 @@ class QuotaTestCase(test.NoDBTestCase):
         self.assertEqual(2, count['user']['instances'])
         self.assertEqual(6, count['user']['cores'])
         self.assertEqual(1536, count['user']['ram'])
+
+    def test_instances_cores_ram_count_cached(self):
+        self.flags(count_usage_cache_time=60, group='quota')
+        self.stub_out('nova.quota._COUNT_CACHE', None)
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+        mapping1 = objects.CellMapping(context=ctxt,
+                                       uuid=uuidutils.generate_uuid(),
+                                       database_connection='cell1',
+                                       transport_url='none:///')
+        mapping1.create()
+
+        with context.target_cell(ctxt, mapping1) as cctxt:
+            instance = objects.Instance(context=cctxt,
+                                        project_id='fake-project',
+                                        user_id='fake-user',
+                                        vcpus=2, memory_mb=512)
+            instance.create()
+
+        count = quota._instances_cores_ram_count(ctxt, 'fake-project',
+                                                 user_id='fake-user')
+        self.assertEqual(1, count['user']['instances'])
+
+        # The new instance is not counted until the cached counts are
+        # dropped.
+        with context.target_cell(ctxt, mapping1) as cctxt:
+            instance = objects.Instance(context=cctxt,
+                                        project_id='fake-project',
+                                        user_id='fake-user',
+                                        vcpus=2, memory_mb=512)
+            instance.create()
+
+        count = quota._instances_cores_ram_count(ctxt, 'fake-project',
+                                                 user_id='fake-user')
+        self.assertEqual(1, count['user']['instances'])
+        self.assertEqual(2, count['project']['cores'])
+
+        quota.invalidate_instances_cores_ram_count('fake-project',
+                                                   'fake-user')
+        count = quota._instances_cores_ram_count(ctxt, 'fake-project',
+                                                 user_id='fake-user')
+        self.assertEqual(2, count['user']['instances'])
+        self.assertEqual(4, count['project']['cores'])
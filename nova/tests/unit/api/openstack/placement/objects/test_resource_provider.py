@@ -488,3 +488,48 @@ class TestTraits(test.NoDBTestCase):
         rp.set_traits(traits)
         mock_set_traits.assert_called_once_with(self.context, rp, traits)
         mock_reset.assert_called_once_with()
+
+
+class TestLimitCandidates(test.NoDBTestCase):
+
+    def _candidates(self, count):
+        # Record how far the generator has been consumed
+        self.consumed = 0
+        for i in range(count):
+            self.consumed += 1
+            yield i
+
+    def test_no_limit(self):
+        res = resource_provider._limit_candidates(self._candidates(5))
+        self.assertEqual([0, 1, 2, 3, 4], res)
+
+    def test_limit_stops_early(self):
+        res = resource_provider._limit_candidates(self._candidates(100), 3)
+        self.assertEqual([0, 1, 2], res)
+        self.assertEqual(3, self.consumed)
+
+    @mock.patch('random.shuffle')
+    def test_no_limit_randomize(self, mock_shuffle):
+        res = resource_provider._limit_candidates(self._candidates(5),
+                                                  randomize=True)
+        self.assertEqual([0, 1, 2, 3, 4], res)
+        mock_shuffle.assert_called_once_with(res)
+
+    @mock.patch('random.shuffle')
+    @mock.patch('random.randint')
+    def test_limit_randomize(self, mock_randint, mock_shuffle):
+        # Candidate 3 replaces slot 1, candidate 4 is dropped and candidate 5
+        # replaces slot 0.
+        mock_randint.side_effect = [1, 4, 0]
+        res = resource_provider._limit_candidates(self._candidates(6), 3,
+                                                  randomize=True)
+        self.assertEqual([5, 3, 2], res)
+        self.assertEqual(6, self.consumed)
+        mock_randint.assert_has_calls(
+            [mock.call(0, 3), mock.call(0, 4), mock.call(0, 5)])
+        mock_shuffle.assert_called_once_with(res)
+
+    def test_limit_randomize_fewer_than_limit(self):
+        res = resource_provider._limit_candidates(self._candidates(2), 5,
+                                                  randomize=True)
+        self.assertEqual([0, 1], sorted(res))
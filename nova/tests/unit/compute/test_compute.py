@@ -7798,9 +7798,12 @@ class ComputeTestCase(BaseTestCase,
         mock_get.assert_has_calls([mock.call(mock.ANY), mock.call(mock.ANY),
                                    mock.call(mock.ANY)])
         mock_sync.assert_has_calls([
-            mock.call(ctxt, mock.ANY, power_state.NOSTATE, use_slave=True),
-            mock.call(ctxt, mock.ANY, power_state.RUNNING, use_slave=True),
-            mock.call(ctxt, mock.ANY, power_state.SHUTDOWN, use_slave=True)])
+            mock.call(ctxt, mock.ANY, power_state.NOSTATE, use_slave=True,
+                      verify_vm_power_state=False),
+            mock.call(ctxt, mock.ANY, power_state.RUNNING, use_slave=True,
+                      verify_vm_power_state=False),
+            mock.call(ctxt, mock.ANY, power_state.SHUTDOWN, use_slave=True,
+                      verify_vm_power_state=False)])
 
     @mock.patch.object(compute_manager.ComputeManager, '_get_power_state')
     @mock.patch.object(compute_manager.ComputeManager,
@@ -5411,7 +5411,7 @@ class _ComputeAPIUnitTestMixIn(object):
             mock_buildreq_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, limit=None, marker='fake-marker',
                 sort_keys=['baz'], sort_dirs=['desc'])
-            fields = ['metadata', 'info_cache', 'security_groups']
+            fields = ['metadata', 'info_cache']
             mock_inst_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, None, None,
                 fields, ['baz'], ['desc'])
@@ -5446,7 +5446,7 @@ class _ComputeAPIUnitTestMixIn(object):
             mock_buildreq_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, limit=None, marker='fake-marker',
                 sort_keys=['baz'], sort_dirs=['desc'])
-            fields = ['metadata', 'info_cache', 'security_groups']
+            fields = ['metadata', 'info_cache']
             mock_inst_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, None, None,
                 fields, ['baz'], ['desc'])
@@ -5481,7 +5481,7 @@ class _ComputeAPIUnitTestMixIn(object):
             mock_buildreq_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, limit=10, marker='fake-marker',
                 sort_keys=['baz'], sort_dirs=['desc'])
-            fields = ['metadata', 'info_cache', 'security_groups']
+            fields = ['metadata', 'info_cache']
             mock_inst_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, 8, None,
                 fields, ['baz'], ['desc'])
@@ -5518,7 +5518,7 @@ class _ComputeAPIUnitTestMixIn(object):
             if self.cell_type is None:
                 for cm in mock_cm_get_all.return_value:
                     mock_target_cell.assert_any_call(self.context, cm)
-            fields = ['metadata', 'info_cache', 'security_groups']
+            fields = ['metadata', 'info_cache']
             mock_inst_get.assert_called_once_with(
                 mock.ANY, {'foo': 'bar'},
                 8, None,
@@ -5712,11 +5712,27 @@ class ComputeAPIUnitTestCase(_ComputeAPIUnitTestMixIn, test.NoDBTestCase):
         self.assertRaises(exception.NovaException,
                           compute_api._find_service_in_cell, self.context)
 
+    @mock.patch('nova.objects.CellMappingList.get_all')
+    def test_load_cells_refreshed_by_context(self, mock_get_all):
+        self.flags(cell_mappings_cache_time=60, group='api')
+        mock_get_all.return_value = [mock.sentinel.cell1]
+        compute_api.load_cells()
+        self.assertEqual([mock.sentinel.cell1], compute_api.CELLS)
+
+        # The list is refreshed through nova.context first.
+        mock_get_all.return_value = [mock.sentinel.cell1, mock.sentinel.cell2]
+        context.CELLS_LOADED_AT -= datetime.timedelta(seconds=61)
+        context.load_cells()
+        compute_api.load_cells()
+        self.assertEqual([mock.sentinel.cell1, mock.sentinel.cell2],
+                         compute_api.CELLS)
+        self.assertEqual(2, mock_get_all.call_count)
+
     @mock.patch('nova.objects.Service.get_by_id')
     def test_find_service_in_cell_targets(self, mock_get_service):
         mock_get_service.side_effect = [exception.NotFound(),
                                         mock.sentinel.service]
-        compute_api.CELLS = [mock.sentinel.cell0, mock.sentinel.cell1]
+        context.CELLS = [mock.sentinel.cell0, mock.sentinel.cell1]
 
         @contextlib.contextmanager
         def fake_target(context, cell):
@@ -5841,6 +5857,26 @@ class ComputeAPIUnitTestCase(_ComputeAPIUnitTestMixIn, test.NoDBTestCase):
                               self.compute_api.attach_volume,
                               self.context, instance, uuids.volumeid)
 
+    @mock.patch.object(objects.BuildRequestList, 'get_by_filters',
+                       return_value=objects.BuildRequestList(objects=[]))
+    def test_get_all_nova_network_loads_security_groups(self,
+                                                        mock_buildreq_get):
+        self.flags(use_neutron=False)
+        with mock.patch('nova.compute.instance_list.'
+                        'get_instance_objects_sorted') as mock_inst_get:
+            mock_inst_get.return_value = objects.InstanceList(
+                self.context, objects=self._list_of_instances(2))
+
+            self.compute_api.get_all(
+                self.context, search_opts={'foo': 'bar'},
+                limit=None, marker=None, sort_keys=['baz'],
+                sort_dirs=['desc'])
+
+            fields = ['metadata', 'info_cache', 'security_groups']
+            mock_inst_get.assert_called_once_with(
+                self.context, {'foo': 'bar'}, None, None,
+                fields, ['baz'], ['desc'])
+
     @mock.patch.object(neutron_api.API, 'has_substr_port_filtering_extension')
     @mock.patch.object(neutron_api.API, 'list_ports')
     @mock.patch.object(objects.BuildRequestList, 'get_by_filters')
@@ -5867,7 +5903,7 @@ class ComputeAPIUnitTestCase(_ComputeAPIUnitTestMixIn, test.NoDBTestCase):
                 self.context, {'ip': 'fake', 'uuid': ['fake_device_id']},
                 limit=None, marker='fake-marker',
                 sort_keys=['baz'], sort_dirs=['desc'])
-            fields = ['metadata', 'info_cache', 'security_groups']
+            fields = ['metadata', 'info_cache']
             mock_inst_get.assert_called_once_with(
                 self.context, {'ip': 'fake', 'uuid': ['fake_device_id']},
                 None, None, fields, ['baz'], ['desc'])
@@ -5898,7 +5934,7 @@ class ComputeAPIUnitTestCase(_ComputeAPIUnitTestMixIn, test.NoDBTestCase):
                 self.context, {'ip6': 'fake', 'uuid': ['fake_device_id']},
                 limit=None, marker='fake-marker',
                 sort_keys=['baz'], sort_dirs=['desc'])
-            fields = ['metadata', 'info_cache', 'security_groups']
+            fields = ['metadata', 'info_cache']
             mock_inst_get.assert_called_once_with(
                 self.context, {'ip6': 'fake', 'uuid': ['fake_device_id']},
                 None, None, fields, ['baz'], ['desc'])
@@ -5936,7 +5972,7 @@ class ComputeAPIUnitTestCase(_ComputeAPIUnitTestMixIn, test.NoDBTestCase):
                                'uuid': ['fake_device_id', 'fake_device_id']},
                 limit=None, marker='fake-marker',
                 sort_keys=['baz'], sort_dirs=['desc'])
-            fields = ['metadata', 'info_cache', 'security_groups']
+            fields = ['metadata', 'info_cache']
             mock_inst_get.assert_called_once_with(
                 self.context, {'ip': 'fake1', 'ip6': 'fake2',
                                'uuid': ['fake_device_id', 'fake_device_id']},
@@ -6038,7 +6074,7 @@ class Cellsv1DeprecatedTestMixIn(object):
             mock_buildreq_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, limit=None, marker='fake-marker',
                 sort_keys=['baz'], sort_dirs=['desc'])
-            fields = ['metadata', 'info_cache', 'security_groups']
+            fields = ['metadata', 'info_cache']
             mock_inst_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, limit=None, marker=None,
                 fields=fields, sort_keys=['baz'], sort_dirs=['desc'])
@@ -6073,7 +6109,7 @@ class Cellsv1DeprecatedTestMixIn(object):
             mock_buildreq_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, limit=None, marker='fake-marker',
                 sort_keys=['baz'], sort_dirs=['desc'])
-            fields = ['metadata', 'info_cache', 'security_groups']
+            fields = ['metadata', 'info_cache']
             mock_inst_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, limit=None, marker=None,
                 fields=fields, sort_keys=['baz'], sort_dirs=['desc'])
@@ -6108,7 +6144,7 @@ class Cellsv1DeprecatedTestMixIn(object):
             mock_buildreq_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, limit=10, marker='fake-marker',
                 sort_keys=['baz'], sort_dirs=['desc'])
-            fields = ['metadata', 'info_cache', 'security_groups']
+            fields = ['metadata', 'info_cache']
             mock_inst_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, limit=8, marker=None,
                 fields=fields, sort_keys=['baz'], sort_dirs=['desc'])
@@ -6158,7 +6194,7 @@ class Cellsv1DeprecatedTestMixIn(object):
             if self.cell_type is None:
                 for cm in mock_cm_get_all.return_value:
                     mock_target_cell.assert_any_call(self.context, cm)
-            fields = ['metadata', 'info_cache', 'security_groups']
+            fields = ['metadata', 'info_cache']
             inst_get_calls = [mock.call(cctxt, {'foo': 'bar'},
                                         limit=8, marker=None,
                                         fields=fields, sort_keys=['baz'],
@@ -6231,7 +6267,7 @@ class Cellsv1DeprecatedTestMixIn(object):
             if self.cell_type is None:
                 for cm in mock_cm_get_all.return_value:
                     mock_target_cell.assert_any_call(self.context, cm)
-            fields = ['metadata', 'info_cache', 'security_groups']
+            fields = ['metadata', 'info_cache']
             inst_get_calls = [mock.call(cctxt, {'foo': 'bar'},
                                         limit=10, marker=marker,
                                         fields=fields, sort_keys=['baz'],
@@ -1588,6 +1588,37 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
             self.assertTrue(mock_begin.called)
             self.assertTrue(mock_end.called)
 
+    @mock.patch.object(objects.Instance, 'get_by_uuid')
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_heal_instance_info_cache_batch(self, mock_get_by_host,
+                                            mock_get_by_uuid):
+        self.flags(heal_instance_info_cache_batch_size=2)
+        instances = [objects.Instance(uuid=getattr(uuids, 'inst%d' % i),
+                                      host=self.compute.host,
+                                      vm_state=vm_states.ACTIVE,
+                                      task_state=None)
+                     for i in range(4)]
+        mock_get_by_host.return_value = instances
+        mock_get_by_uuid.side_effect = instances[2:]
+        error = exception.InstanceNotFound(instance_id=uuids.inst1)
+        with mock.patch.object(
+                self.compute.network_api, 'get_instances_nw_info',
+                side_effect=[{uuids.inst0: mock.sentinel.nw_info,
+                              uuids.inst1: error},
+                             {uuids.inst2: mock.sentinel.nw_info,
+                              uuids.inst3: mock.sentinel.nw_info}]
+        ) as mock_get_nw_info:
+            self.compute._heal_instance_info_cache(self.context)
+            mock_get_nw_info.assert_called_once_with(self.context,
+                                                     instances[:2])
+            self.assertEqual([uuids.inst2, uuids.inst3],
+                             self.compute._instance_uuids_to_heal)
+
+            self.compute._heal_instance_info_cache(self.context)
+            mock_get_nw_info.assert_called_with(self.context, instances[2:])
+            self.assertEqual([], self.compute._instance_uuids_to_heal)
+        self.assertEqual(2, mock_get_by_uuid.call_count)
+
     @mock.patch.object(objects.InstanceList, 'get_by_host')
     def test_sync_power_states(self, mock_get):
         instance = mock.Mock()
@@ -1600,6 +1631,44 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                                         use_slave=True)
             mock_spawn.assert_called_once_with(mock.ANY, instance)
 
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_sync_power_states_bulk(self, mock_get):
+        instances = [objects.Instance(uuid=uuids.instance1),
+                     objects.Instance(uuid=uuids.instance2)]
+        mock_get.return_value = instances
+        with test.nested(
+            mock.patch.object(self.compute.driver, 'get_power_states',
+                              return_value={
+                                  uuids.instance1: power_state.RUNNING}),
+            mock.patch.object(self.compute,
+                              '_query_driver_power_state_and_sync'),
+            mock.patch.object(self.compute._sync_power_pool, 'spawn_n',
+                              side_effect=lambda f, *args: f(*args)),
+        ) as (mock_states, mock_query, mock_spawn):
+            self.compute._sync_power_states(self.context)
+            mock_states.assert_called_once_with(instances)
+            mock_query.assert_has_calls([
+                mock.call(self.context, instances[0],
+                          vm_power_state=power_state.RUNNING),
+                mock.call(self.context, instances[1],
+                          vm_power_state=power_state.NOSTATE)])
+
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_sync_power_states_bulk_failed(self, mock_get):
+        instance = objects.Instance(uuid=uuids.instance)
+        mock_get.return_value = [instance]
+        with test.nested(
+            mock.patch.object(self.compute.driver, 'get_power_states',
+                              side_effect=exception.VirtDriverNotReady),
+            mock.patch.object(self.compute,
+                              '_query_driver_power_state_and_sync'),
+            mock.patch.object(self.compute._sync_power_pool, 'spawn_n',
+                              side_effect=lambda f, *args: f(*args)),
+        ) as (mock_states, mock_query, mock_spawn):
+            self.compute._sync_power_states(self.context)
+            mock_query.assert_called_once_with(self.context, instance,
+                                               vm_power_state=None)
+
     def _get_sync_instance(self, power_state, vm_state, task_state=None,
                            shutdown_terminate=False):
         instance = objects.Instance()
@@ -1619,6 +1688,21 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                                                 power_state.RUNNING)
         mock_refresh.assert_called_once_with(use_slave=False)
 
+    @mock.patch.object(objects.Instance, 'refresh')
+    @mock.patch.object(objects.Instance, 'save')
+    def test_sync_instance_power_state_verify(self, mock_save, mock_refresh):
+        instance = self._get_sync_instance(power_state.SHUTDOWN,
+                                           vm_states.STOPPED)
+        # The instance was stopped since its power state was read
+        with mock.patch.object(self.compute, '_get_power_state',
+                               return_value=power_state.SHUTDOWN) as mock_get:
+            self.compute._sync_instance_power_state(
+                self.context, instance, power_state.RUNNING,
+                verify_vm_power_state=True)
+            mock_get.assert_called_once_with(self.context, instance)
+        self.assertEqual(power_state.SHUTDOWN, instance.power_state)
+        mock_save.assert_not_called()
+
     @mock.patch.object(objects.Instance, 'refresh')
     @mock.patch.object(objects.Instance, 'save')
     def test_sync_instance_power_state_running_stopped(self, mock_save,
@@ -1706,10 +1790,25 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
             self.compute._query_driver_power_state_and_sync(self.context,
                                                             db_instance)
             mock_get_info.assert_called_once_with(db_instance)
-            mock_sync_power_state.assert_called_once_with(self.context,
-                                                          db_instance,
-                                                          power_state.NOSTATE,
-                                                          use_slave=True)
+            mock_sync_power_state.assert_called_once_with(
+                self.context, db_instance, power_state.NOSTATE,
+                use_slave=True, verify_vm_power_state=False)
+
+    @mock.patch('nova.compute.manager.ComputeManager.'
+                '_sync_instance_power_state')
+    def test_query_driver_power_state_and_sync_bulk_state(
+            self, mock_sync_power_state):
+        with mock.patch.object(self.compute.driver,
+                               'get_info') as mock_get_info:
+            db_instance = objects.Instance(uuid=uuids.db_instance,
+                                           task_state=None)
+            self.compute._query_driver_power_state_and_sync(
+                self.context, db_instance,
+                vm_power_state=power_state.RUNNING)
+            mock_get_info.assert_not_called()
+            mock_sync_power_state.assert_called_once_with(
+                self.context, db_instance, power_state.RUNNING,
+                use_slave=True, verify_vm_power_state=True)
 
     @mock.patch.object(virt_driver.ComputeDriver, 'delete_instance_files')
     @mock.patch.object(objects.InstanceList, 'get_by_filters')
@@ -2832,8 +2931,8 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                     _process_instance_vif_deleted_event, extend_volume):
             self.compute.external_instance_event(self.context,
                                                  instances, events)
-            get_instance_nw_info.assert_called_once_with(self.context,
-                                                         instances[0])
+            get_instance_nw_info.assert_called_once_with(
+                self.context, instances[0], refresh_networks=True)
             _process_instance_event.assert_called_once_with(instances[1],
                                                             events[1])
             _process_instance_vif_deleted_event.assert_called_once_with(
@@ -2900,8 +2999,8 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                     obj_load_attr, bdm_get_by_vol_and_inst):
             self.compute.external_instance_event(self.context,
                                                  instances, events)
-            get_instance_nw_info.assert_called_once_with(self.context,
-                                                         instances[0])
+            get_instance_nw_info.assert_called_once_with(
+                self.context, instances[0], refresh_networks=True)
             update_instance_cache_with_nw_info.assert_called_once_with(
                                                    self.compute.network_api,
                                                    self.context,
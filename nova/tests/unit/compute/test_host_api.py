@@ -429,10 +429,10 @@ class ComputeHostAPITestCase(test.TestCase):
             {'stat1': 1, 'stat2': 4.0},
             {'stat1': 5, 'stat2': 1.2},
         ]
-        compute_api.CELLS = [objects.CellMapping(uuid=uuids.cell1),
-                             objects.CellMapping(
-                                 uuid=objects.CellMapping.CELL0_UUID),
-                             objects.CellMapping(uuid=uuids.cell2)]
+        context.CELLS = [objects.CellMapping(uuid=uuids.cell1),
+                         objects.CellMapping(
+                             uuid=objects.CellMapping.CELL0_UUID),
+                         objects.CellMapping(uuid=uuids.cell2)]
         stats = self.host_api.compute_node_statistics(self.ctxt)
         self.assertEqual({'stat1': 6, 'stat2': 5.2}, stats)
 
@@ -10,6 +10,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
 import mock
 
 from nova.compute import instance_list
@@ -77,3 +79,146 @@ class TestInstanceList(test.NoDBTestCase):
         insts_two = [inst['hostname'] for inst in insts]
 
         self.assertEqual(insts_one, insts_two)
+
+    def _fake_target_cell(self, ctx, cell_mapping):
+        @contextlib.contextmanager
+        def target_cell():
+            # Hand the cell uuid to the query instead of a real context so
+            # that it can tell which cell it is listing.
+            yield cell_mapping.uuid
+        return target_cell()
+
+    def _fake_instance_get_all(self, cell_uuid, filters, limit, marker,
+                               **kwargs):
+        insts = self.insts[cell_uuid]
+        start = 0
+        if marker:
+            start = [inst['uuid'] for inst in insts].index(marker) + 1
+        if limit is None:
+            return insts[start:]
+        return insts[start:start + limit]
+
+    @mock.patch('nova.context.target_cell')
+    @mock.patch('nova.db.instance_get_all_by_filters_sort')
+    @mock.patch('nova.objects.CellMappingList.get_all')
+    def test_get_instances_sorted_batched(self, mock_cells, mock_inst,
+                                          mock_target):
+        self.flags(list_records_batch_size=2, group='api')
+        mock_cells.return_value = self.cells
+        mock_inst.side_effect = self._fake_instance_get_all
+        mock_target.side_effect = self._fake_target_cell
+
+        insts = instance_list.get_instances_sorted(self.context, {},
+                                                   None, None,
+                                                   [], ['hostname'], ['asc'])
+
+        self.assertEqual(sorted(inst['hostname']
+                                for cell_insts in self.insts.values()
+                                for inst in cell_insts),
+                         [inst['hostname'] for inst in insts])
+        # Every cell returned a full page of two and then a short page of
+        # the last instance.
+        self.assertEqual(6, mock_inst.call_count)
+        for cell in self.cells:
+            mock_inst.assert_any_call(cell.uuid, {}, limit=2, marker=None,
+                                      sort_keys=['hostname', 'uuid'],
+                                      sort_dirs=['asc', 'asc'],
+                                      columns_to_join=[])
+            mock_inst.assert_any_call(
+                cell.uuid, {}, limit=2,
+                marker=self.insts[cell.uuid][1]['uuid'],
+                sort_keys=['hostname', 'uuid'], sort_dirs=['asc', 'asc'],
+                columns_to_join=[])
+
+    @mock.patch('nova.context.target_cell')
+    @mock.patch('nova.db.instance_get_all_by_filters_sort')
+    @mock.patch('nova.objects.CellMappingList.get_all')
+    def test_get_instances_sorted_batched_limit(self, mock_cells, mock_inst,
+                                                mock_target):
+        self.flags(list_records_batch_size=1, group='api')
+        mock_cells.return_value = self.cells
+        mock_inst.side_effect = self._fake_instance_get_all
+        mock_target.side_effect = self._fake_target_cell
+
+        insts = instance_list.get_instances_sorted(self.context, {},
+                                                   2, None,
+                                                   [], ['hostname'], ['asc'])
+
+        self.assertEqual(['cell0-inst0', 'cell0-inst1'],
+                         [inst['hostname'] for inst in insts])
+        # One page from every cell, and a second page only from the cell
+        # that both results came from.
+        self.assertEqual(4, mock_inst.call_count)
+        for call in mock_inst.call_args_list:
+            self.assertEqual(1, call[1]['limit'])
+
+    @mock.patch('nova.context.target_cell')
+    @mock.patch('nova.db.instance_get_all_by_filters_sort')
+    @mock.patch('nova.objects.CellMappingList.get_all')
+    def test_get_instances_sorted_unbatched(self, mock_cells, mock_inst,
+                                            mock_target):
+        self.flags(list_records_batch_size=0, group='api')
+        mock_cells.return_value = self.cells
+        mock_inst.side_effect = self._fake_instance_get_all
+        mock_target.side_effect = self._fake_target_cell
+
+        insts = instance_list.get_instances_sorted(self.context, {},
+                                                   2, None,
+                                                   [], ['hostname'], ['asc'])
+
+        self.assertEqual(['cell0-inst0', 'cell0-inst1'],
+                         [inst['hostname'] for inst in insts])
+        self.assertEqual(3, mock_inst.call_count)
+        for call in mock_inst.call_args_list:
+            self.assertEqual(2, call[1]['limit'])
+
+    @mock.patch('nova.compute.multi_cell_list.LOG.warning')
+    @mock.patch('nova.context.target_cell')
+    @mock.patch('nova.db.instance_get_all_by_filters_sort')
+    @mock.patch('nova.objects.CellMappingList.get_all')
+    def test_get_instances_sorted_batched_page_fails(self, mock_cells,
+                                                     mock_inst, mock_target,
+                                                     mock_warning):
+        self.flags(list_records_batch_size=2, group='api')
+        mock_cells.return_value = self.cells
+        mock_target.side_effect = self._fake_target_cell
+
+        def fake_instance_get_all(cell_uuid, filters, limit, marker,
+                                  **kwargs):
+            if cell_uuid == uuids.cell1 and marker:
+                raise test.TestingException()
+            return self._fake_instance_get_all(cell_uuid, filters, limit,
+                                               marker, **kwargs)
+
+        mock_inst.side_effect = fake_instance_get_all
+
+        insts = instance_list.get_instances_sorted(self.context, {},
+                                                   None, None,
+                                                   [], ['hostname'], ['asc'])
+
+        # The first page of cell1 is returned, but not the rest of it.
+        self.assertEqual(['cell0-inst0', 'cell0-inst1', 'cell0-inst2',
+                          'cell1-inst0', 'cell1-inst1',
+                          'cell2-inst0', 'cell2-inst1', 'cell2-inst2'],
+                         [inst['hostname'] for inst in insts])
+        mock_warning.assert_called_once_with(
+            'Cell %s did not respond or failed and is skipped from the '
+            'results', uuids.cell1)
+
+    @mock.patch('nova.db.instance_get_all_by_filters_sort')
+    @mock.patch('nova.objects.CellMappingList.get_all')
+    def test_get_instances_sorted_skips_failed_cell(self, mock_cells,
+                                                    mock_inst):
+        mock_cells.return_value = self.cells
+        insts_by_cell = [self.insts[cell.uuid] for cell in self.cells]
+        mock_inst.side_effect = [insts_by_cell[0],
+                                 test.TestingException(),
+                                 insts_by_cell[2]]
+
+        insts = instance_list.get_instances_sorted(self.context, {},
+                                                   None, None,
+                                                   [], ['hostname'], ['asc'])
+
+        self.assertEqual(['cell0-inst0', 'cell0-inst1', 'cell0-inst2',
+                          'cell2-inst0', 'cell2-inst1', 'cell2-inst2'],
+                         [inst['hostname'] for inst in insts])
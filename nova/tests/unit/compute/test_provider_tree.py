@@ -597,3 +597,48 @@ class TestProviderTree(test.NoDBTestCase):
         self.assertTrue(pt.in_aggregates(cn.uuid, aggregates[-1:]))
         # Previously-taken data now differs
         self.assertTrue(pt.have_aggregates_changed(cn.uuid, cnsnap.aggregates))
+
+    def test_copy(self):
+        pt = self._pt_with_cns()
+        cn = self.compute_node1
+        pt.new_child('numa_cell0', cn.uuid, uuid=uuids.numa_cell0)
+        pt.update_inventory(uuids.numa_cell0, {'VCPU': {'total': 4}}, 1)
+        pt.update_traits(cn.uuid, ['HW_CPU_X86_AVX'])
+        pt.update_aggregates(cn.uuid, [uuids.agg1])
+
+        ptcopy = pt.copy()
+        self.assertEqual(pt.get_provider_uuids(), ptcopy.get_provider_uuids())
+        for uuid in pt.get_provider_uuids():
+            self.assertEqual(pt.data(uuid), ptcopy.data(uuid))
+        self.assertTrue(ptcopy.exists('numa_cell0'))
+
+        # Changes to either tree have no effect on the other
+        pt.update_inventory(uuids.numa_cell0, {'VCPU': {'total': 8}}, 2)
+        pt.update_traits(cn.uuid, [])
+        ptcopy.update_aggregates(cn.uuid, [])
+        ptcopy.remove(uuids.numa_cell0)
+        self.assertEqual({'VCPU': {'total': 8}},
+                         pt.data(uuids.numa_cell0).inventory)
+        self.assertEqual(set(), pt.data(cn.uuid).traits)
+        self.assertEqual(set([uuids.agg1]), pt.data(cn.uuid).aggregates)
+        self.assertFalse(ptcopy.exists(uuids.numa_cell0))
+        self.assertEqual(set(['HW_CPU_X86_AVX']),
+                         ptcopy.data(cn.uuid).traits)
+        self.assertEqual(set(), ptcopy.data(cn.uuid).aggregates)
+
+    def test_snapshot(self):
+        pt = self._pt_with_cns()
+        cn = self.compute_node1
+        pt.new_child('numa_cell0', cn.uuid, uuid=uuids.numa_cell0)
+        pt.update_inventory(uuids.numa_cell0, {'VCPU': {'total': 4}}, 1)
+
+        snap = pt.snapshot()
+        self.assertEqual(pt.get_provider_uuids(), list(snap))
+        for uuid in pt.get_provider_uuids():
+            self.assertEqual(pt.data(uuid), snap[uuid])
+
+        # Updating the tree does not change the snapshot
+        pt.update_inventory(uuids.numa_cell0, {'VCPU': {'total': 8}}, 2)
+        self.assertEqual({'VCPU': {'total': 4}},
+                         snap[uuids.numa_cell0].inventory)
+        self.assertEqual(1, snap[uuids.numa_cell0].generation)
@@ -13,6 +13,7 @@
 import copy
 import datetime
 
+import eventlet
 import mock
 from oslo_config import cfg
 from oslo_utils import timeutils
@@ -970,6 +971,145 @@ class TestUpdateAvailableResources(BaseTestCase):
                                                  actual_resources))
 
 
+@mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
+            return_value=objects.InstancePCIRequests(requests=[]))
+@mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
+            return_value=objects.PciDeviceList())
+@mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename',
+            return_value=_COMPUTE_NODE_FIXTURES[0])
+@mock.patch('nova.objects.MigrationList.get_in_progress_by_host_and_node')
+@mock.patch('nova.objects.InstanceList.get_by_filters')
+@mock.patch('nova.objects.InstanceList.get_by_host_and_node')
+class TestReconcileAvailableResources(BaseTestCase):
+
+    def setUp(self):
+        super(TestReconcileAvailableResources, self).setUp()
+        self.flags(resource_tracker_full_audit_interval=3600, group='compute')
+        self._setup_rt()
+        self.driver_mock.requires_allocation_refresh = False
+        self.instance = _INSTANCE_FIXTURES[0].obj_clone()
+        self.instance.deleted = False
+
+    @mock.patch('nova.objects.Service.get_minimum_version',
+                return_value=22)
+    def _update_available_resources(self, version_mock):
+        with mock.patch.object(self.rt, '_update') as update_mock:
+            self.rt.update_available_resource(mock.MagicMock(), _NODENAME)
+        return update_mock
+
+    def test_full_audit_if_disabled(self, get_mock, get_filters_mock,
+                                    migr_mock, *args):
+        self.flags(resource_tracker_full_audit_interval=0, group='compute')
+        get_mock.return_value = []
+        migr_mock.return_value = []
+
+        self._update_available_resources()
+        self._update_available_resources()
+
+        self.assertEqual(2, get_mock.call_count)
+        get_filters_mock.assert_not_called()
+
+    def test_reconcile_new_instance(self, get_mock, get_filters_mock,
+                                    migr_mock, *args):
+        get_mock.return_value = []
+        migr_mock.return_value = []
+        self._update_available_resources()
+
+        get_filters_mock.return_value = [self.instance]
+        update_mock = self._update_available_resources()
+
+        get_mock.assert_called_once_with(
+            mock.ANY, _HOSTNAME, _NODENAME,
+            expected_attrs=resource_tracker._INSTANCE_EXPECTED_ATTRS)
+        get_filters_mock.assert_called_once_with(
+            mock.ANY, {'host': _HOSTNAME, 'changes-since': mock.ANY},
+            expected_attrs=resource_tracker._INSTANCE_EXPECTED_ATTRS)
+        self.assertIn(self.instance.uuid, self.rt.tracked_instances)
+        cn = update_mock.call_args[0][1]
+        self.assertEqual(self.instance.flavor.vcpus, cn.vcpus_used)
+        self.assertEqual(self.instance.flavor.memory_mb, cn.memory_mb_used)
+        self.assertEqual(1, cn.running_vms)
+
+    def test_reconcile_deleted_instance(self, get_mock, get_filters_mock,
+                                        migr_mock, *args):
+        get_mock.return_value = [self.instance]
+        migr_mock.return_value = []
+        self._update_available_resources()
+        self.assertIn(self.instance.uuid, self.rt.tracked_instances)
+
+        deleted = self.instance.obj_clone()
+        deleted.deleted = True
+        deleted.vm_state = vm_states.DELETED
+        get_filters_mock.return_value = [deleted]
+        update_mock = self._update_available_resources()
+
+        get_mock.assert_called_once_with(
+            mock.ANY, _HOSTNAME, _NODENAME,
+            expected_attrs=resource_tracker._INSTANCE_EXPECTED_ATTRS)
+        self.assertNotIn(self.instance.uuid, self.rt.tracked_instances)
+        cn = update_mock.call_args[0][1]
+        self.assertEqual(0, cn.vcpus_used)
+        self.assertEqual(0, cn.memory_mb_used)
+        self.assertEqual(0, cn.running_vms)
+
+    def test_reconcile_instance_moved_away(self, get_mock, get_filters_mock,
+                                           migr_mock, *args):
+        get_mock.return_value = [self.instance]
+        migr_mock.return_value = []
+        self._update_available_resources()
+
+        moved = self.instance.obj_clone()
+        moved.host = 'other-host'
+        get_filters_mock.side_effect = [[], [moved]]
+        update_mock = self._update_available_resources()
+
+        get_filters_mock.assert_called_with(
+            mock.ANY,
+            {'uuid': [self.instance.uuid], 'changes-since': mock.ANY},
+            expected_attrs=resource_tracker._INSTANCE_EXPECTED_ATTRS)
+        self.assertNotIn(self.instance.uuid, self.rt.tracked_instances)
+        cn = update_mock.call_args[0][1]
+        self.assertEqual(0, cn.vcpus_used)
+
+    def test_full_audit_if_migrations_changed(self, get_mock,
+                                              get_filters_mock, migr_mock,
+                                              *args):
+        get_mock.return_value = []
+        migr_mock.return_value = []
+        self._update_available_resources()
+
+        migr_mock.return_value = [_MIGRATION_FIXTURES['source-only']]
+        self._update_available_resources()
+
+        self.assertEqual(2, get_mock.call_count)
+        get_filters_mock.assert_not_called()
+
+    def test_full_audit_if_capacity_changed(self, get_mock, get_filters_mock,
+                                            migr_mock, *args):
+        get_mock.return_value = []
+        migr_mock.return_value = []
+        self._update_available_resources()
+
+        self.driver_mock.get_available_resource.return_value = dict(
+            _VIRT_DRIVER_AVAIL_RESOURCES, memory_mb=1024)
+        self._update_available_resources()
+
+        self.assertEqual(2, get_mock.call_count)
+        get_filters_mock.assert_not_called()
+
+    def test_full_audit_if_due(self, get_mock, get_filters_mock, migr_mock,
+                               *args):
+        get_mock.return_value = []
+        migr_mock.return_value = []
+        self._update_available_resources()
+
+        self.rt.audits[_NODENAME]['full'] -= datetime.timedelta(hours=2)
+        self._update_available_resources()
+
+        self.assertEqual(2, get_mock.call_count)
+        get_filters_mock.assert_not_called()
+
+
 class TestInitComputeNode(BaseTestCase):
 
     @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
@@ -2863,8 +3003,10 @@ class TestUpdateUsageFromInstance(BaseTestCase):
             self.rt._update_usage_from_instances('ctxt', [self.instance],
                                                  _NODENAME)
 
-            uufi.assert_called_once_with('ctxt', self.instance, _NODENAME,
-                                         require_allocation_refresh=True)
+            uufi.assert_called_once_with('ctxt', self.instance, _NODENAME)
+            ui_mock = self.rt.reportclient.update_instance_allocation
+            ui_mock.assert_called_once_with(
+                'ctxt', self.rt.compute_nodes[_NODENAME], self.instance, 1)
 
         test()
 
@@ -2880,8 +3022,9 @@ class TestUpdateUsageFromInstance(BaseTestCase):
             self.rt._update_usage_from_instances('ctxt', [self.instance],
                                                  _NODENAME)
 
-            uufi.assert_called_once_with('ctxt', self.instance, _NODENAME,
-                                         require_allocation_refresh=False)
+            uufi.assert_called_once_with('ctxt', self.instance, _NODENAME)
+            ui_mock = self.rt.reportclient.update_instance_allocation
+            ui_mock.assert_not_called()
 
         test()
 
@@ -3055,6 +3198,69 @@ class TestIsTrackableMigration(test.NoDBTestCase):
             self.assertFalse(resource_tracker._is_trackable_migration(mig))
 
 
+class TestSynchronizedNode(test.NoDBTestCase):
+
+    class FakeTracker(object):
+
+        @resource_tracker._synchronized_node
+        def claim(self, context, instance, nodename, limits=None):
+            return nodename
+
+        @resource_tracker._synchronized_node
+        def audit(self, context, resources):
+            return resources['hypervisor_hostname']
+
+    @mock.patch('nova.utils.synchronized')
+    def test_lock_by_nodename(self, mock_sync):
+        mock_sync.return_value = lambda f: f
+        tracker = self.FakeTracker()
+
+        self.assertEqual('node1', tracker.claim(mock.sentinel.ctx,
+                                                mock.sentinel.instance,
+                                                'node1'))
+        self.assertEqual('node2', tracker.claim(mock.sentinel.ctx,
+                                                mock.sentinel.instance,
+                                                nodename='node2'))
+        self.assertEqual('node3', tracker.audit(
+            mock.sentinel.ctx, {'hypervisor_hostname': 'node3'}))
+
+        mock_sync.assert_has_calls([mock.call('compute_resources-node1'),
+                                    mock.call('compute_resources-node2'),
+                                    mock.call('compute_resources-node3')])
+
+    def test_claim_during_audit_of_other_node(self):
+        audit_started = eventlet.event.Event()
+        finish_audit = eventlet.event.Event()
+
+        class SlowAuditTracker(self.FakeTracker):
+
+            @resource_tracker._synchronized_node
+            def audit(self, context, resources):
+                audit_started.send()
+                finish_audit.wait()
+                return resources['hypervisor_hostname']
+
+        tracker = SlowAuditTracker()
+        audit = eventlet.spawn(tracker.audit, mock.sentinel.ctx,
+                               {'hypervisor_hostname': 'node1'})
+        audit_started.wait()
+
+        # The audit of node1 holds the lock of node1, which does not block a
+        # claim on node2 but blocks a claim on node1.
+        self.assertEqual('node2', tracker.claim(mock.sentinel.ctx,
+                                                mock.sentinel.instance,
+                                                'node2'))
+        claim = eventlet.spawn(tracker.claim, mock.sentinel.ctx,
+                               mock.sentinel.instance, 'node1')
+        eventlet.sleep(0)
+        self.assertFalse(audit.dead)
+        self.assertFalse(claim.dead)
+
+        finish_audit.send()
+        self.assertEqual('node1', audit.wait())
+        self.assertEqual('node1', claim.wait())
+
+
 class OverCommitTestCase(BaseTestCase):
     def test_cpu_allocation_ratio_none_negative(self):
         self.assertRaises(ValueError,
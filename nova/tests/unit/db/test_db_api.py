@@ -689,6 +689,20 @@ class SqlAlchemyDbApiNoDbTestCase(test.NoDBTestCase):
                                               connection='fake://')
         self.assertEqual('fake://', db_conf['connection'])
 
+    @mock.patch('oslo_db.sqlalchemy.enginefacade.transaction_context')
+    def test_create_context_manager_cell_pool_size(self, mock_ctxt_mgr):
+        self.flags(max_pool_size=5, group='database')
+        sqlalchemy_api.create_context_manager('fake://')
+        kwargs = mock_ctxt_mgr.return_value.configure.call_args[1]
+        self.assertEqual('fake://', kwargs['connection'])
+        self.assertEqual(5, kwargs['max_pool_size'])
+
+        mock_ctxt_mgr.reset_mock()
+        self.flags(cell_database_max_pool_size=2, group='api')
+        sqlalchemy_api.create_context_manager('fake://')
+        kwargs = mock_ctxt_mgr.return_value.configure.call_args[1]
+        self.assertEqual(2, kwargs['max_pool_size'])
+
     @mock.patch.object(sqlalchemy_api.api_context_manager._factory,
                        'get_legacy_facade')
     def test_get_api_engine(self, mock_create_facade):
@@ -2359,6 +2373,43 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self.assertIn(instance2['uuid'], instance_uuids)
         self.assertIn(instance3['uuid'], instance_uuids)
 
+    def test_instance_get_all_by_filters_sort_security_groups(self):
+        instance1 = self.create_instance_with_args()
+        instance2 = self.create_instance_with_args()
+        instance3 = self.create_instance_with_args()
+        self._create_security_group(
+            {'name': 'fake-secgroup1', 'instances': [instance1, instance2]})
+        self._create_security_group(
+            {'name': 'fake-secgroup2', 'instances': [instance1]})
+
+        instances = db.instance_get_all_by_filters_sort(
+            self.ctxt, {}, columns_to_join=['security_groups'])
+
+        secgroups = {instance['uuid']: sorted(secgroup['name'] for secgroup
+                                              in instance['security_groups'])
+                     for instance in instances}
+        self.assertEqual({instance1['uuid']: ['fake-secgroup1',
+                                              'fake-secgroup2'],
+                          instance2['uuid']: ['fake-secgroup1'],
+                          instance3['uuid']: []}, secgroups)
+
+    @mock.patch('nova.db.sqlalchemy.api._instance_security_groups_get_multi')
+    def test_instance_get_all_by_filters_sort_security_groups_deleted(
+            self, mock_get_secgroups):
+        mock_get_secgroups.return_value = []
+        instance1 = self.create_instance_with_args()
+        instance2 = self.create_instance_with_args()
+        db.instance_destroy(self.ctxt, instance2['uuid'])
+        ctxt = context.get_admin_context(read_deleted='yes')
+
+        instances = db.instance_get_all_by_filters_sort(
+            ctxt, {}, columns_to_join=['security_groups'])
+
+        self.assertEqual(2, len(instances))
+        # Like the relationship, deleted instances have no security groups.
+        mock_get_secgroups.assert_called_once_with(mock.ANY,
+                                                   [instance1['uuid']])
+
     def test_instance_get_all_by_grantee_security_groups_empty_group_ids(self):
         results = db.instance_get_all_by_grantee_security_groups(self.ctxt, [])
         self.assertEqual([], results)
@@ -3240,6 +3291,30 @@ class ServiceTestCase(test.TestCase, ModelsObjectComparatorMixin):
                                             include_disabled=True)
         self._assertEqualListsOfObjects(expected, real)
 
+    def test_service_get_all_by_binary_changed_since(self):
+        self.addCleanup(timeutils.clear_time_override)
+        start = timeutils.utcnow()
+        timeutils.set_time_override(start - datetime.timedelta(hours=1))
+        old = self._create_service({'host': 'host1', 'binary': 'b1'})
+        deleted = self._create_service({'host': 'host2', 'binary': 'b1'})
+        updated = self._create_service({'host': 'host3', 'binary': 'b1'})
+        timeutils.set_time_override(start)
+        created = self._create_service({'host': 'host4', 'binary': 'b1'})
+        self._create_service({'host': 'host5', 'binary': 'b2'})
+        db.service_update(self.ctxt, updated['id'], {'report_count': 4})
+        db.service_destroy(self.ctxt, deleted['id'])
+
+        real = db.service_get_all_by_binary_changed_since(self.ctxt, 'b1',
+                                                          start)
+        self.assertEqual(set([created['id'], updated['id']]),
+                         set(service['id'] for service in real))
+        self.assertNotIn(old['id'], [service['id'] for service in real])
+
+        real = db.service_get_all_by_binary_changed_since(
+            self.ctxt.elevated(read_deleted='yes'), 'b1', start)
+        self.assertEqual(set([created['id'], updated['id'], deleted['id']]),
+                         set(service['id'] for service in real))
+
     def test_service_get_all_computes_by_hv_type(self):
         values = [
             {'host': 'host1', 'binary': 'nova-compute'},
@@ -6907,6 +6982,36 @@ class ComputeNodeTestCase(test.TestCase, ModelsObjectComparatorMixin):
         cns = db.compute_node_get_all_mapped_less_than(self.ctxt, 1)
         self.assertEqual(2, len(cns))
 
+    def test_compute_node_get_all_changed_since(self):
+        self.addCleanup(timeutils.clear_time_override)
+        start = timeutils.utcnow()
+        timeutils.set_time_override(start - datetime.timedelta(hours=1))
+        nodes = []
+        for name in ('old', 'updated', 'deleted'):
+            cn = dict(self.compute_node_dict,
+                      hypervisor_hostname=name,
+                      uuid=uuidutils.generate_uuid())
+            nodes.append(db.compute_node_create(self.ctxt, cn))
+        old, updated, deleted = nodes
+        timeutils.set_time_override(start)
+        cn = dict(self.compute_node_dict,
+                  hypervisor_hostname='created',
+                  uuid=uuidutils.generate_uuid())
+        created = db.compute_node_create(self.ctxt, cn)
+        db.compute_node_update(self.ctxt, updated['id'], {'vcpus_used': 1})
+        db.compute_node_delete(self.ctxt, deleted['id'])
+
+        cns = db.compute_node_get_all_changed_since(self.ctxt, start)
+        self.assertEqual(set([created['uuid'], updated['uuid']]),
+                         set(node['uuid'] for node in cns))
+
+        cns = db.compute_node_get_all_changed_since(
+            self.ctxt.elevated(read_deleted='yes'), start)
+        self.assertEqual(
+            set([created['uuid'], updated['uuid'], deleted['uuid']]),
+            set(node['uuid'] for node in cns))
+        self.assertNotIn(old['uuid'], [node['uuid'] for node in cns])
+
     def test_compute_node_get_all_by_pagination(self):
         service_dict = dict(host='host2', binary='nova-compute',
                             topic=compute_rpcapi.RPC_TOPIC,
@@ -17,6 +17,7 @@
 import collections
 import copy
 
+import eventlet
 from keystoneauth1.fixture import V2Token
 from keystoneauth1 import loading as ks_loading
 from keystoneauth1 import service_token
@@ -373,6 +374,7 @@ class TestNeutronv2Base(test.TestCase):
                              'floating_ip_address': '172.0.1.2'}]
         self.dhcp_port_data1 = [{'fixed_ips': [{'ip_address': '10.0.1.9',
                                                'subnet_id': 'my_subid1'}],
+                                 'network_id': uuids.my_netid1,
                                  'status': 'ACTIVE',
                                  'admin_state_up': True}]
         self.port_address2 = '10.0.2.2'
@@ -759,23 +761,17 @@ class TestNeutronv2Base(test.TestCase):
         nets = number == 1 and self.nets1 or self.nets2
         self.moxed_client.list_networks(
             id=net_ids).AndReturn({'networks': nets})
-        for i in range(1, number + 1):
-            float_data = number == 1 and self.float_data1 or self.float_data2
-            for ip in port_data[i - 1]['fixed_ips']:
-                float_data = [x for x in float_data
-                              if x['fixed_ip_address'] == ip['ip_address']]
-                self.moxed_client.list_floatingips(
-                    fixed_ip_address=ip['ip_address'],
-                    port_id=port_data[i - 1]['id']).AndReturn(
-                        {'floatingips': float_data})
-            subnet_data = i == 1 and self.subnet_data1 or self.subnet_data2
-            self.moxed_client.list_subnets(
-                id=mox.SameElementsAs(['my_subid%s' % i])).AndReturn(
-                    {'subnets': subnet_data})
-            self.moxed_client.list_ports(
-                network_id=subnet_data[0]['network_id'],
-                device_owner='network:dhcp').AndReturn(
-                    {'ports': []})
+        float_data = number == 1 and self.float_data1 or self.float_data2
+        self.moxed_client.list_floatingips(
+            port_id=[port['id'] for port in port_data]).AndReturn(
+                {'floatingips': float_data})
+        subnet_data = self.subnet_data1 + self.subnet_data2[:number - 1]
+        self.moxed_client.list_subnets(
+            id=['my_subid%s' % i for i in range(1, number + 1)]).AndReturn(
+                {'subnets': subnet_data})
+        self.moxed_client.list_ports(
+            network_id=[subnet['network_id'] for subnet in subnet_data],
+            device_owner='network:dhcp').AndReturn({'ports': []})
         self.instance['info_cache'] = self._fake_instance_info_cache(
             net_info_cache, self.instance['uuid'])
         self.mox.StubOutWithMock(api.db, 'instance_info_cache_get')
@@ -979,29 +975,28 @@ class TestNeutronv2(TestNeutronv2Base):
                 for iface in ifaces]
             port_ids = [iface['id'] for iface in ifaces] + port_ids
 
-        index = 0
-
         current_neutron_port_map = {}
         for current_neutron_port in current_neutron_ports:
             current_neutron_port_map[current_neutron_port['id']] = (
                 current_neutron_port)
-        for port_id in port_ids:
-            current_neutron_port = current_neutron_port_map.get(port_id)
-            if current_neutron_port:
-                for ip in current_neutron_port['fixed_ips']:
-                    self.moxed_client.list_floatingips(
-                        fixed_ip_address=ip['ip_address'],
-                        port_id=current_neutron_port['id']).AndReturn(
-                            {'floatingips': [self.float_data2[index]]})
-                    self.moxed_client.list_subnets(
-                        id=mox.SameElementsAs([ip['subnet_id']])
-                        ).AndReturn(
-                            {'subnets': [self.subnet_data_n[index]]})
-                    self.moxed_client.list_ports(
-                        network_id=current_neutron_port['network_id'],
-                        device_owner='network:dhcp').AndReturn(
-                        {'ports': self.dhcp_port_data1})
-                    index += 1
+        ports = [current_neutron_port_map[port_id] for port_id in port_ids
+                 if port_id in current_neutron_port_map]
+        subnet_ids = [ip['subnet_id'] for port in ports
+                      for ip in port['fixed_ips']]
+        index = len(subnet_ids)
+        if ports:
+            self.moxed_client.list_floatingips(
+                port_id=[port['id'] for port in ports]).AndReturn(
+                    {'floatingips': self.float_data2})
+        if subnet_ids:
+            subnets = [subnet for subnet in self.subnet_data_n
+                       if subnet['id'] in subnet_ids]
+            self.moxed_client.list_subnets(id=subnet_ids).AndReturn(
+                {'subnets': subnets})
+            self.moxed_client.list_ports(
+                network_id=[subnet['network_id'] for subnet in subnets],
+                device_owner='network:dhcp').AndReturn(
+                    {'ports': self.dhcp_port_data1})
         self.instance['info_cache'] = self._fake_instance_info_cache(
             network_cache['info_cache']['network_info'], self.instance['uuid'])
 
@@ -1042,6 +1037,9 @@ class TestNeutronv2(TestNeutronv2Base):
         self.moxed_client.list_networks(
             id=[self.port_data1[0]['network_id']]).AndReturn(
                 {'networks': self.nets1})
+        self.moxed_client.list_floatingips(
+            port_id=[self.port_data3[0]['id']]).AndReturn(
+                {'floatingips': []})
 
         net_info_cache = []
         for port in self.port_data3:
@@ -1672,13 +1670,10 @@ class TestNeutronv2(TestNeutronv2Base):
         self.moxed_client.list_networks(id=net_ids).AndReturn(
             {'networks': nets})
         float_data = number == 1 and self.float_data1 or self.float_data2
-        for data in port_data[1:]:
-            for ip in data['fixed_ips']:
-                self.moxed_client.list_floatingips(
-                    fixed_ip_address=ip['ip_address'],
-                    port_id=data['id']).AndReturn(
-                        {'floatingips': float_data[1:]})
-        for port in port_data[1:]:
+        if port_data[1:]:
+            self.moxed_client.list_floatingips(
+                port_id=[data['id'] for data in port_data[1:]]).AndReturn(
+                    {'floatingips': float_data[1:]})
             self.moxed_client.list_subnets(id=['my_subid2']).AndReturn({})
 
         self.mox.StubOutWithMock(api.db, 'instance_info_cache_get')
@@ -2682,7 +2677,7 @@ class TestNeutronv2(TestNeutronv2Base):
         api = neutronapi.API()
         self.mox.StubOutWithMock(api, '_get_subnets_from_port')
         api._get_subnets_from_port(
-            self.context, fake_port, None).AndReturn(
+            self.context, fake_port, None, lookups=None).AndReturn(
             [fake_subnet])
         self.mox.ReplayAll()
         subnets = api._nw_info_get_subnets(self.context, fake_port, fake_ips)
@@ -2955,17 +2950,21 @@ class TestNeutronv2(TestNeutronv2Base):
             tenant_id=uuids.fake, device_id=uuids.instance).AndReturn(
                 {'ports': fake_ports})
 
-        self.mox.StubOutWithMock(api, '_get_floating_ips_by_fixed_and_port')
+        self.mox.StubOutWithMock(api, '_get_port_lookups')
         self.mox.StubOutWithMock(api, '_get_subnets_from_port')
         requested_ports = [fake_ports[2], fake_ports[0], fake_ports[1],
                            fake_ports[3], fake_ports[4], fake_ports[5]]
-        for requested_port in requested_ports:
-            api._get_floating_ips_by_fixed_and_port(
-                self.moxed_client, '1.1.1.1', requested_port['id']).AndReturn(
-                    [{'floating_ip_address': '10.0.0.1'}])
+        lookups = neutronapi._PortLookups(
+            {port['id']: [{'port_id': port['id'],
+                           'fixed_ip_address': '1.1.1.1',
+                           'floating_ip_address': '10.0.0.1'}]
+             for port in requested_ports}, {}, {})
+        api._get_port_lookups(self.moxed_client, requested_ports).AndReturn(
+            lookups)
         for requested_port in requested_ports:
             api._get_subnets_from_port(self.context, requested_port,
-                                       self.moxed_client).AndReturn(
+                                       self.moxed_client,
+                                       lookups=lookups).AndReturn(
                 fake_subnets)
 
         self.mox.StubOutWithMock(api, '_get_preexisting_port_ids')
@@ -2990,6 +2989,8 @@ class TestNeutronv2(TestNeutronv2Base):
         for nw_info in nw_infos:
             self.assertEqual(requested_ports[index]['mac_address'],
                              nw_info['address'])
+            self.assertEqual(['10.0.0.1'],
+                             [ip['address'] for ip in nw_info.floating_ips()])
             self.assertEqual('tapport' + str(index), nw_info['devname'])
             self.assertIsNone(nw_info['ovs_interfaceid'])
             self.assertEqual(requested_ports[index]['binding:vif_type'],
@@ -3403,6 +3404,260 @@ class TestNeutronv2WithMock(test.TestCase):
         self.assertEqual(new_port_ids, instance_port_ids + port_ids)
         self.assertEqual(2, mock_log.warning.call_count)
 
+    @mock.patch.object(neutronapi.API, '_get_available_networks')
+    def test_gather_port_ids_and_networks_available_networks(
+            self, mock_get_networks):
+        network_info = model.NetworkInfo([
+            {'id': uuids.port1, 'network': model.Network(id=uuids.net2)},
+            {'id': uuids.port2, 'network': model.Network(id=uuids.net1)},
+            {'id': uuids.port3, 'network': model.Network(id=uuids.net2)}])
+        instance = objects.Instance(uuid=uuids.instance,
+                                    info_cache=objects.InstanceInfoCache(
+                                        network_info=network_info))
+        available_networks = {uuids.net1: {'id': uuids.net1},
+                              uuids.net2: {'id': uuids.net2},
+                              uuids.net3: {'id': uuids.net3}}
+
+        networks, port_ids = self.api._gather_port_ids_and_networks(
+            self.context, instance, available_networks=available_networks)
+
+        mock_get_networks.assert_not_called()
+        self.assertEqual([{'id': uuids.net2}, {'id': uuids.net1}], networks)
+        self.assertEqual([uuids.port1, uuids.port2, uuids.port3], port_ids)
+
+    @mock.patch.object(neutronapi.API, 'get_instance_nw_info')
+    @mock.patch.object(neutronapi, 'get_client')
+    def test_get_instances_nw_info(self, mock_get_client, mock_get_nw_info):
+        client = mock_get_client.return_value
+        ports = [{'id': uuids.port1, 'device_id': uuids.instance1},
+                 {'id': uuids.port2, 'device_id': uuids.instance2}]
+        client.list_ports.return_value = {'ports': ports}
+        networks = [{'id': uuids.net1}]
+        client.list_networks.return_value = {'networks': networks}
+        network_info = model.NetworkInfo([
+            {'id': uuids.port1, 'network': model.Network(id=uuids.net1)}])
+        instances = [
+            objects.Instance(uuid=uuids.instance1,
+                             info_cache=objects.InstanceInfoCache(
+                                 network_info=network_info)),
+            objects.Instance(uuid=uuids.instance2,
+                             info_cache=objects.InstanceInfoCache(
+                                 network_info=model.NetworkInfo()))]
+        error = exception.InstanceNotFound(instance_id=uuids.instance2)
+        mock_get_nw_info.side_effect = [mock.sentinel.nw_info, error]
+
+        nw_infos = self.api.get_instances_nw_info(self.context, instances)
+
+        self.assertEqual({uuids.instance1: mock.sentinel.nw_info,
+                          uuids.instance2: error}, nw_infos)
+        mock_get_client.assert_called_once_with(self.context, admin=True)
+        client.list_ports.assert_called_once_with(
+            device_id=[uuids.instance1, uuids.instance2])
+        client.list_networks.assert_called_once_with(id=[uuids.net1])
+        mock_get_nw_info.assert_has_calls([
+            mock.call(self.context, instance, admin_client=client,
+                      neutron_ports={uuids.instance1: [ports[0]],
+                                     uuids.instance2: [ports[1]]},
+                      available_networks={uuids.net1: networks[0]})
+            for instance in instances])
+
+    @mock.patch.object(neutronapi.API, '_get_port_lookups')
+    @mock.patch.object(neutronapi.API, '_gather_port_ids_and_networks',
+                       return_value=([], []))
+    def _test_build_network_info_model_neutron_ports(
+            self, neutron_ports, mock_gather, mock_lookups):
+        network_info = model.NetworkInfo([
+            {'id': uuids.port1, 'network': model.Network(id=uuids.net1)}])
+        instance = objects.Instance(uuid=uuids.instance,
+                                    project_id=uuids.project,
+                                    info_cache=objects.InstanceInfoCache(
+                                        network_info=network_info))
+        client = mock.Mock()
+        client.list_ports.return_value = {'ports': []}
+        self.api._build_network_info_model(
+            self.context, instance, admin_client=client,
+            neutron_ports=neutron_ports)
+        return client
+
+    def test_build_network_info_model_neutron_ports(self):
+        ports = [{'id': uuids.port1, 'device_id': uuids.instance,
+                  'tenant_id': uuids.project}]
+        client = self._test_build_network_info_model_neutron_ports(
+            {uuids.instance: ports})
+        client.list_ports.assert_not_called()
+
+    def test_build_network_info_model_neutron_ports_outdated(self):
+        # The port in the info cache was attached after the ports were
+        # listed, so they are listed again.
+        client = self._test_build_network_info_model_neutron_ports(
+            {uuids.instance: []})
+        client.list_ports.assert_called_once_with(
+            tenant_id=uuids.project, device_id=uuids.instance)
+
+    @mock.patch.object(neutronapi.API, 'get_instance_nw_info')
+    @mock.patch.object(neutronapi, 'get_client')
+    def test_get_instances_nw_info_single_instance(self, mock_get_client,
+                                                   mock_get_nw_info):
+        instance = objects.Instance(uuid=uuids.instance)
+        nw_infos = self.api.get_instances_nw_info(self.context, [instance])
+        self.assertEqual({uuids.instance: mock_get_nw_info.return_value},
+                         nw_infos)
+        mock_get_client.assert_not_called()
+        mock_get_nw_info.assert_called_once_with(self.context, instance)
+
+    def test_get_port_lookups(self):
+        client = mock.Mock()
+        ports = [{'id': uuids.port1,
+                  'fixed_ips': [{'ip_address': '10.0.1.2',
+                                 'subnet_id': uuids.subnet1},
+                                {'ip_address': '10.0.2.2',
+                                 'subnet_id': uuids.subnet2}]},
+                 {'id': uuids.port2,
+                  'fixed_ips': [{'ip_address': '10.0.1.3',
+                                 'subnet_id': uuids.subnet1}]}]
+        fips = [{'port_id': uuids.port1, 'fixed_ip_address': '10.0.1.2',
+                 'floating_ip_address': '172.24.4.2'}]
+        subnets = [{'id': uuids.subnet1, 'network_id': uuids.net1},
+                   {'id': uuids.subnet2, 'network_id': uuids.net1}]
+        dhcp_ports = [{'id': uuids.dhcp_port, 'network_id': uuids.net1}]
+        client.list_floatingips.return_value = {'floatingips': fips}
+        client.list_subnets.return_value = {'subnets': subnets}
+        client.list_ports.return_value = {'ports': dhcp_ports}
+
+        lookups = self.api._get_port_lookups(client, ports)
+
+        client.list_floatingips.assert_called_once_with(
+            port_id=[uuids.port1, uuids.port2])
+        client.list_subnets.assert_called_once_with(
+            id=[uuids.subnet1, uuids.subnet2])
+        client.list_ports.assert_called_once_with(
+            network_id=[uuids.net1], device_owner='network:dhcp')
+        self.assertEqual({uuids.port1: fips, uuids.port2: []},
+                         lookups.floating_ips)
+        self.assertEqual({uuids.subnet1: subnets[0],
+                          uuids.subnet2: subnets[1]}, lookups.subnets)
+        self.assertEqual({uuids.net1: dhcp_ports}, lookups.dhcp_ports)
+
+    def test_get_port_lookups_no_fixed_ips(self):
+        client = mock.Mock()
+        client.list_floatingips.return_value = {'floatingips': []}
+
+        lookups = self.api._get_port_lookups(
+            client, [{'id': uuids.port, 'fixed_ips': []}])
+
+        client.list_floatingips.assert_called_once_with(port_id=[uuids.port])
+        client.list_subnets.assert_not_called()
+        client.list_ports.assert_not_called()
+        self.assertEqual({uuids.port: []}, lookups.floating_ips)
+
+    def test_get_subnets_from_port_lookups(self):
+        port = {'id': uuids.port,
+                'fixed_ips': [{'ip_address': '10.0.1.2',
+                               'subnet_id': uuids.subnet}]}
+        lookups = neutronapi._PortLookups(
+            {}, {uuids.subnet: {'id': uuids.subnet,
+                                'network_id': uuids.net,
+                                'cidr': '10.0.1.0/24',
+                                'gateway_ip': '10.0.1.1'}},
+            {uuids.net: [{'fixed_ips': [{'ip_address': '10.0.1.9',
+                                         'subnet_id': uuids.subnet}]}]})
+        client = mock.Mock()
+
+        subnets = self.api._get_subnets_from_port(self.context, port, client,
+                                                  lookups=lookups)
+
+        self.assertFalse(client.mock_calls)
+        self.assertEqual(1, len(subnets))
+        self.assertEqual('10.0.1.0/24', subnets[0]['cidr'])
+        self.assertEqual('10.0.1.9', subnets[0]['meta']['dhcp_server'])
+
+    def _enable_network_cache(self):
+        self.flags(network_cache_time=60, group='neutron')
+        neutronapi.reset_state()
+        self.addCleanup(neutronapi.reset_state)
+
+    def test_refresh_neutron_extensions_cache_shared(self):
+        self._enable_network_cache()
+        client = mock.Mock()
+        client.list_extensions.return_value = {
+            'extensions': [{'name': constants.QOS_QUEUE}]}
+
+        for api in (neutronapi.API(), neutronapi.API()):
+            api._refresh_neutron_extensions_cache(self.context,
+                                                  neutron=client)
+            self.assertEqual(
+                {constants.QOS_QUEUE: {'name': constants.QOS_QUEUE}},
+                api.extensions)
+
+        client.list_extensions.assert_called_once_with()
+
+    @mock.patch.object(neutronapi.API, '_lookup_phynet_info',
+                       return_value=None)
+    def test_get_phynet_info_cached(self, mock_lookup):
+        self._enable_network_cache()
+
+        for _ in range(2):
+            self.assertIsNone(self.api._get_phynet_info(
+                self.context, mock.sentinel.client, uuids.net))
+
+        mock_lookup.assert_called_once_with(
+            self.context, mock.sentinel.client, uuids.net)
+
+    @mock.patch.object(neutronapi.API, '_get_available_networks')
+    def test_get_cached_networks(self, mock_get_networks):
+        self._enable_network_cache()
+        net1 = {'id': uuids.net1}
+        net2 = {'id': uuids.net2}
+        mock_get_networks.side_effect = [[net1], [net2]]
+
+        self.assertEqual([net1], self.api._get_cached_networks(
+            self.context, uuids.project, [uuids.net1], mock.sentinel.client))
+        self.assertEqual([net2, net1], self.api._get_cached_networks(
+            self.context, uuids.project, [uuids.net2, uuids.net1, uuids.net2],
+            mock.sentinel.client))
+
+        mock_get_networks.assert_has_calls([
+            mock.call(self.context, uuids.project, [uuids.net1],
+                      mock.sentinel.client),
+            mock.call(self.context, uuids.project, [uuids.net2],
+                      mock.sentinel.client)])
+
+    @mock.patch.object(neutronapi.API, '_get_available_networks')
+    def test_get_cached_networks_disabled(self, mock_get_networks):
+        for _ in range(2):
+            self.assertEqual(
+                mock_get_networks.return_value,
+                self.api._get_cached_networks(
+                    self.context, uuids.project, [uuids.net],
+                    mock.sentinel.client))
+        self.assertEqual(2, mock_get_networks.call_count)
+
+    @mock.patch.object(neutronapi.API, '_get_available_networks')
+    def test_gather_port_ids_and_networks_refresh_networks(
+            self, mock_get_networks):
+        self._enable_network_cache()
+        network_info = model.NetworkInfo([
+            {'id': uuids.port, 'network': model.Network(id=uuids.net)}])
+        instance = objects.Instance(uuid=uuids.instance,
+                                    project_id=uuids.project,
+                                    info_cache=objects.InstanceInfoCache(
+                                        network_info=network_info))
+        old_net = {'id': uuids.net, 'mtu': 1500}
+        new_net = {'id': uuids.net, 'mtu': 9000}
+        mock_get_networks.side_effect = [[old_net], [new_net]]
+
+        for refresh_networks, expected in ((False, old_net),
+                                           (False, old_net),
+                                           (True, new_net),
+                                           (False, new_net)):
+            networks, port_ids = self.api._gather_port_ids_and_networks(
+                self.context, instance, neutron=mock.sentinel.client,
+                refresh_networks=refresh_networks)
+            self.assertEqual([expected], networks)
+            self.assertEqual([uuids.port], port_ids)
+
+        self.assertEqual(2, mock_get_networks.call_count)
+
     @mock.patch('oslo_concurrency.lockutils.lock')
     @mock.patch.object(neutronapi.API, '_get_instance_nw_info')
     @mock.patch('nova.network.base_api.update_instance_cache_with_nw_info')
@@ -5629,7 +5884,7 @@ class TestAllocateForInstance(test.NoDBTestCase):
             mock_client.delete_port.call_args_list)
         self.assertEqual(3, mock_client.create_port.call_count)
 
-    def test_create_ports_for_instance_with_cleanup_after_sg_failure(self):
+    def test_create_ports_for_instance_no_ports_after_sg_failure(self):
         api = neutronapi.API()
         ordered_networks = [
             objects.NetworkRequest(network_id=uuids.net1),
@@ -5642,19 +5897,76 @@ class TestAllocateForInstance(test.NoDBTestCase):
             uuids.net3: {"id": uuids.net3, "port_security_enabled": True}
         }
         mock_client = mock.Mock()
-        mock_client.create_port.side_effect = [
-            {"port": {"id": uuids.port1}},
-            {"port": {"id": uuids.port2}}
-        ]
 
         self.assertRaises(exception.SecurityGroupCannotBeApplied,
             api._create_ports_for_instance,
             self.context, self.instance, ordered_networks, nets,
             mock_client, None)
 
-        self.assertEqual([mock.call(uuids.port1), mock.call(uuids.port2)],
-            mock_client.delete_port.call_args_list)
+        # All the networks are checked before creating any port.
+        self.assertFalse(mock_client.create_port.called)
+        self.assertFalse(mock_client.delete_port.called)
+
+    def _test_create_ports_for_instance_concurrently(self, failing_net=None):
+        self.flags(port_operation_concurrency=2, group='neutron')
+        api = neutronapi.API()
+        net_ids = [uuids.net1, uuids.net2, uuids.net3]
+        ordered_networks = [objects.NetworkRequest(network_id=net_id)
+                            for net_id in net_ids]
+        ordered_networks.insert(
+            1, objects.NetworkRequest(network_id=uuids.net2,
+                                      port_id=uuids.existing_port))
+        nets = {net_id: {'id': net_id, 'port_security_enabled': False}
+                for net_id in net_ids}
+        ports = {uuids.net1: uuids.port1, uuids.net2: uuids.port2,
+                 uuids.net3: uuids.port3}
+        in_flight = []
+        max_in_flight = []
+
+        def fake_create_port(body):
+            network_id = body['port']['network_id']
+            in_flight.append(network_id)
+            max_in_flight.append(len(in_flight))
+            # Let the other port creations start.
+            eventlet.sleep(0)
+            in_flight.remove(network_id)
+            if network_id == failing_net:
+                raise exception.PortLimitExceeded()
+            return {'port': {'id': ports[network_id]}}
+
+        mock_client = mock.Mock()
+        mock_client.create_port.side_effect = fake_create_port
+
+        if failing_net:
+            self.assertRaises(exception.PortLimitExceeded,
+                api._create_ports_for_instance,
+                self.context, self.instance, ordered_networks, nets,
+                mock_client, None)
+        else:
+            result = api._create_ports_for_instance(
+                self.context, self.instance, ordered_networks, nets,
+                mock_client, None)
+            self.assertEqual([(ordered_networks[0], uuids.port1),
+                              (ordered_networks[1], None),
+                              (ordered_networks[2], uuids.port2),
+                              (ordered_networks[3], uuids.port3)], result)
+
+        self.assertEqual(2, max(max_in_flight))
+        return mock_client
+
+    def test_create_ports_for_instance_concurrently(self):
+        mock_client = self._test_create_ports_for_instance_concurrently()
+        self.assertEqual(3, mock_client.create_port.call_count)
+        self.assertFalse(mock_client.delete_port.called)
+
+    def test_create_ports_for_instance_concurrently_with_cleanup(self):
+        # The creations of the first two ports start together and the
+        # failure of the second one stops the creation of the third port.
+        mock_client = self._test_create_ports_for_instance_concurrently(
+            failing_net=uuids.net2)
         self.assertEqual(2, mock_client.create_port.call_count)
+        self.assertEqual([mock.call(uuids.port1)],
+                         mock_client.delete_port.call_args_list)
 
     def test_create_ports_for_instance_raises_subnets_missing(self):
         api = neutronapi.API()
@@ -5728,6 +6040,53 @@ class TestAllocateForInstance(test.NoDBTestCase):
                 neutronapi.BINDING_HOST_ID: bind_host_id,
                 'device_id': self.instance.uuid}})
 
+    @mock.patch.object(neutronapi.API, '_update_port_dns_name')
+    @mock.patch.object(neutronapi.API, '_populate_neutron_extension_values')
+    @mock.patch.object(objects.VirtualInterface, 'create')
+    @mock.patch.object(objects.VirtualInterface, 'destroy')
+    @mock.patch.object(neutronapi.API, '_unbind_ports')
+    @mock.patch.object(neutronapi.API, '_delete_ports')
+    def test_update_ports_for_instance_concurrently_with_cleanup(
+            self, mock_delete_ports, mock_unbind_ports, mock_vif_destroy,
+            mock_vif_create, mock_populate_ext_values, mock_dns_name):
+        self.flags(port_operation_concurrency=2, group='neutron')
+        api = neutronapi.API()
+        self.instance.availability_zone = 'test_az'
+        mock_client = mock.Mock()
+        requests_and_created_ports = [
+            (objects.NetworkRequest(network_id=uuids.net1), uuids.port1),
+            (objects.NetworkRequest(network_id=uuids.net1), uuids.port2),
+            (objects.NetworkRequest(network_id=uuids.net1), uuids.port3)]
+        nets = {uuids.net1: {'id': uuids.net1}}
+
+        def fake_update_port(port_client, instance, port_id, port_req_body):
+            # Let the other port update start.
+            eventlet.sleep(0)
+            if port_id == uuids.port1:
+                raise exception.PortInUse(port_id=port_id)
+            return {'id': port_id, 'mac_address': 'fake-mac'}
+
+        with mock.patch.object(api, '_update_port',
+                               side_effect=fake_update_port) as mock_update:
+            self.assertRaises(exception.PortInUse,
+                              api._update_ports_for_instance,
+                              self.context, self.instance, mock_client,
+                              mock_client, requests_and_created_ports, nets,
+                              bind_host_id=None, available_macs=None,
+                              requested_ports_dict=None)
+
+        # The updates of the first two ports start together and the failure
+        # of the first one stops the update of the third port.
+        self.assertEqual(2, mock_update.call_count)
+        mock_vif_create.assert_called_once_with()
+        mock_vif_destroy.assert_called_once_with()
+        mock_unbind_ports.assert_called_once_with(
+            self.context, [], mock_client, mock_client)
+        # Every created port is deleted, including the one never updated.
+        mock_delete_ports.assert_called_once_with(
+            mock_client, self.instance,
+            [uuids.port1, uuids.port2, uuids.port3])
+
 
 class TestNeutronv2NeutronHostnameDNS(TestNeutronv2Base):
     def setUp(self):
@@ -401,6 +401,18 @@ class _TestComputeNodeObject(object):
                          comparators=self.comparators())
         mock_get_all.assert_called_once_with(self.context)
 
+    @mock.patch.object(db, 'compute_node_get_all_changed_since')
+    def test_get_all_changed_since(self, mock_get_all):
+        mock_get_all.return_value = [fake_compute_node]
+        since = timeutils.utcnow()
+        computes = compute_node.ComputeNodeList.get_all_changed_since(
+            self.context, since)
+        self.assertEqual(1, len(computes))
+        self.compare_obj(computes[0], fake_compute_node,
+                         subs=self.subs(),
+                         comparators=self.comparators())
+        mock_get_all.assert_called_once_with(self.context, since)
+
     @mock.patch.object(db, 'compute_node_search_by_hypervisor')
     def test_get_by_hypervisor(self, mock_search):
         mock_search.return_value = [fake_compute_node]
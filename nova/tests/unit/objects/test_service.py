@@ -284,6 +284,16 @@ class _TestServiceObject(object):
         service_obj.compute_node
         mock_get.assert_called_once_with(self.context, 'fake-host')
 
+    @mock.patch.object(db, 'service_get_all_by_binary_changed_since')
+    def test_get_by_binary_changed_since(self, mock_get):
+        mock_get.return_value = [fake_service]
+        since = timeutils.utcnow()
+        services = service.ServiceList.get_by_binary_changed_since(
+            self.context, 'fake-binary', since)
+        self.assertEqual(1, len(services))
+        self.compare_obj(services[0], fake_service, allow_missing=OPTIONAL)
+        mock_get.assert_called_once_with(self.context, 'fake-binary', since)
+
     @mock.patch.object(db, 'service_get_all_computes_by_hv_type')
     def test_get_all_computes_by_hv_type(self, mock_get_all):
         mock_get_all.return_value = [fake_service]
@@ -26,6 +26,7 @@ from nova.scheduler import utils as scheduler_utils
 from nova import test
 from nova.tests.unit import fake_requests
 from nova.tests import uuidsentinel as uuids
+from nova import utils
 
 CONF = nova.conf.CONF
 
@@ -153,8 +154,9 @@ class TestConstructor(test.NoDBTestCase):
         client = report.SchedulerReportClient()
 
         load_auth_mock.assert_called_once_with(CONF, 'placement')
-        load_sess_mock.assert_called_once_with(CONF, 'placement',
-                                              auth=load_auth_mock.return_value)
+        load_sess_mock.assert_called_once_with(
+            CONF, 'placement', auth=load_auth_mock.return_value,
+            session=utils._get_http_session('placement'))
         self.assertEqual(['internal', 'public'], client._client.interface)
         self.assertEqual({'accept': 'application/json'},
                          client._client.additional_headers)
@@ -166,8 +168,9 @@ class TestConstructor(test.NoDBTestCase):
         client = report.SchedulerReportClient()
 
         load_auth_mock.assert_called_once_with(CONF, 'placement')
-        load_sess_mock.assert_called_once_with(CONF, 'placement',
-                                              auth=load_auth_mock.return_value)
+        load_sess_mock.assert_called_once_with(
+            CONF, 'placement', auth=load_auth_mock.return_value,
+            session=utils._get_http_session('placement'))
         self.assertEqual(['admin'], client._client.interface)
         self.assertEqual({'accept': 'application/json'},
                          client._client.additional_headers)
@@ -849,6 +852,102 @@ class TestPutAllocations(SchedulerReportClientTestCase):
         self.assertFalse(res)
         self.assertTrue(mock_log.called)
 
+    def test_claim_resources_batch_fail_retry_success(self):
+        resp_mocks = [
+            mock.Mock(
+                status_code=409,
+                text='Inventory changed while attempting to allocate: '
+                     'Another thread concurrently updated the data. '
+                     'Please retry your update'),
+            mock.Mock(status_code=204),
+        ]
+        self.ks_adap_mock.post.side_effect = resp_mocks
+        alloc_reqs = {
+            uuids.consumer1: {
+                'allocations': [
+                    {
+                        'resource_provider': {
+                            'uuid': uuids.cn1
+                        },
+                        'resources': {
+                            'VCPU': 1,
+                        }
+                    },
+                ],
+            },
+            uuids.consumer2: {
+                'allocations': [
+                    {
+                        'resource_provider': {
+                            'uuid': uuids.cn2
+                        },
+                        'resources': {
+                            'VCPU': 2,
+                        }
+                    },
+                ],
+            },
+        }
+
+        project_id = uuids.project_id
+        user_id = uuids.user_id
+        res = self.client.claim_resources_batch(
+            self.context, alloc_reqs, project_id, user_id,
+            allocation_request_version='1.10')
+
+        expected_payload = {
+            uuids.consumer1: {
+                'allocations': {uuids.cn1: {'resources': {'VCPU': 1}}},
+                'project_id': project_id,
+                'user_id': user_id,
+            },
+            uuids.consumer2: {
+                'allocations': {uuids.cn2: {'resources': {'VCPU': 2}}},
+                'project_id': project_id,
+                'user_id': user_id,
+            },
+        }
+        # We should have exactly two calls to the placement API that look
+        # identical since we're retrying the same HTTP request
+        expected_calls = [
+            mock.call('/allocations', microversion='1.13',
+                      json=expected_payload, raise_exc=False,
+                      headers={'X-Openstack-Request-Id':
+                               self.context.global_id})] * 2
+        self.assertEqual(len(expected_calls),
+                         self.ks_adap_mock.post.call_count)
+        self.ks_adap_mock.post.assert_has_calls(expected_calls)
+        self.ks_adap_mock.get.assert_not_called()
+
+        self.assertTrue(res)
+
+    @mock.patch.object(report.LOG, 'warning')
+    def test_claim_resources_batch_failure(self, mock_log):
+        self.ks_adap_mock.post.return_value = mock.Mock(status_code=409,
+                                                        text='not cool')
+        alloc_reqs = {
+            uuids.consumer1: {
+                'allocations': {
+                    uuids.cn1: {
+                        'resources': {
+                            'VCPU': 1,
+                        }
+                    },
+                },
+            },
+        }
+
+        res = self.client.claim_resources_batch(
+            self.context, alloc_reqs, uuids.project_id, uuids.user_id,
+            allocation_request_version='1.12')
+
+        self.ks_adap_mock.post.assert_called_once_with(
+            '/allocations', microversion='1.13', json=mock.ANY,
+            raise_exc=False,
+            headers={'X-Openstack-Request-Id': self.context.global_id})
+        self.assertFalse(res)
+        self.assertTrue(mock_log.called)
+
     def test_remove_provider_from_inst_alloc_no_shared(self):
         """Tests that the method which manipulates an existing doubled-up
         allocation for a move operation to remove the source host results in
@@ -1387,6 +1486,68 @@ class TestProviderOperations(SchedulerReportClientTestCase):
         self.assertEqual(tree_uuids,
                          set(self.client._provider_tree.get_provider_uuids()))
 
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                '_get_providers_in_tree')
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                '_refresh_and_get_inventory')
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                '_refresh_associations')
+    def test_ensure_resource_provider_unchanged(self, mock_ref_assoc,
+                                                mock_ref_inv, mock_gpit):
+        """Make sure the providers of a tree are not refreshed again if
+        their generations didn't change since they were fetched.
+        """
+        mock_gpit.return_value = [
+            {'uuid': uuids.root, 'name': 'root', 'generation': 42},
+            {'uuid': uuids.child, 'name': 'child', 'generation': 7,
+             'parent_provider_uuid': uuids.root}]
+        self.client._ensure_resource_provider(self.context, uuids.root)
+        self.assertEqual(2, mock_ref_inv.call_count)
+        self.assertEqual(2, mock_ref_assoc.call_count)
+        for uuid in (uuids.root, uuids.child):
+            self.client.association_refresh_time[uuid] = time.time()
+        mock_ref_inv.reset_mock()
+        mock_ref_assoc.reset_mock()
+
+        self.client._ensure_resource_provider(self.context, uuids.root)
+
+        self.assertEqual(2, mock_gpit.call_count)
+        mock_ref_inv.assert_not_called()
+        mock_ref_assoc.assert_not_called()
+
+        # Associations due for a refresh are refreshed alone.
+        self.client.association_refresh_time.pop(uuids.child)
+        self.client._ensure_resource_provider(self.context, uuids.root)
+
+        mock_ref_inv.assert_not_called()
+        mock_ref_assoc.assert_called_once_with(self.context, uuids.child)
+
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                '_get_providers_in_tree')
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                '_refresh_and_get_inventory')
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                '_refresh_associations')
+    def test_ensure_resource_provider_generation_changed(
+            self, mock_ref_assoc, mock_ref_inv, mock_gpit):
+        """Make sure the providers of a tree are refreshed again if the
+        generation of one of them changed since they were fetched.
+        """
+        mock_gpit.return_value = [
+            {'uuid': uuids.root, 'name': 'root', 'generation': 42}]
+        self.client._ensure_resource_provider(self.context, uuids.root)
+        self.client.association_refresh_time[uuids.root] = time.time()
+        mock_ref_inv.reset_mock()
+        mock_ref_assoc.reset_mock()
+
+        mock_gpit.return_value = [
+            {'uuid': uuids.root, 'name': 'root', 'generation': 43}]
+        self.client._ensure_resource_provider(self.context, uuids.root)
+
+        mock_ref_inv.assert_called_once_with(self.context, uuids.root)
+        mock_ref_assoc.assert_called_once_with(
+            self.context, uuids.root, generation=43, force=True)
+
     @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
                 '_get_providers_in_tree')
     @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
@@ -1965,6 +2126,15 @@ class TestProviderOperations(SchedulerReportClientTestCase):
         self.assertEqual(set(aggs),
                          self.client._provider_tree.data(uuids.rp).aggregates)
 
+    def test_set_aggregates_for_provider_no_change(self):
+        aggs = [uuids.agg1, uuids.agg2]
+        self.client._provider_tree.new_root('rp', uuids.rp, 0)
+        self.client._provider_tree.update_aggregates(uuids.rp, aggs)
+
+        self.client.set_aggregates_for_provider(self.context, uuids.rp, aggs)
+
+        self.ks_adap_mock.put.assert_not_called()
+
     def test_set_aggregates_for_provider_fail(self):
         self.ks_adap_mock.put.return_value = mock.Mock(status_code=503)
         self.assertRaises(
@@ -14,6 +14,7 @@ import mock
 
 from nova import objects
 from nova.scheduler.filters import disk_filter
+from nova.scheduler.filters import utils
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -109,3 +110,42 @@ class TestDiskFilter(test.NoDBTestCase):
 
         agg_mock.return_value = set(['2'])
         self.assertTrue(filt_cls.host_passes(host, spec_obj))
+
+    def test_disk_filter_batch(self):
+        filt_cls = disk_filter.DiskFilter()
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(root_gb=3, ephemeral_gb=3, swap=1024))
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                {'free_disk_mb': 1 * 1024, 'total_usable_disk_gb': 12,
+                 'disk_allocation_ratio': 10.0}),
+            fakes.FakeHostState('host2', 'node2',
+                {'free_disk_mb': 1 * 1024, 'total_usable_disk_gb': 12,
+                 'disk_allocation_ratio': 1.0}),
+            fakes.FakeHostState('host3', 'node3',
+                {'free_disk_mb': 6 * 1024, 'total_usable_disk_gb': 6,
+                 'disk_allocation_ratio': 10.0})]
+        passes = filt_cls.filter_all_batch(
+            utils.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([True, False, False], list(passes))
+        self.assertEqual([{'disk_gb': 12 * 10.0}, {}, {}],
+                         [host.limits for host in hosts])
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_aggregate_disk_filter_batch(self, agg_mock):
+        filt_cls = disk_filter.AggregateDiskFilter()
+        spec_obj = objects.RequestSpec(
+            context=mock.sentinel.ctx,
+            flavor=objects.Flavor(root_gb=3, ephemeral_gb=3, swap=1024))
+        hosts = [
+            fakes.FakeHostState('host%s' % i, 'node%s' % i,
+                {'free_disk_mb': 1 * 1024, 'total_usable_disk_gb': 12,
+                 'disk_allocation_ratio': 1.0})
+            for i in range(2)]
+        agg_mock.side_effect = [set(['10']), set([])]
+        passes = filt_cls.filter_all_batch(
+            utils.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([True, False], list(passes))
+        agg_mock.assert_has_calls([
+            mock.call(hosts[0], 'disk_allocation_ratio'),
+            mock.call(hosts[1], 'disk_allocation_ratio')])
@@ -12,6 +12,7 @@
 
 from nova import objects
 from nova.scheduler.filters import exact_core_filter
+from nova.scheduler.filters import utils
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -46,3 +47,19 @@ class TestExactCoreFilter(test.NoDBTestCase):
 
     def _get_host(self, host_attributes):
         return fakes.FakeHostState('host1', 'node1', host_attributes)
+
+    def test_exact_core_filter_batch(self):
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(vcpus=1))
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                                {'vcpus_total': 3, 'vcpus_used': 2}),
+            fakes.FakeHostState('host2', 'node2',
+                                {'vcpus_total': 3, 'vcpus_used': 1}),
+            fakes.FakeHostState('host3', 'node3',
+                                {'vcpus_total': 0, 'vcpus_used': 0})]
+        passes = self.filt_cls.filter_all_batch(
+            utils.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([True, False, False], list(passes))
+        self.assertEqual([{'vcpu': 3}, {}, {}],
+                         [host.limits for host in hosts])
@@ -12,6 +12,7 @@
 
 from nova import objects
 from nova.scheduler.filters import exact_disk_filter
+from nova.scheduler.filters import utils
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -40,3 +41,17 @@ class TestExactDiskFilter(test.NoDBTestCase):
 
     def _get_host(self, host_attributes):
         return fakes.FakeHostState('host1', 'node1', host_attributes)
+
+    def test_exact_disk_filter_batch(self):
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(root_gb=1, ephemeral_gb=1, swap=1024))
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                {'free_disk_mb': 3 * 1024, 'total_usable_disk_gb': 4}),
+            fakes.FakeHostState('host2', 'node2',
+                {'free_disk_mb': 2 * 1024, 'total_usable_disk_gb': 4})]
+        passes = self.filt_cls.filter_all_batch(
+            utils.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([True, False], list(passes))
+        self.assertEqual([{'disk_gb': 4}, {}],
+                         [host.limits for host in hosts])
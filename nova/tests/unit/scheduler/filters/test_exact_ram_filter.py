@@ -12,6 +12,7 @@
 
 from nova import objects
 from nova.scheduler.filters import exact_ram_filter
+from nova.scheduler.filters import utils
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -40,3 +41,17 @@ class TestRamFilter(test.NoDBTestCase):
 
     def _get_host(self, host_attributes):
         return fakes.FakeHostState('host1', 'node1', host_attributes)
+
+    def test_exact_ram_filter_batch(self):
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(memory_mb=1024))
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                {'free_ram_mb': 1024, 'total_usable_ram_mb': 2048}),
+            fakes.FakeHostState('host2', 'node2',
+                {'free_ram_mb': 2048, 'total_usable_ram_mb': 2048})]
+        passes = self.filt_cls.filter_all_batch(
+            utils.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([True, False], list(passes))
+        self.assertEqual([{'memory_mb': 2048}, {}],
+                         [host.limits for host in hosts])
@@ -15,6 +15,7 @@ import mock
 
 from nova import objects
 from nova.scheduler.filters import io_ops_filter
+from nova.scheduler.filters import utils
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -60,3 +61,27 @@ class TestIoOpsFilter(test.NoDBTestCase):
         spec_obj = objects.RequestSpec(context=mock.sentinel.ctx)
         self.assertTrue(self.filt_cls.host_passes(host, spec_obj))
         agg_mock.assert_called_once_with(host, 'max_io_ops_per_host')
+
+    def test_filter_num_iops_batch(self):
+        self.flags(max_io_ops_per_host=8, group='filter_scheduler')
+        self.filt_cls = io_ops_filter.IoOpsFilter()
+        hosts = [fakes.FakeHostState('host%s' % i, 'node%s' % i,
+                                     {'num_io_ops': i + 6})
+                 for i in range(4)]
+        spec_obj = objects.RequestSpec()
+        passes = self.filt_cls.filter_all_batch(
+            utils.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([True, True, False, False], list(passes))
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_aggregate_filter_num_iops_batch(self, agg_mock):
+        self.flags(max_io_ops_per_host=7, group='filter_scheduler')
+        self.filt_cls = io_ops_filter.AggregateIoOpsFilter()
+        hosts = [fakes.FakeHostState('host%s' % i, 'node%s' % i,
+                                     {'num_io_ops': 7})
+                 for i in range(2)]
+        spec_obj = objects.RequestSpec(context=mock.sentinel.ctx)
+        agg_mock.side_effect = [set(['8']), set([])]
+        passes = self.filt_cls.filter_all_batch(
+            utils.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([True, False], list(passes))
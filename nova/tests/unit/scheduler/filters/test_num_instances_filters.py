@@ -14,6 +14,7 @@ import mock
 
 from nova import objects
 from nova.scheduler.filters import num_instances_filter
+from nova.scheduler.filters import utils
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -60,3 +61,27 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         agg_mock.return_value = set(['XXX'])
         self.assertTrue(self.filt_cls.host_passes(host, spec_obj))
         agg_mock.assert_called_once_with(host, 'max_instances_per_host')
+
+    def test_filter_num_instances_batch(self):
+        self.flags(max_instances_per_host=5, group='filter_scheduler')
+        self.filt_cls = num_instances_filter.NumInstancesFilter()
+        hosts = [fakes.FakeHostState('host%s' % i, 'node%s' % i,
+                                     {'num_instances': i + 3})
+                 for i in range(4)]
+        spec_obj = objects.RequestSpec()
+        passes = self.filt_cls.filter_all_batch(
+            utils.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([True, True, False, False], list(passes))
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_filter_aggregate_num_instances_batch(self, agg_mock):
+        self.flags(max_instances_per_host=4, group='filter_scheduler')
+        self.filt_cls = num_instances_filter.AggregateNumInstancesFilter()
+        hosts = [fakes.FakeHostState('host%s' % i, 'node%s' % i,
+                                     {'num_instances': 5})
+                 for i in range(2)]
+        spec_obj = objects.RequestSpec(context=mock.sentinel.ctx)
+        agg_mock.side_effect = [set(['6']), set([])]
+        passes = self.filt_cls.filter_all_batch(
+            utils.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([True, False], list(passes))
@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
+
 from nova import objects
 from nova.scheduler.filters import utils
 from nova import test
@@ -106,3 +108,66 @@ class TestUtils(test.NoDBTestCase):
         self.assertTrue(utils.instance_uuids_overlap(host_state,
                                                      [uuids.instance_1]))
         self.assertFalse(utils.instance_uuids_overlap(host_state, ['zz']))
+
+
+class TestHostStateColumns(test.NoDBTestCase):
+    def setUp(self):
+        super(TestHostStateColumns, self).setUp()
+        self.hosts = [
+            fakes.FakeHostState('host%s' % i, 'node%s' % i,
+                                {'free_ram_mb': 512 * i})
+            for i in range(1, 5)]
+        self.columns = utils.HostStateColumns(self.hosts)
+
+    def test_get(self):
+        self.assertEqual([512, 1024, 1536, 2048],
+                         self.columns.get('free_ram_mb').tolist())
+        # Unset fields can't be turned into arrays
+        self.assertIsNone(self.columns.get('ram_allocation_ratio'))
+
+    def test_get_cached(self):
+        self.columns.get('free_ram_mb')
+        self.hosts[0].free_ram_mb = 0
+        self.assertEqual(512, self.columns.get('free_ram_mb')[0])
+
+    def test_evaluate(self):
+        self.assertEqual(
+            [1, 2, 3, 4],
+            self.columns.evaluate(lambda h: int(h.host[-1])).tolist())
+        self.assertIsNone(self.columns.evaluate(lambda h: None))
+        # Non-numeric values can't be turned into arrays either
+        self.assertIsNone(self.columns.evaluate(lambda h: h.host))
+
+    def test_compress(self):
+        self.columns.get('free_ram_mb')
+        columns = self.columns.compress([True, False, False, True])
+        self.assertEqual([self.hosts[0], self.hosts[3]], columns.objs)
+        self.assertEqual([512, 2048], columns.get('free_ram_mb').tolist())
+
+    def test_select(self):
+        self.columns.get('free_ram_mb')
+        columns = self.columns.select([self.hosts[2], self.hosts[1]])
+        self.assertEqual([self.hosts[2], self.hosts[1]], columns.objs)
+        self.assertEqual([1536, 1024], columns.get('free_ram_mb').tolist())
+
+    def test_select_unknown_host(self):
+        other = fakes.FakeHostState('other', 'node', {'free_ram_mb': 42})
+        columns = self.columns.select([self.hosts[0], other])
+        self.assertEqual([512, 42], columns.get('free_ram_mb').tolist())
+
+    def test_set_limits(self):
+        self.columns.set_limits('memory_mb', 1024.0,
+                                [False, True, False, False])
+        self.columns.set_limits('disk_gb', [1, 2, 3, 4],
+                                [True, False, False, True])
+        self.assertEqual([{'disk_gb': 1}, {'memory_mb': 1024.0}, {},
+                          {'disk_gb': 4}],
+                         [host.limits for host in self.hosts])
+
+    def test_columns_supported(self):
+        # NumPy is a test requirement, so that the batch filters are tested.
+        self.assertTrue(utils.columns_supported())
+
+    @mock.patch.object(utils, 'np', None)
+    def test_columns_not_supported(self):
+        self.assertFalse(utils.columns_supported())
@@ -103,7 +103,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         mock_get_all_states.assert_called_once_with(
             ctx.elevated.return_value, spec_obj,
             mock.sentinel.provider_summaries)
-        mock_get_hosts.assert_called_once_with(spec_obj, all_host_states, 0)
+        mock_get_hosts.assert_called_once_with(spec_obj, all_host_states, 0,
+                                               limit=None)
 
         self.assertEqual(len(selected_hosts), 1)
         self.assertEqual(expected_hosts, selected_hosts)
@@ -152,7 +153,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         mock_get_all_states.assert_called_once_with(
             ctx.elevated.return_value, spec_obj,
             mock.sentinel.provider_summaries)
-        mock_get_hosts.assert_called_once_with(spec_obj, all_host_states, 0)
+        mock_get_hosts.assert_called_once_with(spec_obj, all_host_states, 0,
+                                               limit=None)
 
         self.assertEqual(len(selected_hosts), 1)
         expected_host = objects.Selection.from_host_state(host_state)
@@ -272,7 +274,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         mock_get_all_states.assert_called_once_with(
             ctx.elevated.return_value, spec_obj,
             mock.sentinel.provider_summaries)
-        mock_get_hosts.assert_called_once_with(spec_obj, all_host_states, 0)
+        mock_get_hosts.assert_called_once_with(spec_obj, all_host_states, 0,
+                                               limit=None)
         mock_claim.assert_called_once_with(ctx.elevated.return_value,
                 self.placement_client, spec_obj, uuids.instance,
                 alloc_reqs_by_rp_uuid[uuids.cn1][0],
@@ -332,6 +335,291 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         # Ensure we cleaned up the first successfully-claimed instance
         mock_cleanup.assert_called_once_with(ctx, [uuids.instance1])
 
+    @mock.patch('nova.scheduler.utils.claim_resources')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_all_host_states')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_sorted_hosts')
+    def test_schedule_claim_fails_on_best_hosts(self, mock_get_hosts,
+            mock_get_all_states, mock_claim):
+        """Tests that the hosts following the best ones are only sorted when
+        none of the best hosts can be claimed against.
+        """
+        spec_obj = objects.RequestSpec(
+            num_instances=2,
+            flavor=objects.Flavor(memory_mb=512,
+                                  root_gb=512,
+                                  ephemeral_gb=0,
+                                  swap=0,
+                                  vcpus=1),
+            project_id=uuids.project_id,
+            instance_group=None)
+
+        hs1 = mock.Mock(spec=host_manager.HostState, host='host1',
+                nodename="node1", limits={}, uuid=uuids.cn1,
+                cell_uuid=uuids.cell1)
+        hs2 = mock.Mock(spec=host_manager.HostState, host='host2',
+                nodename="node2", limits={}, uuid=uuids.cn2,
+                cell_uuid=uuids.cell1)
+        hs3 = mock.Mock(spec=host_manager.HostState, host='host3',
+                nodename="node3", limits={}, uuid=uuids.cn3,
+                cell_uuid=uuids.cell1)
+        all_host_states = [hs1, hs2, hs3]
+        mock_get_all_states.return_value = all_host_states
+        # Only host1 is sorted for the first instance, then all of the hosts
+        # are for the second one and again before picking alternates.
+        mock_get_hosts.side_effect = ([hs1, hs2, hs3], [hs3, hs1, hs2],
+                                      [hs3, hs1, hs2])
+        weighed_hosts = [weights.WeighedHost(hs1, 1.0),
+                         weights.WeighedHost(hs3, 0.5),
+                         weights.WeighedHost(hs2, 0.0)]
+        # The claim of the first instance fails on host1.
+        mock_claim.side_effect = [False, True, True]
+
+        alloc_reqs_by_rp_uuid = {
+            uuids.cn1: [{"allocations": "fake_cn1_alloc"}],
+            uuids.cn2: [{"allocations": "fake_cn2_alloc"}],
+            uuids.cn3: [{"allocations": "fake_cn3_alloc"}],
+        }
+        instance_uuids = [uuids.instance0, uuids.instance1]
+        ctx = mock.Mock()
+        with mock.patch.object(self.driver.host_manager, 'get_weighed_hosts',
+                               return_value=weighed_hosts) as mock_weighed:
+            selections = self.driver._schedule(ctx, spec_obj, instance_uuids,
+                alloc_reqs_by_rp_uuid, mock.sentinel.provider_summaries)
+
+        mock_weighed.assert_called_once_with([hs1, hs2, hs3], spec_obj)
+        elevated = ctx.elevated.return_value
+        mock_claim.assert_has_calls([
+            mock.call(elevated, self.placement_client, spec_obj,
+                      uuids.instance0, {"allocations": "fake_cn1_alloc"},
+                      allocation_request_version=None),
+            mock.call(elevated, self.placement_client, spec_obj,
+                      uuids.instance0, {"allocations": "fake_cn3_alloc"},
+                      allocation_request_version=None),
+            mock.call(elevated, self.placement_client, spec_obj,
+                      uuids.instance1, {"allocations": "fake_cn3_alloc"},
+                      allocation_request_version=None),
+        ])
+        mock_get_hosts.assert_has_calls([
+            mock.call(spec_obj, all_host_states, 0, limit=1),
+            mock.call(spec_obj, [hs1, hs2, hs3], 1, limit=None),
+        ])
+        self.assertEqual([hs3.host, hs3.host],
+                         [sel[0].service_host for sel in selections])
+
+    @mock.patch('nova.scheduler.utils.claim_resources')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_all_host_states')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_sorted_hosts')
+    def test_schedule_batch_claims(self, mock_get_hosts, mock_get_all_states,
+                                   mock_claim):
+        self.flags(batch_claims=True, group='filter_scheduler')
+        spec_obj = objects.RequestSpec(
+            num_instances=2,
+            flavor=objects.Flavor(memory_mb=512,
+                                  root_gb=512,
+                                  ephemeral_gb=0,
+                                  swap=0,
+                                  vcpus=1),
+            project_id=uuids.project_id,
+            instance_group=None)
+
+        hs1 = mock.Mock(spec=host_manager.HostState, host='host1',
+                nodename="node1", limits={}, uuid=uuids.cn1,
+                cell_uuid=uuids.cell1, updated='fake')
+        hs2 = mock.Mock(spec=host_manager.HostState, host='host2',
+                nodename="node2", limits={}, uuid=uuids.cn2,
+                cell_uuid=uuids.cell1, updated='fake')
+        hs3 = mock.Mock(spec=host_manager.HostState, host='host3',
+                nodename="node3", limits={}, uuid=uuids.cn3,
+                cell_uuid=uuids.cell1, updated='fake')
+        all_host_states = [hs1, hs2, hs3]
+        mock_get_all_states.return_value = all_host_states
+        # host3 has no allocation request so it is skipped, which makes the
+        # hosts following the best one be sorted for the first instance.
+        mock_get_hosts.side_effect = ([hs3, hs1, hs2], [hs2, hs1, hs3],
+                                      [hs1, hs2, hs3])
+        weighed_hosts = [weights.WeighedHost(hs3, 1.0),
+                         weights.WeighedHost(hs1, 0.5),
+                         weights.WeighedHost(hs2, 0.0)]
+        alloc_reqs_by_rp_uuid = {
+            uuids.cn1: [{"allocations": "fake_cn1_alloc"}],
+            uuids.cn2: [{"allocations": "fake_cn2_alloc"}],
+        }
+        instance_uuids = [uuids.instance0, uuids.instance1]
+        self.placement_client.claim_resources_batch.return_value = True
+        ctx = mock.Mock()
+        with mock.patch.object(self.driver.host_manager, 'get_weighed_hosts',
+                               return_value=weighed_hosts) as mock_weighed:
+            selections = self.driver._schedule(ctx, spec_obj, instance_uuids,
+                alloc_reqs_by_rp_uuid, mock.sentinel.provider_summaries,
+                fake_alloc_version, return_alternates=True)
+
+        mock_weighed.assert_called_once_with([hs3, hs1, hs2], spec_obj)
+        self.placement_client.claim_resources_batch.assert_called_once_with(
+            ctx.elevated.return_value,
+            {uuids.instance0: alloc_reqs_by_rp_uuid[uuids.cn1][0],
+             uuids.instance1: alloc_reqs_by_rp_uuid[uuids.cn2][0]},
+            uuids.project_id, ctx.elevated.return_value.user_id,
+            allocation_request_version=fake_alloc_version)
+        mock_get_hosts.assert_has_calls([
+            mock.call(spec_obj, all_host_states, 0, limit=1),
+            mock.call(spec_obj, [hs3, hs1, hs2], 1, limit=None),
+            mock.call(spec_obj, [hs2, hs1, hs3], 1),
+        ])
+        mock_claim.assert_not_called()
+        self.assertEqual([hs1.host, hs2.host],
+                         [sel[0].service_host for sel in selections])
+        hs1.consume_from_request.assert_called_once_with(mock.ANY)
+        hs2.consume_from_request.assert_called_once_with(mock.ANY)
+
+    @mock.patch('nova.scheduler.utils.claim_resources')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_all_host_states')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_sorted_hosts')
+    def test_schedule_batch_claims_fallback_anti_affinity(self,
+            mock_get_hosts, mock_get_all_states, mock_claim):
+        """Tests that when the batch claim fails, the selections are undone
+        and the hosts are filtered again for each instance, so that the
+        anti-affinity of the instance group holds.
+        """
+        self.flags(batch_claims=True, group='filter_scheduler')
+        ig = objects.InstanceGroup(hosts=[], policies=['anti-affinity'])
+        spec_obj = objects.RequestSpec(
+            num_instances=2,
+            flavor=objects.Flavor(memory_mb=512,
+                                  root_gb=512,
+                                  ephemeral_gb=0,
+                                  swap=0,
+                                  vcpus=1),
+            project_id=uuids.project_id,
+            instance_group=ig)
+
+        hs1 = mock.Mock(spec=host_manager.HostState, host='host1',
+                nodename="node1", limits={}, uuid=uuids.cn1,
+                cell_uuid=uuids.cell1, updated='fake')
+        hs2 = mock.Mock(spec=host_manager.HostState, host='host2',
+                nodename="node2", limits={}, uuid=uuids.cn2,
+                cell_uuid=uuids.cell1, updated='fake')
+        hs3 = mock.Mock(spec=host_manager.HostState, host='host3',
+                nodename="node3", limits={}, uuid=uuids.cn3,
+                cell_uuid=uuids.cell1, updated='fake')
+        all_host_states = [hs1, hs2, hs3]
+        mock_get_all_states.return_value = all_host_states
+
+        # Act as the anti-affinity filter does, dropping the hosts of the
+        # instance group for the second instance, and record those hosts.
+        sorted_hosts = iter([
+            # The batch selects host1 then host2.
+            [hs1, hs2, hs3], [hs2, hs3],
+            # The claim on host2 fails, then host3 and host1 are claimed.
+            [hs2, hs1, hs3], [hs1, hs2],
+            # The alternates.
+            [hs2],
+        ])
+        group_hosts = []
+
+        def fake_get_sorted_hosts(spec_obj, hosts, index, limit=None):
+            group_hosts.append(list(ig.hosts))
+            return next(sorted_hosts)
+
+        mock_get_hosts.side_effect = fake_get_sorted_hosts
+        weighed_hosts = [weights.WeighedHost(hs2, 1.0),
+                         weights.WeighedHost(hs3, 0.5),
+                         weights.WeighedHost(hs1, 0.0)]
+        mock_claim.side_effect = [False, True, True]
+
+        alloc_reqs_by_rp_uuid = {
+            uuids.cn1: [{"allocations": "fake_cn1_alloc"}],
+            uuids.cn2: [{"allocations": "fake_cn2_alloc"}],
+            uuids.cn3: [{"allocations": "fake_cn3_alloc"}],
+        }
+        instance_uuids = [uuids.instance0, uuids.instance1]
+        self.placement_client.claim_resources_batch.return_value = False
+        ctx = mock.Mock()
+        with mock.patch.object(self.driver.host_manager, 'get_weighed_hosts',
+                               return_value=weighed_hosts):
+            selections = self.driver._schedule(ctx, spec_obj, instance_uuids,
+                alloc_reqs_by_rp_uuid, mock.sentinel.provider_summaries,
+                fake_alloc_version, return_alternates=True)
+
+        elevated = ctx.elevated.return_value
+        self.placement_client.claim_resources_batch.assert_called_once_with(
+            elevated,
+            {uuids.instance0: alloc_reqs_by_rp_uuid[uuids.cn1][0],
+             uuids.instance1: alloc_reqs_by_rp_uuid[uuids.cn2][0]},
+            uuids.project_id, elevated.user_id,
+            allocation_request_version=fake_alloc_version)
+        # The host states are fetched again and filtered from scratch, with
+        # the hosts selected by the batch removed from the instance group.
+        self.assertEqual(2, mock_get_all_states.call_count)
+        mock_get_all_states.assert_called_with(elevated, spec_obj,
+            mock.sentinel.provider_summaries)
+        mock_get_hosts.assert_has_calls([
+            mock.call(spec_obj, all_host_states, 0, limit=1),
+            mock.call(spec_obj, [hs2, hs1, hs3], 1, limit=None),
+        ])
+        self.assertEqual([[], ['host1'], [], ['host3'], ['host3', 'host1']],
+                         group_hosts)
+        mock_claim.assert_has_calls([
+            mock.call(elevated, self.placement_client, spec_obj,
+                      uuids.instance0, {"allocations": "fake_cn2_alloc"},
+                      allocation_request_version=fake_alloc_version),
+            mock.call(elevated, self.placement_client, spec_obj,
+                      uuids.instance0, {"allocations": "fake_cn3_alloc"},
+                      allocation_request_version=fake_alloc_version),
+            mock.call(elevated, self.placement_client, spec_obj,
+                      uuids.instance1, {"allocations": "fake_cn1_alloc"},
+                      allocation_request_version=fake_alloc_version),
+        ])
+        self.assertEqual([hs3.host, hs1.host],
+                         [sel[0].service_host for sel in selections])
+        self.assertEqual(['host3', 'host1'], ig.hosts)
+        self.assertEqual({}, ig.obj_get_changes())
+        # The host states selected by the batch are to be refreshed.
+        self.assertIsNone(hs1.updated)
+        self.assertIsNone(hs2.updated)
+        self.assertEqual('fake', hs3.updated)
+
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_cleanup_allocations')
+    @mock.patch('nova.scheduler.utils.claim_resources')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_all_host_states')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_sorted_hosts')
+    def test_schedule_batch_claims_not_enough_hosts(self, mock_get_hosts,
+            mock_get_all_states, mock_claim, mock_cleanup):
+        self.flags(batch_claims=True, group='filter_scheduler')
+        spec_obj = objects.RequestSpec(
+            num_instances=2,
+            flavor=objects.Flavor(memory_mb=512,
+                                  root_gb=512,
+                                  ephemeral_gb=0,
+                                  swap=0,
+                                  vcpus=1),
+            project_id=uuids.project_id,
+            instance_group=None)
+        host_state = mock.Mock(spec=host_manager.HostState,
+                host="fake_host", nodename="fake_node", uuid=uuids.cn1,
+                cell_uuid=uuids.cell1, limits={}, updated='fake')
+        mock_get_all_states.return_value = [host_state]
+        mock_get_hosts.side_effect = [[host_state], []]
+
+        alloc_reqs_by_rp_uuid = {uuids.cn1: [fake_alloc]}
+        self.assertRaises(exception.NoValidHost, self.driver._schedule,
+                mock.Mock(), spec_obj, [uuids.instance1, uuids.instance2],
+                alloc_reqs_by_rp_uuid, mock.sentinel.provider_summaries)
+
+        # Nothing was claimed so there is nothing to clean up.
+        self.placement_client.claim_resources_batch.assert_not_called()
+        mock_claim.assert_not_called()
+        mock_cleanup.assert_not_called()
+        self.assertIsNone(host_state.updated)
+
     @mock.patch('nova.scheduler.utils.claim_resources')
     @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
                 '_get_all_host_states')
@@ -528,8 +816,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         # second time, we pass it the hosts that were returned from
         # _get_sorted_hosts() the first time
         sorted_host_calls = [
-            mock.call(spec_obj, all_host_states, 0),
-            mock.call(spec_obj, [hs2, hs1], 1),
+            mock.call(spec_obj, all_host_states, 0, limit=1),
+            mock.call(spec_obj, [hs2, hs1], 1, limit=None),
         ]
         mock_get_hosts.assert_has_calls(sorted_host_calls)
 
@@ -564,7 +852,7 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
             mock.sentinel.index)
 
         mock_weighed.assert_called_once_with(mock_filt.return_value,
-            mock.sentinel.spec)
+            mock.sentinel.spec, limit=None)
 
         # We override random.choice() to pick the **second** element of the
         # returned weighed hosts list, which is the host state #2. This tests
@@ -598,7 +886,7 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
             mock.sentinel.index)
 
         mock_weighed.assert_called_once_with(mock_filt.return_value,
-            mock.sentinel.spec)
+            mock.sentinel.spec, limit=None)
 
         # We should be randomly selecting only from a list of one host state
         mock_rand.assert_called_once_with([hs1])
@@ -630,7 +918,7 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
             mock.sentinel.index)
 
         mock_weighed.assert_called_once_with(mock_filt.return_value,
-            mock.sentinel.spec)
+            mock.sentinel.spec, limit=None)
 
         # We overrode random.choice() to return the first element in the list,
         # so even though we had a host_subset_size greater than the number of
@@ -668,7 +956,7 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
             mock.sentinel.index)
 
         mock_weighed.assert_called_once_with(mock_filt.return_value,
-            mock.sentinel.spec)
+            mock.sentinel.spec, limit=None)
 
         # We override random.shuffle() to reverse the list, thus the
         # head of the list should become [host#2, host#1]
@@ -120,6 +120,46 @@ class FiltersTestCase(test.NoDBTestCase):
         filt2_mock.filter_all.assert_called_once_with(filter_objs_second,
                                                       spec_obj)
 
+    def test_filter_all_batch(self):
+        self.assertIsNone(Filter1().filter_all_batch(mock.sentinel.columns,
+                                                     objects.RequestSpec()))
+
+    def test_get_filtered_objects_batch(self):
+        filter_objs_initial = ['initial', 'filter1', 'objects1']
+        filter_objs_second = ['second', 'filter2', 'objects2']
+        filter_objs_last = ['last', 'filter3', 'objects3']
+        spec_obj = objects.RequestSpec()
+        columns_initial = mock.Mock(objs=filter_objs_initial)
+        columns_second = mock.Mock(objs=filter_objs_second)
+        columns_last = mock.Mock(objs=filter_objs_last)
+        columns_initial.compress.return_value = columns_second
+        columns_second.select.return_value = columns_last
+
+        filt1_mock = mock.Mock(Filter1)
+        filt1_mock.run_filter_for_index.return_value = True
+        filt1_mock.filter_all_batch.return_value = mock.sentinel.passes
+        filt2_mock = mock.Mock(Filter2)
+        filt2_mock.run_filter_for_index.return_value = True
+        filt2_mock.filter_all_batch.return_value = None
+        filt2_mock.filter_all.return_value = iter(filter_objs_last)
+
+        filter_mocks = [filt1_mock, filt2_mock]
+        with mock.patch.object(self.filter_handler, 'get_columns',
+                               return_value=columns_initial) as get_columns:
+            result = self.filter_handler.get_filtered_objects(
+                filter_mocks, filter_objs_initial, spec_obj)
+        self.assertEqual(filter_objs_last, result)
+        get_columns.assert_called_once_with(filter_objs_initial)
+        filt1_mock.filter_all_batch.assert_called_once_with(columns_initial,
+                                                            spec_obj)
+        self.assertFalse(filt1_mock.filter_all.called)
+        columns_initial.compress.assert_called_once_with(mock.sentinel.passes)
+        filt2_mock.filter_all_batch.assert_called_once_with(columns_second,
+                                                            spec_obj)
+        filt2_mock.filter_all.assert_called_once_with(filter_objs_second,
+                                                      spec_obj)
+        columns_second.select.assert_called_once_with(filter_objs_last)
+
     def test_get_filtered_objects_for_index(self):
         """Test that we don't call a filter when its
         run_filter_for_index() method returns false
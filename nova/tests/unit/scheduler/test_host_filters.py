@@ -14,9 +14,14 @@
 """
 Tests For Scheduler Host Filters.
 """
+import mock
+
+from nova import objects
 from nova.scheduler import filters
 from nova.scheduler.filters import all_hosts_filter
 from nova.scheduler.filters import compute_filter
+from nova.scheduler.filters import ram_filter
+from nova.scheduler.filters import utils
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -35,3 +40,34 @@ class HostFiltersTestCase(test.NoDBTestCase):
         filt_cls = all_hosts_filter.AllHostsFilter()
         host = fakes.FakeHostState('host1', 'node1', {})
         self.assertTrue(filt_cls.host_passes(host, {}))
+
+    def test_host_filter_handler_get_columns(self):
+        filter_handler = filters.HostFilterHandler()
+        host = fakes.FakeHostState('host1', 'node1', {})
+        columns = filter_handler.get_columns([host])
+        self.assertIsInstance(columns, utils.HostStateColumns)
+        self.assertEqual([host], columns.objs)
+
+    @mock.patch.object(utils, 'columns_supported', return_value=False)
+    def test_host_filter_handler_get_columns_unsupported(self, mock_supp):
+        filter_handler = filters.HostFilterHandler()
+        host = fakes.FakeHostState('host1', 'node1', {})
+        self.assertIsNone(filter_handler.get_columns([host]))
+
+    def test_filter_all_batch_rebuild(self):
+        filt_cls = ram_filter.RamFilter()
+        spec_obj = objects.RequestSpec(
+            scheduler_hints={'_nova_check_type': ['rebuild']})
+        with mock.patch.object(filt_cls, 'host_passes_batch') as mock_batch:
+            self.assertIsNone(filt_cls.filter_all_batch(mock.sentinel.columns,
+                                                        spec_obj))
+        self.assertFalse(mock_batch.called)
+
+    def test_filter_all_batch(self):
+        filt_cls = ram_filter.RamFilter()
+        spec_obj = objects.RequestSpec()
+        with mock.patch.object(filt_cls, 'host_passes_batch') as mock_batch:
+            self.assertEqual(mock_batch.return_value,
+                             filt_cls.filter_all_batch(mock.sentinel.columns,
+                                                       spec_obj))
+        mock_batch.assert_called_once_with(mock.sentinel.columns, spec_obj)
@@ -22,6 +22,7 @@ import datetime
 
 import mock
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 from oslo_utils import versionutils
 import six
 
@@ -1153,6 +1154,147 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         self.assertEqual(0, num_hosts2)
 
 
+class HostManagerCachedHostStatesTestCase(test.NoDBTestCase):
+    """Test case for the HostManager host state cache."""
+
+    @mock.patch.object(host_manager.HostManager, '_init_instance_info')
+    @mock.patch.object(host_manager.HostManager, '_init_aggregates')
+    def setUp(self, mock_init_agg, mock_init_inst):
+        super(HostManagerCachedHostStatesTestCase, self).setUp()
+        self.flags(cache_host_states=True, group='filter_scheduler')
+        self.host_manager = host_manager.HostManager()
+        self.computes = []
+        for fake_compute in fakes.COMPUTE_NODES[:4]:
+            compute = fake_compute.obj_clone()
+            compute.deleted = False
+            self.computes.append(compute)
+        self.services = [
+            objects.Service(id=i, host=cn.host, disabled=False,
+                            deleted=False)
+            for i, cn in enumerate(self.computes)]
+        self.compute_uuids = [cn.uuid for cn in self.computes]
+        self.addCleanup(timeutils.clear_time_override)
+        timeutils.set_time_override()
+        patcher = mock.patch.object(self.host_manager,
+                                    '_get_instances_by_host',
+                                    return_value={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_host_states(self, compute_uuids=None):
+        return list(self.host_manager.get_host_states_by_uuids(
+            nova_context.get_admin_context(),
+            compute_uuids or self.compute_uuids,
+            objects.RequestSpec()))
+
+    @mock.patch('nova.objects.ServiceList.get_by_binary_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    def test_get_host_states_by_uuids_delta(self, mock_get_all,
+                                            mock_get_by_binary,
+                                            mock_get_changed,
+                                            mock_get_services_changed):
+        mock_get_all.return_value = self.computes
+        mock_get_by_binary.return_value = self.services
+        first_sync = timeutils.utcnow()
+
+        host_states = self._get_host_states(self.compute_uuids[:2])
+        self.assertEqual(['host1', 'host2'],
+                         [host_state.host for host_state in host_states])
+        self.assertEqual(512, host_states[0].free_ram_mb)
+        mock_get_all.assert_called_once_with(mock.ANY)
+        mock_get_changed.assert_not_called()
+
+        # Only the first compute node has changed since then
+        timeutils.advance_time_seconds(10)
+        updated = self.computes[0].obj_clone()
+        updated.free_ram_mb = 256
+        updated.updated_at = timeutils.utcnow()
+        mock_get_changed.return_value = [updated]
+        mock_get_services_changed.return_value = []
+
+        new_host_states = self._get_host_states()
+        self.assertEqual(4, len(new_host_states))
+        self.assertIs(host_states[0], new_host_states[0])
+        self.assertEqual(256, new_host_states[0].free_ram_mb)
+        mock_get_all.assert_called_once_with(mock.ANY)
+        changed_since = first_sync - datetime.timedelta(
+            seconds=host_manager.HOST_STATE_CACHE_SYNC_OVERLAP)
+        mock_get_changed.assert_called_once_with(mock.ANY, changed_since)
+        mock_get_services_changed.assert_called_once_with(
+            mock.ANY, 'nova-compute', changed_since)
+
+    @mock.patch('nova.objects.ServiceList.get_by_binary_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    def test_get_host_states_by_uuids_delta_deleted(
+            self, mock_get_all, mock_get_by_binary, mock_get_changed,
+            mock_get_services_changed):
+        mock_get_all.return_value = self.computes
+        mock_get_by_binary.return_value = self.services
+        self.assertEqual(4, len(self._get_host_states()))
+
+        deleted_compute = self.computes[0].obj_clone()
+        deleted_compute.deleted = True
+        deleted_service = self.services[1].obj_clone()
+        deleted_service.deleted = True
+        # A deleted service record for a host which has a newer one must not
+        # evict the newer one.
+        old_service = objects.Service(id=42, host='host3', disabled=False,
+                                      deleted=True)
+        mock_get_changed.return_value = [deleted_compute]
+        mock_get_services_changed.return_value = [deleted_service,
+                                                  old_service]
+
+        host_states = self._get_host_states()
+        self.assertEqual(['host3', 'host4'],
+                         [host_state.host for host_state in host_states])
+        self.assertNotIn(self.computes[0].uuid,
+                         self.host_manager._host_state_cache)
+
+    @mock.patch('nova.objects.ServiceList.get_by_binary_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    def test_get_host_states_by_uuids_full_refresh(
+            self, mock_get_all, mock_get_by_binary, mock_get_changed,
+            mock_get_services_changed):
+        self.flags(host_state_cache_full_refresh_interval=60,
+                   group='filter_scheduler')
+        mock_get_all.side_effect = [self.computes, self.computes[1:]]
+        mock_get_by_binary.return_value = self.services
+        self.assertEqual(4, len(self._get_host_states()))
+
+        timeutils.advance_time_seconds(61)
+        self.assertEqual(3, len(self._get_host_states()))
+        self.assertEqual(2, mock_get_all.call_count)
+        mock_get_changed.assert_not_called()
+        mock_get_services_changed.assert_not_called()
+
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    def test_get_host_states_by_uuids_no_service(self, mock_get_all,
+                                                 mock_get_by_binary):
+        mock_get_all.return_value = self.computes
+        mock_get_by_binary.return_value = self.services[1:]
+        host_states = self._get_host_states()
+        self.assertEqual(['host2', 'host3', 'host4'],
+                         [host_state.host for host_state in host_states])
+
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    def test_refresh_cells_caches_resets_host_states(self, mock_get_all,
+                                                     mock_get_by_binary):
+        mock_get_all.return_value = self.computes
+        mock_get_by_binary.return_value = self.services
+        self._get_host_states()
+        self.host_manager.refresh_cells_caches()
+        self.assertEqual({}, self.host_manager._host_state_cache)
+        self.assertEqual({}, self.host_manager._host_state_cache_synced)
+
+
 class HostStateTestCase(test.NoDBTestCase):
     """Test case for HostState class."""
 
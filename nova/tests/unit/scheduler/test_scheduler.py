@@ -28,6 +28,7 @@ from nova.scheduler import filter_scheduler
 from nova.scheduler import host_manager
 from nova.scheduler import ironic_host_manager
 from nova.scheduler import manager
+from nova.scheduler import timing
 from nova import servicegroup
 from nova import test
 from nova.tests.unit import fake_server_actions
@@ -248,6 +249,68 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
             mock_get_ac.assert_called_once_with(
                 self.context, mock_rfrs.return_value)
 
+    @mock.patch('nova.scheduler.utils.resources_from_request_spec')
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                'get_allocation_candidates')
+    def test_select_destination_timing_metrics(self, mock_get_ac,
+                                               mock_rfrs):
+        self.flags(timing_metrics=True, group='scheduler')
+        fake_spec = objects.RequestSpec()
+        mock_get_ac.return_value = (fakes.ALLOC_REQS, mock.sentinel.p_sums,
+                                    "42.0")
+
+        def fake_select_destinations(*args):
+            with timing.timed('fake_phase'):
+                pass
+            timing.count('fake_event')
+            return []
+
+        with test.nested(
+            mock.patch.object(self.manager.driver, 'select_destinations',
+                              side_effect=fake_select_destinations),
+            mock.patch.object(manager.LOG, 'info'),
+        ) as (select_destinations, mock_log):
+            self.manager.select_destinations(self.context, spec_obj=fake_spec,
+                    instance_uuids=[uuids.instance])
+
+        mock_log.assert_called_once_with(mock.ANY, mock.ANY)
+        log_args = mock_log.call_args[0][1]
+        self.assertEqual([uuids.instance], log_args['uuids'])
+        timings = log_args['timings']
+        self.assertEqual(['fake_phase', 'placement.allocation_candidates'],
+                         sorted(timings['phases']))
+        self.assertEqual(1, timings['phases']['fake_phase']['count'])
+        self.assertEqual({'fake_event': 1}, timings['counters'])
+        self.assertNotIn('trace', log_args)
+        # The request is not timed anymore once it returned.
+        self.assertIsNone(timing.current())
+
+    @mock.patch('nova.scheduler.utils.resources_from_request_spec')
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                'get_allocation_candidates', return_value=None)
+    def test_select_destination_timing_trace(self, mock_get_ac, mock_rfrs):
+        self.flags(timing_trace=True, group='scheduler')
+        fake_spec = objects.RequestSpec()
+        with mock.patch.object(manager.LOG, 'info') as mock_log:
+            self.assertRaises(messaging.rpc.dispatcher.ExpectedException,
+                              self.manager.select_destinations, self.context,
+                              spec_obj=fake_spec,
+                              instance_uuids=[uuids.instance])
+
+        mock_log.assert_called_once_with(mock.ANY, mock.ANY)
+        self.assertIn('placement.allocation_candidates',
+                      mock_log.call_args[0][1]['trace'])
+        self.assertIsNone(timing.current())
+
+    def test_select_destination_not_timed(self):
+        with mock.patch.object(self.manager, '_select_destinations',
+                               return_value=[]):
+            with mock.patch.object(timing, 'start') as mock_start:
+                self.manager.select_destinations(
+                    self.context, spec_obj=objects.RequestSpec(),
+                    instance_uuids=[uuids.instance], return_objects=True)
+        mock_start.assert_not_called()
+
     # TODO(sbauza): Remove that test once the API v4 is removed
     @mock.patch('nova.scheduler.utils.resources_from_request_spec')
     @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
@@ -0,0 +1,82 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For Scheduler request timings.
+"""
+
+import mock
+
+from nova.scheduler import filters
+from nova.scheduler.filters import all_hosts_filter
+from nova.scheduler import timing
+from nova.scheduler import weights
+from nova.scheduler.weights import io_ops
+from nova import test
+from nova.tests.unit.scheduler import fakes
+
+
+class TimingTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(TimingTestCase, self).setUp()
+        self.addCleanup(timing.stop)
+
+    def test_not_timed(self):
+        self.assertIsNone(timing.current())
+        with timing.timed('phase'):
+            pass
+        timing.count('event')
+        self.assertIsNone(timing.stop())
+
+    @mock.patch('oslo_utils.timeutils.StopWatch.elapsed')
+    def test_timed(self, mock_elapsed):
+        mock_elapsed.side_effect = [0.5, 1.0, 1.5, 3.5, 4.0, 4.5]
+        timings = timing.start()
+        self.assertIs(timings, timing.current())
+
+        with timing.timed('phase1'):
+            pass
+        with timing.timed('phase2'):
+            pass
+        self.assertRaises(ValueError, self._raise_in_phase, 'phase1')
+        timing.count('event')
+        timing.count('event', 2)
+
+        self.assertIs(timings, timing.stop())
+        self.assertIsNone(timing.current())
+        self.assertEqual([('phase1', 0.5, 0.5), ('phase2', 1.5, 2.0),
+                          ('phase1', 4.0, 0.5)], timings.trace)
+        mock_elapsed.side_effect = [5.0]
+        self.assertEqual({'total': 5.0,
+                          'phases': {'phase1': {'count': 2, 'total': 1.0},
+                                     'phase2': {'count': 1, 'total': 2.0}},
+                          'counters': {'event': 3}},
+                         timings.to_dict())
+        self.assertEqual('   500.000    500.000 phase1\n'
+                         '  1500.000   2000.000 phase2\n'
+                         '  4000.000    500.000 phase1',
+                         timings.format_trace())
+
+    @staticmethod
+    def _raise_in_phase(phase):
+        with timing.timed(phase):
+            raise ValueError()
+
+    def test_host_filters_and_weighers_timed(self):
+        timings = timing.start()
+        hosts = [fakes.FakeHostState('host1', 'node1', {'num_io_ops': 1})]
+        hosts = filters.HostFilterHandler().get_filtered_objects(
+            [all_hosts_filter.AllHostsFilter()], hosts, None)
+        weights.HostWeightHandler().get_weighed_objects(
+            [io_ops.IoOpsWeigher()], hosts, {})
+        self.assertEqual(['filter.AllHostsFilter', 'weigher.IoOpsWeigher'],
+                         list(timings.phases))
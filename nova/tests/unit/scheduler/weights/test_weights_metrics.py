@@ -13,9 +13,12 @@
 Tests For Scheduler metrics weights.
 """
 
+import mock
+
 from nova import exception
 from nova.objects import fields
 from nova.objects import monitor_metric
+from nova.scheduler.filters import utils
 from nova.scheduler import weights
 from nova.scheduler.weights import metrics
 from nova import test
@@ -181,3 +184,24 @@ class MetricsWeigherTestCase(test.NoDBTestCase):
         self.flags(required=False, group='metrics')
         setting = [idle + '=0.0001', user + '=-1']
         self._do_test(setting, 1.0, 'host5')
+
+    def test_metric_not_found_non_required_batch(self):
+        self.flags(required=False, group='metrics')
+        self.flags(weight_setting=[idle + '=0.0001', user + '=-1'],
+                   group='metrics')
+        self.flags(weight_of_unavailable=-10000.0, group='metrics')
+        weigher = self.weighers[0]
+        weigher._parse_setting()
+        hostinfo_list = self._get_all_hosts()
+        weights = weigher.weigh_objects_batch(
+            utils.HostStateColumns(hostinfo_list), {})
+        self.assertEqual([-10000.0] * 4 + [768 * 0.0001 - 1,
+                                           2048 * 0.0001 - 2],
+                         weights.tolist())
+        self.assertEqual(-10000.0, weigher.minval)
+        self.assertEqual(768 * 0.0001 - 1, weigher.maxval)
+
+    def test_metric_not_found_required_batch(self):
+        weigher = self.weighers[0]
+        columns = mock.Mock(spec=utils.HostStateColumns)
+        self.assertIsNone(weigher.weigh_objects_batch(columns, {}))
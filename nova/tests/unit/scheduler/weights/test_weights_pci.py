@@ -19,6 +19,7 @@ import copy
 
 from nova import objects
 from nova.pci import stats
+from nova.scheduler.filters import utils
 from nova.scheduler import weights
 from nova.scheduler.weights import pci
 from nova import test
@@ -169,3 +170,17 @@ class PCIWeigherTestCase(test.NoDBTestCase):
         for weighed_host in weighed_hosts:
             # the weigher normalizes all weights to 0 if they're all equal
             self.assertEqual(0.0, weighed_host.weight)
+
+    def test_weigh_objects_batch(self):
+        hosts = [
+            ('host1', 'node1', [2, 2, 2]),  # 6 devs
+            ('host2', 'node2', [3, 1]),  # 4 devs
+            ('host3', 'node3', [500]),  # 500 devs
+            ('host4', 'node4', None),  # no PCI stats
+        ]
+        hostinfo_list = self._get_all_hosts(hosts)
+        spec_obj = objects.RequestSpec(pci_requests=None)
+
+        weights = self.weighers[0].weigh_objects_batch(
+            utils.HostStateColumns(hostinfo_list), spec_obj)
+        self.assertEqual([94, 96, 1, 100], weights.tolist())
@@ -12,9 +12,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
+import eventlet.event
 import mock
 from oslo_context import context as o_context
 from oslo_context import fixture as o_fixture
+from oslo_utils import timeutils
 
 from nova import context
 from nova import exception
@@ -329,6 +333,85 @@ class ContextTestCase(test.NoDBTestCase):
         mock_create_cm.assert_not_called()
         mock_create_tport.assert_not_called()
 
+    @mock.patch('nova.rpc.create_transport')
+    @mock.patch('nova.db.create_context_manager')
+    def test_target_cell_mapping_changed(self, mock_create_cm,
+                                         mock_create_tport):
+        mock_create_cm.side_effect = [mock.sentinel.db_conn_obj,
+                                      mock.sentinel.db_conn_obj2]
+        mock_create_tport.return_value = mock.sentinel.mq_conn_obj
+        ctxt = context.get_context()
+        mapping = objects.CellMapping(database_connection='fake://db',
+                                      transport_url='fake://mq',
+                                      uuid=uuids.cell)
+        with context.target_cell(ctxt, mapping) as cctxt:
+            self.assertEqual(mock.sentinel.db_conn_obj, cctxt.db_connection)
+
+        # A changed database connection is connected to anew.
+        mapping.database_connection = 'fake://db2'
+        with context.target_cell(ctxt, mapping) as cctxt:
+            self.assertEqual(mock.sentinel.db_conn_obj2, cctxt.db_connection)
+            self.assertEqual(mock.sentinel.mq_conn_obj, cctxt.mq_connection)
+        mock_create_cm.assert_has_calls([mock.call('fake://db'),
+                                         mock.call('fake://db2')])
+        self.assertEqual(2, mock_create_tport.call_count)
+
+    @mock.patch('nova.objects.CellMappingList.get_all')
+    def test_load_cells_cache_time(self, mock_get_all):
+        self.flags(cell_mappings_cache_time=60, group='api')
+        mapping1 = objects.CellMapping(uuid=uuids.cell1, name='cell1')
+        mapping2 = objects.CellMapping(uuid=uuids.cell2, name='cell2')
+        mock_get_all.side_effect = [[mapping1], [mapping1, mapping2]]
+
+        context.load_cells()
+        context.load_cells()
+        self.assertEqual([mapping1], context.CELLS)
+        self.assertEqual(1, mock_get_all.call_count)
+
+        context.CELLS_LOADED_AT = (
+            timeutils.utcnow() - datetime.timedelta(seconds=61))
+        context.load_cells()
+        self.assertEqual([mapping1, mapping2], context.CELLS)
+        self.assertEqual(2, mock_get_all.call_count)
+
+    @mock.patch('nova.objects.CellMappingList.get_all')
+    def test_load_cells_no_cache_time(self, mock_get_all):
+        mock_get_all.return_value = [
+            objects.CellMapping(uuid=uuids.cell1, name='cell1')]
+
+        context.load_cells()
+        context.CELLS_LOADED_AT = (
+            timeutils.utcnow() - datetime.timedelta(days=1))
+        context.load_cells()
+        mock_get_all.assert_called_once_with(mock.ANY)
+
+    @mock.patch('nova.context.LOG.warning')
+    @mock.patch('nova.context.target_cell')
+    @mock.patch('nova.objects.CellMappingList.get_all')
+    def test_warm_up_cells(self, mock_get_all, mock_target_cell,
+                           mock_log_warning):
+        mapping0 = objects.CellMapping(database_connection='fake://db0',
+                                       transport_url='none:///',
+                                       uuid=objects.CellMapping.CELL0_UUID)
+        mapping1 = objects.CellMapping(database_connection='fake://db1',
+                                       transport_url='fake://mq1',
+                                       uuid=uuids.cell1)
+        mock_get_all.return_value = objects.CellMappingList(
+            objects=[mapping0, mapping1])
+        cctxt = mock_target_cell.return_value.__enter__.return_value
+        get_engine = cctxt.db_connection.get_legacy_facade.return_value.\
+            get_engine
+        # The first cell cannot be reached, the second one is set up anyway.
+        get_engine.side_effect = [test.TestingException(), None]
+
+        context.warm_up_cells()
+
+        mock_target_cell.assert_has_calls([mock.call(mock.ANY, mapping0),
+                                           mock.call(mock.ANY, mapping1)],
+                                          any_order=True)
+        self.assertEqual(2, get_engine.call_count)
+        self.assertEqual(1, mock_log_warning.call_count)
+
     @mock.patch('nova.context.target_cell')
     @mock.patch('nova.objects.InstanceList.get_by_filters')
     def test_scatter_gather_cells(self, mock_get_inst, mock_target_cell):
@@ -419,6 +502,117 @@ class ContextTestCase(test.NoDBTestCase):
         self.assertIn(context.raised_exception_sentinel, results.values())
         self.assertTrue(mock_log_exception.called)
 
+    @mock.patch('nova.context.LOG.warning')
+    @mock.patch('eventlet.timeout.Timeout')
+    @mock.patch('eventlet.queue.LightQueue.get')
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
+    def test_scatter_gather_cells_skips_down_cell(self, mock_get_inst,
+                                                  mock_get_result,
+                                                  mock_timeout,
+                                                  mock_log_warning):
+        self.flags(cell_down_cooldown=60, group='api')
+        self.useFixture(nova_fixtures.SpawnIsSynchronousFixture())
+        ctxt = context.get_context()
+        mapping0 = objects.CellMapping(database_connection='fake://db0',
+                                       transport_url='none:///',
+                                       uuid=objects.CellMapping.CELL0_UUID)
+        mapping1 = objects.CellMapping(database_connection='fake://db1',
+                                       transport_url='fake://mq1',
+                                       uuid=uuids.cell1)
+        mappings = objects.CellMappingList(objects=[mapping0, mapping1])
+
+        # Simulate cell1 not responding.
+        mock_get_result.side_effect = [(mapping0.uuid,
+                                        mock.sentinel.instances),
+                                       exception.CellTimeout()]
+        results = context.scatter_gather_cells(
+            ctxt, mappings, 30, objects.InstanceList.get_by_filters)
+        self.assertEqual(context.did_not_respond_sentinel,
+                         results[uuids.cell1])
+        self.assertIn(uuids.cell1, context.CELL_TIMEOUTS)
+        self.assertEqual(2, mock_get_inst.call_count)
+
+        # cell1 is not called again while it is considered down.
+        mock_get_inst.reset_mock()
+        mock_get_result.side_effect = [(mapping0.uuid,
+                                        mock.sentinel.instances)]
+        results = context.scatter_gather_cells(
+            ctxt, mappings, 30, objects.InstanceList.get_by_filters)
+        self.assertEqual({mapping0.uuid: mock.sentinel.instances,
+                          uuids.cell1: context.did_not_respond_sentinel},
+                         results)
+        self.assertEqual(1, mock_get_inst.call_count)
+
+        # Once the cooldown has passed, cell1 is called again and is no
+        # longer considered down when it responds.
+        context.CELL_TIMEOUTS[uuids.cell1] = (
+            timeutils.utcnow() - datetime.timedelta(seconds=61))
+        mock_get_inst.reset_mock()
+        mock_get_result.side_effect = [
+            (mapping0.uuid, mock.sentinel.instances),
+            (mapping1.uuid, mock.sentinel.instances1)]
+        results = context.scatter_gather_cells(
+            ctxt, mappings, 30, objects.InstanceList.get_by_filters)
+        self.assertEqual({mapping0.uuid: mock.sentinel.instances,
+                          uuids.cell1: mock.sentinel.instances1},
+                         results)
+        self.assertEqual(2, mock_get_inst.call_count)
+        self.assertNotIn(uuids.cell1, context.CELL_TIMEOUTS)
+
+    @mock.patch('nova.context.target_cell')
+    def test_scatter_gather_cells_hedged(self, mock_target_cell):
+        self.flags(cell_hedge_delay=0.01, group='api')
+        ctxt = context.get_context()
+        mapping = objects.CellMapping(database_connection='fake://db',
+                                      transport_url='fake://mq',
+                                      uuid=uuids.cell)
+        mappings = objects.CellMappingList(objects=[mapping])
+        slow = eventlet.event.Event()
+        calls = []
+        finished = []
+
+        def fake_get(cctxt):
+            calls.append(cctxt)
+            call = len(calls)
+            if call == 1:
+                # The first call is slower than the hedged one.
+                slow.wait()
+            finished.append(call)
+            return call
+
+        results = context.scatter_gather_cells(ctxt, mappings, 30, fake_get)
+
+        self.assertEqual({uuids.cell: 2}, results)
+        self.assertEqual(2, len(calls))
+        self.assertNotIn(uuids.cell, context.CELL_TIMEOUTS)
+
+        # The slower call is not killed, it finishes and its result is
+        # discarded.
+        self.assertEqual([2], finished)
+        slow.send()
+        eventlet.sleep(0)
+        self.assertEqual([2, 1], finished)
+        self.assertEqual({uuids.cell: 2}, results)
+
+    @mock.patch('nova.context.target_cell')
+    def test_scatter_gather_cells_latencies(self, mock_target_cell):
+        self.useFixture(nova_fixtures.SpawnIsSynchronousFixture())
+        ctxt = context.get_context()
+        mapping = objects.CellMapping(database_connection='fake://db',
+                                      transport_url='fake://mq',
+                                      uuid=uuids.cell)
+        mappings = objects.CellMappingList(objects=[mapping])
+
+        context.scatter_gather_cells(ctxt, mappings, 30, mock.Mock())
+        context.scatter_gather_cells(ctxt, mappings, 30, mock.Mock())
+
+        latencies = context.get_cell_latencies()
+        self.assertEqual([uuids.cell], list(latencies))
+        bounds = [bound for bound, count in latencies[uuids.cell]]
+        self.assertEqual(list(context.CELL_LATENCY_BUCKETS) + [None], bounds)
+        self.assertEqual(2, sum(count
+                                for bound, count in latencies[uuids.cell]))
+
     @mock.patch('nova.context.scatter_gather_cells')
     @mock.patch('nova.objects.CellMappingList.get_all')
     def test_scatter_gather_all_cells(self, mock_get_all, mock_scatter):
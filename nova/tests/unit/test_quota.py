@@ -20,6 +20,7 @@ from six.moves import range
 
 from nova import compute
 from nova.compute import flavors
+from nova.compute import utils as compute_utils
 import nova.conf
 from nova import context
 from nova import db
@@ -2262,3 +2263,95 @@ class NoopQuotaDriverTestCase(test.TestCase):
                                                  quota.QUOTAS._resources,
                                                  'test_project')
         self.assertEqual(self.expected_settable_quotas, result)
+
+
+@mock.patch('nova.context.scatter_gather_all_cells')
+class InstancesCoresRamCountTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(InstancesCoresRamCountTestCase, self).setUp()
+        self.stub_out('nova.quota._COUNT_CACHE', None)
+        self.ctxt = context.RequestContext('fake-user', 'fake-project')
+        self.counts = {'project': {'instances': 2, 'cores': 4, 'ram': 1024},
+                       'user': {'instances': 1, 'cores': 2, 'ram': 512}}
+
+    def test_count_not_cached(self, mock_scatter):
+        mock_scatter.return_value = {'cell1': self.counts}
+        for i in range(2):
+            count = quota._instances_cores_ram_count(
+                self.ctxt, 'fake-project', user_id='fake-user')
+            self.assertEqual(self.counts, count)
+        self.assertEqual(2, mock_scatter.call_count)
+
+    def test_count_cached(self, mock_scatter):
+        self.flags(count_usage_cache_time=10, group='quota')
+        mock_scatter.return_value = {'cell1': self.counts}
+        count = quota._instances_cores_ram_count(
+            self.ctxt, 'fake-project', user_id='fake-user')
+        self.assertEqual(self.counts, count)
+        # Changing the returned counts must not change the cached ones.
+        count['project']['instances'] += 1
+
+        count = quota._instances_cores_ram_count(
+            self.ctxt, 'fake-project', user_id='fake-user')
+        self.assertEqual(self.counts, count)
+        mock_scatter.assert_called_once_with(
+            self.ctxt, objects.InstanceList.get_counts, 'fake-project',
+            user_id='fake-user')
+
+        # Counts are cached per project and user.
+        project_counts = {'project': self.counts['project']}
+        mock_scatter.return_value = {'cell1': project_counts}
+        count = quota._instances_cores_ram_count(self.ctxt, 'fake-project')
+        self.assertEqual(project_counts, count)
+        self.assertEqual(2, mock_scatter.call_count)
+
+    def test_count_cached_missing_cell(self, mock_scatter):
+        self.flags(count_usage_cache_time=10, group='quota')
+        mock_scatter.return_value = {
+            'cell1': self.counts,
+            'cell2': context.did_not_respond_sentinel}
+        for i in range(2):
+            count = quota._instances_cores_ram_count(
+                self.ctxt, 'fake-project', user_id='fake-user')
+            self.assertEqual(self.counts, count)
+        # Counts missing a cell are not cached.
+        self.assertEqual(2, mock_scatter.call_count)
+
+    def test_invalidate_count(self, mock_scatter):
+        self.flags(count_usage_cache_time=10, group='quota')
+        mock_scatter.return_value = {'cell1': self.counts}
+        quota._instances_cores_ram_count(self.ctxt, 'fake-project',
+                                         user_id='fake-user')
+        quota._instances_cores_ram_count(self.ctxt, 'fake-project')
+        self.assertEqual(1, mock_scatter.call_count)
+
+        # Another user of the project drops the project counts.
+        quota.invalidate_instances_cores_ram_count('fake-project',
+                                                   'other-user')
+        quota._instances_cores_ram_count(self.ctxt, 'fake-project',
+                                         user_id='fake-user')
+        self.assertEqual(2, mock_scatter.call_count)
+
+        quota.invalidate_instances_cores_ram_count('fake-project',
+                                                   'fake-user')
+        quota._instances_cores_ram_count(self.ctxt, 'fake-project',
+                                         user_id='fake-user')
+        self.assertEqual(3, mock_scatter.call_count)
+
+    @mock.patch('nova.objects.Quotas.check_deltas')
+    def test_recheck_not_cached(self, mock_check, mock_scatter):
+        self.flags(count_usage_cache_time=10, group='quota')
+        mock_scatter.return_value = {'cell1': {'project':
+                                               self.counts['project']}}
+        flavor = objects.Flavor(vcpus=1, memory_mb=512)
+        quota._instances_cores_ram_count(self.ctxt, 'fake-project')
+
+        compute_utils.check_num_instances_quota(self.ctxt, flavor, 1, 1)
+        quota._instances_cores_ram_count(self.ctxt, 'fake-project')
+        self.assertEqual(1, mock_scatter.call_count)
+
+        # The recheck made after creating instances counts them again.
+        compute_utils.check_num_instances_quota(self.ctxt, flavor, 0, 0,
+                                                orig_num_req=1)
+        quota._instances_cores_ram_count(self.ctxt, 'fake-project')
+        self.assertEqual(2, mock_scatter.call_count)
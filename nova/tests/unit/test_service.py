@@ -281,6 +281,18 @@ class TestWSGIService(test.NoDBTestCase):
         test_service.start()
         self.assertFalse(mock_create.called)
 
+    @mock.patch('nova.context.warm_up_cells')
+    @mock.patch('nova.objects.Service.get_by_host_and_binary')
+    def test_service_start_warms_up_cells(self, mock_get, mock_warm_up):
+        test_service = service.WSGIService("test_service")
+        test_service.start()
+        mock_warm_up.assert_not_called()
+
+        self.flags(warm_up_cells=True, group='api')
+        test_service = service.WSGIService("test_service")
+        test_service.start()
+        mock_warm_up.assert_called_once_with()
+
     @mock.patch('nova.objects.Service.get_by_host_and_binary')
     def test_service_random_port(self, mock_get):
         test_service = service.WSGIService("test_service")
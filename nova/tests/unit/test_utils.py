@@ -1334,6 +1334,77 @@ class GetKSAAdapterTestCase(test.NoDBTestCase):
             min_version=None, max_version=None)
 
 
+class GetKSASessionTestCase(test.NoDBTestCase):
+    """Tests for nova.utils.get_ksa_session()."""
+    def setUp(self):
+        super(GetKSASessionTestCase, self).setUp()
+        load_sess_p = mock.patch(
+            'keystoneauth1.loading.load_session_from_conf_options')
+        self.addCleanup(load_sess_p.stop)
+        self.load_sess = load_sess_p.start()
+
+        http_sessions_p = mock.patch.dict(utils._HTTP_SESSIONS, clear=True)
+        self.addCleanup(http_sessions_p.stop)
+        http_sessions_p.start()
+
+    def test_pooled_session(self):
+        ret = utils.get_ksa_session('placement', auth='auth')
+        self.assertEqual(self.load_sess.return_value, ret)
+        http_session = utils._get_http_session('placement')
+        self.load_sess.assert_called_once_with(
+            utils.CONF, 'placement', auth='auth', session=http_session)
+        for url in ('http://placement', 'https://placement'):
+            adapter = http_session.get_adapter(url)
+            self.assertIsInstance(adapter, utils._PooledHTTPAdapter)
+            self.assertEqual(10, adapter._pool_maxsize)
+            self.assertFalse(adapter._pool_block)
+
+        # Sessions loaded later share the connection pool
+        utils.get_ksa_session('placement')
+        self.load_sess.assert_called_with(
+            utils.CONF, 'placement', auth=None, session=http_session)
+
+    def test_pool_options_changed(self):
+        http_session = utils._get_http_session('neutron')
+        self.flags(connection_pool_size=20, connection_pool_block=True,
+                   group='neutron')
+        new_http_session = utils._get_http_session('neutron')
+        self.assertIsNot(http_session, new_http_session)
+        adapter = new_http_session.get_adapter('https://neutron')
+        self.assertEqual(20, adapter._pool_maxsize)
+        self.assertTrue(adapter._pool_block)
+
+    def test_no_pool_options(self):
+        utils.get_ksa_session('cinder')
+        self.load_sess.assert_called_once_with(utils.CONF, 'cinder',
+                                               auth=None)
+        self.assertEqual({}, utils._HTTP_SESSIONS)
+
+    @mock.patch.object(utils.LOG, 'warning')
+    @mock.patch('requests.adapters.HTTPAdapter.send')
+    def test_pool_saturated(self, mock_send, mock_warn):
+        adapter = utils._PooledHTTPAdapter('placement', pool_maxsize=1)
+
+        def send(request, **kwargs):
+            self.assertEqual(1, adapter.in_flight)
+            return mock.sentinel.response
+
+        mock_send.side_effect = send
+        self.assertEqual(mock.sentinel.response, adapter.send('req'))
+        self.assertEqual(0, adapter.saturated)
+        mock_warn.assert_not_called()
+
+        # Pretend another request holds the only pooled connection
+        adapter.in_flight = 1
+        mock_send.side_effect = lambda request, **kwargs: None
+        adapter.send('req')
+        adapter.send('req')
+        self.assertEqual(2, adapter.saturated)
+        self.assertEqual(1, adapter.in_flight)
+        # Only the first of every _POOL_SATURATION_WARN_EVERY is logged
+        self.assertEqual(1, mock_warn.call_count)
+
+
 class GetEndpointTestCase(test.NoDBTestCase):
     def setUp(self):
         super(GetEndpointTestCase, self).setUp()
@@ -18,7 +18,10 @@ Tests For weights.
 
 import mock
 
+from nova.scheduler.filters import utils
 from nova.scheduler import weights as scheduler_weights
+from nova.scheduler.weights import disk
+from nova.scheduler.weights import io_ops
 from nova.scheduler.weights import ram
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -57,6 +60,81 @@ class TestWeigher(test.NoDBTestCase):
             ret = weights.normalize(seq, minval=minval, maxval=maxval)
             self.assertEqual(tuple(ret), result)
 
+    def test_normalization_array(self):
+        # weight_list, expected_result, minval, maxval
+        map_ = (
+            ((0.0, 0.0), (0.0, 0.0), None, None),
+            ((1.0, 1.0), (0.0, 0.0), None, None),
+
+            ((20.0, 50.0), (0.0, 1.0), None, None),
+            ((20.0, 50.0), (0.0, 0.375), None, 100.0),
+            ((20.0, 50.0), (0.4, 1.0), 0.0, None),
+            ((20.0, 50.0), (0.2, 0.5), 0.0, 100.0),
+        )
+        for seq, result, minval, maxval in map_:
+            ret = weights.normalize_array(weights.np.array(seq),
+                                          minval=minval, maxval=maxval)
+            self.assertEqual(tuple(ret.tolist()), result)
+
+    def test_weigh_objects_batch_not_supported(self):
+        weigher = ram.RAMWeigher()
+        columns = mock.Mock(spec=utils.HostStateColumns)
+        columns.get.return_value = None
+        self.assertIsNone(weigher.weigh_objects_batch(columns, {}))
+        self.assertEqual(0, weigher.minval)
+        self.assertIsNone(weigher.maxval)
+
+    def test_weigh_objects_batch_records_bounds(self):
+        weigher = io_ops.IoOpsWeigher()
+        hostinfo = [fakes.FakeHostState('host%s' % i, 'node%s' % i,
+                                        {'num_io_ops': i + 1})
+                    for i in range(3)]
+        weights = weigher.weigh_objects_batch(
+            utils.HostStateColumns(hostinfo), {})
+        self.assertEqual([1, 2, 3], weights.tolist())
+        self.assertEqual(0, weigher.minval)
+        self.assertEqual(3, weigher.maxval)
+
+    def _get_weighed_hosts(self, batch, **kwargs):
+        host_values = [
+            ('host1', 'node1', {'free_ram_mb': 512, 'free_disk_mb': 1000,
+                                'num_io_ops': 3}),
+            ('host2', 'node2', {'free_ram_mb': 1024, 'free_disk_mb': 7,
+                                'num_io_ops': 0}),
+            ('host3', 'node3', {'free_ram_mb': 3072, 'free_disk_mb': 700,
+                                'num_io_ops': 8}),
+            ('host4', 'node4', {'free_ram_mb': 8192, 'free_disk_mb': 100,
+                                'num_io_ops': 5}),
+            ('host5', 'node5', {'free_ram_mb': 1024, 'free_disk_mb': 7,
+                                'num_io_ops': 0}),
+        ]
+        hostinfo = [fakes.FakeHostState(host, node, values)
+                    for host, node, values in host_values]
+        weight_handler = scheduler_weights.HostWeightHandler()
+        weighers = [ram.RAMWeigher(), disk.DiskWeigher(),
+                    io_ops.IoOpsWeigher()]
+        if not batch:
+            self.stub_out('nova.scheduler.weights.HostWeightHandler.'
+                          'get_columns', lambda *args: None)
+        return [(w.obj.host, w.weight)
+                for w in weight_handler.get_weighed_objects(
+                    weighers, hostinfo, {}, **kwargs)]
+
+    def test_get_weighed_objects_batch(self):
+        self.flags(disk_weight_multiplier=2.0, group='filter_scheduler')
+        batch_weighed = self._get_weighed_hosts(True)
+        weighed = self._get_weighed_hosts(False)
+        self.assertEqual(weighed, batch_weighed)
+        self.assertEqual(['host1', 'host3', 'host4', 'host2', 'host5'],
+                         [host for host, weight in weighed])
+
+    def test_get_weighed_objects_limit(self):
+        self.flags(disk_weight_multiplier=2.0, group='filter_scheduler')
+        weighed = self._get_weighed_hosts(False)
+        weighed_limit = self._get_weighed_hosts(False, limit=2)
+        self.assertEqual(weighed[:2], weighed_limit[:2])
+        self.assertEqual(sorted(weighed), sorted(weighed_limit))
+
     @mock.patch('nova.weights.BaseWeigher.weigh_objects')
     def test_only_one_host(self, mock_weigh):
         host_values = [
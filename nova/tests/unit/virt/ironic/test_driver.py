@@ -539,6 +539,21 @@ class IronicDriverTestCase(test.NoDBTestCase):
         mock_call.assert_called_with("node.list", associated=True, limit=0)
         self.assertFalse(mock_inst_by_uuid.called)
 
+    @mock.patch.object(cw.IronicClientWrapper, 'call')
+    def test_get_power_states(self, mock_call):
+        nodes = [
+            ironic_utils.get_test_node(instance_uuid=uuids.instance1,
+                                       power_state=ironic_states.POWER_ON),
+            ironic_utils.get_test_node(instance_uuid=uuids.instance2,
+                                       power_state=ironic_states.POWER_OFF)]
+        mock_call.return_value = nodes
+        power_states = self.driver.get_power_states(mock.sentinel.instances)
+        mock_call.assert_called_once_with('node.list', associated=True,
+                                          limit=0)
+        self.assertEqual({uuids.instance1: nova_states.RUNNING,
+                          uuids.instance2: nova_states.SHUTDOWN},
+                         power_states)
+
     @mock.patch.object(cw.IronicClientWrapper, 'call')
     def test_list_instance_uuids(self, mock_call):
         num_nodes = 2
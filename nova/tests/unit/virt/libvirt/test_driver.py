@@ -6584,6 +6584,25 @@ class LibvirtConnTestCase(test.NoDBTestCase,
         self.assertEqual(uuids[3], vm4.UUIDString())
         mock_list.assert_called_with(only_guests=True, only_running=False)
 
+    @mock.patch.object(host.Host, "list_instance_domains")
+    def test_get_power_states(self, mock_list):
+        vm1 = FakeVirtDomain(id=3, uuidstr=uuids.vm1)
+        vm2 = FakeVirtDomain(uuidstr=uuids.vm2,
+                             info=[libvirt_guest.VIR_DOMAIN_SHUTOFF, 512,
+                                   512, None, None])
+        vm3 = FakeVirtDomain(uuidstr=uuids.vm3)
+        mock_list.return_value = [vm1, vm2, vm3]
+        instances = [objects.Instance(uuid=uuids.vm1),
+                     objects.Instance(uuid=uuids.vm2),
+                     objects.Instance(uuid=uuids.missing)]
+
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        self.assertEqual({uuids.vm1: power_state.RUNNING,
+                          uuids.vm2: power_state.SHUTDOWN},
+                         drvr.get_power_states(instances))
+        mock_list.assert_called_once_with(only_guests=True,
+                                          only_running=False)
+
     @mock.patch('nova.virt.libvirt.host.Host.get_online_cpus',
                 return_value=None)
     @mock.patch('nova.virt.libvirt.host.Host.get_cpu_count',
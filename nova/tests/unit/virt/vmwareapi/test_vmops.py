@@ -238,6 +238,33 @@ class VMwareVMOpsTestCase(test.NoDBTestCase):
         vms = ops._get_valid_vms_from_retrieve_result(fake_objects)
         self.assertEqual(1, len(vms))
 
+    def test_get_power_states(self):
+        fake_objects = vmwareapi_fake.FakeRetrieveResult()
+        for vm_uuid, powerstate, conn_state in (
+                (uuidsentinel.vm1, 'poweredOn', 'connected'),
+                (uuidsentinel.vm2, 'poweredOff', 'connected'),
+                (uuidsentinel.vm3, 'poweredOn', 'orphaned')):
+            vm = vmwareapi_fake.VirtualMachine(powerstate=powerstate,
+                                               conn_state=conn_state)
+            vm.set('config.extraConfig["nvp.vm-uuid"]',
+                   vmwareapi_fake.OptionValue(value=vm_uuid))
+            fake_objects.add_object(vm)
+        # VMs without nvp.vm-uuid are ignored
+        fake_objects.add_object(vmwareapi_fake.VirtualMachine())
+
+        with mock.patch.object(self._session, '_call_method',
+                               side_effect=[fake_objects, None]) as mock_call:
+            power_states = self._vmops.get_power_states()
+        self.assertEqual({uuidsentinel.vm1: power_state.RUNNING,
+                          uuidsentinel.vm2: power_state.SHUTDOWN},
+                         power_states)
+        mock_call.assert_has_calls([
+            mock.call(vim_util, 'get_inner_objects',
+                      self._vmops._root_resource_pool, 'vm', 'VirtualMachine',
+                      ['runtime.connectionState', 'runtime.powerState',
+                       'config.extraConfig["nvp.vm-uuid"]']),
+            mock.call(vutil, 'continue_retrieval', fake_objects)])
+
     def test_delete_vm_snapshot(self):
         def fake_call_method(module, method, *args, **kwargs):
             self.assertEqual('RemoveSnapshot_Task', method)
@@ -37,6 +37,7 @@ import time
 import eventlet
 from keystoneauth1 import exceptions as ks_exc
 from keystoneauth1 import loading as ks_loading
+from keystoneauth1 import session as ks_session
 import netaddr
 from os_service_types import service_types
 from oslo_concurrency import lockutils
@@ -50,6 +51,7 @@ from oslo_utils import importutils
 from oslo_utils import strutils
 from oslo_utils import timeutils
 from oslo_utils import units
+import requests
 import six
 from six.moves import range
 
@@ -94,6 +96,11 @@ _FILE_CACHE = {}
 
 _SERVICE_TYPES = service_types.ServiceTypes()
 
+# Pooled HTTP sessions, keyed by conf group and pool settings
+_HTTP_SESSIONS = {}
+# Log a warning on the first and every Nth request finding a pool exhausted
+_POOL_SATURATION_WARN_EVERY = 1000
+
 
 def get_root_helper():
     if CONF.workarounds.disable_rootwrap:
@@ -1274,14 +1281,83 @@ def get_ksa_adapter(service_type, ksa_auth=None, ksa_session=None,
             ksa_auth = ks_loading.load_auth_from_conf_options(CONF, confgrp)
 
     if not ksa_session:
-        ksa_session = ks_loading.load_session_from_conf_options(
-            CONF, confgrp, auth=ksa_auth)
+        ksa_session = get_ksa_session(confgrp, auth=ksa_auth)
 
     return ks_loading.load_adapter_from_conf_options(
         CONF, confgrp, session=ksa_session, auth=ksa_auth,
         min_version=min_version, max_version=max_version)
 
 
+class _PooledHTTPAdapter(ks_session.TCPKeepAliveAdapter):
+    """Keep-alive HTTP adapter counting requests which exhaust its pool."""
+
+    def __init__(self, name, **kwargs):
+        self.name = name
+        self.in_flight = 0
+        self.saturated = 0
+        super(_PooledHTTPAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        # NOTE: The pool size applies to each endpoint host, but the clients
+        # using these adapters talk to a single endpoint.
+        if self.in_flight >= self._pool_maxsize:
+            self.saturated += 1
+            if self.saturated % _POOL_SATURATION_WARN_EVERY == 1:
+                LOG.warning('The HTTP connection pool for %(name)s is '
+                            'exhausted with %(count)d requests in flight; '
+                            '%(saturated)d requests have found it exhausted '
+                            'so far. Consider increasing '
+                            '[%(name)s]/connection_pool_size.',
+                            {'name': self.name, 'count': self.in_flight,
+                             'saturated': self.saturated})
+        self.in_flight += 1
+        try:
+            return super(_PooledHTTPAdapter, self).send(request, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+def _get_http_session(confgrp):
+    """Get the pooled requests Session shared by clients of a conf group.
+
+    :param confgrp: String name of the conf group of the service.
+    :return: A requests.Session, or None if the conf group has no connection
+             pool options.
+    """
+    group = CONF[confgrp]
+    if 'connection_pool_size' not in group:
+        return None
+    key = (confgrp, group.connection_pool_size, group.connection_pool_block)
+    session = _HTTP_SESSIONS.get(key)
+    if session is None:
+        session = requests.Session()
+        for scheme in ('https://', 'http://'):
+            session.mount(scheme, _PooledHTTPAdapter(
+                confgrp, pool_maxsize=group.connection_pool_size,
+                pool_block=group.connection_pool_block))
+        _HTTP_SESSIONS[key] = session
+    return session
+
+
+def get_ksa_session(confgrp, auth=None):
+    """Load a keystoneauth1 Session from the options of a conf group.
+
+    If the conf group provides connection pool options, the Session sends its
+    requests through keep-alive connections shared by every Session loaded for
+    that conf group within the process.
+
+    :param confgrp: String name of the conf group of the service.
+    :param auth: A keystoneauth1 auth plugin for the Session, or None.
+    :return: A keystoneauth1 Session.
+    """
+    kwargs = {}
+    http_session = _get_http_session(confgrp)
+    if http_session is not None:
+        kwargs['session'] = http_session
+    return ks_loading.load_session_from_conf_options(
+        CONF, confgrp, auth=auth, **kwargs)
+
+
 def get_endpoint(ksa_adapter):
     """Get the endpoint URL represented by a keystoneauth1 Adapter.
 
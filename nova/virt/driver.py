@@ -166,6 +166,21 @@ class ComputeDriver(object):
         # TODO(Vek): Need to pass context in for access to auth_token
         raise NotImplementedError()
 
+    def get_power_states(self, instances):
+        """Get the current power states of instances in one pass.
+
+        Drivers should implement this when it is cheaper than calling
+        get_info() for each of the instances, for example when that makes a
+        remote call per instance.
+
+        :param instances: nova.objects.instance.InstanceList object
+        :returns: dict, keyed by instance UUID, of the power states of the
+                  instances. Instances not found on the hypervisor may be
+                  omitted, and instances other than those requested may be
+                  included.
+        """
+        raise NotImplementedError()
+
     def get_num_instances(self):
         """Return the total number of virtual machines.
 
@@ -619,6 +619,20 @@ class IronicDriver(virt_driver.ComputeDriver):
         return list(n.instance_uuid
                     for n in self._get_node_list(associated=True, limit=0))
 
+    def get_power_states(self, instances):
+        """Return the power states of all the instances provisioned.
+
+        :param instances: the instance objects. Unused, since listing all the
+                          associated nodes takes a single call to Ironic.
+        :returns: a dict of power states, keyed by instance UUID.
+        :raises: VirtDriverNotReady
+
+        """
+        # NOTE(lucasagomes): limit == 0 is an indicator to continue
+        # pagination until there're no more values to be returned.
+        return {n.instance_uuid: map_power_state(n.power_state)
+                for n in self._get_node_list(associated=True, limit=0)}
+
     def node_is_available(self, nodename):
         """Confirms a Nova hypervisor node exists in the Ironic inventory.
 
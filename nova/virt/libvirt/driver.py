@@ -5402,6 +5402,20 @@ class LibvirtDriver(driver.ComputeDriver):
         # workaround, see libvirt/compat.py
         return guest.get_info(self._host)
 
+    def get_power_states(self, instances):
+        uuids = set(instance.uuid for instance in instances)
+        power_states = {}
+        for guest in self._host.list_guests(only_running=False):
+            uuid = guest.uuid
+            if uuid not in uuids:
+                continue
+            try:
+                power_states[uuid] = guest.get_power_state(self._host)
+            except exception.InstanceNotFound:
+                # The domain went away since it was listed
+                pass
+        return power_states
+
     def _create_domain_setup_lxc(self, context, instance, image_meta,
                                  block_device_info):
         inst_path = libvirt_utils.get_instance_path(instance)
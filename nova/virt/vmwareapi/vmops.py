@@ -1582,6 +1582,34 @@ class VMwareVMOps(object):
         return hardware.InstanceInfo(
             state=constants.POWER_STATES[vm_props['runtime.powerState']])
 
+    def get_power_states(self):
+        """Return the power states of the VM instances in the cluster, keyed
+        by instance UUID.
+        """
+        properties = ['runtime.connectionState',
+                      'runtime.powerState',
+                      'config.extraConfig["nvp.vm-uuid"]']
+        vms = None
+        if self._root_resource_pool:
+            vms = self._session._call_method(
+                vim_util, 'get_inner_objects', self._root_resource_pool, 'vm',
+                'VirtualMachine', properties)
+
+        power_states = {}
+        while vms:
+            for vm in vms.objects:
+                props = {prop.name: prop.val for prop in vm.propSet}
+                vm_uuid = props.get('config.extraConfig["nvp.vm-uuid"]')
+                # Ignore VM's that do not have nvp.vm-uuid defined, and the
+                # orphaned or inaccessible VMs
+                if (not vm_uuid or props.get('runtime.connectionState') in
+                        ["orphaned", "inaccessible"]):
+                    continue
+                power_states[vm_uuid.value] = constants.POWER_STATES[
+                    props['runtime.powerState']]
+            vms = self._session._call_method(vutil, 'continue_retrieval', vms)
+        return power_states
+
     def _get_diagnostics(self, instance):
         """Return data about VM diagnostics."""
         vm_ref = vm_util.get_vm_ref(self._session, instance)
@@ -18,11 +18,16 @@ Pluggable Weighing support
 """
 
 import abc
+import contextlib
+import heapq
 
+from oslo_utils import importutils
 import six
 
 from nova import loadables
 
+np = importutils.try_import('numpy')
+
 
 def normalize(weight_list, minval=None, maxval=None):
     """Normalize the values in a list between 0 and 1.0.
@@ -53,6 +58,27 @@ def normalize(weight_list, minval=None, maxval=None):
     return ((i - minval) / range_ for i in weight_list)
 
 
+def normalize_array(weights, minval=None, maxval=None):
+    """Normalize the values of a NumPy array between 0 and 1.0.
+
+    Same as normalize(), for the weights returned by
+    BaseWeigher.weigh_objects_batch().
+    """
+    if maxval is None:
+        maxval = weights.max()
+
+    if minval is None:
+        minval = weights.min()
+
+    maxval = float(maxval)
+    minval = float(minval)
+
+    if minval == maxval:
+        return np.zeros(len(weights))
+
+    return (weights - minval) / (maxval - minval)
+
+
 class WeighedObject(object):
     """Object with weight information."""
     def __init__(self, obj, weight):
@@ -117,27 +143,123 @@ class BaseWeigher(object):
 
         return weights
 
+    def _weigh_objects_batch(self, columns, weight_properties):
+        """Weigh all of the objects of a column store at once.
+
+        Override in a subclass to return a NumPy array of the weights,
+        or None if the objects can't be weighed that way.
+        """
+        return None
+
+    def weigh_objects_batch(self, columns, weight_properties):
+        """Weigh all of the objects of a column store at once.
+
+        Return a NumPy array of weights, or None in which case
+        weigh_objects() is used instead.
+
+        :param columns: column store of the objects to weigh, as returned by
+                        BaseWeightHandler.get_columns()
+        """
+        weights = self._weigh_objects_batch(columns, weight_properties)
+        if weights is None or not len(weights):
+            return weights
+
+        # Record the min and max values the same way weigh_objects() does.
+        minval = float(weights.min())
+        maxval = float(weights.max())
+        if self.minval is None or minval < self.minval:
+            self.minval = minval
+        if self.maxval is None or maxval > self.maxval:
+            self.maxval = maxval
+
+        return weights
+
 
 class BaseWeightHandler(loadables.BaseLoader):
     object_class = WeighedObject
 
-    def get_weighed_objects(self, weighers, obj_list, weighing_properties):
-        """Return a sorted (descending), normalized list of WeighedObjects."""
+    def get_columns(self, objs):
+        """Return a column store of objs for BaseWeigher.weigh_objects_batch(),
+        or None if batch weighing is not supported.
+
+        Can be overridden in a subclass. The returned object must have an
+        'objs' attribute listing the objects it holds.
+        """
+        return None
+
+    @contextlib.contextmanager
+    def weigher_context(self, weigher):
+        """Context manager wrapped around each run of a weigher.
+
+        Can be overridden in a subclass to instrument the weighers.
+        """
+        yield
+
+    def _get_weight_matrix(self, weighers, weighed_objs, weighing_properties,
+                           columns):
+        """Return a NumPy array of the normalized weights of the objects,
+        with a row per object and a column per weigher.
+        """
+        matrix = np.zeros((len(weighed_objs), len(weighers)))
+        for i, weigher in enumerate(weighers):
+            with self.weigher_context(weigher):
+                weights = weigher.weigh_objects_batch(columns,
+                                                      weighing_properties)
+                if weights is None:
+                    weights = np.array(
+                        weigher.weigh_objects(weighed_objs,
+                                              weighing_properties),
+                        dtype=float)
+                matrix[:, i] = normalize_array(weights,
+                                               minval=weigher.minval,
+                                               maxval=weigher.maxval)
+        return matrix
+
+    def get_weighed_objects(self, weighers, obj_list, weighing_properties,
+                            limit=None):
+        """Return a sorted (descending), normalized list of WeighedObjects.
+
+        If limit is set, only the limit first WeighedObjects of the list are
+        sorted, and are the best ones. The other ones follow in no particular
+        order.
+        """
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
 
         if len(weighed_objs) <= 1:
             return weighed_objs
 
-        for weigher in weighers:
-            weights = weigher.weigh_objects(weighed_objs, weighing_properties)
-
-            # Normalize the weights
-            weights = normalize(weights,
-                                minval=weigher.minval,
-                                maxval=weigher.maxval)
-
-            for i, weight in enumerate(weights):
-                obj = weighed_objs[i]
-                obj.weight += weigher.weight_multiplier() * weight
+        columns = self.get_columns(obj_list)
+        if columns is not None:
+            matrix = self._get_weight_matrix(weighers, weighed_objs,
+                                             weighing_properties, columns)
+            scores = np.zeros(len(weighed_objs))
+            # NOTE: Add the weighers up one after the other, like below, so
+            # that the scores are the same as without NumPy.
+            for i, weigher in enumerate(weighers):
+                scores += weigher.weight_multiplier() * matrix[:, i]
+            for obj, score in six.moves.zip(weighed_objs, scores.tolist()):
+                obj.weight = score
+        else:
+            for weigher in weighers:
+                with self.weigher_context(weigher):
+                    weights = weigher.weigh_objects(weighed_objs,
+                                                    weighing_properties)
+
+                    # Normalize the weights
+                    weights = normalize(weights,
+                                        minval=weigher.minval,
+                                        maxval=weigher.maxval)
+
+                    multiplier = weigher.weight_multiplier()
+                    for i, weight in enumerate(weights):
+                        obj = weighed_objs[i]
+                        obj.weight += multiplier * weight
+
+        if limit is not None and limit < len(weighed_objs):
+            best_objs = heapq.nlargest(limit, weighed_objs,
+                                       key=lambda x: x.weight)
+            best_ids = set(id(obj) for obj in best_objs)
+            return best_objs + [obj for obj in weighed_objs
+                                if id(obj) not in best_ids]
 
         return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
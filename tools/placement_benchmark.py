@@ -0,0 +1,376 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Benchmark the placement API against a local database.
+
+The placement WSGI application is loaded in-process with noauth2 and driven
+through webob, so the measurements cover the middleware, handlers, objects
+and database but no HTTP server. The database is seeded through the API with
+compute node provider trees, traits, aggregates and sharing storage
+providers, then each scenario is run and its latency statistics are emitted
+as JSON.
+
+Usage::
+
+    python tools/placement_benchmark.py --providers 1000 --sharing 10 \\
+        --iterations 200 --output placement-bench.json
+
+By default a SQLite database is created in a temporary directory. Pass
+--connection to use another database, for example a MySQL one. Its schema is
+synced and it is expected to be empty.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+from oslo_serialization import jsonutils
+import webob
+
+from nova.api.openstack.placement import deploy
+from nova import conf
+from nova import config
+from nova.db.sqlalchemy import api as sqlalchemy_api
+from nova.db.sqlalchemy import migration
+
+
+CONF = conf.CONF
+
+MICROVERSION = 'placement 1.21'
+TRAITS = ['HW_CPU_X86_AVX2', 'HW_CPU_X86_SSE42', 'HW_NIC_OFFLOAD_GENEVE']
+SHARING_TRAIT = 'MISC_SHARES_VIA_AGGREGATE'
+SCENARIOS = ('allocation_candidates', 'allocation_candidates_traits',
+             'allocation_candidates_member_of', 'allocation_writes',
+             'inventory_updates')
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class PlacementClient(object):
+    """Sends requests to an in-process placement WSGI application."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def request(self, method, path, body=None, expected=(200, 201, 204)):
+        headers = {
+            'x-auth-token': 'admin',
+            'accept': 'application/json',
+            'openstack-api-version': MICROVERSION,
+        }
+        req = webob.Request.blank(path, method=method, headers=headers)
+        if body is not None:
+            req.content_type = 'application/json'
+            req.body = jsonutils.dump_as_bytes(body)
+        resp = req.get_response(self.app)
+        if resp.status_int not in expected:
+            raise BenchmarkError('%s %s returned %s: %s' % (
+                method, path, resp.status, resp.text))
+        if resp.body:
+            return resp.json_body
+
+
+def _new_uuid():
+    return str(uuid.uuid4())
+
+
+class Seeder(object):
+    """Seeds the placement database with provider trees.
+
+    Each compute node is a root provider with VCPU and MEMORY_MB inventory
+    and a number of child providers with SRIOV_NET_VF inventory. Compute
+    nodes are spread over aggregates. When sharing providers are requested,
+    each aggregate gets sharing storage providers with DISK_GB inventory and
+    the compute nodes of that aggregate have no local disk; otherwise each
+    compute node has local DISK_GB inventory.
+    """
+
+    def __init__(self, client, args):
+        self.client = client
+        self.args = args
+        self.generations = {}
+        self.compute_nodes = []
+        self.aggregates = [_new_uuid() for _i in range(args.aggregates)]
+
+    def _create_provider(self, name, parent_uuid=None):
+        rp_uuid = _new_uuid()
+        body = {'name': name, 'uuid': rp_uuid}
+        if parent_uuid:
+            body['parent_provider_uuid'] = parent_uuid
+        rp = self.client.request('POST', '/resource_providers', body)
+        self.generations[rp_uuid] = rp['generation']
+        return rp_uuid
+
+    def _put(self, rp_uuid, resource, body):
+        body['resource_provider_generation'] = self.generations[rp_uuid]
+        resp = self.client.request(
+            'PUT', '/resource_providers/%s/%s' % (rp_uuid, resource), body)
+        self.generations[rp_uuid] = resp['resource_provider_generation']
+
+    def _set_inventory(self, rp_uuid, inventories):
+        self._put(rp_uuid, 'inventories', {'inventories': inventories})
+
+    def seed(self):
+        args = self.args
+        for i in range(args.sharing):
+            ss_uuid = self._create_provider('ss%d' % i)
+            self._set_inventory(ss_uuid, {
+                'DISK_GB': {'total': 100000, 'max_unit': 10000}})
+            self._put(ss_uuid, 'traits', {'traits': [SHARING_TRAIT]})
+            self._put(ss_uuid, 'aggregates', {
+                'aggregates': [self.aggregates[i % len(self.aggregates)]]})
+
+        for i in range(args.providers):
+            cn_uuid = self._create_provider('cn%d' % i)
+            inventories = {
+                'VCPU': {'total': 64, 'allocation_ratio': 16.0},
+                'MEMORY_MB': {'total': 262144, 'allocation_ratio': 1.5},
+            }
+            if not args.sharing:
+                inventories['DISK_GB'] = {'total': 2000, 'reserved': 100}
+            self._set_inventory(cn_uuid, inventories)
+            traits = [trait for trait in TRAITS
+                      if random.random() < args.trait_ratio]
+            if traits:
+                self._put(cn_uuid, 'traits', {'traits': traits})
+            agg_uuid = self.aggregates[i % len(self.aggregates)]
+            self._put(cn_uuid, 'aggregates', {'aggregates': [agg_uuid]})
+            for j in range(args.children):
+                child_uuid = self._create_provider('cn%d_pf%d' % (i, j),
+                                                   parent_uuid=cn_uuid)
+                self._set_inventory(child_uuid, {
+                    'SRIOV_NET_VF': {'total': 8}})
+            self.compute_nodes.append(cn_uuid)
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    index = int(round(percent / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def _stats(durations, errors):
+    durations_ms = sorted(d * 1000.0 for d in durations)
+    count = len(durations_ms)
+    elapsed = sum(durations)
+    return {
+        'requests': count,
+        'errors': errors,
+        'elapsed_s': elapsed,
+        'requests_per_s': count / elapsed if elapsed else None,
+        'latency_ms': {
+            'min': durations_ms[0] if count else None,
+            'mean': sum(durations_ms) / count if count else None,
+            'p50': _percentile(durations_ms, 50),
+            'p90': _percentile(durations_ms, 90),
+            'p99': _percentile(durations_ms, 99),
+            'max': durations_ms[-1] if count else None,
+        },
+    }
+
+
+def _run(iterations, make_request, prepare=None):
+    """Times iterations calls of make_request(i). The optional prepare(i) is
+    called untimed before each of them and its result passed along.
+    """
+    durations = []
+    errors = 0
+    for i in range(iterations):
+        arg = prepare(i) if prepare else None
+        before = time.time()
+        try:
+            make_request(i, arg)
+        except BenchmarkError:
+            errors += 1
+            continue
+        durations.append(time.time() - before)
+    return _stats(durations, errors)
+
+
+def _candidates_path(args, extra=''):
+    path = '/allocation_candidates?resources=%s' % args.resources
+    if args.limit:
+        path += '&limit=%d' % args.limit
+    return path + extra
+
+
+def run_scenario(name, client, seeder, args):
+    if name == 'allocation_candidates':
+        path = _candidates_path(args)
+        return _run(args.iterations,
+                    lambda i, _arg: client.request('GET', path))
+
+    if name == 'allocation_candidates_traits':
+        path = _candidates_path(args, '&required=%s' % TRAITS[0])
+        return _run(args.iterations,
+                    lambda i, _arg: client.request('GET', path))
+
+    if name == 'allocation_candidates_member_of':
+        def prepare(i):
+            agg_uuid = seeder.aggregates[i % len(seeder.aggregates)]
+            return _candidates_path(args, '&member_of=%s' % agg_uuid)
+        return _run(args.iterations,
+                    lambda i, path: client.request('GET', path), prepare)
+
+    if name == 'allocation_writes':
+        def prepare(i):
+            return random.choice(seeder.compute_nodes)
+
+        def write(i, cn_uuid):
+            client.request('PUT', '/allocations/%s' % _new_uuid(), {
+                'allocations': {
+                    cn_uuid: {'resources': {'VCPU': 1, 'MEMORY_MB': 512}},
+                },
+                'project_id': _new_uuid(),
+                'user_id': _new_uuid(),
+            })
+        return _run(args.iterations, write, prepare)
+
+    if name == 'inventory_updates':
+        def prepare(i):
+            cn_uuid = seeder.compute_nodes[i % len(seeder.compute_nodes)]
+            rp = client.request('GET', '/resource_providers/%s' % cn_uuid)
+            return cn_uuid, rp['generation']
+
+        def update(i, arg):
+            cn_uuid, generation = arg
+            inventories = {
+                'VCPU': {'total': 64, 'allocation_ratio': 16.0,
+                         'reserved': i % 4},
+                'MEMORY_MB': {'total': 262144, 'allocation_ratio': 1.5},
+            }
+            if not args.sharing:
+                inventories['DISK_GB'] = {'total': 2000, 'reserved': 100}
+            client.request(
+                'PUT', '/resource_providers/%s/inventories' % cn_uuid, {
+                    'resource_provider_generation': generation,
+                    'inventories': inventories,
+                })
+        return _run(args.iterations, update, prepare)
+
+    raise ValueError('Unknown scenario %s' % name)
+
+
+def setup_app(connection):
+    config.parse_args([], default_config_files=[], configure_db=False,
+                      init_rpc=False)
+    CONF.set_override('auth_strategy', 'noauth2', group='api')
+    CONF.set_override('connection', connection, group='api_database')
+    # The main database is not used by placement but must be configured.
+    CONF.set_override('connection', 'sqlite://', group='database')
+    sqlalchemy_api.configure(CONF)
+    migration.db_sync(database='api')
+    return deploy.loadapp(CONF)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connection',
+                        help='Database connection URL, defaults to a SQLite '
+                             'database in a temporary directory.')
+    parser.add_argument('--providers', type=int, default=100,
+                        help='Number of compute node root providers.')
+    parser.add_argument('--children', type=int, default=2,
+                        help='Number of child providers per compute node.')
+    parser.add_argument('--sharing', type=int, default=0,
+                        help='Number of sharing storage providers. When '
+                             'non-zero compute nodes have no local disk.')
+    parser.add_argument('--aggregates', type=int, default=10,
+                        help='Number of aggregates to spread providers over.')
+    parser.add_argument('--trait-ratio', type=float, default=0.5,
+                        help='Probability of a compute node having each '
+                             'trait.')
+    parser.add_argument('--resources', default='VCPU:1,MEMORY_MB:512,'
+                                                'DISK_GB:10',
+                        help='Resources requested from allocation '
+                             'candidates.')
+    parser.add_argument('--limit', type=int, default=0,
+                        help='Limit of allocation candidates, 0 for none.')
+    parser.add_argument('--iterations', type=int, default=100,
+                        help='Number of requests per scenario.')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help='Scenario to run, may be repeated. Defaults to '
+                             'all of them.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed, for reproducible runs.')
+    parser.add_argument('--output',
+                        help='File to write the JSON results to, defaults to '
+                             'stdout.')
+    args = parser.parse_args(argv)
+    if args.aggregates < 1:
+        parser.error('--aggregates must be at least 1')
+    if args.providers < 1:
+        parser.error('--providers must be at least 1')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    random.seed(args.seed)
+
+    tmpdir = None
+    connection = args.connection
+    if not connection:
+        tmpdir = tempfile.mkdtemp(prefix='placement-bench-')
+        connection = 'sqlite:///%s' % os.path.join(tmpdir, 'placement.db')
+    try:
+        client = PlacementClient(setup_app(connection))
+        seeder = Seeder(client, args)
+        start = time.time()
+        seeder.seed()
+        seed_elapsed = time.time() - start
+
+        results = {
+            'config': {
+                'database': connection.split(':', 1)[0],
+                'providers': args.providers,
+                'children': args.children,
+                'sharing': args.sharing,
+                'aggregates': args.aggregates,
+                'trait_ratio': args.trait_ratio,
+                'resources': args.resources,
+                'limit': args.limit,
+                'iterations': args.iterations,
+                'seed': args.seed,
+                'microversion': MICROVERSION,
+            },
+            'seed_elapsed_s': seed_elapsed,
+            'scenarios': {},
+        }
+        for name in args.scenario or SCENARIOS:
+            results['scenarios'][name] = run_scenario(name, client, seeder,
+                                                      args)
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())